@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+基准脚本 - 对比 ChromaDB (HNSW) 与 NumPy 精确检索后端
+在临时目录中构造随机语料，分别写入两个后端，统计检索延迟与 ChromaDB 召回率
+
+用法：
+    python bench_vector_backends.py [--size 20000] [--dim 1024] [--queries 200] [--top-k 10]
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from core.ai.vector_backend import NumpyVectorClient
+
+# 写入批大小（ChromaDB 单次 add 有上限）
+_INSERT_BATCH = 2000
+
+
+def _percentile_ms(samples: list[float], q: float) -> float:
+    """返回毫秒单位的分位数"""
+    return float(np.percentile(np.asarray(samples) * 1000, q))
+
+
+def _fill(collection, vectors: np.ndarray, timestamps: np.ndarray) -> float:
+    """批量写入语料，返回耗时（秒）"""
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), _INSERT_BATCH):
+        end = offset + _INSERT_BATCH
+        ids = [str(i) for i in range(offset, min(end, len(vectors)))]
+        collection.add(
+            ids=ids,
+            embeddings=vectors[offset:end].tolist(),
+            documents=ids,
+            metadatas=[{"created_ts": int(ts)} for ts in timestamps[offset:end]],
+        )
+    return time.perf_counter() - start
+
+
+def _run_queries(collection, queries: np.ndarray, top_k: int, where: dict | None):
+    """执行查询，返回 (每次耗时列表, 每次返回的 ID 列表)"""
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(
+            query_embeddings=[query.tolist()], n_results=top_k, where=where, include=["distances"]
+        )
+        latencies.append(time.perf_counter() - start)
+        results.append(result["ids"][0])
+    return latencies, results
+
+
+def _recall(expected: list[list[str]], actual: list[list[str]]) -> float:
+    """计算 recall@k（以精确检索结果为基准）"""
+    hits = sum(len(set(e) & set(a)) for e, a in zip(expected, actual, strict=True))
+    total = sum(len(e) for e in expected)
+    return hits / total if total else 1.0
+
+
+def main():
+    """主基准函数"""
+    parser = argparse.ArgumentParser(description="对比 ChromaDB 与 NumPy 向量后端")
+    parser.add_argument("--size", type=int, default=20000, help="语料向量数")
+    parser.add_argument("--dim", type=int, default=1024, help="向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询次数")
+    parser.add_argument("--top-k", type=int, default=10, help="每次返回条数")
+    parser.add_argument("--dtype", default="float16", help="NumPy 后端存储精度")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((args.size, args.dim), dtype=np.float32)
+    timestamps = rng.integers(1_700_000_000, 1_800_000_000, size=args.size)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    # 约保留一半文档的时间过滤条件
+    where = {"created_ts": {"$gte": 1_750_000_000}}
+
+    print("=" * 60)
+    print(f"向量后端基准: {args.size} x {args.dim}, {args.queries} 次查询, top_k={args.top_k}")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        collections = {
+            "numpy": NumpyVectorClient(f"{tmp}/numpy", dtype=args.dtype).get_or_create_collection(
+                "bench"
+            )
+        }
+        try:
+            import chromadb
+            from chromadb.config import Settings
+
+            client = chromadb.PersistentClient(
+                path=f"{tmp}/chroma", settings=Settings(anonymized_telemetry=False)
+            )
+            collections["chroma"] = client.get_or_create_collection(
+                "bench", metadata={"hnsw:space": "cosine"}
+            )
+        except ImportError:
+            print("⚠️  ChromaDB 未安装，仅测试 NumPy 后端")
+
+        exact = {}
+        for name, collection in collections.items():
+            elapsed = _fill(collection, vectors, timestamps)
+            print(f"\n[{name}] 写入耗时: {elapsed:.1f}s")
+
+            for label, condition in (("无过滤", None), ("created_ts 过滤", where)):
+                latencies, results = _run_queries(collection, queries, args.top_k, condition)
+                line = (
+                    f"  {label}: p50={_percentile_ms(latencies, 50):.2f}ms "
+                    f"p95={_percentile_ms(latencies, 95):.2f}ms"
+                )
+                # NumPy 后端为精确检索，作为召回率基准
+                if name == "numpy":
+                    exact[label] = results
+                else:
+                    line += f" recall@{args.top_k}={_recall(exact[label], results):.3f}"
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
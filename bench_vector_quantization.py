@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+基准脚本 - 对比 NumPy 向量后端各量化精度的召回率、延迟与内存占用
+以 float32 精确检索为基准，帮助为 summaries / messages 分别选择 VECTOR_NUMPY_*_DTYPE 与重排倍数
+
+用法：
+    python bench_vector_quantization.py [--size 20000] [--dim 1024]
+    python bench_vector_quantization.py --collection data/vectors/numpy/messages
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from core.ai.vector_backend import NumpyCollection
+
+# 写入批大小
+_INSERT_BATCH = 2000
+
+
+def _load_corpus(args) -> np.ndarray:
+    """读取已有 collection 的向量，或生成随机语料"""
+    if args.collection:
+        source = NumpyCollection(args.collection, "source")
+        vectors = np.asarray(source.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+        print(f"已读取 {args.collection}: {len(vectors)} 条向量")
+        return vectors
+
+    rng = np.random.default_rng(42)
+    # 带少量聚类结构的随机向量，比纯高斯噪声更接近真实 embedding 分布
+    centers = rng.standard_normal((64, args.dim), dtype=np.float32)
+    labels = rng.integers(0, len(centers), size=args.size)
+    noise = rng.standard_normal((args.size, args.dim), dtype=np.float32)
+    return centers[labels] + noise * 0.8
+
+
+def _build(path: str, vectors: np.ndarray, dtype: str, rescore_factor: int) -> NumpyCollection:
+    """构建指定精度的临时 collection"""
+    collection = NumpyCollection(path, "bench", dtype=dtype, rescore_factor=rescore_factor)
+    for offset in range(0, len(vectors), _INSERT_BATCH):
+        chunk = vectors[offset : offset + _INSERT_BATCH]
+        collection.add(ids=[str(offset + i) for i in range(len(chunk))], embeddings=chunk.tolist())
+    return collection
+
+
+def _run(collection: NumpyCollection, queries: np.ndarray, top_k: int):
+    """执行查询，返回 (每次耗时列表, 每次返回的 ID 列表)"""
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(
+            query_embeddings=[query.tolist()], n_results=top_k, include=["distances"]
+        )
+        latencies.append(time.perf_counter() - start)
+        results.append(result["ids"][0])
+    return latencies, results
+
+
+def main():
+    """主基准函数"""
+    parser = argparse.ArgumentParser(description="对比 NumPy 向量后端量化精度")
+    parser.add_argument("--collection", help="已有 NumPy collection 目录（不指定则使用随机语料）")
+    parser.add_argument("--size", type=int, default=20000, help="随机语料向量数")
+    parser.add_argument("--dim", type=int, default=1024, help="随机语料向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询次数")
+    parser.add_argument("--top-k", type=int, default=10, help="每次返回条数")
+    parser.add_argument(
+        "--rescore-factors", default="0,2,4,8", help="量化精度下测试的重排倍数（逗号分隔）"
+    )
+    args = parser.parse_args()
+
+    vectors = _load_corpus(args)
+    if len(vectors) == 0:
+        print("⚠️  语料为空")
+        return
+    rng = np.random.default_rng(7)
+    # 以语料中向量加扰动作为查询，模拟相似问题
+    picks = rng.integers(0, len(vectors), size=args.queries)
+    queries = vectors[picks] + rng.standard_normal(
+        (args.queries, vectors.shape[1]), dtype=np.float32
+    ) * float(np.std(vectors))
+    factors = [int(f) for f in args.rescore_factors.split(",") if f.strip()]
+
+    print("=" * 72)
+    print(
+        f"量化基准: {len(vectors)} x {vectors.shape[1]}, {args.queries} 次查询, top_k={args.top_k}"
+    )
+    print("=" * 72)
+    print(f"{'精度':<10}{'重排':>6}{'检索矩阵':>12}{'p50(ms)':>10}{'p95(ms)':>10}{'recall':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = None
+        for dtype in ("float32", "float16", "int8"):
+            for factor in [0] if dtype == "float32" else factors:
+                collection = _build(f"{tmp}/{dtype}-{factor}", vectors, dtype, factor)
+                latencies, results = _run(collection, queries, args.top_k)
+                if exact is None:
+                    exact = results
+                hits = sum(len(set(e) & set(a)) for e, a in zip(exact, results, strict=True))
+                recall = hits / max(1, sum(len(e) for e in exact))
+                info = collection.get_storage_info()
+                matrix_mb = info["search_bytes_per_vector"] * len(vectors) / 1024 / 1024
+                print(
+                    f"{dtype:<10}{factor:>6}{matrix_mb:>10.1f}MB"
+                    f"{np.percentile(latencies, 50) * 1000:>10.2f}"
+                    f"{np.percentile(latencies, 95) * 1000:>10.2f}{recall:>10.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -16,9 +16,21 @@ Agentic RAG 工具定义与执行器
 import asyncio
 import json
 import logging
+import os
 import re
+import time
 from typing import Any
 
+from core.ai.context_packer import (
+    compact_tool_result,
+    context_budget,
+    pack_by_relevance,
+    result_key,
+)
+from core.ai.qa_tracing import get_latency_tracer
+from core.infrastructure.utils.text_chunking import join_passages
+from core.infrastructure.utils.token_estimate import truncate_to_tokens
+
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
@@ -264,31 +276,77 @@ TOOL_SCHEMAS = [
     },
 ]
 
-# 在 tool message 中截断 summary_text 的最大字符数
+# 在 tool message 中截断 summary_text 的最大字符数（未指定文本时的默认截断）
 _SUMMARY_TRUNCATE_LEN = 500
 
+# 单条搜索结果最多占用工具结果 token 预算的比例（1/N）
+_ITEM_BUDGET_DIVISOR = 4
+
+# 同一轮多个工具调用的最大并发数与单个工具的超时（秒）
+AGENT_TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
+AGENT_TOOL_TIMEOUT = float(os.getenv("AGENT_TOOL_TIMEOUT", "30"))
+
+# 引用本轮搜索结果 ID 的工具：需等同一轮的其他工具完成后再按原顺序执行
+_DEPENDENT_TOOLS = frozenset({"rerank_results", "get_source_detail"})
+
 
 class ToolExecutor:
     """工具执行器：将 LLM 的 tool_call 请求路由到实际的检索组件。"""
 
-    def __init__(self, vector_store, memory_manager, reranker):
+    def __init__(self, vector_store, memory_manager, reranker, token_budget: int | None = None):
+        """初始化工具执行器
+
+        执行器保存单次 agent loop 的检索结果与已发送记录，每个问答请求需使用独立实例。
+
+        Args:
+            vector_store: 向量存储
+            memory_manager: 记忆管理器
+            reranker: 重排序器
+            token_budget: 单个工具结果的 token 预算（None 时按默认模型窗口计算）
+        """
         self.vector_store = vector_store
         self.memory_manager = memory_manager
         self.reranker = reranker
         # 累积所有搜索结果，供 rerank_results 按 ID 引用
         self._result_store: dict[int, dict[str, Any]] = {}
         self._doc_result_store: dict[str, dict[str, Any]] = {}
-
-    def reset(self):
-        """重置结果存储（每次 agent loop 开始时调用）"""
+        self.max_concurrency = max(1, AGENT_TOOL_CONCURRENCY)
+        self.tool_timeout = AGENT_TOOL_TIMEOUT
+        # 单个工具结果的 token 预算（None 时按默认模型窗口计算）
+        self.token_budget = token_budget
+        # 工具调用轮次；文档键 -> 原文所在轮次；轮次 -> 该轮涉及的文档键
+        self._round = 0
+        self._sent: dict[str, int] = {}
+        self._round_keys: dict[int, set[str]] = {}
+
+    def reset(self, token_budget: int | None = None):
+        """重置结果存储（每次 agent loop 开始时调用）
+
+        Args:
+            token_budget: 单个工具结果的 token 预算，通常按当前模型上下文窗口计算
+        """
         self._result_store.clear()
         self._doc_result_store.clear()
+        self.token_budget = token_budget
+        self._round = 0
+        self._sent.clear()
+        self._round_keys.clear()
+
+    @property
+    def budget(self) -> int:
+        """单个工具结果的 token 预算"""
+        return self.token_budget or context_budget()
 
     async def execute(self, tool_name: str, arguments: dict[str, Any]) -> str:
         """执行工具调用，返回 JSON 字符串格式的结果。
 
         所有异常都被捕获并作为错误结果返回，不会向上抛出。
         """
+        with get_latency_tracer().span(f"tool.{tool_name}"):
+            return await self._dispatch(tool_name, arguments)
+
+    async def _dispatch(self, tool_name: str, arguments: dict[str, Any]) -> str:
+        """按工具名路由到具体实现"""
         try:
             if tool_name == "semantic_search":
                 return await self._execute_semantic_search(arguments)
@@ -316,6 +374,47 @@ class ToolExecutor:
                 {"error": f"工具执行失败: {type(e).__name__}: {e}"}, ensure_ascii=False
             )
 
+    async def execute_many(self, calls: list[tuple[str, dict[str, Any]]]) -> list[str]:
+        """并发执行同一轮的多个工具调用，结果按调用顺序返回。
+
+        相互独立的工具在并发上限内同时执行，每个工具单独超时；
+        rerank_results / get_source_detail 依赖本轮搜索结果，在其余工具完成后按顺序执行。
+        """
+        self._round += 1
+        results: list[str | None] = [None] * len(calls)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(index: int) -> None:
+            tool_name, arguments = calls[index]
+            async with semaphore:
+                results[index] = await self._execute_with_timeout(tool_name, arguments)
+
+        independent = [i for i, (name, _) in enumerate(calls) if name not in _DEPENDENT_TOOLS]
+        await asyncio.gather(*(run(i) for i in independent))
+
+        for i, (tool_name, arguments) in enumerate(calls):
+            if results[i] is None:
+                results[i] = await self._execute_with_timeout(tool_name, arguments)
+        return results
+
+    async def _execute_with_timeout(self, tool_name: str, arguments: dict[str, Any]) -> str:
+        """执行单个工具调用，超时时返回错误结果"""
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                self.execute(tool_name, arguments), timeout=self.tool_timeout
+            )
+        except TimeoutError:
+            logger.warning(f"工具执行超时 [{tool_name}]: {self.tool_timeout:.1f}s")
+            return json.dumps(
+                {"error": f"工具执行超时（{self.tool_timeout:.0f}s），请缩小范围或换用其他工具"},
+                ensure_ascii=False,
+            )
+        logger.debug(
+            f"工具执行完成 [{tool_name}]: 耗时 {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+        return result
+
     # ---- 各工具实现 ----
 
     async def _execute_semantic_search(self, args: dict) -> str:
@@ -332,7 +431,7 @@ class ToolExecutor:
         collection = args.get("collection", "all")
 
         if collection == "messages" and self.vector_store.is_messages_available():
-            results = self.vector_store.search_messages(
+            results = await self.vector_store.asearch_messages(
                 query=args["query"],
                 top_k=args.get("top_k", 20),
                 filter_metadata=filter_metadata,
@@ -340,7 +439,7 @@ class ToolExecutor:
                 date_before=args.get("date_before"),
             )
         elif collection == "summaries":
-            results = self.vector_store.search_similar(
+            results = await self.vector_store.asearch_similar(
                 query=args["query"],
                 top_k=args.get("top_k", 20),
                 filter_metadata=filter_metadata,
@@ -350,7 +449,7 @@ class ToolExecutor:
         else:
             # 默认: 同时搜索 summaries + messages
             if self.vector_store.is_messages_available():
-                results = self.vector_store.search_all(
+                results = await self.vector_store.asearch_all(
                     query=args["query"],
                     top_k=args.get("top_k", 20),
                     filter_metadata=filter_metadata,
@@ -358,7 +457,7 @@ class ToolExecutor:
                     date_before=args.get("date_before"),
                 )
             else:
-                results = self.vector_store.search_similar(
+                results = await self.vector_store.asearch_similar(
                     query=args["query"],
                     top_k=args.get("top_k", 20),
                     filter_metadata=filter_metadata,
@@ -366,11 +465,8 @@ class ToolExecutor:
                     date_before=args.get("date_before"),
                 )
 
-        # 累积到 result_store 并序列化（截断长文本）
-        serialized = []
-        for r in results:
-            self._store_result(r)
-            serialized.append(self._serialize_result(r))
+        # 累积到 result_store，并按 token 预算打包
+        serialized = self._pack_results(results)
 
         return json.dumps(
             {"results": serialized, "count": len(serialized)},
@@ -387,7 +483,7 @@ class ToolExecutor:
         )
 
         # keyword_search 返回原始 DB 行，需要归一化为统一格式
-        serialized = []
+        normalized_results = []
         for r in results:
             sid = r.get("id")
             if sid is None:
@@ -404,16 +500,16 @@ class ToolExecutor:
                     "post_links": post_links,
                 },
             }
-            self._store_result(normalized)
-            serialized.append(self._serialize_result(normalized))
+            normalized_results.append(normalized)
 
+        serialized = self._pack_results(normalized_results)
         return json.dumps(
             {"results": serialized, "count": len(serialized)},
             ensure_ascii=False,
         )
 
     async def _execute_rerank(self, args: dict) -> str:
-        if not self.reranker.is_available():
+        if not (self.reranker.is_available() or self.reranker.is_local_available()):
             return json.dumps(
                 {"error": "重排序服务不可用", "results": [], "count": 0}, ensure_ascii=False
             )
@@ -426,21 +522,15 @@ class ToolExecutor:
                 {"error": "未找到有效的结果ID", "results": [], "count": 0}, ensure_ascii=False
             )
 
-        loop = asyncio.get_running_loop()
-        reranked = await loop.run_in_executor(
-            None,
-            lambda: self.reranker.rerank(
+        with get_latency_tracer().span("rerank"):
+            reranked = await self.reranker.arerank(
                 query=args["query"],
                 candidates=candidates,
                 top_k=args.get("top_k", 5),
-            ),
-        )
+            )
 
-        # 更新 result_store 中的结果（含 rerank_score）
-        serialized = []
-        for r in reranked:
-            self._store_result(r)
-            serialized.append(self._serialize_result(r))
+        # 更新 result_store 中的结果（含 rerank_score），之前已发送原文的文档只返回引用
+        serialized = self._pack_results(reranked)
 
         return json.dumps(
             {"results": serialized, "count": len(serialized)},
@@ -469,7 +559,7 @@ class ToolExecutor:
             limit=args.get("limit", 5),
             time_range_days=args.get("time_range_days"),
         )
-        serialized = []
+        normalized_results = []
         for r in results:
             sid = r.get("id") or r.get("summary_id")
             if sid is None:
@@ -487,9 +577,9 @@ class ToolExecutor:
                 },
                 "source": "summary",
             }
-            self._store_result(normalized)
-            serialized.append(self._serialize_result(normalized))
+            normalized_results.append(normalized)
 
+        serialized = self._pack_results(normalized_results)
         return json.dumps({"results": serialized, "count": len(serialized)}, ensure_ascii=False)
 
     async def _execute_channel_stats(self, args: dict) -> str:
@@ -513,8 +603,11 @@ class ToolExecutor:
                 ensure_ascii=False,
             )
 
-        detail = self._serialize_result(result)
-        detail["summary_text"] = result.get("summary_text", "")
+        # 完整原文（超出预算时截断），并记为已发送
+        detail = self._serialize_result(
+            result, text=truncate_to_tokens(result.get("summary_text", ""), self.budget)
+        )
+        self._mark_sent(result_key(result))
         return json.dumps({"detail": detail}, ensure_ascii=False)
 
     async def _execute_channel_info(self, args: dict) -> str:
@@ -533,13 +626,101 @@ class ToolExecutor:
 
     # ---- 辅助方法 ----
 
-    @staticmethod
-    def _serialize_result(result: dict) -> dict:
-        """序列化单条结果用于 tool message（截断长文本）。"""
-        text = result.get("summary_text", "")
-        truncated = (
-            text[:_SUMMARY_TRUNCATE_LEN] + "..." if len(text) > _SUMMARY_TRUNCATE_LEN else text
+    def _pack_results(self, results: list[dict[str, Any]]) -> list[dict]:
+        """累积搜索结果并按 token 预算序列化。
+
+        - 本次 agent loop 中已发送过原文的文档只返回引用，不重复占用上下文
+        - 其余文档按相关度贪心填充预算，单条最多占用预算的 1/4，超出预算的只返回引用
+        """
+        budget = self.budget
+        fresh, texts, fresh_keys = [], [], set()
+        for r in results:
+            self._store_result(r)
+            key = result_key(r)
+            if key is None or (key not in self._sent and key not in fresh_keys):
+                fresh.append(r)
+                texts.append(self._result_text(r, budget))
+                fresh_keys.add(key)
+
+        packed = pack_by_relevance(
+            fresh, texts, budget, max_item_tokens=budget // _ITEM_BUDGET_DIVISOR
         )
+        packed_by_id = {id(r): text for r, text in zip(fresh, packed, strict=True)}
+
+        serialized = []
+        for r in results:
+            key = result_key(r)
+            if id(r) not in packed_by_id:
+                self._mark_sent(key)
+                serialized.append(self._reference_entry(r, "已在之前的结果中提供原文"))
+            elif packed_by_id[id(r)] is None:
+                serialized.append(
+                    self._reference_entry(r, "超出上下文预算，可调用 get_source_detail 获取原文")
+                )
+            else:
+                self._mark_sent(key)
+                serialized.append(self._serialize_result(r, text=packed_by_id[id(r)]))
+        return serialized
+
+    def _mark_sent(self, key: str | None) -> None:
+        """记录本轮涉及的文档；首次发送原文时记录原文所在轮次"""
+        if key is None:
+            return
+        self._sent.setdefault(key, self._round)
+        self._round_keys.setdefault(self._round, set()).add(key)
+
+    def compact_history(self, messages: list[dict], indices: list[int]) -> None:
+        """将较早轮次的工具结果压缩为文档 ID 引用（原地修改 messages）。
+
+        最新一轮仍引用的文档保留原文；原文被压缩掉的文档之后再次检索到时重新发送。
+
+        Args:
+            messages: 对话消息列表
+            indices: 最新一轮之前所有工具结果消息在 messages 中的下标
+        """
+        keep = self._round_keys.get(self._round, set())
+        for index in indices:
+            messages[index]["content"] = compact_tool_result(messages[index]["content"], keep)
+        for key, sent_round in list(self._sent.items()):
+            if sent_round < self._round and key not in keep:
+                del self._sent[key]
+
+    @staticmethod
+    def _result_text(result: dict, budget: int) -> str:
+        """发送给 LLM 的候选原文：有命中段落时为段落（按原文顺序），否则为全文"""
+        passages = result.get("matched_passages")
+        if passages:
+            # 字符上限只做粗略约束（每 token 至多约 4 字符），精确截断交给 token 预算
+            return join_passages(passages, budget * 4)
+        return result.get("summary_text", "")
+
+    @staticmethod
+    def _reference_entry(result: dict, note: str) -> dict:
+        """只含 ID、来源与分数的结果引用"""
+        entry = ToolExecutor._serialize_result(result, text="")
+        del entry["summary_text"]
+        del entry["post_links"]
+        entry["note"] = note
+        return entry
+
+    @staticmethod
+    def _serialize_result(result: dict, text: str | None = None) -> dict:
+        """序列化单条结果用于 tool message。
+
+        Args:
+            result: 搜索结果
+            text: 发送的正文（已按预算处理）；为空时按固定长度截断
+        """
+        if text is not None:
+            truncated = text
+        elif passages := result.get("matched_passages"):
+            # 长总结只发送命中的段落，完整内容可通过 get_source_detail 获取
+            truncated = join_passages(passages, _SUMMARY_TRUNCATE_LEN)
+        else:
+            full = result.get("summary_text", "")
+            truncated = (
+                full[:_SUMMARY_TRUNCATE_LEN] + "..." if len(full) > _SUMMARY_TRUNCATE_LEN else full
+            )
 
         metadata = result.get("metadata", {})
         created_at = metadata.get("created_at")
@@ -0,0 +1,291 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+问答语义缓存 - 相近问题在同一频道/时间范围内直接复用已生成的回答
+
+- 键：(解析出的频道, 时间范围) 作用域 + 查询向量邻域（余弦相似度 ≥ 阈值）
+- 失效：每个作用域记录写入时的"代数"，新总结保存或消息向量变更时递增代数，
+  代数不一致的条目在下次查询时丢弃
+- 代数保存在 data/ 下的小 JSON 文件中：总结与消息由主进程写入，
+  问答 Bot 运行在独立进程，通过文件修改时间感知变化
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 缓存配置
+DEFAULT_MAX_SIZE = 256  # 最大缓存条目数，0 表示禁用
+DEFAULT_TTL = 600  # 条目生存时间（秒），0 表示永不过期
+DEFAULT_THRESHOLD = 0.95  # 命中所需的最小余弦相似度
+
+# 未限定频道的回答检索全部频道，任何频道的变更都会使其失效
+ALL_CHANNELS = "*"
+
+
+class ChannelGenerations:
+    """频道代数表（跨进程共享，读取时按文件修改时间按需重新加载）"""
+
+    def __init__(self, path: str | None = None):
+        """
+        初始化代数表
+
+        Args:
+            path: 代数文件路径，为空时仅在进程内生效
+        """
+        self.path = Path(path) if path else None
+        self._generations: dict[str, int] = {}
+        self._mtime: int | None = None
+        self._lock = threading.Lock()
+
+    def _reload_locked(self) -> None:
+        """文件被其他进程更新时重新加载（调用方需持有锁）"""
+        if self.path is None:
+            return
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            self._generations = json.loads(self.path.read_text(encoding="utf-8"))
+            self._mtime = mtime
+        except Exception as e:
+            logger.warning(f"读取答案缓存代数文件失败: {type(e).__name__}: {e}")
+
+    def get(self, key: str) -> int:
+        """获取作用域当前代数"""
+        with self._lock:
+            self._reload_locked()
+            return self._generations.get(key, 0)
+
+    def bump(self, channel_ids: list[str]) -> None:
+        """递增频道代数（同时递增全局代数），并原子写回文件"""
+        with self._lock:
+            self._reload_locked()
+            for key in {*channel_ids, ALL_CHANNELS}:
+                self._generations[key] = self._generations.get(key, 0) + 1
+            if self.path is None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            tmp_path.write_text(json.dumps(self._generations), encoding="utf-8")
+            tmp_path.replace(self.path)
+            self._mtime = self.path.stat().st_mtime_ns
+
+
+class SemanticAnswerCache:
+    """问答语义缓存
+
+    条目按作用域 (channel_id, time_range) 分组，作用域内按查询向量余弦相似度匹配。
+    支持 LRU 淘汰、TTL 过期与按频道代数失效，并统计命中率用于调优阈值与容量。
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        ttl: int = DEFAULT_TTL,
+        threshold: float = DEFAULT_THRESHOLD,
+        generations: ChannelGenerations | None = None,
+    ):
+        """初始化缓存
+
+        Args:
+            max_size: 最大缓存条目数（LRU淘汰阈值），0 表示禁用缓存
+            ttl: 条目生存时间（秒），0 表示永不过期
+            threshold: 命中所需的最小余弦相似度
+            generations: 频道代数表
+        """
+        self._max_size = max_size
+        self._ttl = ttl
+        self._threshold = threshold
+        self.generations = generations or ChannelGenerations()
+        # entry_id -> {"scope", "vector", "answer", "generation", "timestamp"}
+        self._entries: OrderedDict[int, dict[str, Any]] = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """缓存是否启用"""
+        return self._max_size > 0
+
+    @staticmethod
+    def _scope(channel_id: str | None, time_range: int | None) -> tuple[str, int | None]:
+        return channel_id or ALL_CHANNELS, time_range
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray | None:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def current_generation(self, channel_id: str | None) -> int:
+        """作用域当前代数（生成回答前记录，写入缓存时传入，避免生成期间的变更被忽略）"""
+        return self.generations.get(channel_id or ALL_CHANNELS)
+
+    def get(
+        self, embedding: list[float], channel_id: str | None, time_range: int | None
+    ) -> str | None:
+        """查找相近问题的缓存回答
+
+        Args:
+            embedding: 查询向量
+            channel_id: 解析出的频道（None 表示全部频道）
+            time_range: 时间范围（天）
+
+        Returns:
+            缓存的回答，未命中返回 None
+        """
+        if not self.enabled:
+            return None
+
+        vector = self._normalize(embedding)
+        scope = self._scope(channel_id, time_range)
+        generation = self.current_generation(channel_id)
+        now = time.monotonic()
+
+        with self._lock:
+            best_id, best_score = None, self._threshold
+            for entry_id, entry in list(self._entries.items()):
+                if entry["scope"] != scope:
+                    continue
+                if entry["generation"] != generation:
+                    del self._entries[entry_id]
+                    self._invalidations += 1
+                    continue
+                if self._ttl and now - entry["timestamp"] > self._ttl:
+                    del self._entries[entry_id]
+                    self._expirations += 1
+                    continue
+                if vector is None or entry["vector"].shape != vector.shape:
+                    continue
+                score = float(entry["vector"] @ vector)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self._hits += 1
+            logger.debug(f"答案缓存命中: similarity={best_score:.4f}")
+            return self._entries[best_id]["answer"]
+
+    def set(
+        self,
+        embedding: list[float],
+        channel_id: str | None,
+        time_range: int | None,
+        answer: str,
+        generation: int | None = None,
+    ) -> None:
+        """缓存回答
+
+        Args:
+            embedding: 查询向量
+            channel_id: 解析出的频道（None 表示全部频道）
+            time_range: 时间范围（天）
+            answer: 完整回答文本
+            generation: 开始生成回答时的作用域代数，为空时使用当前代数
+        """
+        if not self.enabled or not answer:
+            return
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+
+        scope = self._scope(channel_id, time_range)
+        entry = {
+            "scope": scope,
+            "vector": vector,
+            "answer": answer,
+            "generation": (
+                self.current_generation(channel_id) if generation is None else generation
+            ),
+            "timestamp": time.monotonic(),
+        }
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存（统计数据保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "ttl": self._ttl,
+                "threshold": self._threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# 创建全局答案缓存实例
+answer_cache = None
+
+
+def get_answer_cache():
+    """获取全局问答语义缓存实例"""
+    global answer_cache
+    if answer_cache is None:
+        answer_cache = SemanticAnswerCache(
+            max_size=int(os.getenv("QA_ANSWER_CACHE_SIZE", str(DEFAULT_MAX_SIZE))),
+            ttl=int(os.getenv("QA_ANSWER_CACHE_TTL", str(DEFAULT_TTL))),
+            threshold=float(os.getenv("QA_ANSWER_CACHE_THRESHOLD", str(DEFAULT_THRESHOLD))),
+            generations=ChannelGenerations(
+                os.getenv("QA_ANSWER_CACHE_GENERATIONS_PATH", "data/answer_cache_generations.json")
+            ),
+        )
+    return answer_cache
+
+
+async def invalidate_channel_answers(*channel_ids: str) -> None:
+    """频道内容变更后使相关缓存回答失效（失败不影响调用方）"""
+    cache = get_answer_cache()
+    if not cache.enabled:
+        return
+    try:
+        await asyncio.to_thread(cache.generations.bump, [c for c in channel_ids if c])
+    except Exception as e:
+        logger.warning(f"更新答案缓存代数失败: {type(e).__name__}: {e}")
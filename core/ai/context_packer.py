@@ -0,0 +1,169 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+RAG 上下文打包 - 按 token 预算与相关度选择发送给 LLM 的文档内容
+
+- 预算：按模型上下文窗口的比例计算，并受 QA_CONTEXT_MAX_TOKENS 上限约束
+- 打包：按相关度（重排分 > 相似度 > 关键词相关度）贪心填充预算，放不下的文档截断或省略
+- 压缩：较早轮次的工具结果只保留文档 ID 引用，避免多轮 agent 循环中提示词持续膨胀
+"""
+
+import json
+import os
+from typing import Any
+
+from core.infrastructure.utils.token_estimate import estimate_tokens, truncate_to_tokens
+
+# 常见模型的上下文窗口（token，按模型名小写前缀匹配，越具体的前缀越靠前）
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5": 16_000,
+    "gpt-4o": 128_000,
+    "gpt-4.1": 1_000_000,
+    "gpt-4": 8_000,
+    "deepseek": 64_000,
+    "qwen": 32_000,
+    "glm": 128_000,
+    "moonshot": 128_000,
+    "claude": 200_000,
+    "gemini": 1_000_000,
+}
+DEFAULT_CONTEXT_WINDOW = 32_000
+
+# 单次检索上下文（RAG 提示词或单个工具结果）最多占用的上下文窗口比例与 token 上限
+QA_CONTEXT_WINDOW_RATIO = float(os.getenv("QA_CONTEXT_WINDOW_RATIO", "0.25"))
+QA_CONTEXT_MAX_TOKENS = int(os.getenv("QA_CONTEXT_MAX_TOKENS", "4000"))
+
+# 预算下限，以及截断文档时至少保留的 token 数（更少时直接省略该文档）
+_MIN_BUDGET = 256
+_MIN_DOCUMENT_TOKENS = 64
+
+
+def context_budget(model: str | None = None) -> int:
+    """
+    计算单次检索上下文的 token 预算
+
+    Args:
+        model: LLM 模型名称
+
+    Returns:
+        int: token 预算
+    """
+    name = (model or "").lower().rsplit("/", 1)[-1]
+    window = next(
+        (size for prefix, size in MODEL_CONTEXT_WINDOWS.items() if name.startswith(prefix)),
+        DEFAULT_CONTEXT_WINDOW,
+    )
+    return max(_MIN_BUDGET, min(QA_CONTEXT_MAX_TOKENS, int(window * QA_CONTEXT_WINDOW_RATIO)))
+
+
+def relevance_score(doc: dict[str, Any]) -> float:
+    """文档相关度：优先使用重排分，其次向量相似度与关键词检索相关度"""
+    for field in ("rerank_score", "similarity", "relevance"):
+        value = doc.get(field)
+        if value is not None:
+            return float(value)
+    return 0.0
+
+
+def pack_by_relevance(
+    docs: list[dict[str, Any]],
+    texts: list[str],
+    budget: int,
+    max_item_tokens: int | None = None,
+) -> list[str | None]:
+    """
+    按相关度贪心分配 token 预算
+
+    Args:
+        docs: 文档列表（用于读取相关度）
+        texts: 与 docs 一一对应的候选文本
+        budget: token 预算
+        max_item_tokens: 单个文档最多占用的 token 数
+
+    Returns:
+        与输入顺序对应的文本列表：完整放入、截断后放入，或放不下时为 None
+    """
+    # 相关度相同时保持原顺序（上游已排序的结果不会被打乱）
+    order = sorted(range(len(docs)), key=lambda i: -relevance_score(docs[i]))
+    packed: list[str | None] = [None] * len(docs)
+    remaining = budget
+    min_tokens = min(_MIN_DOCUMENT_TOKENS, max_item_tokens or _MIN_DOCUMENT_TOKENS)
+    for index in order:
+        limit = min(remaining, max_item_tokens) if max_item_tokens else remaining
+        if limit < min_tokens:
+            continue
+        text = truncate_to_tokens(texts[index], limit)
+        packed[index] = text
+        remaining -= estimate_tokens(text)
+    return packed
+
+
+def result_key(result: dict[str, Any]) -> str | None:
+    """检索结果的去重键：消息用 doc_id，总结用 summary_id"""
+    if result.get("doc_id"):
+        return f"doc:{result['doc_id']}"
+    if result.get("summary_id") is not None:
+        return f"summary:{result['summary_id']}"
+    return None
+
+
+def _compact_entry(entry: dict[str, Any]) -> dict[str, Any]:
+    """只保留文档引用与分数"""
+    compact = {
+        field: entry[field]
+        for field in ("summary_id", "doc_id", "channel_name", "created_at", "rerank_score")
+        if entry.get(field) is not None
+    }
+    compact["compressed"] = True
+    return compact
+
+
+def compact_tool_result(content: str, keep_keys: set[str] | None = None) -> str:
+    """
+    将较早轮次的工具结果压缩为文档 ID 引用
+
+    Args:
+        content: 工具结果 JSON 字符串
+        keep_keys: 仍需保留正文的文档键（后续轮次以引用方式指向的文档）
+
+    Returns:
+        压缩后的 JSON 字符串；无法解析或不含文档时原样返回
+    """
+    try:
+        payload = json.loads(content)
+    except (TypeError, ValueError):
+        return content
+    if not isinstance(payload, dict):
+        return content
+
+    keep_keys = keep_keys or set()
+    changed = False
+    results = payload.get("results")
+    if isinstance(results, list):
+        compacted = []
+        for entry in results:
+            if isinstance(entry, dict) and "summary_text" in entry:
+                if result_key(entry) not in keep_keys:
+                    entry = _compact_entry(entry)
+                    changed = True
+            compacted.append(entry)
+        payload["results"] = compacted
+
+    detail = payload.get("detail")
+    if isinstance(detail, dict) and "summary_text" in detail:
+        if result_key(detail) not in keep_keys:
+            payload["detail"] = _compact_entry(detail)
+            changed = True
+
+    if not changed:
+        return content
+    payload["note"] = "较早的检索结果已压缩为引用，如需原文请调用 get_source_detail"
+    return json.dumps(payload, ensure_ascii=False)
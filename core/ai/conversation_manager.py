@@ -11,16 +11,64 @@
 """
 会话管理器 - 管理用户的多轮对话会话
 实现会话生命周期管理、超时检测和状态维护
+
+对话历史采用写穿透的内存环形缓冲：
+- 每个会话在内存中保留最近 MAX_MESSAGES_PER_SESSION 条消息，读取直接命中内存
+- 新消息先写入内存，再由后台任务按批次异步写入 MySQL
+- 只有缓存未命中（如重启后、被 LRU 淘汰）时才从数据库读取，内存按会话数 LRU 限制
+
+长会话滚动压缩：缓冲中的历史超过 token 阈值后，在后台把较早的轮次合并进会话的运行摘要，
+缓冲只保留最近的消息；格式化上下文时输出「摘要 + 最近轮次」并受固定 token 预算约束。
+摘要以 role=summary 的记录写入对话历史表，缓冲被淘汰或重启后从数据库一并恢复
+
+会话表（user_id -> 当前会话）按 LRU 与超时时间限制大小，并定期写入 data/ 下的快照文件，
+重启后恢复未超时的会话，用户的多轮对话不会因重启而中断
 """
 
+import asyncio
+import json
 import logging
+import os
+import time
 import uuid
+from collections import OrderedDict, deque
 from datetime import UTC, datetime, timedelta
+from pathlib import Path
 
 from core.infrastructure.database import get_db_manager
+from core.infrastructure.utils.token_estimate import estimate_tokens, truncate_to_tokens
 
 logger = logging.getLogger(__name__)
 
+# 内存中保留对话历史的最大会话数（LRU 淘汰）
+QA_HISTORY_CACHE_SESSIONS = int(os.getenv("QA_HISTORY_CACHE_SESSIONS", "1000"))
+# 待写入消息的批量写入延迟（秒）
+QA_HISTORY_FLUSH_INTERVAL = float(os.getenv("QA_HISTORY_FLUSH_INTERVAL", "1.0"))
+# 数据库不可用时最多积压的待写入消息数（超出后丢弃最早的消息）
+_MAX_PENDING_MESSAGES = 5000
+
+# 会话表最多保留的用户数（LRU 淘汰）与会话快照文件（为空时不持久化）
+QA_SESSION_CACHE_SIZE = int(os.getenv("QA_SESSION_CACHE_SIZE", "10000"))
+DEFAULT_SESSION_SNAPSHOT_PATH = "data/qa_sessions.json"
+# 会话快照写入最小间隔（秒），写入前清理已超时的会话
+_SESSION_SNAPSHOT_INTERVAL = 30
+
+# 会话历史超过该 token 数后压缩较早的轮次（0 禁用），压缩时保留的最近消息数
+QA_HISTORY_COMPACT_TOKENS = int(os.getenv("QA_HISTORY_COMPACT_TOKENS", "2000"))
+QA_HISTORY_RECENT_MESSAGES = int(os.getenv("QA_HISTORY_RECENT_MESSAGES", "4"))
+# 格式化后的对话上下文（摘要 + 最近轮次）的 token 预算，摘要最多占用其中一半
+QA_HISTORY_CONTEXT_TOKENS = int(os.getenv("QA_HISTORY_CONTEXT_TOKENS", "1500"))
+
+HISTORY_SUMMARY_PROMPT = """请将以下对话记录合并进已有的对话摘要，生成新的摘要。
+要求：保留用户关心的主题、提到的频道与时间范围、已给出的关键结论和未解决的问题；
+省略寒暄与重复内容；使用简洁的中文陈述，不超过300字，只输出摘要本身。
+
+【已有摘要】
+{previous}
+
+【新的对话记录】
+{transcript}"""
+
 
 class ConversationManager:
     """会话管理器 - 负责管理用户的对话会话"""
@@ -34,8 +82,21 @@ class ConversationManager:
     def __init__(self):
         """初始化会话管理器"""
         self.db = get_db_manager()
-        # 内存缓存：user_id -> {session_id, last_active}
-        self._session_cache: dict[int, dict[str, any]] = {}
+        # 会话表：user_id -> {session_id, last_active}（按最近活动排序）
+        self._session_cache: OrderedDict[int, dict[str, any]] = OrderedDict()
+        snapshot_path = os.getenv("QA_SESSION_SNAPSHOT_PATH", DEFAULT_SESSION_SNAPSHOT_PATH)
+        self._session_snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._last_session_save = time.monotonic()
+        self._load_sessions()
+        # 对话历史环形缓冲：(user_id, session_id) -> 最近的消息（按最近使用排序）
+        self._history: OrderedDict[tuple[int, str], deque[dict]] = OrderedDict()
+        # 等待批量写入数据库的消息
+        self._pending: list[dict] = []
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        # 较早轮次的运行摘要：(user_id, session_id) -> 摘要文本（随历史缓冲一起淘汰，可从数据库恢复）
+        self._summaries: dict[tuple[int, str], str] = {}
+        self._compact_tasks: dict[tuple[int, str], asyncio.Task] = {}
         logger.info("会话管理器初始化完成")
 
     def get_or_create_session(self, user_id: int) -> tuple[str, bool]:
@@ -61,15 +122,20 @@ class ConversationManager:
                 if (now - last_active) < timedelta(minutes=self.SESSION_TIMEOUT_MINUTES):
                     # 会话仍然有效，更新活动时间
                     cached["last_active"] = now
+                    self._session_cache.move_to_end(user_id)
+                    self._maybe_save_sessions()
                     logger.debug(f"用户 {user_id} 继续使用会话 {session_id}")
                     return session_id, False
                 else:
                     # 会话超时，创建新会话
                     logger.info(f"用户 {user_id} 的会话 {session_id} 已超时")
+                    self._forget_history(user_id, session_id)
 
-            # 创建新会话
+            # 创建新会话（新会话没有历史，直接建立空缓冲，无需查询数据库）
             session_id = str(uuid.uuid4())
-            self._session_cache[user_id] = {"session_id": session_id, "last_active": now}
+            self._remember_session(user_id, session_id, now)
+            self._remember_history(user_id, session_id, [])
+            self._maybe_save_sessions()
 
             logger.info(f"为用户 {user_id} 创建新会话 {session_id}")
             return session_id, True
@@ -83,7 +149,7 @@ class ConversationManager:
         self, user_id: int, session_id: str, role: str, content: str, metadata: dict | None = None
     ) -> bool:
         """
-        保存对话消息
+        保存对话消息（写入内存缓冲，数据库写入在后台批量进行）
 
         Args:
             user_id: 用户ID
@@ -96,21 +162,41 @@ class ConversationManager:
             是否成功
         """
         try:
-            # 保存到数据库
-            success = await self.db.save_conversation(
-                user_id=user_id,
-                session_id=session_id,
-                role=role,
-                content=content,
-                metadata=metadata,
+            now = datetime.now(UTC)
+
+            # 缓冲已加载时追加（未加载时下次读取会先写入数据库再加载）
+            buffer = self._history.get((user_id, session_id))
+            if buffer is not None:
+                message = {
+                    "role": role,
+                    "content": content,
+                    "timestamp": now.replace(tzinfo=None).isoformat(),
+                }
+                if metadata:
+                    message["metadata"] = metadata
+                buffer.append(message)
+                self._history.move_to_end((user_id, session_id))
+                if role == "assistant":
+                    self._maybe_compact(user_id, session_id)
+
+            self._pending.append(
+                {
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "role": role,
+                    "content": content,
+                    "metadata": metadata,
+                    "timestamp": now,
+                }
             )
+            self._schedule_flush()
 
-            if success:
-                # 更新缓存的活动时间
-                if user_id in self._session_cache:
-                    self._session_cache[user_id]["last_active"] = datetime.now(UTC)
+            # 更新缓存的活动时间
+            if user_id in self._session_cache:
+                self._session_cache[user_id]["last_active"] = now
+                self._session_cache.move_to_end(user_id)
 
-            return success
+            return True
 
         except Exception as e:
             logger.error(f"保存消息失败: {type(e).__name__}: {e}", exc_info=True)
@@ -125,13 +211,30 @@ class ConversationManager:
             session_id: 会话ID
 
         Returns:
-            对话历史列表，格式：[{'role': 'user', 'content': '...'}, ...]
+            对话历史列表，格式：[{'role': 'user', 'content': '...'}, ...]；
+            较早轮次已压缩时，第一项为 {'role': 'summary', 'content': 摘要}
         """
         try:
+            key = (user_id, session_id)
+            buffer = self._history.get(key)
+            if buffer is not None:
+                self._history.move_to_end(key)
+                summary = self._summaries.get(key)
+                if summary:
+                    return [{"role": "summary", "content": summary}, *buffer]
+                return list(buffer)
+
+            # 缓存未命中：先写入待保存的消息，再从数据库加载（含最近一次的摘要）
+            await self.flush()
             history = await self.db.get_conversation_history(
                 user_id=user_id, session_id=session_id, limit=self.MAX_MESSAGES_PER_SESSION
             )
-            return history
+            summary, history = self._split_summary(history)
+            buffer = self._remember_history(user_id, session_id, history)
+            if summary:
+                self._summaries[key] = summary
+                return [{"role": "summary", "content": summary}, *buffer]
+            return list(buffer)
 
         except Exception as e:
             logger.error(f"获取对话历史失败: {type(e).__name__}: {e}", exc_info=True)
@@ -149,6 +252,20 @@ class ConversationManager:
             删除的记录数
         """
         try:
+            # 丢弃尚未写入的消息与内存缓冲
+            self._pending = [
+                row
+                for row in self._pending
+                if row["user_id"] != user_id
+                or (session_id is not None and row["session_id"] != session_id)
+            ]
+            for key in [
+                key
+                for key in self._history
+                if key[0] == user_id and (session_id is None or key[1] == session_id)
+            ]:
+                self._forget_history(*key)
+
             # 从数据库删除
             deleted = await self.db.clear_user_conversations(user_id, session_id)
 
@@ -170,10 +287,10 @@ class ConversationManager:
 
     def format_conversation_context(self, history: list) -> str:
         """
-        格式化对话历史为上下文字符串
+        格式化对话历史为上下文字符串（摘要 + 最近轮次，总长度受 token 预算约束）
 
         Args:
-            history: 对话历史列表
+            history: 对话历史列表（可包含 get_conversation_history 返回的摘要项）
 
         Returns:
             格式化的上下文字符串
@@ -181,9 +298,18 @@ class ConversationManager:
         if not history:
             return ""
 
-        context_parts = []
+        budget = QA_HISTORY_CONTEXT_TOKENS
+        summary_part = ""
+        messages = history
+        if history[0]["role"] == "summary":
+            summary = truncate_to_tokens(history[0]["content"], budget // 2)
+            summary_part = f"较早对话摘要：{summary}"
+            budget -= estimate_tokens(summary_part)
+            messages = history[1:]
 
-        for item in history:
+        # 从最近的消息开始填充预算，超出预算的更早消息省略
+        context_parts = []
+        for item in reversed(messages):
             role = item["role"]
             content = item["content"]
 
@@ -194,9 +320,16 @@ class ConversationManager:
             if len(content) > 500:
                 content = content[:500] + "..."
 
-            context_parts.append(f"{role_name}：{content}")
+            line = f"{role_name}：{content}"
+            cost = estimate_tokens(line)
+            if cost > budget and context_parts:
+                break
+            context_parts.append(line)
+            budget -= cost
 
-        return "\n".join(context_parts)
+        if summary_part:
+            context_parts.append(summary_part)
+        return "\n".join(reversed(context_parts))
 
     async def get_session_info(self, user_id: int) -> dict | None:
         """
@@ -220,9 +353,10 @@ class ConversationManager:
             now = datetime.now(UTC)
             duration = now - last_active
 
-            # 获取会话中的消息数
+            # 获取会话中的消息数（先写入待保存的消息）
+            await self.flush()
             history = await self.db.get_conversation_history(user_id, session_id, limit=1000)
-            message_count = len(history)
+            message_count = sum(1 for item in history if item["role"] != "summary")
 
             return {
                 "session_id": session_id,
@@ -250,23 +384,258 @@ class ConversationManager:
             deleted = await self.db.delete_old_conversations(days)
 
             # 清理缓存中不活跃的会话
-            now = datetime.now(UTC)
-            expired_users = []
+            expired = self.compact_sessions()
 
-            for user_id, cached in self._session_cache.items():
-                if (now - cached["last_active"]) > timedelta(minutes=self.SESSION_TIMEOUT_MINUTES):
-                    expired_users.append(user_id)
-
-            for user_id in expired_users:
-                del self._session_cache[user_id]
-
-            logger.info(f"清理旧会话: 删除{deleted}条记录, 清理{len(expired_users)}个缓存")
+            logger.info(f"清理旧会话: 删除{deleted}条记录, 清理{expired}个缓存")
             return deleted
 
         except Exception as e:
             logger.error(f"清理旧会话失败: {type(e).__name__}: {e}", exc_info=True)
             return 0
 
+    def compact_sessions(self) -> int:
+        """
+        清理会话表中已超时的会话及其历史缓冲
+
+        Returns:
+            清理的会话数
+        """
+        now = datetime.now(UTC)
+        timeout = timedelta(minutes=self.SESSION_TIMEOUT_MINUTES)
+        expired_users = [
+            user_id
+            for user_id, cached in self._session_cache.items()
+            if (now - cached["last_active"]) > timeout
+        ]
+        for user_id in expired_users:
+            session_id = self._session_cache.pop(user_id)["session_id"]
+            self._forget_history(user_id, session_id)
+        return len(expired_users)
+
+    def _remember_session(self, user_id: int, session_id: str, last_active: datetime) -> None:
+        """记录用户的当前会话，超出上限时淘汰最久未活动的用户"""
+        self._session_cache[user_id] = {"session_id": session_id, "last_active": last_active}
+        self._session_cache.move_to_end(user_id)
+        while len(self._session_cache) > QA_SESSION_CACHE_SIZE:
+            evicted_user, evicted = self._session_cache.popitem(last=False)
+            self._forget_history(evicted_user, evicted["session_id"])
+
+    def _load_sessions(self) -> None:
+        """从快照文件恢复未超时的会话（启动时调用一次）"""
+        if self._session_snapshot_path is None:
+            return
+        try:
+            snapshot = json.loads(self._session_snapshot_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"读取会话快照失败: {type(e).__name__}: {e}")
+            return
+
+        now = datetime.now(UTC)
+        timeout = timedelta(minutes=self.SESSION_TIMEOUT_MINUTES)
+        # 快照按最近活动时间正序保存，依次放入即可恢复 LRU 顺序
+        for user_id, session_id, last_active in snapshot.get("sessions", []):
+            last_active = datetime.fromtimestamp(last_active, UTC)
+            if now - last_active < timeout:
+                self._remember_session(int(user_id), session_id, last_active)
+        if self._session_cache:
+            logger.info(f"从快照恢复 {len(self._session_cache)} 个活跃会话")
+
+    def _session_snapshot(self) -> dict:
+        """生成会话快照内容（在事件循环线程中生成，写入在线程池中进行）"""
+        return {
+            "sessions": [
+                [user_id, cached["session_id"], round(cached["last_active"].timestamp(), 3)]
+                for user_id, cached in self._session_cache.items()
+            ],
+            "updated_at": time.time(),
+        }
+
+    def _write_session_snapshot(self, snapshot: dict) -> None:
+        """原子写入会话快照文件"""
+        try:
+            self._session_snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._session_snapshot_path.with_name(
+                self._session_snapshot_path.name + ".tmp"
+            )
+            tmp_path.write_text(json.dumps(snapshot), encoding="utf-8")
+            tmp_path.replace(self._session_snapshot_path)
+        except Exception as e:
+            logger.warning(f"写入会话快照失败: {type(e).__name__}: {e}")
+
+    def _maybe_save_sessions(self) -> None:
+        """距离上次写入超过间隔时，清理超时会话并在线程池中写入会话快照"""
+        if self._session_snapshot_path is None:
+            return
+        now = time.monotonic()
+        if now - self._last_session_save < _SESSION_SNAPSHOT_INTERVAL:
+            return
+        self._last_session_save = now
+        self.compact_sessions()
+        snapshot = self._session_snapshot()
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self._write_session_snapshot, snapshot)
+        except RuntimeError:
+            self._write_session_snapshot(snapshot)
+
+    async def save_sessions(self) -> None:
+        """立即写入会话快照（关闭时调用）"""
+        if self._session_snapshot_path is None:
+            return
+        self._last_session_save = time.monotonic()
+        self.compact_sessions()
+        await asyncio.to_thread(self._write_session_snapshot, self._session_snapshot())
+
+    def _remember_history(self, user_id: int, session_id: str, history: list) -> deque:
+        """建立会话的历史缓冲，超出会话数上限时淘汰最久未使用的会话"""
+        buffer = deque(history, maxlen=self.MAX_MESSAGES_PER_SESSION)
+        self._history[(user_id, session_id)] = buffer
+        self._history.move_to_end((user_id, session_id))
+        while len(self._history) > QA_HISTORY_CACHE_SESSIONS:
+            self._forget_history(*next(iter(self._history)))
+        return buffer
+
+    @staticmethod
+    def _split_summary(history: list) -> tuple[str, list]:
+        """
+        从数据库加载的历史中取出最近一次的摘要，并去掉已被摘要覆盖的消息
+
+        摘要记录的 metadata.recent 为写入摘要时缓冲中保留（未被摘要）的消息数，
+        这些消息位于摘要记录之前
+
+        Returns:
+            (摘要文本, 未被摘要覆盖的消息列表)
+        """
+        last = next(
+            (i for i in range(len(history) - 1, -1, -1) if history[i]["role"] == "summary"),
+            None,
+        )
+        if last is None:
+            return "", history
+        recent = int((history[last].get("metadata") or {}).get("recent", 0))
+        before = [item for item in history[:last] if item["role"] != "summary"]
+        kept = before[max(0, len(before) - recent) :]
+        return history[last]["content"], kept + history[last + 1 :]
+
+    def _forget_history(self, user_id: int, session_id: str) -> None:
+        """移除会话的历史缓冲与摘要（进行中的压缩结果会被丢弃）"""
+        self._history.pop((user_id, session_id), None)
+        self._summaries.pop((user_id, session_id), None)
+
+    def _maybe_compact(self, user_id: int, session_id: str) -> None:
+        """会话历史超过 token 阈值时，在后台压缩较早的轮次"""
+        key = (user_id, session_id)
+        buffer = self._history.get(key)
+        if (
+            not QA_HISTORY_COMPACT_TOKENS
+            or buffer is None
+            or len(buffer) <= QA_HISTORY_RECENT_MESSAGES
+            or key in self._compact_tasks
+        ):
+            return
+        if sum(estimate_tokens(m["content"]) for m in buffer) <= QA_HISTORY_COMPACT_TOKENS:
+            return
+        self._compact_tasks[key] = asyncio.create_task(self._compact_history(key, buffer))
+
+    async def _compact_history(self, key: tuple[int, str], buffer: deque) -> None:
+        """将较早的轮次合并进运行摘要，并从缓冲中移除（数据库中的记录保持不变）"""
+        from core.ai.llm_scheduler import get_llm_scheduler
+
+        older = list(buffer)[: len(buffer) - QA_HISTORY_RECENT_MESSAGES]
+        try:
+            # 压缩是后台任务：经过 LLM 准入调度，只在没有用户请求排队时占用名额
+            async with get_llm_scheduler().admitted(key[0], background=True):
+                summary = await self._summarize(self._summaries.get(key, ""), older)
+        except Exception as e:
+            logger.warning(f"压缩对话历史失败: {type(e).__name__}: {e}")
+            return
+        finally:
+            self._compact_tasks.pop(key, None)
+
+        if self._history.get(key) is not buffer or not summary:
+            # 压缩期间会话已被清除或淘汰
+            return
+        summarized = {id(message) for message in older}
+        remaining = [message for message in buffer if id(message) not in summarized]
+        buffer.clear()
+        buffer.extend(remaining)
+        self._summaries[key] = summary
+        # 摘要随对话历史一起写入数据库，缓冲被淘汰或重启后可恢复
+        self._pending.append(
+            {
+                "user_id": key[0],
+                "session_id": key[1],
+                "role": "summary",
+                "content": summary,
+                "metadata": {"recent": len(remaining)},
+                "timestamp": datetime.now(UTC),
+            }
+        )
+        self._schedule_flush()
+        logger.info(f"会话 {key[1]} 已压缩 {len(older)} 条较早消息，摘要 {len(summary)} 字符")
+
+    async def _summarize(self, previous: str, messages: list[dict]) -> str:
+        """调用 LLM 把对话记录合并进已有摘要"""
+        from core.ai.ai_client import async_client_llm
+        from core.settings import get_llm_model
+
+        transcript = "\n".join(
+            f"{'用户' if m['role'] == 'user' else '助手'}：{m['content']}" for m in messages
+        )
+        response = await async_client_llm.chat.completions.create(
+            model=get_llm_model(),
+            messages=[
+                {
+                    "role": "user",
+                    "content": HISTORY_SUMMARY_PROMPT.format(
+                        previous=previous or "（无）",
+                        transcript=truncate_to_tokens(transcript, QA_HISTORY_COMPACT_TOKENS * 2),
+                    ),
+                }
+            ],
+            temperature=0.3,
+        )
+        summary = (response.choices[0].message.content or "").strip()
+        return truncate_to_tokens(summary, QA_HISTORY_CONTEXT_TOKENS // 2)
+
+    def _schedule_flush(self) -> None:
+        """安排一次延迟批量写入（已有待执行的写入任务时合并到同一批次）"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(QA_HISTORY_FLUSH_INTERVAL)
+        await self.flush()
+
+    async def flush(self) -> bool:
+        """
+        将待保存的消息批量写入数据库
+
+        Returns:
+            是否全部写入成功
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return True
+            batch, self._pending = self._pending, []
+            try:
+                saved = await self.db.save_conversations_batch(batch)
+            except Exception as e:
+                logger.error(f"批量写入对话历史失败: {type(e).__name__}: {e}", exc_info=True)
+                saved = 0
+
+            if saved:
+                return True
+
+            # 写入失败：放回队列等待下次写入，积压过多时丢弃最早的消息
+            self._pending = batch + self._pending
+            dropped = len(self._pending) - _MAX_PENDING_MESSAGES
+            if dropped > 0:
+                del self._pending[:dropped]
+                logger.warning(f"对话历史写入积压过多，丢弃最早的 {dropped} 条消息")
+            return False
+
 
 # 创建全局会话管理器实例
 conversation_manager = None
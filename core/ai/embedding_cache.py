@@ -0,0 +1,160 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+查询向量缓存 - 在 Embedding API 前增加进程内 LRU + TTL 缓存
+
+Agentic 循环中同一问题常被多次 semantic_search，热门问题也会在不同用户间重复，
+命中缓存时可完全跳过一次 Embedding API 往返。
+"""
+
+import logging
+import os
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# 缓存配置
+DEFAULT_MAX_SIZE = 1024  # 最大缓存条目数，0 表示禁用
+DEFAULT_TTL = 3600  # 默认 TTL（1小时，单位：秒），0 表示永不过期
+
+
+def normalize_query_text(text: str) -> str:
+    """归一化查询文本：NFKC、折叠空白、统一小写，使细微差异的查询共享缓存"""
+    normalized = unicodedata.normalize("NFKC", text or "")
+    return " ".join(normalized.split()).lower()
+
+
+class QueryEmbeddingCache:
+    """查询向量缓存
+
+    键为 (model, 归一化文本)，值以 float32 数组紧凑存储。
+    支持 LRU 淘汰、TTL 过期，并统计命中/未命中/淘汰次数。
+    同步检索可能在线程池中执行，因此所有操作都在线程锁内完成。
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: int = DEFAULT_TTL):
+        """初始化缓存
+
+        Args:
+            max_size: 最大缓存条目数（LRU淘汰阈值），0 表示禁用缓存
+            ttl: 缓存条目生存时间（秒），0 表示永不过期
+        """
+        self._max_size = max_size
+        self._ttl = ttl
+        # OrderedDict 实现 LRU：key -> (vector, timestamp)
+        self._entries: OrderedDict[tuple[str, str], tuple[array, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """缓存是否启用"""
+        return self._max_size > 0
+
+    def _is_expired(self, timestamp: float) -> bool:
+        """检查缓存条目是否过期"""
+        if self._ttl == 0:
+            return False
+        return time.monotonic() - timestamp > self._ttl
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        """获取缓存的查询向量
+
+        Args:
+            model: Embedding 模型名
+            text: 查询文本（内部会归一化）
+
+        Returns:
+            向量列表，未命中或已过期返回 None
+        """
+        if not self.enabled:
+            return None
+
+        key = (model, normalize_query_text(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            vector, timestamp = entry
+            if self._is_expired(timestamp):
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return vector.tolist()
+
+    def set(self, model: str, text: str, embedding: list[float]) -> None:
+        """缓存查询向量
+
+        Args:
+            model: Embedding 模型名
+            text: 查询文本（内部会归一化）
+            embedding: 查询向量
+        """
+        if not self.enabled or not embedding:
+            return
+
+        key = (model, normalize_query_text(text))
+        with self._lock:
+            self._entries[key] = (array("f", embedding), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存（统计数据保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "ttl": self._ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# 创建全局查询向量缓存实例（同步/异步 Embedding 生成器共享）
+query_embedding_cache = None
+
+
+def get_query_embedding_cache():
+    """获取全局查询向量缓存实例"""
+    global query_embedding_cache
+    if query_embedding_cache is None:
+        query_embedding_cache = QueryEmbeddingCache(
+            max_size=int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", str(DEFAULT_MAX_SIZE))),
+            ttl=int(os.getenv("EMBEDDING_QUERY_CACHE_TTL", str(DEFAULT_TTL))),
+        )
+    return query_embedding_cache
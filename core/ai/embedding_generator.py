@@ -11,12 +11,20 @@
 """
 Embedding生成器 - 将文本转换为向量
 支持多种API服务（OpenAI兼容）
+
+提供同步版本 EmbeddingGenerator（供线程/同步调用方使用）和
+异步版本 AsyncEmbeddingGenerator（基于连接池长连接，供事件循环内调用）。
 """
 
+import asyncio
 import logging
 import os
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from core.ai.embedding_cache import get_query_embedding_cache
+from core.ai.embedding_store import get_embedding_store
 
 logger = logging.getLogger(__name__)
 
@@ -46,12 +54,13 @@ class EmbeddingGenerator:
         """检查Embedding服务是否可用"""
         return self.client is not None
 
-    def generate(self, text: str) -> list[float] | None:
+    def generate(self, text: str, use_cache: bool = False) -> list[float] | None:
         """
         生成单个文本的embedding
 
         Args:
             text: 输入文本
+            use_cache: 是否使用查询向量缓存（检索查询时开启）
 
         Returns:
             向量列表，失败返回None
@@ -60,11 +69,20 @@ class EmbeddingGenerator:
             logger.warning("Embedding服务不可用")
             return None
 
+        cache = get_query_embedding_cache() if use_cache else None
+        if cache is not None:
+            cached = cache.get(self.model, text)
+            if cached is not None:
+                logger.debug("查询向量缓存命中")
+                return cached
+
         try:
             response = self.client.embeddings.create(model=self.model, input=text)
 
             embedding = response.data[0].embedding
             logger.debug(f"成功生成embedding，维度: {len(embedding)}")
+            if cache is not None:
+                cache.set(self.model, text, embedding)
             return embedding
 
         except Exception as e:
@@ -75,30 +93,193 @@ class EmbeddingGenerator:
         """
         批量生成embedding
 
+        先查询持久化Embedding存储，仅对未命中的文本调用API，并将新结果写回存储。
+
         Args:
             texts: 输入文本列表
 
         Returns:
-            向量列表
+            向量列表，与输入顺序一一对应
         """
         if not self.client:
             logger.warning("Embedding服务不可用")
             return [None] * len(texts)
 
+        store = get_embedding_store()
+        embeddings = store.get_many(self.model, texts) if store else [None] * len(texts)
+        missing = [i for i, emb in enumerate(embeddings) if emb is None]
+        if not missing:
+            logger.info(f"批量embedding全部命中持久化存储: {len(texts)}个")
+            return embeddings
+
         try:
-            response = self.client.embeddings.create(model=self.model, input=texts)
+            missing_texts = [texts[i] for i in missing]
+            response = self.client.embeddings.create(model=self.model, input=missing_texts)
+
+            generated = [item.embedding for item in response.data]
+            for i, emb in zip(missing, generated, strict=True):
+                embeddings[i] = emb
+            if store:
+                store.put_many(self.model, missing_texts, generated)
 
-            embeddings = [item.embedding for item in response.data]
-            logger.info(f"成功批量生成{len(embeddings)}个embedding")
+            logger.info(
+                f"成功批量生成{len(generated)}个embedding"
+                f"（持久化存储命中 {len(texts) - len(missing)} 个）"
+            )
             return embeddings
 
         except Exception as e:
             logger.error(f"批量生成embedding失败: {type(e).__name__}: {e}")
+            return embeddings
+
+
+class AsyncEmbeddingGenerator:
+    """异步Embedding生成器
+
+    基于 AsyncOpenAI + 共享的 httpx.AsyncClient 连接池，
+    在事件循环内发起请求，不会阻塞其他协程（QA 用户、Telethon 处理器等）。
+    """
+
+    def __init__(self):
+        """初始化异步Embedding生成器"""
+        self.api_key = os.getenv("EMBEDDING_API_KEY")
+        self.api_base = os.getenv("EMBEDDING_API_BASE", "https://api.siliconflow.cn/v1/embeddings")
+        self.model = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+        self.dimension = int(os.getenv("EMBEDDING_DIMENSION", "1024"))
+        self.max_connections = int(os.getenv("EMBEDDING_MAX_CONNECTIONS", "10"))
+        self.timeout = float(os.getenv("EMBEDDING_TIMEOUT", "30"))
+
+        self._http_client: httpx.AsyncClient | None = None
+        self.client: AsyncOpenAI | None = None
+
+        if not self.api_key:
+            logger.warning("未设置EMBEDDING_API_KEY，异步Embedding功能将不可用")
+            return
+
+        try:
+            # 长连接池：复用 TCP/TLS 连接，避免每次请求重新握手
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+                timeout=self.timeout,
+            )
+            self.client = AsyncOpenAI(
+                api_key=self.api_key, base_url=self.api_base, http_client=self._http_client
+            )
+            logger.info(
+                f"异步Embedding生成器初始化成功: {self.model}, 连接池上限: {self.max_connections}"
+            )
+        except Exception as e:
+            logger.error(f"异步Embedding生成器初始化失败: {type(e).__name__}: {e}")
+            self._http_client = None
+            self.client = None
+
+    def is_available(self) -> bool:
+        """检查Embedding服务是否可用"""
+        return self.client is not None
+
+    async def agenerate(self, text: str, use_cache: bool = False) -> list[float] | None:
+        """
+        异步生成单个文本的embedding
+
+        Args:
+            text: 输入文本
+            use_cache: 是否使用查询向量缓存（检索查询时开启）
+
+        Returns:
+            向量列表，失败返回None
+        """
+        if not self.client:
+            logger.warning("Embedding服务不可用")
+            return None
+
+        cache = get_query_embedding_cache() if use_cache else None
+        if cache is not None:
+            cached = cache.get(self.model, text)
+            if cached is not None:
+                logger.debug("查询向量缓存命中")
+                return cached
+
+        try:
+            response = await self.client.embeddings.create(model=self.model, input=text)
+
+            embedding = response.data[0].embedding
+            logger.debug(f"成功生成embedding（异步），维度: {len(embedding)}")
+            if cache is not None:
+                cache.set(self.model, text, embedding)
+            return embedding
+
+        except Exception as e:
+            logger.error(f"异步生成embedding失败: {type(e).__name__}: {e}")
+            return None
+
+    async def abatch_generate(self, texts: list[str]) -> list[list[float] | None]:
+        """
+        异步批量生成embedding
+
+        Args:
+            texts: 输入文本列表
+
+        Returns:
+            向量列表，与输入顺序一一对应
+        """
+        if not self.client:
+            logger.warning("Embedding服务不可用")
             return [None] * len(texts)
 
+        if not texts:
+            return []
+
+        # 持久化存储为磁盘 I/O，放到线程池执行
+        store = get_embedding_store()
+        embeddings = (
+            await asyncio.to_thread(store.get_many, self.model, texts)
+            if store
+            else [None] * len(texts)
+        )
+        missing = [i for i, emb in enumerate(embeddings) if emb is None]
+        if not missing:
+            logger.info(f"批量embedding全部命中持久化存储: {len(texts)}个")
+            return embeddings
+
+        try:
+            missing_texts = [texts[i] for i in missing]
+            response = await self.client.embeddings.create(model=self.model, input=missing_texts)
+
+            generated = [item.embedding for item in response.data]
+            for i, emb in zip(missing, generated, strict=True):
+                embeddings[i] = emb
+            if store:
+                await asyncio.to_thread(store.put_many, self.model, missing_texts, generated)
+
+            logger.info(
+                f"成功批量生成{len(generated)}个embedding（异步，"
+                f"持久化存储命中 {len(texts) - len(missing)} 个）"
+            )
+            return embeddings
+
+        except Exception as e:
+            logger.error(f"异步批量生成embedding失败: {type(e).__name__}: {e}")
+            return embeddings
+
+    async def aclose(self) -> None:
+        """关闭底层连接池"""
+        if self._http_client is not None:
+            try:
+                await self._http_client.aclose()
+            except Exception as e:
+                logger.warning(f"关闭Embedding连接池失败: {type(e).__name__}: {e}")
+            finally:
+                self._http_client = None
+                self.client = None
+
 
 # 创建全局Embedding生成器实例
 embedding_generator = None
+async_embedding_generator = None
 
 
 def get_embedding_generator():
@@ -107,3 +288,11 @@ def get_embedding_generator():
     if embedding_generator is None:
         embedding_generator = EmbeddingGenerator()
     return embedding_generator
+
+
+def get_async_embedding_generator():
+    """获取全局异步Embedding生成器实例"""
+    global async_embedding_generator
+    if async_embedding_generator is None:
+        async_embedding_generator = AsyncEmbeddingGenerator()
+    return async_embedding_generator
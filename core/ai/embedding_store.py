@@ -0,0 +1,213 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+持久化向量存储 - 基于内容寻址的 Embedding 磁盘缓存
+
+以 sha256(model + text) 为键，将向量以 float16 紧凑存储在 SQLite 文件中。
+消息编辑重放、向量库重建或 Chroma 版本迁移时，未变化的文本无需再次调用 Embedding API。
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from core.infrastructure.utils.constants import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# 默认存储文件路径（设置 EMBEDDING_STORE_PATH 为空字符串可禁用）
+DEFAULT_STORE_PATH = str(Path(DATA_DIR) / "embedding_store.sqlite3")
+
+# SQLite 单条语句的参数上限保护（旧版本 SQLite 默认 999）
+_SQLITE_MAX_PARAMS = 900
+
+
+def content_key(model: str, text: str) -> bytes:
+    """计算内容寻址键：sha256(model + NUL + text)"""
+    return hashlib.sha256(f"{model}\0{text}".encode()).digest()
+
+
+def _pack_vector(embedding: list[float]) -> bytes:
+    """将向量打包为 float16 字节串"""
+    return struct.pack(f"<{len(embedding)}e", *embedding)
+
+
+def _unpack_vector(blob: bytes, dimension: int) -> list[float]:
+    """将 float16 字节串还原为向量"""
+    return list(struct.unpack(f"<{dimension}e", blob))
+
+
+class EmbeddingStore:
+    """内容寻址的持久化 Embedding 存储
+
+    所有数据库操作在线程锁内执行，可同时被同步调用方和线程池使用。
+    异步调用方应通过 asyncio.to_thread 调用，避免在事件循环中执行磁盘 I/O。
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        """初始化存储
+
+        Args:
+            path: SQLite 文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._hits = 0
+        self._misses = 0
+
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key BLOB PRIMARY KEY,
+                    dimension INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at INTEGER NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.commit()
+            logger.info(f"持久化Embedding存储初始化成功: {path}")
+        except Exception as e:
+            logger.error(f"持久化Embedding存储初始化失败: {type(e).__name__}: {e}")
+            self._conn = None
+
+    def is_available(self) -> bool:
+        """检查存储是否可用"""
+        return self._conn is not None
+
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        """批量查询已存储的向量
+
+        Args:
+            model: Embedding 模型名
+            texts: 文本列表
+
+        Returns:
+            与输入顺序一一对应的向量列表，未命中为 None
+        """
+        if not self._conn or not texts:
+            return [None] * len(texts)
+
+        keys = [content_key(model, text) for text in texts]
+        found: dict[bytes, list[float]] = {}
+
+        try:
+            with self._lock:
+                unique_keys = list(dict.fromkeys(keys))
+                for start in range(0, len(unique_keys), _SQLITE_MAX_PARAMS):
+                    chunk = unique_keys[start : start + _SQLITE_MAX_PARAMS]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._conn.execute(
+                        f"SELECT key, dimension, vector FROM embeddings WHERE key IN ({placeholders})",
+                        chunk,
+                    ).fetchall()
+                    for key, dimension, blob in rows:
+                        found[key] = _unpack_vector(blob, dimension)
+
+                results = [found.get(key) for key in keys]
+                hits = sum(1 for r in results if r is not None)
+                self._hits += hits
+                self._misses += len(results) - hits
+        except Exception as e:
+            logger.error(f"查询持久化Embedding失败: {type(e).__name__}: {e}")
+            return [None] * len(texts)
+
+        return results
+
+    def put_many(self, model: str, texts: list[str], embeddings: list[list[float] | None]) -> int:
+        """批量写入向量（已存在的键直接覆盖）
+
+        Args:
+            model: Embedding 模型名
+            texts: 文本列表
+            embeddings: 与 texts 对应的向量列表，None 会被跳过
+
+        Returns:
+            写入的条目数
+        """
+        if not self._conn:
+            return 0
+
+        now = int(time.time())
+        rows = [
+            (content_key(model, text), len(embedding), _pack_vector(embedding), now)
+            for text, embedding in zip(texts, embeddings, strict=True)
+            if embedding
+        ]
+        if not rows:
+            return 0
+
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, dimension, vector, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+            return len(rows)
+        except Exception as e:
+            logger.error(f"写入持久化Embedding失败: {type(e).__name__}: {e}")
+            return 0
+
+    def get_stats(self) -> dict[str, Any]:
+        """获取存储统计信息"""
+        stats = {
+            "available": self.is_available(),
+            "hits": self._hits,
+            "misses": self._misses,
+            "total_vectors": 0,
+        }
+        if not self._conn:
+            return stats
+
+        try:
+            with self._lock:
+                stats["total_vectors"] = self._conn.execute(
+                    "SELECT COUNT(*) FROM embeddings"
+                ).fetchone()[0]
+        except Exception as e:
+            logger.error(f"获取持久化Embedding统计失败: {type(e).__name__}: {e}")
+        return stats
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+
+# 创建全局持久化Embedding存储实例
+embedding_store = None
+
+
+def get_embedding_store() -> EmbeddingStore | None:
+    """获取全局持久化Embedding存储实例，未启用时返回 None"""
+    global embedding_store
+    path = os.getenv("EMBEDDING_STORE_PATH", DEFAULT_STORE_PATH)
+    if not path:
+        return None
+    if embedding_store is None:
+        embedding_store = EmbeddingStore(path)
+    return embedding_store if embedding_store.is_available() else None
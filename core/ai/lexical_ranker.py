@@ -0,0 +1,124 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+本地词法重排序 - 基于 BM25 的零网络重排
+
+查询词使用 IntentParser 的关键词提取结果（与关键词检索一致），
+查询词与候选文档按相同的 CJK 二元组规则切分，在候选集内用 NumPy 向量化计算 BM25。
+用于远程 Reranker 不可用/失败时的回退，以及调用远程 API 前的候选预筛。
+"""
+
+import logging
+from collections import Counter
+from typing import Any
+
+import numpy as np
+
+from core.ai.intent_parser import get_intent_parser
+from core.infrastructure.utils.text_tokenize import tokenize_terms
+
+logger = logging.getLogger(__name__)
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def query_terms(query: str) -> list[str]:
+    """
+    提取查询词项
+
+    优先使用 IntentParser 提取的关键词（去除时间词、停用词），
+    关键词为空时退回切分整个查询。
+    """
+    keywords = get_intent_parser()._extract_keywords(query)
+    source = keywords or [query]
+
+    terms = []
+    for keyword in source:
+        for term in tokenize_terms(keyword):
+            if term not in terms:
+                terms.append(term)
+    return terms
+
+
+def bm25_scores(
+    terms: list[str], documents: list[list[str]], k1: float = BM25_K1, b: float = BM25_B
+) -> np.ndarray:
+    """
+    计算查询词项对每篇文档的 BM25 分数（IDF 以候选集为语料统计）
+
+    Args:
+        terms: 查询词项（已去重）
+        documents: 每篇文档的词项列表
+
+    Returns:
+        np.ndarray: 形状为 (文档数,) 的分数
+    """
+    if not terms or not documents:
+        return np.zeros(len(documents), dtype=np.float32)
+
+    # 只统计查询词项的词频矩阵（文档数 × 查询词项数）
+    column = {term: j for j, term in enumerate(terms)}
+    tf = np.zeros((len(documents), len(terms)), dtype=np.float32)
+    for i, tokens in enumerate(documents):
+        for term, count in Counter(tokens).items():
+            j = column.get(term)
+            if j is not None:
+                tf[i, j] = count
+
+    doc_len = np.array([len(tokens) for tokens in documents], dtype=np.float32)
+    avg_len = float(doc_len.mean()) or 1.0
+    n_docs = len(documents)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+    norm = k1 * (1.0 - b + b * doc_len / avg_len)
+    return (idf * tf * (k1 + 1.0) / (tf + norm[:, None])).sum(axis=1)
+
+
+def lexical_rerank(
+    query: str, candidates: list[dict[str, Any]], top_k: int
+) -> list[dict[str, Any]]:
+    """
+    按 BM25 对候选文档重排序
+
+    分数相同（包括均未命中）的文档保持原有顺序（即向量相似度顺序）。
+    rerank_score 为按最高分归一化到 [0, 1] 的分数，原始分数记录在 bm25_score。
+
+    Args:
+        query: 用户查询
+        candidates: 候选文档列表（使用 summary_text 字段）
+        top_k: 返回前K个结果
+
+    Returns:
+        重排序后的文档列表
+    """
+    if not candidates:
+        return []
+
+    terms = query_terms(query)
+    documents = [tokenize_terms(doc.get("summary_text", "") or "") for doc in candidates]
+    scores = bm25_scores(terms, documents)
+
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    max_score = float(scores.max()) if len(scores) else 0.0
+
+    reranked = []
+    for index in order:
+        doc = candidates[int(index)].copy()
+        score = float(scores[index])
+        doc["bm25_score"] = score
+        doc["rerank_score"] = score / max_score if max_score > 0 else 0.0
+        reranked.append(doc)
+
+    logger.debug(f"本地BM25重排序完成: {len(candidates)} -> {len(reranked)}, 查询词项: {terms}")
+    return reranked
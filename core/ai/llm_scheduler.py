@@ -0,0 +1,306 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+问答 LLM 准入调度 - 全局并发上限 + 按用户公平排队
+
+- 同时进行 LLM 生成的问答请求数不超过 QA_LLM_CONCURRENCY，超出的请求排队等待
+- 管理员请求进入优先队列，先于普通用户准入
+- 后台任务（如对话历史压缩）进入低优先级队列，只在没有用户请求排队时准入
+- 普通用户按差额轮询（deficit round-robin）调度：每个用户一个队列，
+  少数用户的突发请求不会挤占其他用户
+- 背压：单个用户或全局排队数超过上限时直接拒绝，避免队列无限增长
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4  # 同时进行的 LLM 生成数
+DEFAULT_MAX_QUEUE = 100  # 全局最大排队数
+DEFAULT_MAX_QUEUE_PER_USER = 3  # 单个用户最大排队数
+DEFAULT_QUANTUM = 1.0  # 每轮分配给用户的额度（与请求成本同单位）
+
+
+class AdmissionRejected(RuntimeError):
+    """排队已满，请求被拒绝"""
+
+
+class Ticket:
+    """一次准入申请"""
+
+    __slots__ = ("user_id", "cost", "priority", "background", "admitted", "changed")
+
+    def __init__(self, user_id: int, cost: float, priority: bool, background: bool = False):
+        self.user_id = user_id
+        self.cost = cost
+        self.priority = priority
+        self.background = background
+        self.admitted = False
+        # 准入或排队位置可能变化时置位
+        self.changed = asyncio.Event()
+
+
+class LLMScheduler:
+    """LLM 准入调度器"""
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_queue_per_user: int = DEFAULT_MAX_QUEUE_PER_USER,
+        quantum: float = DEFAULT_QUANTUM,
+    ):
+        """初始化调度器
+
+        Args:
+            max_concurrency: 同时进行的 LLM 生成数
+            max_queue: 全局最大排队数
+            max_queue_per_user: 单个用户最大排队数
+            quantum: 每轮分配给用户的额度
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.quantum = quantum
+        self._active = 0
+        self._priority: deque[Ticket] = deque()
+        self._background: deque[Ticket] = deque()
+        # 轮询顺序即字典顺序：user_id -> 该用户的排队请求
+        self._queues: OrderedDict[int, deque[Ticket]] = OrderedDict()
+        self._deficit: dict[int, float] = {}
+        self._admitted_total = 0
+        self._queued_total = 0
+        self._rejected_total = 0
+
+    @property
+    def queued(self) -> int:
+        """当前排队数"""
+        return (
+            len(self._priority)
+            + sum(len(queue) for queue in self._queues.values())
+            + len(self._background)
+        )
+
+    def submit(
+        self, user_id: int, priority: bool = False, cost: float = 1.0, background: bool = False
+    ) -> Ticket:
+        """
+        申请准入；有空闲名额且无人排队时立即准入
+
+        Args:
+            user_id: 用户ID
+            priority: 是否优先（管理员）
+            cost: 请求成本（默认每个请求计 1）
+            background: 是否为后台任务（低优先级，不计入用户排队数）
+
+        Returns:
+            Ticket: 准入申请，ticket.admitted 为 False 时需通过 wait() 等待
+
+        Raises:
+            AdmissionRejected: 排队已满
+        """
+        ticket = Ticket(user_id, cost, priority and not background, background)
+        if self._active < self.max_concurrency and not self.queued:
+            self._admit(ticket)
+            return ticket
+
+        if background:
+            if len(self._background) >= self.max_queue:
+                self._rejected_total += 1
+                raise AdmissionRejected("后台任务排队过多")
+        elif not priority:
+            user_queue = self._queues.get(user_id)
+            if self.queued >= self.max_queue or (
+                user_queue is not None and len(user_queue) >= self.max_queue_per_user
+            ):
+                self._rejected_total += 1
+                raise AdmissionRejected("排队人数过多")
+
+        self._queued_total += 1
+        if background:
+            self._background.append(ticket)
+        elif priority:
+            self._priority.append(ticket)
+        else:
+            self._queues.setdefault(user_id, deque()).append(ticket)
+        self._dispatch()
+        self._notify_waiting()
+        return ticket
+
+    async def wait(self, ticket: Ticket) -> AsyncIterator[int]:
+        """
+        等待准入，排队期间在位置变化时产生当前位置（从 1 开始）
+
+        Yields:
+            int: 排队位置
+        """
+        last_position = None
+        while not ticket.admitted:
+            ticket.changed.clear()
+            position = self.position(ticket)
+            if position != last_position:
+                last_position = position
+                yield position
+            if not ticket.admitted:
+                await ticket.changed.wait()
+
+    @asynccontextmanager
+    async def admitted(self, user_id: int, priority: bool = False, background: bool = False):
+        """
+        等待准入后执行代码块，结束（或取消）时释放名额
+
+        Raises:
+            AdmissionRejected: 排队已满
+        """
+        ticket = self.submit(user_id, priority=priority, background=background)
+        try:
+            async for _ in self.wait(ticket):
+                pass
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def release(self, ticket: Ticket) -> None:
+        """结束一次准入（或撤销排队中的申请），并准入后续请求"""
+        if ticket.admitted:
+            ticket.admitted = False
+            self._active -= 1
+        elif ticket.background:
+            if ticket in self._background:
+                self._background.remove(ticket)
+        elif ticket.priority:
+            if ticket in self._priority:
+                self._priority.remove(ticket)
+        else:
+            user_queue = self._queues.get(ticket.user_id)
+            if user_queue is not None and ticket in user_queue:
+                user_queue.remove(ticket)
+                if not user_queue:
+                    self._drop_user(ticket.user_id)
+        self._dispatch()
+        self._notify_waiting()
+
+    def position(self, ticket: Ticket) -> int:
+        """估算排队位置：优先队列在前，普通请求按轮询顺序，后台任务在最后"""
+        if ticket.admitted:
+            return 0
+        if ticket.background:
+            if ticket not in self._background:
+                return 0
+            return self.queued - len(self._background) + self._background.index(ticket) + 1
+        if ticket.priority:
+            return self._priority.index(ticket) + 1 if ticket in self._priority else 0
+
+        user_queue = self._queues.get(ticket.user_id)
+        if user_queue is None or ticket not in user_queue:
+            return 0
+        index = user_queue.index(ticket)
+        ahead = len(self._priority) + index
+        before = True
+        for user_id, queue in self._queues.items():
+            if user_id == ticket.user_id:
+                before = False
+                continue
+            # 轮询顺序在前的用户本轮先于该请求准入
+            ahead += min(len(queue), index + 1 if before else index)
+        return ahead + 1
+
+    def get_stats(self) -> dict[str, int]:
+        """获取调度统计"""
+        return {
+            "active": self._active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "admitted": self._admitted_total,
+            "waited": self._queued_total,
+            "rejected": self._rejected_total,
+        }
+
+    def _admit(self, ticket: Ticket) -> None:
+        ticket.admitted = True
+        self._active += 1
+        self._admitted_total += 1
+        ticket.changed.set()
+
+    def _drop_user(self, user_id: int) -> None:
+        """用户队列已空：移出轮询，清零额度"""
+        self._queues.pop(user_id, None)
+        self._deficit.pop(user_id, None)
+
+    def _dispatch(self) -> None:
+        """按优先队列 → 差额轮询 → 后台队列的顺序准入，直到名额用完或队列为空"""
+        # 每次访问用户至少增加 quantum 额度，迭代次数有上界
+        max_cost = max(
+            (ticket.cost for queue in self._queues.values() for ticket in queue), default=0
+        )
+        rounds = int(max_cost / self.quantum) + 2 if self.quantum > 0 else 2
+        limit = self.max_concurrency + self.queued * rounds * (len(self._queues) + 1)
+
+        for _ in itertools.repeat(None, limit):
+            if self._active >= self.max_concurrency:
+                return
+            if self._priority:
+                self._admit(self._priority.popleft())
+                continue
+            if not self._queues:
+                if self._background:
+                    self._admit(self._background.popleft())
+                    continue
+                return
+
+            user_id, queue = next(iter(self._queues.items()))
+            ticket = queue[0]
+            deficit = self._deficit.get(user_id, 0.0)
+            if deficit < ticket.cost:
+                # 额度不足：增加额度并轮到下一个用户
+                self._deficit[user_id] = deficit + self.quantum
+                self._queues.move_to_end(user_id)
+                continue
+
+            queue.popleft()
+            self._deficit[user_id] = deficit - ticket.cost
+            self._admit(ticket)
+            if not queue:
+                self._drop_user(user_id)
+
+        logger.warning("LLM 准入调度达到迭代上限，剩余请求等待下次调度")
+
+    def _notify_waiting(self) -> None:
+        """通知排队中的请求重新计算位置"""
+        for ticket in itertools.chain(self._priority, self._background):
+            ticket.changed.set()
+        for queue in self._queues.values():
+            for ticket in queue:
+                ticket.changed.set()
+
+
+# 创建全局调度器实例
+llm_scheduler = None
+
+
+def get_llm_scheduler():
+    """获取全局问答 LLM 准入调度器实例"""
+    global llm_scheduler
+    if llm_scheduler is None:
+        llm_scheduler = LLMScheduler(
+            max_concurrency=int(os.getenv("QA_LLM_CONCURRENCY", str(DEFAULT_CONCURRENCY))),
+            max_queue=int(os.getenv("QA_LLM_MAX_QUEUE", str(DEFAULT_MAX_QUEUE))),
+            max_queue_per_user=int(
+                os.getenv("QA_LLM_MAX_QUEUE_PER_USER", str(DEFAULT_MAX_QUEUE_PER_USER))
+            ),
+        )
+    return llm_scheduler
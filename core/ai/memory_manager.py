@@ -18,8 +18,10 @@ from datetime import UTC, datetime, timedelta
 from typing import Any
 
 from core.ai.ai_client import client_llm
+from core.ai.summary_index import get_summary_index
 from core.config import normalize_channel_id
 from core.infrastructure.database import get_db_manager
+from core.infrastructure.utils.date_utils import to_unix_timestamp
 from core.settings import get_llm_model
 
 logger = logging.getLogger(__name__)
@@ -339,6 +341,9 @@ class MemoryManager:
         """
         搜索相关总结
 
+        有关键词/主题时优先使用进程内倒排索引（SUMMARY_INDEX_ENABLED），其次数据库全文索引
+        按相关度检索，均不可用时回退到在最近 limit 条总结中逐行匹配。
+
         Args:
             keywords: 关键词列表
             topics: 主题列表
@@ -356,6 +361,27 @@ class MemoryManager:
             end_date = date_before or datetime.now(UTC)
             start_date = end_date - timedelta(days=time_range_days)
 
+            # 有检索词时优先使用进程内倒排索引，其次数据库全文索引，按相关度覆盖整个时间范围
+            if keywords or topics:
+                index = get_summary_index()
+                if index is not None and index.ready:
+                    results = index.search(
+                        (keywords or []) + (topics or []),
+                        channel_id=channel_id,
+                        start_ts=to_unix_timestamp(start_date),
+                        end_ts=to_unix_timestamp(end_date),
+                        limit=limit,
+                    )
+                    logger.info(f"倒排索引检索完成: 找到 {len(results)} 条匹配总结")
+                    return results
+
+                results = await self._search_fulltext(
+                    (keywords or []) + (topics or []), channel_id, start_date, end_date, limit
+                )
+                if results is not None:
+                    logger.info(f"全文检索完成: 找到 {len(results)} 条匹配总结")
+                    return results
+
             # 获取基础总结
             summaries = await self.db.get_summaries(
                 channel_id=channel_id, limit=limit, start_date=start_date, end_date=end_date
@@ -412,6 +438,30 @@ class MemoryManager:
             logger.error(f"搜索总结失败: {type(e).__name__}: {e}", exc_info=True)
             return []
 
+    async def _search_fulltext(
+        self,
+        terms: list[str],
+        channel_id: str | None,
+        start_date: datetime,
+        end_date: datetime,
+        limit: int,
+    ) -> list[dict[str, Any]] | None:
+        """调用数据库全文检索，不可用或失败时返回 None（由调用方回退到逐行匹配）"""
+        search = getattr(self.db, "search_summaries_fulltext", None)
+        if search is None:
+            return None
+        try:
+            return await search(
+                terms,
+                channel_id=channel_id,
+                start_date=start_date,
+                end_date=end_date,
+                limit=limit,
+            )
+        except Exception as e:
+            logger.warning(f"全文检索不可用，回退到逐行匹配: {type(e).__name__}: {e}")
+            return None
+
     @staticmethod
     def _normalize_channel_row(channel: dict[str, Any]) -> dict[str, Any]:
         """标准化频道行中的日期和数值字段。"""
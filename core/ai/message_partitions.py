@@ -0,0 +1,342 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+消息向量时间分区 - 按月（可配置跨度）将频道消息写入独立的 collection
+
+分区命名：messages_YYYYMM（跨度 1 个月）或 messages_YYYYMM_Nm（跨度 N 个月），
+名称本身即包含时间范围，修改分区跨度后旧分区仍可被正确识别与裁剪。
+
+- 写入：按消息 created_ts 路由到对应分区，分区不存在时自动创建
+- 检索：只查询与时间范围有交集的分区；分区列表按间隔重新读取，
+  其他进程（如写入消息的主进程）创建或删除的分区无需重启即可生效
+- 保留：超过保留期的分区整体删除，或先导出为 gzip JSONL 归档后删除
+"""
+
+import gzip
+import json
+import logging
+import re
+import threading
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# 分区 collection 名称前缀
+PARTITION_PREFIX = "messages_"
+
+# 超过保留期的分区处理方式
+RETENTION_ACTIONS = ("archive", "drop")
+
+_PARTITION_NAME_RE = re.compile(r"^messages_(\d{4})(\d{2})(?:_(\d+)m)?$")
+
+# 重新读取后端分区列表的间隔（秒）
+DEFAULT_REFRESH_INTERVAL = 30
+
+# 归档导出每批读取的文档数
+_ARCHIVE_BATCH_SIZE = 1000
+
+# 归档导出最大批次数保护（1000 * 10000 = 1000 万条文档）
+_ARCHIVE_MAX_BATCHES = 10000
+
+
+def _add_months(year: int, month: int, months: int) -> tuple[int, int]:
+    """月份加法，返回 (year, month)"""
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+def partition_name(ts: int | float, months: int) -> str:
+    """
+    计算时间戳所属的分区名称
+
+    Args:
+        ts: Unix 时间戳（秒）
+        months: 分区跨度（月），分区起点按自然年内的跨度对齐
+
+    Returns:
+        分区 collection 名称
+    """
+    dt = datetime.fromtimestamp(ts, UTC)
+    start_month = (dt.month - 1) // months * months + 1
+    name = f"{PARTITION_PREFIX}{dt.year:04d}{start_month:02d}"
+    return name if months == 1 else f"{name}_{months}m"
+
+
+def parse_partition_name(name: str) -> tuple[int, int] | None:
+    """
+    解析分区名称对应的时间范围
+
+    Returns:
+        (start_ts, end_ts)，左闭右开；不是分区名称时返回 None
+    """
+    match = _PARTITION_NAME_RE.match(name)
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    months = int(match.group(3) or 1)
+    if not 1 <= month <= 12 or months < 1:
+        return None
+    end_year, end_month = _add_months(year, month, months)
+    start = datetime(year, month, 1, tzinfo=UTC)
+    end = datetime(end_year, end_month, 1, tzinfo=UTC)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+class MessagePartitionManager:
+    """消息向量分区管理器（线程安全，可在线程池中调用）"""
+
+    def __init__(
+        self,
+        client,
+        months: int,
+        retention_months: int = 0,
+        retention_action: str = "archive",
+        archive_dir: str | None = None,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+    ):
+        """
+        初始化分区管理器
+
+        Args:
+            client: 向量后端客户端（需支持 get_or_create_collection / list_collections /
+                    delete_collection）
+            months: 分区跨度（月），0 表示不再创建新分区（已有分区仍参与检索）
+            retention_months: 保留月数，0 表示永久保留
+            retention_action: 过期分区处理方式（archive / drop）
+            archive_dir: 归档文件目录
+            refresh_interval: 重新读取后端分区列表的间隔（秒）
+        """
+        if retention_action not in RETENTION_ACTIONS:
+            logger.warning(f"未知的分区保留处理方式: {retention_action}，使用 archive")
+            retention_action = "archive"
+
+        self.client = client
+        self.months = max(0, months)
+        self.retention_months = max(0, retention_months)
+        self.retention_action = retention_action
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.refresh_interval = refresh_interval
+        self._partitions: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._last_refresh: float | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """是否将新消息写入分区"""
+        return self.months > 0
+
+    def load(self) -> None:
+        """加载后端中已存在的分区 collection"""
+        self.refresh()
+        if self._partitions:
+            logger.info(f"已加载 {len(self._partitions)} 个消息向量分区")
+
+    def refresh(self) -> None:
+        """重新读取后端中的分区：加入其他进程新建的分区，移除已被删除的分区"""
+        with self._lock:
+            known = set(self._partitions)
+        names = set()
+        for item in self.client.list_collections():
+            # chromadb 0.6 返回名称字符串，其他版本返回 Collection 对象
+            name = getattr(item, "name", item)
+            if isinstance(name, str) and parse_partition_name(name):
+                names.add(name)
+        added = {
+            name: self.client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+            for name in names - known
+        }
+
+        with self._lock:
+            # 只移除读取列表前已知的分区，读取期间本进程新建的分区保留
+            for name in known - names:
+                if self._partitions.pop(name, None) is not None:
+                    logger.info(f"消息向量分区已不存在，不再检索: {name}")
+            for name, collection in added.items():
+                self._partitions.setdefault(name, collection)
+            self._last_refresh = time.monotonic()
+
+    def _maybe_refresh(self) -> None:
+        """距离上次读取分区列表超过间隔时重新读取（失败时沿用已知分区）"""
+        last = self._last_refresh
+        if last is not None and time.monotonic() - last < self.refresh_interval:
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            self._last_refresh = time.monotonic()
+            logger.warning(f"刷新消息向量分区列表失败: {type(e).__name__}: {e}")
+
+    def get(self, name: str):
+        """按名称获取已存在的分区"""
+        with self._lock:
+            return self._partitions.get(name)
+
+    def all(self) -> list[tuple[str, Any]]:
+        """所有分区（按时间升序）"""
+        self._maybe_refresh()
+        with self._lock:
+            return sorted(self._partitions.items())
+
+    def for_timestamp(self, ts: int | float | None):
+        """
+        获取时间戳所属的分区，不存在时创建
+
+        新分区创建时（通常意味着进入新的月份）顺带执行一次保留策略，
+        刚创建的分区本身不会被处理（迁移历史数据时可能落在保留期之外）。
+        """
+        if ts is None:
+            ts = time.time()
+        name = partition_name(ts, self.months)
+
+        with self._lock:
+            collection = self._partitions.get(name)
+            if collection is not None:
+                return collection
+            collection = self.client.get_or_create_collection(
+                name=name, metadata={"hnsw:space": "cosine"}
+            )
+            self._partitions[name] = collection
+        logger.info(f"创建消息向量分区: {name}")
+
+        if self.retention_months:
+            self.enforce_retention(keep=name)
+        return collection
+
+    def select(self, start_ts: int | None, end_ts: int | None) -> list[tuple[str, Any]]:
+        """返回与 [start_ts, end_ts] 有交集的分区，边界为 None 表示不限"""
+        selected = []
+        for name, collection in self.all():
+            span = parse_partition_name(name)
+            if span is None:
+                continue
+            if start_ts is not None and span[1] <= start_ts:
+                continue
+            if end_ts is not None and span[0] > end_ts:
+                continue
+            selected.append((name, collection))
+        return selected
+
+    def list_info(self) -> list[dict[str, Any]]:
+        """分区列表（名称、时间范围、向量数），用于统计与 WebUI"""
+        info = []
+        for name, collection in self.all():
+            start_ts, end_ts = parse_partition_name(name)
+            try:
+                count = collection.count()
+            except Exception as e:
+                logger.warning(f"获取分区 {name} 文档数量失败: {type(e).__name__}: {e}")
+                count = None
+            info.append(
+                {
+                    "name": name,
+                    "start": datetime.fromtimestamp(start_ts, UTC).isoformat(),
+                    "end": datetime.fromtimestamp(end_ts, UTC).isoformat(),
+                    "total_vectors": count,
+                    "expired": self._is_expired(end_ts, time.time()),
+                }
+            )
+        return info
+
+    def _is_expired(self, end_ts: int, now_ts: float) -> bool:
+        """分区结束时间早于保留期起点时视为过期"""
+        if not self.retention_months:
+            return False
+        now = datetime.fromtimestamp(now_ts, UTC)
+        year, month = _add_months(now.year, now.month, -self.retention_months)
+        horizon = datetime(year, month, 1, tzinfo=UTC).timestamp()
+        return end_ts <= horizon
+
+    def enforce_retention(
+        self, dry_run: bool = False, now_ts: float | None = None, keep: str | None = None
+    ) -> dict:
+        """
+        删除或归档超过保留期的分区
+
+        Args:
+            dry_run: 为 True 时只返回将被处理的分区
+            now_ts: 当前时间（测试用）
+            keep: 本次不处理的分区名称
+
+        Returns:
+            dict: {"expired": [...], "action": ..., "archived": {name: path}, "dry_run": ...}
+        """
+        now_ts = time.time() if now_ts is None else now_ts
+        expired = [
+            name
+            for name, _ in self.all()
+            if name != keep and self._is_expired(parse_partition_name(name)[1], now_ts)
+        ]
+        result = {
+            "expired": expired,
+            "action": self.retention_action,
+            "archived": {},
+            "dry_run": dry_run,
+        }
+        if dry_run or not expired:
+            return result
+
+        for name in expired:
+            collection = self.get(name)
+            if collection is None:
+                continue
+            start = time.monotonic()
+            if self.retention_action == "archive":
+                result["archived"][name] = self._archive(name, collection)
+            self.client.delete_collection(name)
+            with self._lock:
+                self._partitions.pop(name, None)
+            logger.info(
+                f"已{'归档并删除' if self.retention_action == 'archive' else '删除'}"
+                f"过期消息向量分区: {name}, 耗时 {time.monotonic() - start:.1f}s"
+            )
+        return result
+
+    def _archive(self, name: str, collection) -> str:
+        """将分区导出为 gzip JSONL（每行一条文档，含向量），返回文件路径"""
+        archive_dir = self.archive_dir or Path("data/vectors/archive")
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        path = archive_dir / f"{name}.jsonl.gz"
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        exported = 0
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for _ in range(_ARCHIVE_MAX_BATCHES):
+                page = collection.get(
+                    include=["documents", "metadatas", "embeddings"],
+                    limit=_ARCHIVE_BATCH_SIZE,
+                    offset=exported,
+                )
+                ids = page.get("ids") or []
+                if not ids:
+                    break
+                embeddings = page.get("embeddings")
+                for i, doc_id in enumerate(ids):
+                    embedding = embeddings[i] if embeddings is not None else None
+                    record = {
+                        "id": doc_id,
+                        "document": (page.get("documents") or [None] * len(ids))[i],
+                        "metadata": (page.get("metadatas") or [None] * len(ids))[i],
+                        "embedding": [float(v) for v in embedding]
+                        if embedding is not None
+                        else None,
+                    }
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                exported += len(ids)
+                if len(ids) < _ARCHIVE_BATCH_SIZE:
+                    break
+            else:
+                raise RuntimeError(f"归档分区 {name} 达到最大批次数 {_ARCHIVE_MAX_BATCHES}")
+        tmp_path.replace(path)
+        logger.info(f"消息向量分区已归档: {name} -> {path} ({exported} 条)")
+        return str(path)
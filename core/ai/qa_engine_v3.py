@@ -15,20 +15,31 @@
 import asyncio
 import json
 import logging
+import os
+import time
+from contextlib import aclosing
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
 from core.ai.agent_tools import TOOL_SCHEMAS, ToolExecutor
-from core.ai.ai_client import client_llm
+from core.ai.ai_client import async_client_llm
+from core.ai.answer_cache import get_answer_cache
+from core.ai.context_packer import context_budget, pack_by_relevance, result_key
+from core.ai.llm_scheduler import AdmissionRejected, get_llm_scheduler
 from core.ai.memory_manager import get_memory_manager
+from core.ai.qa_tracing import get_latency_tracer
+from core.ai.query_coalescer import get_query_coalescer
 from core.ai.reranker import get_reranker
 from core.ai.vector_store import get_vector_store
 from core.config import get_qa_bot_persona
 from core.infrastructure.database import get_db_manager
+from core.infrastructure.utils.text_chunking import join_passages
+from core.infrastructure.utils.text_tokenize import normalize_query
 from core.settings import get_llm_model
 
 from .conversation_manager import get_conversation_manager
 from .intent_parser import get_intent_parser
+from .quota_manager import get_quota_manager
 
 logger = logging.getLogger(__name__)
 
@@ -64,6 +75,19 @@ BASE_SYSTEM_TEMPLATE = """{persona_description}
 # Agentic RAG 最大工具调用迭代次数
 AGENT_MAX_ITERATIONS = 10
 
+# 固定流水线各检索分支的超时（秒），超时的分支按空结果参与融合，不阻塞回答
+SEMANTIC_LEG_TIMEOUT = float(os.getenv("QA_SEMANTIC_LEG_TIMEOUT", "10"))
+KEYWORD_LEG_TIMEOUT = float(os.getenv("QA_KEYWORD_LEG_TIMEOUT", "5"))
+
+# 无明确关键词时，语义结果少于该数量才使用关键词分支（最新总结）补充
+KEYWORD_SUPPLEMENT_THRESHOLD = 5
+
+# 答案缓存命中后按该长度分片回放，保持与实时生成一致的流式输出
+ANSWER_REPLAY_CHUNK_CHARS = 80
+
+# 等待 LLM 准入时的排队位置标记（"__QUEUED__:<位置>"，位置为 0 表示已准入）
+QUEUED_MARKER = "__QUEUED__:"
+
 # 追加到原系统提示词的工具使用说明
 AGENT_TOOL_INSTRUCTIONS = """
 
@@ -100,7 +124,6 @@ class QAEngineV3:
         self.vector_store = get_vector_store()
         self.reranker = get_reranker()
         self.conversation_mgr = get_conversation_manager()
-        self.tool_executor = ToolExecutor(self.vector_store, self.memory_manager, self.reranker)
         logger.info("问答引擎v3.2.0初始化完成（Agentic RAG + 多轮对话）")
 
     async def process_query(self, query: str, user_id: int) -> str:
@@ -168,6 +191,21 @@ class QAEngineV3:
             vector_info = f"\n• 向量总结数: {summaries_count} 条"
             vector_info += f"\n• 向量消息数: {messages_count} 条"
 
+        cache_stats = get_answer_cache().get_stats()
+        if cache_stats["enabled"]:
+            vector_info += (
+                f"\n• 答案缓存命中率: {cache_stats['hit_rate']:.1%} "
+                f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']})"
+            )
+        coalesced = get_query_coalescer().get_stats()["coalesced"]
+        if coalesced:
+            vector_info += f"\n• 合并的相同查询: {coalesced} 次"
+        scheduler_stats = get_llm_scheduler().get_stats()
+        vector_info += (
+            f"\n• 生成中/排队中: {scheduler_stats['active']}/{scheduler_stats['queued']} "
+            f"(并发上限 {scheduler_stats['max_concurrency']})"
+        )
+
         return f"""📊 系统状态
 
 • 每日总限额: {status["daily_limit"]} 次
@@ -196,12 +234,11 @@ class QAEngineV3:
         处理内容查询（v3.1.0）
 
         实现混合检索策略：
-        1. 查询改写（多轮对话中含代词时）
-        2. 语义检索（Dense，含时间过滤）
-        3. 关键词检索（Sparse）作为补充
-        4. RRF融合
-        5. Reranker精排
-        6. RAG生成（含对话历史）
+        1. 计算时间过滤范围
+        2. 语义检索（Dense）与关键词检索（Sparse）并发执行，各分支独立超时
+        3. RRF融合
+        4. Reranker精排
+        5. RAG生成（含对话历史）
         """
         try:
             query = parsed["original_query"]
@@ -222,66 +259,21 @@ class QAEngineV3:
                 date_after = cutoff.isoformat()
                 logger.info(f"时间过滤: date_after={date_after[:10]}")
 
-            # ── 步骤2: 语义检索（双 collection: summaries + messages） ─────────────
-            semantic_results = []
-            if self.vector_store.is_available():
-                try:
-                    # 优先使用双 collection 联合检索
-                    if self.vector_store.is_messages_available():
-                        semantic_results = self.vector_store.search_all(
-                            query=query,
-                            top_k=20,
-                            filter_metadata={"channel_id": channel_id} if channel_id else None,
-                            date_after=date_after,
-                        )
-                        logger.info(f"双collection语义检索: 找到 {len(semantic_results)} 条结果")
-                    else:
-                        semantic_results = self.vector_store.search_similar(
-                            query=query,
-                            top_k=20,
-                            filter_metadata={"channel_id": channel_id} if channel_id else None,
-                            date_after=date_after,
-                        )
-                        logger.info(f"语义检索(summaries): 找到 {len(semantic_results)} 条结果")
-                except Exception as e:
-                    logger.error(f"语义检索失败: {e}")
-
-            # ── 步骤3: 关键词检索（补充方案） ────────────────────────────────────
-            keyword_results = []
-            # 当语义检索结果不足或有明确关键词时，启用关键词检索
-            if keywords or len(semantic_results) < 5:
-                try:
-                    search_days = time_range if time_range is not None else 90
-                    keyword_results = await self.memory_manager.search_summaries(
-                        keywords=keywords,
-                        time_range_days=search_days,
-                        channel_id=channel_id,
-                        limit=10,
-                    )
-                    logger.info(f"关键词检索: 找到 {len(keyword_results)} 条结果")
-                except Exception as e:
-                    logger.error(f"关键词检索失败: {e}")
+            # ── 步骤2: 语义检索与关键词检索并发执行（各分支独立超时） ─────────────
+            semantic_results, keyword_results = await self._run_retrieval_legs(
+                query=query,
+                keywords=keywords,
+                time_range=time_range,
+                date_after=date_after,
+                channel_id=channel_id,
+                search_all=True,
+            )
 
-            # ── 步骤4: 融合结果 ───────────────────────────────────────────────────
+            # ── 步骤3: RRF融合 ────────────────────────────────────────────────────
+            final_candidates = self._rrf_fusion(semantic_results, keyword_results)
             if semantic_results and keyword_results:
-                final_candidates = self._rrf_fusion(semantic_results, keyword_results)
                 logger.info(f"RRF融合: {len(final_candidates)} 条结果")
-            elif semantic_results:
-                final_candidates = semantic_results
-            elif keyword_results:
-                final_candidates = [
-                    {
-                        "summary_id": r["id"],
-                        "summary_text": r["summary_text"],
-                        "metadata": {
-                            "channel_id": r.get("channel_id"),
-                            "channel_name": r.get("channel_name"),
-                            "created_at": r.get("created_at"),
-                        },
-                    }
-                    for r in keyword_results
-                ]
-            else:
+            if not final_candidates:
                 if time_range is not None and time_range <= 7:
                     return (
                         f"🔍 在最近 {time_range} 天内未找到相关总结。\n\n"
@@ -289,10 +281,12 @@ class QAEngineV3:
                     )
                 return "🔍 未找到相关总结。\n\n💡 提示：尝试调整关键词或时间范围。"
 
-            # ── 步骤5: 重排序（Top-20 → Top-5） ─────────────────────────────────
-            if self.reranker.is_available() and len(final_candidates) > 5:
+            # ── 步骤4: 重排序（Top-20 → Top-5） ─────────────────────────────────
+            if len(final_candidates) > 5 and (
+                self.reranker.is_available() or self.reranker.is_local_available()
+            ):
                 try:
-                    final_candidates = self.reranker.rerank(query, final_candidates, top_k=5)
+                    final_candidates = await self.reranker.arerank(query, final_candidates, top_k=5)
                     logger.info(f"重排序完成: 保留 {len(final_candidates)} 条结果")
                 except Exception as e:
                     logger.error(f"重排序失败: {e}")
@@ -300,13 +294,16 @@ class QAEngineV3:
             else:
                 final_candidates = final_candidates[:5]
 
-            # ── 步骤6: AI生成回答（RAG + 对话历史） ──────────────────────────────
-            answer = await self._generate_answer_with_rag(
-                query=query,
-                summaries=final_candidates,
-                keywords=keywords,
-                conversation_history=conversation_history,
-            )
+            # ── 步骤5: AI生成回答（RAG + 对话历史），生成前经过 LLM 准入调度 ─────
+            async with get_llm_scheduler().admitted(
+                user_id, priority=get_quota_manager().is_admin(user_id)
+            ):
+                answer = await self._generate_answer_with_rag(
+                    query=query,
+                    summaries=final_candidates,
+                    keywords=keywords,
+                    conversation_history=conversation_history,
+                )
 
             # 新会话时加上引导语
             if is_new_session:
@@ -314,54 +311,139 @@ class QAEngineV3:
 
             return answer
 
+        except AdmissionRejected:
+            logger.warning(f"LLM 排队已满，拒绝用户 {user_id} 的查询")
+            return "⏳ 当前提问人数过多，请稍后再试。"
         except Exception as e:
             logger.error(f"处理内容查询失败: {type(e).__name__}: {e}", exc_info=True)
             return "❌ 查询失败，请稍后重试。"
 
-    def _rrf_fusion(
-        self, semantic_results: list[dict], keyword_results: list[dict], k: int = 60
+    async def _run_retrieval_legs(
+        self,
+        query: str,
+        keywords: list[str],
+        time_range: int | None,
+        date_after: str | None,
+        channel_id: str | None,
+        search_all: bool = False,
+        log_prefix: str = "",
+    ) -> tuple[list[dict], list[dict]]:
+        """
+        并发执行语义检索与关键词检索
+
+        每个分支独立超时/容错，失败或超时的分支返回空列表，不影响其他分支。
+
+        Args:
+            query: 检索查询
+            keywords: 关键词列表
+            time_range: 时间范围（天），None 表示关键词检索默认 90 天
+            date_after: 语义检索的起始时间（ISO 格式）
+            channel_id: 频道URL
+            search_all: 语义检索是否同时检索 messages collection
+            log_prefix: 日志前缀
+
+        Returns:
+            (语义检索结果, 关键词检索结果)
+        """
+        filter_metadata = {"channel_id": channel_id} if channel_id else None
+
+        async def semantic_leg() -> list[dict]:
+            if not self.vector_store.is_available():
+                return []
+            if search_all and self.vector_store.is_messages_available():
+                return await self.vector_store.asearch_all(
+                    query=query,
+                    top_k=20,
+                    filter_metadata=filter_metadata,
+                    date_after=date_after,
+                )
+            return await self.vector_store.asearch_similar(
+                query=query,
+                top_k=20,
+                filter_metadata=filter_metadata,
+                date_after=date_after,
+            )
+
+        async def keyword_leg() -> list[dict]:
+            return await self.memory_manager.search_summaries(
+                keywords=keywords,
+                time_range_days=time_range if time_range is not None else 90,
+                channel_id=channel_id,
+                limit=10,
+            )
+
+        semantic_results, keyword_results = await asyncio.gather(
+            self._timed_leg(
+                f"{log_prefix}语义检索", semantic_leg(), SEMANTIC_LEG_TIMEOUT, "semantic_leg"
+            ),
+            self._timed_leg(
+                f"{log_prefix}关键词检索", keyword_leg(), KEYWORD_LEG_TIMEOUT, "keyword_leg"
+            ),
+        )
+
+        # 无明确关键词时关键词分支返回的是最新总结，仅在语义结果不足时用于补充
+        if not keywords and len(semantic_results) >= KEYWORD_SUPPLEMENT_THRESHOLD:
+            keyword_results = []
+        return semantic_results, keyword_results
+
+    @staticmethod
+    async def _timed_leg(
+        name: str, coro, timeout: float, stage: str = "retrieval_leg"
     ) -> list[dict]:
+        """执行单个检索分支：超时/异常时返回空列表，并记录分支耗时"""
+        start = time.perf_counter()
+        try:
+            with get_latency_tracer().span(stage):
+                results = await asyncio.wait_for(coro, timeout=timeout)
+        except TimeoutError:
+            logger.warning(f"{name}超时（{timeout:.1f}s），跳过该分支")
+            return []
+        except Exception as e:
+            logger.error(f"{name}失败: {type(e).__name__}: {e}")
+            return []
+        results = results or []
+        logger.info(
+            f"{name}: 找到 {len(results)} 条结果，耗时 {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+        return results
+
+    @staticmethod
+    def _keyword_to_candidate(result: dict) -> dict:
+        """将关键词检索返回的数据库行转换为统一的候选格式"""
+        return {
+            "summary_id": result["id"],
+            "summary_text": result["summary_text"],
+            "metadata": {
+                "channel_id": result.get("channel_id"),
+                "channel_name": result.get("channel_name"),
+                "created_at": result.get("created_at"),
+            },
+        }
+
+    def _rrf_fusion(self, *ranked_lists: list[dict], k: int = 60) -> list[dict]:
         """
         Reciprocal Rank Fusion (RRF) 融合算法
 
         Args:
-            semantic_results: 语义检索结果
-            keyword_results: 关键词检索结果
+            *ranked_lists: 任意数量的有序结果列表（语义检索结果或关键词检索的数据库行）
             k: RRF常数，默认60
 
         Returns:
-            融合后的结果列表
+            按融合分数降序的结果列表（同一总结保留首次出现的结果）
         """
         result_map = {}
 
-        # 处理语义检索结果
-        for rank, result in enumerate(semantic_results, 1):
-            summary_id = result["summary_id"]
-            score = 1.0 / (k + rank)
-            result_map[summary_id] = {"summary": result, "score": score, "source": "semantic"}
-
-        # 处理关键词检索结果
-        for rank, result in enumerate(keyword_results, 1):
-            summary_id = result["id"]
-            score = 1.0 / (k + rank)
+        for results in ranked_lists:
+            for rank, result in enumerate(results or [], 1):
+                if "summary_id" not in result:
+                    result = self._keyword_to_candidate(result)
+                summary_id = result["summary_id"]
+                score = 1.0 / (k + rank)
 
-            if summary_id in result_map:
-                result_map[summary_id]["score"] += score
-                result_map[summary_id]["source"] = "hybrid"
-            else:
-                result_map[summary_id] = {
-                    "summary": {
-                        "summary_id": result["id"],
-                        "summary_text": result["summary_text"],
-                        "metadata": {
-                            "channel_id": result.get("channel_id"),
-                            "channel_name": result.get("channel_name"),
-                            "created_at": result.get("created_at"),
-                        },
-                    },
-                    "score": score,
-                    "source": "keyword",
-                }
+                if summary_id in result_map:
+                    result_map[summary_id]["score"] += score
+                else:
+                    result_map[summary_id] = {"summary": result, "score": score}
 
         sorted_results = sorted(result_map.values(), key=lambda x: x["score"], reverse=True)
 
@@ -439,7 +521,7 @@ class QAEngineV3:
                 f"历史消息: {len(conversation_history) if conversation_history else 0}"
             )
 
-            response = client_llm.chat.completions.create(
+            response = await async_client_llm.chat.completions.create(
                 model=get_llm_model(),
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -485,8 +567,6 @@ class QAEngineV3:
         conversation_history: list[dict] = None,
     ):
         """使用RAG流式生成回答（异步生成器，降级路径使用）"""
-        import asyncio
-
         system_prompt, user_prompt = await self._build_rag_prompts(
             query=query,
             summaries=summaries,
@@ -499,28 +579,13 @@ class QAEngineV3:
             f"历史消息: {len(conversation_history) if conversation_history else 0}"
         )
 
-        loop = asyncio.get_event_loop()
-
-        def _do_stream():
-            return client_llm.chat.completions.create(
-                model=get_llm_model(),
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.7,
-                stream=True,
-            )
-
-        # 在线程池中调用同步 SDK，避免阻塞事件循环
-        stream = await loop.run_in_executor(None, _do_stream)
-
         full_text = ""
-        for chunk in stream:
-            if not chunk.choices:
-                continue
-            delta = chunk.choices[0].delta.content if chunk.choices[0].delta.content else ""
-            if delta:
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+        async with aclosing(self._stream_completion(messages)) as stream:
+            async for delta in stream:
                 full_text += delta
                 yield delta
 
@@ -539,148 +604,357 @@ class QAEngineV3:
         Yields:
             str: 文本片段，以 "__DONE__" 结尾表示完成，
                  以 "__ERROR__:<msg>" 表示出错，
-                 以 "__NEW_SESSION__" 表示开始了新会话。
+                 以 "__NEW_SESSION__" 表示开始了新会话，
+                 以 "__QUEUED__:<位置>" 表示正在排队等待 LLM 准入（0 表示已准入）。
+
+        调用方放弃请求时可提前 aclose() 生成器（或取消所在任务），
+        正在进行的 LLM 流式请求会随之关闭；尚未保存回答时补记一条"（已取消）"
+        助手回合，避免对话历史中残留没有回答的用户消息。
+
+        每个请求记录一棵分阶段的追踪树（意图解析、频道解析、历史读取、检索、LLM 等），
+        用于统计各阶段延迟分位数与定位慢请求。
         """
-        try:
-            logger.info(f"[stream] 处理查询: user_id={user_id}, query={query}")
+        tracer = get_latency_tracer()
+        session_id = None
+        answered = False  # 助手回合是否已写入对话历史
+        full_answer = ""
+        with tracer.trace("qa_request", user_id=user_id) as trace:
+            try:
+                logger.info(
+                    f"[stream] [trace={trace.trace_id}] 处理查询: user_id={user_id}, query={query}"
+                )
 
-            # 1. 获取或创建会话
-            session_id, is_new_session = self.conversation_mgr.get_or_create_session(user_id)
+                # 1. 获取或创建会话
+                session_id, is_new_session = self.conversation_mgr.get_or_create_session(user_id)
 
-            # 2. 保存用户消息
-            await self.conversation_mgr.save_message(
-                user_id=user_id, session_id=session_id, role="user", content=query
-            )
+                # 2. 保存用户消息
+                with tracer.span("history_write"):
+                    await self.conversation_mgr.save_message(
+                        user_id=user_id, session_id=session_id, role="user", content=query
+                    )
 
-            # 3. 解析查询意图
-            parsed = self.intent_parser.parse_query(query)
-            if channel_hint:
-                parsed["channel_hint"] = channel_hint
-            intent = parsed["intent"]
+                # 3. 解析查询意图
+                with tracer.span("intent_parse"):
+                    parsed = self.intent_parser.parse_query(query)
+                trace.attrs["intent"] = parsed["intent"]
+                if channel_hint:
+                    parsed["channel_hint"] = channel_hint
+                intent = parsed["intent"]
+
+                # 4. 非内容查询直接返回（不使用流式）
+                if intent == "status":
+                    answer = await self._handle_status_query()
+                    yield answer
+                    await self.conversation_mgr.save_message(
+                        user_id=user_id, session_id=session_id, role="assistant", content=answer
+                    )
+                    answered = True
+                    yield "__DONE__"
+                    return
+
+                if intent == "stats":
+                    answer = await self._handle_stats_query(parsed)
+                    yield answer
+                    await self.conversation_mgr.save_message(
+                        user_id=user_id, session_id=session_id, role="assistant", content=answer
+                    )
+                    answered = True
+                    yield "__DONE__"
+                    return
+
+                # 5. 内容查询：先完成检索阶段，再流式生成
+                if is_new_session:
+                    yield "__NEW_SESSION__"
+
+                original_query = parsed["original_query"]
+                keywords = parsed.get("keywords", [])
+                time_range = parsed.get("time_range")
+                # 这里预解析频道用于约束首轮检索与降级流水线；即使 agentic 模式后续
+                # 自主调用 resolve_channel，也可以确保向量检索从一开始就限定频道。
+                # 预解析仅做快速限定；若无法唯一解析，agentic 工具仍可返回候选供 LLM 选择。
+                with tracer.span("resolve_channel"):
+                    channel_id = await self._resolve_channel_from_parsed(parsed)
+
+                with tracer.span("history_read"):
+                    conversation_history = await self.conversation_mgr.get_conversation_history(
+                        user_id, session_id
+                    )
 
-            # 4. 非内容查询直接返回（不使用流式）
-            if intent == "status":
-                answer = await self._handle_status_query()
-                yield answer
-                await self.conversation_mgr.save_message(
-                    user_id=user_id, session_id=session_id, role="assistant", content=answer
+                # 时间过滤
+                date_after: str | None = None
+                if time_range is not None:
+                    cutoff = datetime.now(UTC) - timedelta(days=time_range)
+                    date_after = cutoff.isoformat()
+
+                # 语义答案缓存：相近的首轮问题直接回放已生成的回答
+                cache_embedding, cache_generation, cached_answer = await self._lookup_cached_answer(
+                    original_query, channel_id, time_range, conversation_history
                 )
-                yield "__DONE__"
-                return
 
-            if intent == "stats":
-                answer = await self._handle_stats_query(parsed)
-                yield answer
+                if cached_answer is not None:
+                    logger.info(
+                        f"[stream] 答案缓存命中: channel={channel_id}, time_range={time_range}"
+                    )
+                    for start in range(0, len(cached_answer), ANSWER_REPLAY_CHUNK_CHARS):
+                        chunk = cached_answer[start : start + ANSWER_REPLAY_CHUNK_CHARS]
+                        full_answer += chunk
+                        yield chunk
+                else:
+                    # 会话内首轮的相同问题（同一频道与时间范围）共享进行中的检索与生成，
+                    # 生成前经过 LLM 准入调度（合并的请求只占用一个名额）
+                    def produce():
+                        return self._admitted_stream(
+                            user_id,
+                            lambda: self._answer_stream(
+                                query=original_query,
+                                conversation_history=conversation_history,
+                                time_range=time_range,
+                                date_after=date_after,
+                                keywords=keywords,
+                                channel_id=channel_id,
+                                channel_hint=parsed.get("channel_hint"),
+                                cache_embedding=cache_embedding,
+                                cache_generation=cache_generation,
+                            ),
+                        )
+
+                    if self._is_first_turn(conversation_history):
+                        key = (
+                            normalize_query(original_query),
+                            channel_id or parsed.get("channel_hint"),
+                            time_range,
+                        )
+                        answer = get_query_coalescer().stream(key, produce)
+                    else:
+                        answer = produce()
+                    async with aclosing(answer):
+                        async for chunk in answer:
+                            if not chunk.startswith(QUEUED_MARKER):
+                                full_answer += chunk
+                            yield chunk
+
+                # 保存完整回答到对话历史
+                if is_new_session:
+                    full_answer = "🍃 *开始新的对话。*\n\n" + full_answer
                 await self.conversation_mgr.save_message(
-                    user_id=user_id, session_id=session_id, role="assistant", content=answer
+                    user_id=user_id, session_id=session_id, role="assistant", content=full_answer
                 )
-                yield "__DONE__"
-                return
+                answered = True
 
-            # 5. 内容查询：先完成检索阶段，再流式生成
-            if is_new_session:
-                yield "__NEW_SESSION__"
+                yield "__DONE__"
 
-            original_query = parsed["original_query"]
-            keywords = parsed.get("keywords", [])
-            time_range = parsed.get("time_range")
-            # 这里预解析频道用于约束首轮检索与降级流水线；即使 agentic 模式后续
-            # 自主调用 resolve_channel，也可以确保向量检索从一开始就限定频道。
-            # 预解析仅做快速限定；若无法唯一解析，agentic 工具仍可返回候选供 LLM 选择。
-            channel_id = await self._resolve_channel_from_parsed(parsed)
+            except (GeneratorExit, asyncio.CancelledError):
+                if session_id is not None and not answered:
+                    await self._save_cancelled_turn(user_id, session_id, full_answer)
+                raise
+            except AdmissionRejected:
+                logger.warning(f"[stream] [trace={trace.trace_id}] LLM 排队已满，拒绝查询")
+                yield "__ERROR__:⏳ 当前提问人数过多，请稍后再试。"
+            except Exception as e:
+                logger.error(f"[stream] 处理查询失败: {type(e).__name__}: {e}", exc_info=True)
+                yield "__ERROR__:❌ 处理查询时出错，请稍后重试。"
 
-            conversation_history = await self.conversation_mgr.get_conversation_history(
-                user_id, session_id
+    async def _save_cancelled_turn(self, user_id: int, session_id: str, partial: str) -> None:
+        """用户放弃请求时保存已输出的部分回答并标注"（已取消）"，失败时仅记录日志。"""
+        content = (partial + "\n\n" if partial else "") + "（已取消）"
+        try:
+            await self.conversation_mgr.save_message(
+                user_id=user_id, session_id=session_id, role="assistant", content=content
             )
+        except Exception as e:
+            logger.warning(f"[stream] 保存已取消回合失败: {type(e).__name__}: {e}")
 
-            # 时间过滤
-            date_after: str | None = None
-            if time_range is not None:
-                cutoff = datetime.now(UTC) - timedelta(days=time_range)
-                date_after = cutoff.isoformat()
+    async def _admitted_stream(self, user_id: int, factory):
+        """
+        等待 LLM 准入后运行生成（管理员优先，普通用户公平排队）
 
-            # Agentic RAG：LLM 自主决定是否检索
-            full_answer = ""
-            try:
-                async for chunk in self._agentic_stream(
-                    query=original_query,
-                    conversation_history=conversation_history,
-                    time_range=time_range,
-                    date_after=date_after,
-                    keywords=keywords,
-                    channel_id=channel_id,
-                    channel_hint=parsed.get("channel_hint"),
-                ):
+        Args:
+            user_id: 发起请求的用户ID
+            factory: 创建回答生成器的函数（准入后调用）
+
+        Yields:
+            str: 排队期间的 "__QUEUED__:<位置>" 标记（准入后补发位置 0），之后为回答片段
+        """
+        scheduler = get_llm_scheduler()
+        ticket = scheduler.submit(user_id, priority=get_quota_manager().is_admin(user_id))
+        try:
+            if not ticket.admitted:
+                started = time.perf_counter()
+                async for position in scheduler.wait(ticket):
+                    logger.debug(f"用户 {user_id} 等待 LLM 准入，排队位置 {position}")
+                    yield f"{QUEUED_MARKER}{position}"
+                get_latency_tracer().mark("llm_queue", started)
+                yield f"{QUEUED_MARKER}0"
+            async with aclosing(factory()) as source:
+                async for chunk in source:
+                    yield chunk
+        finally:
+            scheduler.release(ticket)
+
+    async def _answer_stream(
+        self,
+        query: str,
+        conversation_history: list[dict],
+        time_range: int | None,
+        date_after: str | None,
+        keywords: list[str],
+        channel_id: str | None,
+        channel_hint: str | None,
+        cache_embedding: list[float] | None,
+        cache_generation: int | None,
+    ):
+        """
+        检索并流式生成回答（Agentic RAG，异常时降级到固定流水线），完成后写入答案缓存
+
+        相同查询合并时由后台任务运行，回答片段会分发给所有等待的请求。
+        """
+        full_answer = ""
+        # Agentic RAG：LLM 自主决定是否检索
+        try:
+            agentic = self._agentic_stream(
+                query=query,
+                conversation_history=conversation_history,
+                time_range=time_range,
+                date_after=date_after,
+                keywords=keywords,
+                channel_id=channel_id,
+                channel_hint=channel_hint,
+            )
+            async with aclosing(agentic):
+                async for chunk in agentic:
                     full_answer += chunk
                     yield chunk
 
-            except Exception as e:
-                logger.error(f"[stream] Agentic 处理异常，降级到固定流水线: {e}", exc_info=True)
+        except Exception as e:
+            logger.error(f"[stream] Agentic 处理异常，降级到固定流水线: {e}", exc_info=True)
+            # 降级回答不写入答案缓存
+            cache_embedding = None
+            with get_latency_tracer().span("fallback_pipeline"):
                 final_candidates = await self._fallback_fixed_pipeline(
-                    search_query=original_query,
+                    search_query=query,
                     keywords=keywords,
                     time_range=time_range,
                     date_after=date_after,
                     channel_id=channel_id,
                 )
-                if final_candidates:
-                    async for chunk in self.generate_answer_stream(
-                        query=original_query,
-                        summaries=final_candidates,
-                        keywords=keywords,
-                        conversation_history=conversation_history,
-                    ):
+            if final_candidates:
+                fallback = self.generate_answer_stream(
+                    query=query,
+                    summaries=final_candidates,
+                    keywords=keywords,
+                    conversation_history=conversation_history,
+                )
+                async with aclosing(fallback):
+                    async for chunk in fallback:
                         full_answer += chunk
                         yield chunk
+            else:
+                if time_range is not None and time_range <= 7:
+                    full_answer = (
+                        f"🔍 在最近 {time_range} 天内未找到相关总结。\n\n"
+                        f"💡 提示：可以尝试扩大时间范围，例如'最近30天关于...'。"
+                    )
                 else:
-                    if time_range is not None and time_range <= 7:
-                        full_answer = (
-                            f"🔍 在最近 {time_range} 天内未找到相关总结。\n\n"
-                            f"💡 提示：可以尝试扩大时间范围，例如'最近30天关于...'。"
-                        )
-                    else:
-                        full_answer = "🔍 未找到相关总结。\n\n💡 提示：尝试调整关键词或时间范围。"
-                    yield full_answer
-
-            # 保存完整回答到对话历史
-            if is_new_session:
-                full_answer = "🍃 *开始新的对话。*\n\n" + full_answer
-            await self.conversation_mgr.save_message(
-                user_id=user_id, session_id=session_id, role="assistant", content=full_answer
+                    full_answer = "🔍 未找到相关总结。\n\n💡 提示：尝试调整关键词或时间范围。"
+                yield full_answer
+
+        if cache_embedding is not None and full_answer:
+            get_answer_cache().set(
+                cache_embedding,
+                channel_id,
+                time_range,
+                full_answer,
+                generation=cache_generation,
             )
 
-            yield "__DONE__"
+    async def _lookup_cached_answer(
+        self,
+        query: str,
+        channel_id: str | None,
+        time_range: int | None,
+        conversation_history: list[dict],
+    ) -> tuple[list[float] | None, int | None, str | None]:
+        """
+        查询语义答案缓存
+
+        多轮对话中的回答依赖上下文，仅对会话内的首轮问题使用缓存。
+        查询向量会写入查询向量缓存，未命中时后续检索可直接复用。
 
+        Returns:
+            (查询向量, 作用域代数, 缓存的回答)；不适用缓存时查询向量为 None
+        """
+        answer_cache = get_answer_cache()
+        if not answer_cache.enabled:
+            return None, None, None
+        if not self._is_first_turn(conversation_history):
+            return None, None, None
+
+        tracer = get_latency_tracer()
+        try:
+            from core.ai.embedding_generator import get_async_embedding_generator
+
+            emb_gen = get_async_embedding_generator()
+            if not emb_gen.is_available():
+                return None, None, None
+            with tracer.span("embedding"):
+                embedding = await emb_gen.agenerate(query, use_cache=True)
+            if embedding is None:
+                return None, None, None
+
+            with tracer.span("answer_cache") as span:
+                generation = await asyncio.to_thread(answer_cache.current_generation, channel_id)
+                cached = await asyncio.to_thread(
+                    answer_cache.get, embedding, channel_id, time_range
+                )
+                if span is not None:
+                    span.attrs["hit"] = cached is not None
+            return embedding, generation, cached
         except Exception as e:
-            logger.error(f"[stream] 处理查询失败: {type(e).__name__}: {e}", exc_info=True)
-            yield "__ERROR__:❌ 处理查询时出错，请稍后重试。"
+            logger.warning(f"查询答案缓存失败: {type(e).__name__}: {e}")
+            return None, None, None
 
-    def _prepare_rag_context(self, summaries: list[dict[str, Any]]) -> str:
+    @staticmethod
+    def _is_first_turn(conversation_history: list[dict]) -> bool:
+        """会话内首轮问题（回答不依赖对话上下文，可复用其他用户的回答）"""
+        return not any(m.get("role") in ("assistant", "summary") for m in conversation_history)
+
+    def _prepare_rag_context(
+        self, summaries: list[dict[str, Any]], passages_only: bool = True
+    ) -> str:
         """
         准备RAG上下文信息
 
-        动态分配每条总结的最大字符数：
-        - 1条结果: 最多 2000 字符
-        - 2条结果: 最多 1500 字符
-        - 3-4条结果: 最多 1000 字符
-        - 5条结果: 最多 800 字符
+        按当前模型的 token 预算打包：相关度（重排分 > 相似度）高的文档优先放入全文，
+        预算不足时截断最后一篇，放不下的文档省略（同一文档只保留一次）。
+
+        passages_only 为 True 时，带有 matched_passages 的总结只发送命中的段落
+        （按原文顺序拼接），而不是全文。
         """
-        count = len(summaries[:5])
-        if count <= 1:
-            max_chars = 2000
-        elif count == 2:
-            max_chars = 1500
-        elif count <= 4:
-            max_chars = 1000
-        else:
-            max_chars = 800
+        budget = context_budget(get_llm_model())
+        docs, texts, seen = [], [], set()
+        for summary in summaries[:5]:
+            key = result_key(summary)
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            passages = summary.get("matched_passages")
+            if passages_only and passages:
+                # 字符上限只做粗略约束（每 token 至多约 4 字符），精确截断交给 token 预算
+                texts.append(join_passages(passages, budget * 4))
+            else:
+                texts.append(summary.get("summary_text", ""))
+            docs.append(summary)
+
+        packed = pack_by_relevance(docs, texts, budget)
 
         context_parts = []
-        for i, summary in enumerate(summaries[:5], 1):
+        for summary, text_preview in zip(docs, packed, strict=True):
+            if text_preview is None:
+                continue
             metadata = summary.get("metadata", {})
             channel_name = metadata.get("channel_name") or summary.get("channel_name", "未知频道")
             created_at = metadata.get("created_at") or summary.get("created_at", "")
-            summary_text = summary.get("summary_text", "")
             post_links = QAEngineV3._extract_post_links(summary)
 
             # 来源标签（总结 or 原始消息）
@@ -690,11 +964,6 @@ class QAEngineV3:
             elif summary.get("source") == "summary":
                 source_tag = " [总结]"
 
-            # 动态截断
-            text_preview = (
-                summary_text[:max_chars] + "..." if len(summary_text) > max_chars else summary_text
-            )
-
             # 分数信息
             score_info = ""
             if "similarity" in summary:
@@ -707,7 +976,7 @@ class QAEngineV3:
                 links_text = "\n相关帖子链接: " + " ".join(post_links[:5])
 
             context_parts.append(
-                f"[{i}] {channel_name} ({created_at}){source_tag}{score_info}\n"
+                f"[{len(context_parts) + 1}] {channel_name} ({created_at}){source_tag}{score_info}\n"
                 f"{text_preview}{links_text}"
             )
 
@@ -773,8 +1042,14 @@ class QAEngineV3:
         channel_hint: str | None = None,
     ):
         """Agentic RAG 流式生成器。Tool-calling 循环（非流式）+ 最终回答（流式）。"""
-        self.tool_executor.reset()
-        loop = asyncio.get_running_loop()
+        # 每个请求使用独立的工具执行器：多个用户的 agent loop 并发进行，
+        # 检索结果存储与已发送记录不能共享
+        tool_executor = ToolExecutor(
+            self.vector_store,
+            self.memory_manager,
+            self.reranker,
+            token_budget=context_budget(get_llm_model()),
+        )
 
         # 构建系统提示词：原有提示词 + 工具说明
         channel_context = await self.memory_manager.get_channel_context()
@@ -816,20 +1091,20 @@ class QAEngineV3:
             {"role": "user", "content": user_content},
         ]
 
-        # Tool-calling 循环（非流式）
+        # Tool-calling 循环（非流式）；earlier_tool_indices 记录较早轮次工具结果的消息下标
+        earlier_tool_indices: list[int] = []
+        latest_tool_indices: list[int] = []
         for iteration in range(AGENT_MAX_ITERATIONS):
             logger.info(f"[agent] 迭代 {iteration + 1}/{AGENT_MAX_ITERATIONS}")
 
-            response = await loop.run_in_executor(
-                None,
-                lambda: client_llm.chat.completions.create(
+            with get_latency_tracer().span("agent_llm", iteration=iteration + 1):
+                response = await async_client_llm.chat.completions.create(
                     model=get_llm_model(),
                     messages=messages,
                     tools=TOOL_SCHEMAS,
                     tool_choice="auto",
                     temperature=0.7,
-                ),
-            )
+                )
 
             if not response or not response.choices:
                 logger.warning("[agent] LLM 返回无效响应")
@@ -843,17 +1118,28 @@ class QAEngineV3:
                 logger.info(f"[agent] LLM 就绪（迭代 {iteration + 1}），开始流式生成")
                 break
 
-            # 执行 tool calls
+            # 执行 tool calls（同一轮的独立工具并发执行，结果按原顺序追加）
+            calls = []
             for tool_call in message.tool_calls:
-                tool_name = tool_call.function.name
                 try:
                     tool_args = json.loads(tool_call.function.arguments)
                 except json.JSONDecodeError:
                     logger.warning(f"[agent] 工具参数解析失败: {tool_call.function.arguments}")
                     tool_args = {}
+                calls.append((tool_call.function.name, tool_args))
 
-                logger.info(f"[agent] 调用工具: {tool_name}")
-                result_str = await self.tool_executor.execute(tool_name, tool_args)
+            logger.info(f"[agent] 调用工具: {', '.join(name for name, _ in calls)}")
+            started = time.perf_counter()
+            with get_latency_tracer().span("tool_round", iteration=iteration + 1):
+                results = await tool_executor.execute_many(calls)
+            logger.info(
+                f"[agent] 工具执行完成: {len(calls)} 个，耗时 "
+                f"{(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+            earlier_tool_indices.extend(latest_tool_indices)
+            latest_tool_indices = []
+            for tool_call, result_str in zip(message.tool_calls, results, strict=True):
+                latest_tool_indices.append(len(messages))
                 messages.append(
                     {
                         "role": "tool",
@@ -861,6 +1147,9 @@ class QAEngineV3:
                         "content": result_str,
                     }
                 )
+            # 较早轮次的工具结果压缩为 ID 引用，避免提示词随迭代持续膨胀
+            if earlier_tool_indices:
+                tool_executor.compact_history(messages, earlier_tool_indices)
         else:
             # 达到最大迭代，追加提示
             logger.warning(f"[agent] 达到最大迭代 {AGENT_MAX_ITERATIONS}，强制生成回答")
@@ -872,31 +1161,48 @@ class QAEngineV3:
             )
 
         # 流式生成最终回答
-        stream = await loop.run_in_executor(
-            None,
-            lambda: client_llm.chat.completions.create(
-                model=get_llm_model(),
-                messages=messages,
-                temperature=0.7,
-                stream=True,
-            ),
-        )
-
         full_text = ""
-        for chunk in stream:
-            if not chunk.choices:
-                continue
-            delta = chunk.choices[0].delta.content or ""
-            if delta:
+        async with aclosing(self._stream_completion(messages)) as stream:
+            async for delta in stream:
                 full_text += delta
                 yield delta
 
         # 追加来源信息
-        all_results = self.tool_executor.get_all_results()
+        all_results = tool_executor.get_all_results()
         if all_results and "📚 数据来源" not in full_text:
             source_info = self._format_source_info_v3(all_results)
             yield f"\n\n{source_info}"
 
+    @staticmethod
+    async def _stream_completion(messages: list[dict]):
+        """
+        异步流式调用 LLM，逐段 yield 文本增量
+
+        调用方提前关闭生成器（用户放弃请求）或任务被取消时，
+        在 finally 中关闭底层 HTTP 流，停止继续接收与计费。
+        首个文本增量到达时记录首 token 延迟（llm_ttft）。
+        """
+        started = time.perf_counter()
+        stream = await async_client_llm.chat.completions.create(
+            model=get_llm_model(),
+            messages=messages,
+            temperature=0.7,
+            stream=True,
+        )
+        first_token = True
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if delta:
+                    if first_token:
+                        get_latency_tracer().mark("llm_ttft", started)
+                        first_token = False
+                    yield delta
+        finally:
+            await stream.close()
+
     @staticmethod
     def _message_to_dict(message) -> dict:
         """将 OpenAI Message 对象转为 dict（保留 tool_calls）。"""
@@ -926,58 +1232,30 @@ class QAEngineV3:
         """降级到固定流水线（当 Agentic 处理异常时使用）。"""
         logger.info("[fallback] 使用固定流水线检索")
 
-        # 语义检索
-        semantic_results = []
-        if self.vector_store.is_available():
-            try:
-                semantic_results = self.vector_store.search_similar(
-                    query=search_query,
-                    top_k=20,
-                    filter_metadata={"channel_id": channel_id} if channel_id else None,
-                    date_after=date_after,
-                )
-            except Exception as e:
-                logger.error(f"[fallback] 语义检索失败: {e}")
-
-        # 关键词检索
-        keyword_results = []
-        if keywords or len(semantic_results) < 5:
-            try:
-                search_days = time_range if time_range is not None else 90
-                keyword_results = await self.memory_manager.search_summaries(
-                    keywords=keywords,
-                    time_range_days=search_days,
-                    channel_id=channel_id,
-                    limit=10,
-                )
-            except Exception as e:
-                logger.error(f"[fallback] 关键词检索失败: {e}")
+        # 语义检索与关键词检索并发执行
+        semantic_results, keyword_results = await self._run_retrieval_legs(
+            query=search_query,
+            keywords=keywords,
+            time_range=time_range,
+            date_after=date_after,
+            channel_id=channel_id,
+            log_prefix="[fallback] ",
+        )
 
         # 融合
-        if semantic_results and keyword_results:
-            final_candidates = self._rrf_fusion(semantic_results, keyword_results)
-        elif semantic_results:
-            final_candidates = semantic_results
-        elif keyword_results:
-            final_candidates = [
-                {
-                    "summary_id": r["id"],
-                    "summary_text": r["summary_text"],
-                    "metadata": {
-                        "channel_id": r.get("channel_id"),
-                        "channel_name": r.get("channel_name"),
-                        "created_at": r.get("created_at"),
-                    },
-                }
-                for r in keyword_results
-            ]
-        else:
+        final_candidates = self._rrf_fusion(semantic_results, keyword_results)
+        if not final_candidates:
             return []
 
         # 重排序
-        if self.reranker.is_available() and len(final_candidates) > 5:
+        if len(final_candidates) > 5 and (
+            self.reranker.is_available() or self.reranker.is_local_available()
+        ):
             try:
-                final_candidates = self.reranker.rerank(search_query, final_candidates, top_k=5)
+                with get_latency_tracer().span("rerank"):
+                    final_candidates = await self.reranker.arerank(
+                        search_query, final_candidates, top_k=5
+                    )
             except Exception as e:
                 logger.error(f"[fallback] 重排序失败: {e}")
                 final_candidates = final_candidates[:5]
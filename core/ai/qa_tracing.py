@@ -0,0 +1,298 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+问答流水线分阶段延迟追踪
+
+- 每个问答请求是一棵 span 树（带 trace_id），当前 span 通过 contextvars 传递，
+  并发的子任务（asyncio.gather）会挂到同一父 span 下
+- 请求结束时按阶段名汇总耗时，保留最近 N 次的滚动窗口，计算 p50/p95/p99
+- 超过慢请求阈值的请求记录完整 span 树并写入日志
+- 问答 Bot 运行在独立进程，统计快照定期写入 data/ 下的 JSON 文件，供 Web API 读取
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 1000  # 每个阶段保留的最近样本数
+DEFAULT_SLOW_MS = 8000  # 慢请求阈值（毫秒），0 表示不记录慢请求
+DEFAULT_SLOW_LOG_SIZE = 50  # 保留的慢请求数
+DEFAULT_FLUSH_INTERVAL = 10  # 统计快照写入间隔（秒）
+DEFAULT_SNAPSHOT_PATH = "data/qa_latency.json"
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar(
+    "qa_current_span", default=None
+)
+
+
+class Span:
+    """追踪区间（一个阶段的一次执行）"""
+
+    __slots__ = ("name", "trace_id", "attrs", "start", "end", "children")
+
+    def __init__(self, name: str, trace_id: str, attrs: dict[str, Any] | None = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end: float | None = None
+        self.children: list[Span] = []
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def walk(self):
+        """深度优先遍历 span 树"""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self, origin: float | None = None) -> dict[str, Any]:
+        """转换为可序列化的 span 树（offset_ms 为相对请求开始的偏移）"""
+        origin = self.start if origin is None else origin
+        data: dict[str, Any] = {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round(self.duration_ms, 1),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+class LatencyTracer:
+    """分阶段延迟追踪器
+
+    维护每个阶段的滚动耗时窗口与慢请求记录，并定期把统计快照写入文件。
+    """
+
+    def __init__(
+        self,
+        window: int = DEFAULT_WINDOW,
+        slow_ms: float = DEFAULT_SLOW_MS,
+        slow_log_size: int = DEFAULT_SLOW_LOG_SIZE,
+        snapshot_path: str | None = None,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        """初始化追踪器
+
+        Args:
+            window: 每个阶段保留的最近样本数
+            slow_ms: 慢请求阈值（毫秒），0 表示不记录慢请求
+            slow_log_size: 保留的慢请求数
+            snapshot_path: 统计快照文件路径，为空时不写文件
+            flush_interval: 快照写入最小间隔（秒）
+        """
+        self.window = window
+        self.slow_ms = slow_ms
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.flush_interval = flush_interval
+        self._samples: dict[str, deque[float]] = {}
+        self._counts: dict[str, int] = {}
+        self._slow: deque[dict[str, Any]] = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    @contextmanager
+    def trace(self, name: str, **attrs):
+        """开始一次请求追踪（根 span），结束时汇总耗时
+
+        Yields:
+            Span: 根 span，trace_id 可用于日志关联
+        """
+        root = Span(name, uuid.uuid4().hex[:12], attrs)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            root.end = time.perf_counter()
+            _restore(token, None)
+            self._finish(root)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """在当前请求中记录一个阶段；不在追踪中时不做任何事
+
+        Yields:
+            Span | None: 当前阶段的 span
+        """
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(name, parent.trace_id, attrs)
+        parent.children.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _restore(token, parent)
+
+    def mark(self, name: str, started: float, **attrs) -> None:
+        """记录一个已完成的阶段（从 started 到现在），用于首 token 延迟等无法用 with 包裹的阶段
+
+        Args:
+            name: 阶段名
+            started: 阶段开始时间（time.perf_counter()）
+        """
+        parent = _current_span.get()
+        if parent is None:
+            return
+        span = Span(name, parent.trace_id, attrs)
+        span.start = started
+        span.end = time.perf_counter()
+        parent.children.append(span)
+
+    def _finish(self, root: Span) -> None:
+        """汇总一次请求的各阶段耗时，记录慢请求并按需写入快照"""
+        with self._lock:
+            for span in root.walk():
+                samples = self._samples.get(span.name)
+                if samples is None:
+                    samples = self._samples[span.name] = deque(maxlen=self.window)
+                samples.append(span.duration_ms)
+                self._counts[span.name] = self._counts.get(span.name, 0) + 1
+
+            total_ms = root.duration_ms
+            if self.slow_ms and total_ms >= self.slow_ms:
+                tree = root.to_dict()
+                self._slow.append(
+                    {"trace_id": root.trace_id, "finished_at": time.time(), "tree": tree}
+                )
+                logger.warning(
+                    f"[trace={root.trace_id}] 慢请求 {total_ms:.0f}ms: "
+                    f"{json.dumps(tree, ensure_ascii=False, default=str)}"
+                )
+
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        """距离上次写入超过间隔时，在线程池中写入统计快照（不阻塞事件循环）"""
+        if self.snapshot_path is None:
+            return
+        now = time.monotonic()
+        if now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self.write_snapshot)
+        except RuntimeError:
+            self.write_snapshot()
+
+    def get_stats(self) -> dict[str, Any]:
+        """获取各阶段延迟分位数与慢请求记录"""
+        with self._lock:
+            stages = {}
+            for name, samples in self._samples.items():
+                values = np.fromiter(samples, dtype=np.float64)
+                p50, p95, p99 = np.percentile(values, [50, 95, 99])
+                stages[name] = {
+                    "count": self._counts[name],
+                    "window": len(values),
+                    "p50_ms": round(float(p50), 1),
+                    "p95_ms": round(float(p95), 1),
+                    "p99_ms": round(float(p99), 1),
+                    "max_ms": round(float(values.max()), 1),
+                    "mean_ms": round(float(values.mean()), 1),
+                }
+            return {
+                "stages": stages,
+                "slow_requests": list(self._slow),
+                "slow_threshold_ms": self.slow_ms,
+            }
+
+    def write_snapshot(self) -> None:
+        """原子写入统计快照文件"""
+        if self.snapshot_path is None:
+            return
+        try:
+            snapshot = {**self.get_stats(), "pid": os.getpid(), "updated_at": time.time()}
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+            tmp_path.write_text(json.dumps(snapshot, ensure_ascii=False), encoding="utf-8")
+            tmp_path.replace(self.snapshot_path)
+        except Exception as e:
+            logger.warning(f"写入问答延迟快照失败: {type(e).__name__}: {e}")
+
+
+def _restore(token: contextvars.Token, previous: Span | None) -> None:
+    """恢复上一层 span（在异步生成器中跨 yield 退出时 token 可能属于其他上下文）"""
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        _current_span.set(previous)
+
+
+def current_trace_id() -> str | None:
+    """当前请求的 trace_id（不在追踪中时为 None）"""
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+# 创建全局追踪器实例
+latency_tracer = None
+
+
+def get_latency_tracer():
+    """获取全局问答延迟追踪器实例"""
+    global latency_tracer
+    if latency_tracer is None:
+        latency_tracer = LatencyTracer(
+            window=int(os.getenv("QA_TRACE_WINDOW", str(DEFAULT_WINDOW))),
+            slow_ms=float(os.getenv("QA_TRACE_SLOW_MS", str(DEFAULT_SLOW_MS))),
+            snapshot_path=os.getenv("QA_TRACE_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH),
+        )
+    return latency_tracer
+
+
+def load_latency_snapshot(path: str | None = None) -> dict[str, Any] | None:
+    """读取问答 Bot 进程写入的延迟统计快照
+
+    Args:
+        path: 快照文件路径，默认取 QA_TRACE_SNAPSHOT_PATH
+
+    Returns:
+        快照内容，文件不存在或无法解析时返回 None
+    """
+    snapshot_path = path or os.getenv("QA_TRACE_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+    if not snapshot_path:
+        return None
+    try:
+        return json.loads(Path(snapshot_path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"读取问答延迟快照失败: {type(e).__name__}: {e}")
+        return None
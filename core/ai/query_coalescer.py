@@ -0,0 +1,130 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+相同查询合并（singleflight）- 同时进行中的相同问题共享一次检索与生成
+
+- 键：(规范化查询, 解析出的频道, 时间范围)
+- 首个请求在后台任务中运行生成，后到的请求先回放已生成的片段，再接收后续片段
+- 后台任务与单个请求解耦：某个用户取消不影响其他等待者，所有等待者都离开后才取消生成
+- 会话历史与配额仍由各请求各自处理，这里只共享回答文本
+"""
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Callable, Hashable
+from contextlib import aclosing
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """一次进行中的生成：已产生的片段与订阅者计数"""
+
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task: asyncio.Task | None = None
+
+
+class QueryCoalescer:
+    """相同查询合并器"""
+
+    def __init__(self):
+        self._flights: dict[Hashable, _Flight] = {}
+        self._coalesced = 0
+
+    async def stream(
+        self, key: Hashable, factory: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """
+        获取查询的回答片段流；相同键已有进行中的生成时直接共享
+
+        Args:
+            key: 合并键
+            factory: 创建回答生成器的函数（仅首个请求调用）
+
+        Yields:
+            str: 回答片段（后到的请求从第一个片段开始回放）
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, factory))
+        else:
+            self._coalesced += 1
+            logger.info(
+                f"合并相同查询: 已有 {flight.subscribers} 个请求等待，"
+                f"已生成 {len(flight.chunks)} 个片段"
+            )
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                async with flight.changed:
+                    while index >= len(flight.chunks) and not flight.done:
+                        await flight.changed.wait()
+                # 先发送已生成的片段，生成结束后再处理错误
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task is not None:
+                # 所有等待者都已离开，停止生成（关闭 LLM 流），之后的相同查询重新生成
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def _run(
+        self, key: Hashable, flight: _Flight, factory: Callable[[], AsyncIterator[str]]
+    ) -> None:
+        """在后台任务中运行生成，逐段通知订阅者"""
+        try:
+            async with aclosing(factory()) as source:
+                async for chunk in source:
+                    flight.chunks.append(chunk)
+                    async with flight.changed:
+                        flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = RuntimeError("共享查询已取消")
+        except Exception as e:
+            flight.error = e
+        finally:
+            # 生成结束后移除，之后的相同查询由答案缓存处理
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.done = True
+            async with flight.changed:
+                flight.changed.notify_all()
+
+    def get_stats(self) -> dict[str, int]:
+        """获取合并统计"""
+        return {"in_flight": len(self._flights), "coalesced": self._coalesced}
+
+
+# 创建全局查询合并器实例
+query_coalescer = None
+
+
+def get_query_coalescer():
+    """获取全局相同查询合并器实例"""
+    global query_coalescer
+    if query_coalescer is None:
+        query_coalescer = QueryCoalescer()
+    return query_coalescer
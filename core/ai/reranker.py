@@ -11,16 +11,129 @@
 """
 重排序器 - 对检索结果进行精排
 提升RAG系统的准确性
+
+同步 rerank 供线程/同步调用方使用，异步 arerank 基于长连接池（可用时启用 HTTP/2），
+供事件循环内调用；两者共享按 (模型, 查询, 候选集) 缓存的重排结果。
+远程 API 未配置或调用失败时回退到本地 BM25 重排，也可在调用 API 前用 BM25 预筛候选。
 """
 
+import hashlib
+import importlib.util
 import logging
 import os
+import threading
+import time
+from collections import OrderedDict
 from typing import Any
 
 import httpx
 
+from core.ai.embedding_cache import normalize_query_text
+from core.ai.lexical_ranker import lexical_rerank
+
 logger = logging.getLogger(__name__)
 
+# 安装 h2（httpx[http2]）时启用 HTTP/2，多个请求复用同一连接
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# 重排结果缓存配置
+DEFAULT_CACHE_SIZE = 256  # 最大缓存条目数，0 表示禁用
+DEFAULT_CACHE_TTL = 600  # 默认 TTL（10分钟，单位：秒），0 表示永不过期
+
+
+def _candidate_key(doc: dict[str, Any]) -> str:
+    """候选文档的缓存标识：优先使用 summary_id，否则使用文本哈希"""
+    summary_id = doc.get("summary_id")
+    if summary_id is not None:
+        return f"id:{summary_id}"
+    text = doc.get("summary_text", "") or ""
+    return "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class RerankCache:
+    """重排结果缓存
+
+    键为 (model, 归一化查询, top_k, 排序后的候选标识)，值为按相关度排序的
+    (候选标识, 分数) 列表，命中时映射回本次传入的候选文档。
+    支持 LRU 淘汰与 TTL 过期，同步重排可能在线程池中执行，因此所有操作都在线程锁内完成。
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE, ttl: int = DEFAULT_CACHE_TTL):
+        """初始化缓存
+
+        Args:
+            max_size: 最大缓存条目数（LRU淘汰阈值），0 表示禁用缓存
+            ttl: 缓存条目生存时间（秒），0 表示永不过期
+        """
+        self._max_size = max_size
+        self._ttl = ttl
+        # OrderedDict 实现 LRU：key -> (ranking, timestamp)
+        self._entries: OrderedDict[tuple, tuple[list[tuple[str, float]], float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """缓存是否启用"""
+        return self._max_size > 0
+
+    @staticmethod
+    def make_key(model: str, query: str, keys: list[str], top_k: int) -> tuple:
+        """构造缓存键（候选顺序不影响命中）"""
+        return (model, normalize_query_text(query), top_k, tuple(sorted(keys)))
+
+    def get(self, key: tuple) -> list[tuple[str, float]] | None:
+        """获取缓存的排序结果，未命中或已过期返回 None"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            ranking, timestamp = entry
+            if self._ttl and time.monotonic() - timestamp > self._ttl:
+                del self._entries[key]
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return ranking
+
+    def set(self, key: tuple, ranking: list[tuple[str, float]]) -> None:
+        """缓存排序结果"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (ranking, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存（统计数据保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "ttl": self._ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
 
 class Reranker:
     """重排序器"""
@@ -32,9 +145,24 @@ class Reranker:
         self.model = os.getenv("RERANKER_MODEL", "BAAI/bge-reranker-v2-m3")
         self.top_k = int(os.getenv("RERANKER_TOP_K", "20"))
         self.final_k = int(os.getenv("RERANKER_FINAL", "5"))
+        self.max_connections = int(os.getenv("RERANKER_MAX_CONNECTIONS", "10"))
+        self.timeout = float(os.getenv("RERANKER_TIMEOUT", "30"))
+        # 本地 BM25 回退（远程不可用/失败时），以及发送远程 API 前的预筛数量（0 表示不预筛）
+        self.local_enabled = os.getenv("RERANKER_LOCAL", "true").lower() == "true"
+        self.prefilter_k = int(os.getenv("RERANKER_PREFILTER_K", "0"))
+
+        self.cache = RerankCache(
+            max_size=int(os.getenv("RERANKER_CACHE_SIZE", str(DEFAULT_CACHE_SIZE))),
+            ttl=int(os.getenv("RERANKER_CACHE_TTL", str(DEFAULT_CACHE_TTL))),
+        )
+        # 异步长连接池，首次 arerank 时创建（需在事件循环内）
+        self._async_client: httpx.AsyncClient | None = None
 
         if not self.api_key:
-            logger.warning("未设置RERANKER_API_KEY，重排序功能将不可用")
+            if self.local_enabled:
+                logger.warning("未设置RERANKER_API_KEY，使用本地BM25重排序")
+            else:
+                logger.warning("未设置RERANKER_API_KEY，重排序功能将不可用")
         else:
             logger.info(f"Reranker初始化成功: {self.model}")
 
@@ -42,6 +170,115 @@ class Reranker:
         """检查Reranker服务是否可用"""
         return self.api_key is not None
 
+    def is_local_available(self) -> bool:
+        """检查本地BM25重排序是否启用（远程服务不可用时仍可重排）"""
+        return self.local_enabled
+
+    def _fallback(
+        self, query: str, candidates: list[dict[str, Any]], top_k: int
+    ) -> list[dict[str, Any]]:
+        """远程重排不可用或失败时的回退：本地 BM25 重排，未启用时截断原始结果"""
+        if not self.local_enabled:
+            return candidates[:top_k]
+        try:
+            return lexical_rerank(query, candidates, top_k)
+        except Exception as e:
+            logger.error(f"本地BM25重排序失败: {type(e).__name__}: {e}")
+            return candidates[:top_k]
+
+    def _build_request(self, query: str, candidates: list[dict[str, Any]], top_k: int) -> dict:
+        """构造 Reranker API 请求参数"""
+        documents = [doc.get("summary_text", "") for doc in candidates]
+        return {
+            "headers": {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+            "json": {
+                "model": self.model,
+                "query": query,
+                "documents": documents,
+                "top_n": min(len(documents), top_k),
+            },
+        }
+
+    @staticmethod
+    def _apply_ranking(
+        candidates: list[dict[str, Any]], ranking: list[tuple[int, float]]
+    ) -> list[dict[str, Any]]:
+        """按 (候选下标, 分数) 列表生成带 rerank_score 的结果"""
+        reranked_results = []
+        for index, score in ranking:
+            doc = candidates[index].copy()
+            doc["rerank_score"] = score
+            reranked_results.append(doc)
+        return reranked_results
+
+    def _cached_result(
+        self, key: tuple, candidates: list[dict[str, Any]], keys: list[str]
+    ) -> list[dict[str, Any]] | None:
+        """缓存命中时将排序结果映射回本次的候选文档"""
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        positions = {k: i for i, k in enumerate(keys)}
+        logger.debug(f"重排序缓存命中: {len(cached)} 个结果")
+        return self._apply_ranking(candidates, [(positions[k], s) for k, s in cached])
+
+    def _handle_response(
+        self,
+        result: dict,
+        query: str,
+        key: tuple,
+        candidates: list[dict[str, Any]],
+        keys: list[str],
+        top_k: int,
+    ) -> list[dict[str, Any]]:
+        """解析 API 响应并写入缓存"""
+        if "results" not in result:
+            logger.warning(f"Reranker API返回格式异常: {result}")
+            return self._fallback(query, candidates, top_k)
+
+        ranking = [(item["index"], item.get("relevance_score", 0)) for item in result["results"]]
+        self.cache.set(key, [(keys[index], score) for index, score in ranking])
+
+        reranked_results = self._apply_ranking(candidates, ranking)
+        logger.info(f"重排序完成: {len(reranked_results)} 个结果")
+        return reranked_results
+
+    def _prepare(
+        self, query: str, candidates: list[dict[str, Any]], top_k: int | None
+    ) -> tuple[list[dict[str, Any]] | None, int, tuple, list[dict[str, Any]], list[str]]:
+        """公共前置处理：可用性检查、参数默认值、缓存查询与本地预筛
+
+        Returns:
+            (可直接返回的结果或 None, top_k, 缓存键, 发送给 API 的候选, 其候选标识)
+        """
+        if top_k is None:
+            top_k = self.final_k
+
+        if not self.api_key:
+            if not self.local_enabled:
+                logger.warning("Reranker服务不可用，返回原始结果")
+            return self._fallback(query, candidates, top_k), top_k, (), [], []
+
+        if not candidates:
+            return [], top_k, (), [], []
+
+        # 缓存键基于完整候选集，预筛结果不影响命中
+        keys = [_candidate_key(doc) for doc in candidates]
+        key = self.cache.make_key(self.model, query, keys, top_k)
+        cached = self._cached_result(key, candidates, keys)
+        if cached is not None:
+            return cached, top_k, key, [], []
+
+        prefilter_k = max(self.prefilter_k, top_k)
+        if self.local_enabled and self.prefilter_k and prefilter_k < len(candidates):
+            prefiltered = lexical_rerank(query, candidates, prefilter_k)
+            logger.debug(f"本地BM25预筛: {len(candidates)} -> {len(prefiltered)}")
+            return None, top_k, key, prefiltered, [_candidate_key(doc) for doc in prefiltered]
+        return None, top_k, key, candidates, keys
+
     def rerank(
         self, query: str, candidates: list[dict[str, Any]], top_k: int | None = None
     ) -> list[dict[str, Any]]:
@@ -56,57 +293,74 @@ class Reranker:
         Returns:
             重排序后的文档列表
         """
-        if not self.api_key:
-            logger.warning("Reranker服务不可用，返回原始结果")
-            return candidates[: top_k or self.final_k]
-
-        if not candidates:
-            return []
-
-        if top_k is None:
-            top_k = self.final_k
+        early, top_k, key, sent, sent_keys = self._prepare(query, candidates, top_k)
+        if early is not None:
+            return early
 
         try:
-            # 准备文档列表
-            documents = [doc.get("summary_text", "") for doc in candidates]
-
             # 调用Reranker API（使用httpx）
-            with httpx.Client(timeout=30.0) as client:
-                response = client.post(
-                    self.api_base,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": self.model,
-                        "query": query,
-                        "documents": documents,
-                        "top_n": min(len(documents), top_k),
-                    },
-                )
-
-                result = response.json()
-
-                # 提取排序结果
-                if "results" in result:
-                    reranked_results = []
-                    for item in result["results"]:
-                        index = item["index"]
-                        score = item.get("relevance_score", 0)
-                        doc = candidates[index].copy()
-                        doc["rerank_score"] = score
-                        reranked_results.append(doc)
-
-                    logger.info(f"重排序完成: {len(reranked_results)} 个结果")
-                    return reranked_results
-                else:
-                    logger.warning(f"Reranker API返回格式异常: {result}")
-                    return candidates[:top_k]
+            with httpx.Client(timeout=self.timeout) as client:
+                response = client.post(self.api_base, **self._build_request(query, sent, top_k))
+                return self._handle_response(response.json(), query, key, sent, sent_keys, top_k)
 
         except Exception as e:
             logger.error(f"重排序失败: {type(e).__name__}: {e}")
-            return candidates[:top_k]
+            return self._fallback(query, sent, top_k)
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """获取异步长连接池（复用 TCP/TLS 连接，避免每次请求重新握手）"""
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+                timeout=self.timeout,
+            )
+            logger.info(
+                f"Reranker异步连接池已创建: HTTP/2={'开启' if HTTP2_AVAILABLE else '关闭'}, "
+                f"连接池上限: {self.max_connections}"
+            )
+        return self._async_client
+
+    async def arerank(
+        self, query: str, candidates: list[dict[str, Any]], top_k: int | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        异步对检索结果重排序（不阻塞事件循环）
+
+        Args:
+            query: 用户查询
+            candidates: 候选文档列表，每个文档包含summary_id, summary_text等
+            top_k: 返回前K个结果，默认使用配置的final_k
+
+        Returns:
+            重排序后的文档列表
+        """
+        early, top_k, key, sent, sent_keys = self._prepare(query, candidates, top_k)
+        if early is not None:
+            return early
+
+        try:
+            response = await self._get_async_client().post(
+                self.api_base, **self._build_request(query, sent, top_k)
+            )
+            return self._handle_response(response.json(), query, key, sent, sent_keys, top_k)
+
+        except Exception as e:
+            logger.error(f"异步重排序失败: {type(e).__name__}: {e}")
+            return self._fallback(query, sent, top_k)
+
+    async def aclose(self) -> None:
+        """关闭异步连接池"""
+        if self._async_client is not None:
+            try:
+                await self._async_client.aclose()
+            except Exception as e:
+                logger.warning(f"关闭Reranker连接池失败: {type(e).__name__}: {e}")
+            self._async_client = None
 
 
 # 创建全局Reranker实例
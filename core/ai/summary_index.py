@@ -0,0 +1,462 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+总结倒排索引 - 进程内的关键词检索索引
+
+词项（与本地 BM25 重排相同的切分规则）→ 倒排表 {summary_id: 词频}，
+检索时在倒排表上计算 BM25 并按频道/时间过滤，无需访问数据库。
+
+- 由问答 Bot 进程（唯一的检索方）持有：启动时加载 data/ 下的快照，再按主键追平数据库
+- 之后定期从数据库刷新：追加新总结、重新读取最近总结（关键词/主题可能在保存后补写），
+  并移除数据库中已删除的旧总结；总结由主进程写入，这里只读数据库
+- 快照为 gzip JSON，每个词项的倒排表以 [ids, tfs] 两个数组紧凑存储，
+  有变更时按最小间隔节流写入，关闭时写入最后一次
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from core.ai.lexical_ranker import BM25_B, BM25_K1
+from core.infrastructure.utils.date_utils import to_unix_timestamp
+from core.infrastructure.utils.text_tokenize import tokenize_terms
+
+logger = logging.getLogger(__name__)
+
+# 快照格式版本（切分规则或结构变化时递增，旧快照将被忽略并全量重建）
+SNAPSHOT_VERSION = 1
+
+# 启动追平时每批读取的总结数
+_BUILD_BATCH_SIZE = 500
+
+# 追平循环最大批次数保护（500 * 20000 = 1000 万条总结）
+_BUILD_MAX_BATCHES = 20000
+
+# 每次刷新重新读取的最近总结数（补写的关键词/主题在这个窗口内生效）
+_RECHECK_ROWS = 200
+
+DEFAULT_REFRESH_INTERVAL = 60  # 从数据库刷新的间隔（秒）
+DEFAULT_SAVE_INTERVAL = 600  # 快照写入最小间隔（秒）
+
+# 文档中保存并在检索结果中返回的字段
+_DOC_FIELDS = (
+    "channel_id",
+    "channel_name",
+    "summary_text",
+    "summary_type",
+    "summary_message_ids",
+    "keywords",
+    "topics",
+)
+
+
+def _tag_text(value: Any) -> str:
+    """将 keywords/topics（JSON 字符串或列表）转换为可切分的文本"""
+    if not value:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return str(value)
+
+
+class SummaryInvertedIndex:
+    """总结倒排索引（线程安全，快照读写在线程池中执行）"""
+
+    def __init__(
+        self,
+        path: str | None = None,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+        save_interval: float = DEFAULT_SAVE_INTERVAL,
+    ):
+        """
+        初始化倒排索引
+
+        Args:
+            path: 快照文件路径，为空时不持久化
+            refresh_interval: 从数据库刷新的间隔（秒）
+            save_interval: 快照写入最小间隔（秒）
+        """
+        self.path = Path(path) if path else None
+        self.refresh_interval = refresh_interval
+        self.save_interval = save_interval
+        # summary_id -> 文档字段（含 created_at ISO 字符串、created_ts、length）
+        self._docs: dict[int, dict[str, Any]] = {}
+        # 词项 -> {summary_id: 词频}
+        self._postings: dict[str, dict[int, int]] = {}
+        self._total_length = 0
+        self._max_id = 0
+        self._ready = False
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        # 自上次写入快照后是否有变更，以及上次写入时间
+        self._dirty = False
+        self._last_save = 0.0
+
+    @property
+    def ready(self) -> bool:
+        """索引是否已完成构建（未完成时调用方应回退到数据库检索）"""
+        return self._ready
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @staticmethod
+    def _doc_terms(doc: dict[str, Any]) -> list[str]:
+        """文档的索引词项：总结正文 + 关键词 + 主题"""
+        text = " ".join(
+            [
+                doc.get("summary_text") or "",
+                _tag_text(doc.get("keywords")),
+                _tag_text(doc.get("topics")),
+            ]
+        )
+        return tokenize_terms(text)
+
+    def _remove_locked(self, summary_id: int) -> None:
+        """移除文档（调用方需持有锁）"""
+        doc = self._docs.pop(summary_id, None)
+        if doc is None:
+            return
+        for term in set(self._doc_terms(doc)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(summary_id, None)
+                if not posting:
+                    del self._postings[term]
+        self._total_length -= doc["length"]
+
+    def add(self, row: dict[str, Any]) -> None:
+        """
+        写入或更新一条总结（幂等）
+
+        Args:
+            row: 总结记录（需含 id、summary_text，可含 channel_id、created_at 等）
+        """
+        summary_id = int(row["id"])
+        created_at = row.get("created_at")
+        created_ts = to_unix_timestamp(created_at)
+        if created_ts is None:
+            created_ts = int(time.time())
+        doc = {field: row.get(field) for field in _DOC_FIELDS}
+        doc["created_ts"] = created_ts
+        doc["created_at"] = (
+            created_at.isoformat() if hasattr(created_at, "isoformat") else created_at
+        )
+        counts = Counter(self._doc_terms(doc))
+        doc["length"] = sum(counts.values())
+
+        with self._lock:
+            self._remove_locked(summary_id)
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[summary_id] = tf
+            self._docs[summary_id] = doc
+            self._total_length += doc["length"]
+            self._max_id = max(self._max_id, summary_id)
+            self._dirty = True
+
+    def remove(self, summary_id: int) -> None:
+        """移除一条总结"""
+        with self._lock:
+            if int(summary_id) in self._docs:
+                self._remove_locked(int(summary_id))
+                self._dirty = True
+
+    def remove_older_than(self, cutoff_ts: int) -> int:
+        """移除创建时间早于 cutoff_ts 的总结，返回移除数量"""
+        with self._lock:
+            expired = [sid for sid, doc in self._docs.items() if doc["created_ts"] < cutoff_ts]
+            for summary_id in expired:
+                self._remove_locked(summary_id)
+            if expired:
+                self._dirty = True
+        return len(expired)
+
+    def _tags_changed(self, row: dict[str, Any]) -> bool:
+        """已索引的总结的关键词/主题是否与数据库行不同"""
+        doc = self._docs.get(int(row["id"]))
+        return doc is None or any(
+            _tag_text(doc.get(field)) != _tag_text(row.get(field))
+            for field in ("keywords", "topics")
+        )
+
+    def search(
+        self,
+        terms: list[str],
+        channel_id: str | None = None,
+        start_ts: int | None = None,
+        end_ts: int | None = None,
+        limit: int = 10,
+    ) -> list[dict[str, Any]]:
+        """
+        在倒排表上按 BM25 检索总结
+
+        Args:
+            terms: 检索词（关键词/主题，内部按索引规则切分）
+            channel_id: 频道URL
+            start_ts: 开始时间戳（含）
+            end_ts: 结束时间戳（含）
+            limit: 返回数量限制
+
+        Returns:
+            按相关度降序的总结列表（字段与数据库行一致，另含 relevance）
+        """
+        query_terms = []
+        for term in terms:
+            for token in tokenize_terms(term):
+                if token not in query_terms:
+                    query_terms.append(token)
+        if not query_terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs:
+                return []
+            avg_length = self._total_length / n_docs or 1.0
+
+            scores: dict[int, float] = {}
+            for term in query_terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log1p((n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for summary_id, tf in posting.items():
+                    doc = self._docs[summary_id]
+                    if channel_id and doc["channel_id"] != channel_id:
+                        continue
+                    if start_ts is not None and doc["created_ts"] < start_ts:
+                        continue
+                    if end_ts is not None and doc["created_ts"] > end_ts:
+                        continue
+                    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * doc["length"] / avg_length)
+                    scores[summary_id] = scores.get(summary_id, 0.0) + idf * tf * (
+                        BM25_K1 + 1.0
+                    ) / (tf + norm)
+
+            ranked = sorted(
+                scores.items(),
+                key=lambda item: (item[1], self._docs[item[0]]["created_ts"]),
+                reverse=True,
+            )[:limit]
+
+            results = []
+            for summary_id, score in ranked:
+                doc = self._docs[summary_id]
+                row = {"id": summary_id, **{field: doc.get(field) for field in _DOC_FIELDS}}
+                row["created_at"] = doc["created_at"]
+                row["relevance"] = score
+                results.append(row)
+        return results
+
+    # ── 快照 ────────────────────────────────────────────────────────────────
+
+    def save(self) -> None:
+        """写入快照（原子替换）"""
+        if self.path is None:
+            return
+        start = time.monotonic()
+        with self._lock:
+            self._dirty = False
+            self._last_save = start
+            snapshot = {
+                "version": SNAPSHOT_VERSION,
+                "max_id": self._max_id,
+                "docs": {str(sid): doc for sid, doc in self._docs.items()},
+                "postings": {
+                    term: [list(posting.keys()), list(posting.values())]
+                    for term, posting in self._postings.items()
+                },
+            }
+            data = json.dumps(snapshot, ensure_ascii=False, separators=(",", ":"))
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(data)
+        tmp_path.replace(self.path)
+        logger.debug(
+            f"总结倒排索引快照已保存: {len(snapshot['docs'])} 条, "
+            f"耗时 {time.monotonic() - start:.2f}s"
+        )
+
+    def load(self) -> bool:
+        """加载快照，文件不存在或版本不匹配时返回 False"""
+        if self.path is None or not self.path.exists():
+            return False
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取总结倒排索引快照失败，将全量重建: {type(e).__name__}: {e}")
+            return False
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            logger.info("总结倒排索引快照版本不匹配，将全量重建")
+            return False
+
+        docs = {int(sid): doc for sid, doc in snapshot["docs"].items()}
+        postings = {
+            term: dict(zip(ids, tfs, strict=True))
+            for term, (ids, tfs) in snapshot["postings"].items()
+        }
+        with self._lock:
+            self._docs = docs
+            self._postings = postings
+            self._total_length = sum(doc["length"] for doc in docs.values())
+            self._max_id = int(snapshot.get("max_id") or 0)
+            self._dirty = False
+            self._last_save = time.monotonic()
+        return True
+
+    async def maybe_save(self, force: bool = False) -> bool:
+        """有变更且距上次写入超过最小间隔（或 force）时，在线程池中写入快照
+
+        Returns:
+            是否写入了快照
+        """
+        if self.path is None or not self._dirty:
+            return False
+        if not force and time.monotonic() - self._last_save < self.save_interval:
+            return False
+        await asyncio.to_thread(self.save)
+        return True
+
+    # ── 与数据库同步 ────────────────────────────────────────────────────────
+
+    async def _catch_up(self, db, batch_size: int = _BUILD_BATCH_SIZE) -> int:
+        """按主键追平数据库中新增的总结，返回新增数量"""
+        added = 0
+        for _ in range(_BUILD_MAX_BATCHES):
+            rows = await db.get_summaries_after_id(self._max_id, batch_size)
+            if not rows:
+                break
+            for row in rows:
+                self.add(row)
+            added += len(rows)
+            if len(rows) < batch_size:
+                break
+        else:
+            logger.warning(f"总结倒排索引追平达到最大批次数 {_BUILD_MAX_BATCHES}，提前结束")
+        return added
+
+    async def build(self, db, batch_size: int = _BUILD_BATCH_SIZE) -> None:
+        """
+        构建索引：加载快照后按主键追平数据库中新增的总结
+
+        Args:
+            db: 数据库管理器（需支持 get_summaries_after_id）
+            batch_size: 每批读取的总结数
+        """
+        start = time.monotonic()
+        loaded = await asyncio.to_thread(self.load)
+        if loaded:
+            logger.info(f"已加载总结倒排索引快照: {len(self)} 条, max_id={self._max_id}")
+
+        added = await self._catch_up(db, batch_size)
+        await self.maybe_save(force=True)
+        self._ready = True
+        logger.info(
+            f"总结倒排索引就绪: {len(self)} 条总结, {len(self._postings)} 个词项, "
+            f"新增 {added} 条, 耗时 {time.monotonic() - start:.1f}s"
+        )
+
+    async def refresh(self, db) -> None:
+        """
+        从数据库刷新：追加新总结，重新读取最近总结的关键词/主题，移除已删除的旧总结
+
+        Args:
+            db: 数据库管理器（需支持 get_summaries_after_id、get_oldest_summary_time）
+        """
+        added = await self._catch_up(db)
+
+        recent = await db.get_summaries_after_id(
+            max(0, self._max_id - _RECHECK_ROWS), _RECHECK_ROWS
+        )
+        updated = 0
+        for row in recent:
+            if self._tags_changed(row):
+                self.add(row)
+                updated += 1
+
+        removed = 0
+        oldest = await db.get_oldest_summary_time()
+        if oldest is not None:
+            removed = self.remove_older_than(to_unix_timestamp(oldest))
+        elif not await db.get_summaries_after_id(0, 1):
+            # 数据库中已没有总结
+            removed = self.remove_older_than(2**62)
+
+        if added or updated or removed:
+            logger.info(f"总结倒排索引已刷新: 新增 {added}, 更新 {updated}, 移除 {removed}")
+        await self.maybe_save()
+
+    def start(self, db) -> None:
+        """在后台构建索引并定期从数据库刷新（构建完成前检索回退到数据库）"""
+        if self._task is not None and not self._task.done():
+            return
+
+        async def _run():
+            try:
+                await self.build(db)
+            except Exception as e:
+                logger.error(f"构建总结倒排索引失败: {type(e).__name__}: {e}", exc_info=True)
+                return
+            while True:
+                await asyncio.sleep(self.refresh_interval)
+                try:
+                    await self.refresh(db)
+                except Exception as e:
+                    logger.warning(f"刷新总结倒排索引失败: {type(e).__name__}: {e}")
+
+        self._task = asyncio.create_task(_run())
+
+    async def stop(self) -> None:
+        """停止后台刷新，并写入尚未保存的变更"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._ready:
+            await self.maybe_save(force=True)
+
+
+# 创建全局总结倒排索引实例
+summary_index = None
+
+
+def get_summary_index():
+    """获取全局总结倒排索引实例，未启用（SUMMARY_INDEX_ENABLED）时返回 None"""
+    global summary_index
+    if os.getenv("SUMMARY_INDEX_ENABLED", "false").lower() != "true":
+        return None
+    if summary_index is None:
+        summary_index = SummaryInvertedIndex(
+            os.getenv("SUMMARY_INDEX_PATH", "data/summary_index.json.gz"),
+            refresh_interval=float(
+                os.getenv("SUMMARY_INDEX_REFRESH_INTERVAL", str(DEFAULT_REFRESH_INTERVAL))
+            ),
+            save_interval=float(
+                os.getenv("SUMMARY_INDEX_SAVE_INTERVAL", str(DEFAULT_SAVE_INTERVAL))
+            ),
+        )
+    return summary_index
@@ -0,0 +1,377 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+总结向量重建 - 从 MySQL summaries 表批量回填 ChromaDB
+
+按主键 keyset 顺序分批读取总结，批量生成 Embedding 并 upsert 到 summaries collection，
+同时重建长总结的段落向量（summary_passages collection）。
+每批完成后写入检查点文件，进程崩溃或任务取消后再次运行会从上次位置继续。
+
+用法：
+    python -m core.ai.summary_reindexer [--batch-size 64] [--reset] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from core.ai.embedding_generator import get_async_embedding_generator
+from core.ai.vector_store import get_vector_store
+from core.infrastructure.database import get_db_manager
+from core.infrastructure.utils.constants import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# 检查点文件路径
+DEFAULT_CHECKPOINT_PATH = str(Path(DATA_DIR) / "summary_reindex_checkpoint.json")
+
+# 批量大小配置
+DEFAULT_BATCH_SIZE = 64
+MAX_BATCH_SIZE = 500
+
+# 分批循环最大迭代次数保护
+_MAX_BATCHES = 100000
+
+# 进度中保留的失败 ID 数量上限
+_MAX_FAILED_IDS = 100
+
+
+def _build_metadata(row: dict[str, Any]) -> dict[str, Any]:
+    """根据 summaries 表记录构建向量元数据（与实时写入时的字段保持一致）"""
+    created_at = row.get("created_at")
+    if isinstance(created_at, datetime):
+        # MySQL DATETIME 为 naive UTC
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=UTC)
+        created_at = created_at.isoformat()
+
+    return {
+        "channel_id": row.get("channel_id") or "",
+        "channel_name": row.get("channel_name") or "",
+        "created_at": created_at or "",
+        "summary_type": row.get("summary_type") or "weekly",
+        "message_count": row.get("message_count") or 0,
+        "summary_message_ids": json.dumps(row.get("summary_message_ids") or [], ensure_ascii=False),
+    }
+
+
+def _load_checkpoint(path: str) -> dict[str, Any]:
+    """读取检查点文件，不存在或损坏时返回空字典"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"读取重建检查点失败，将从头开始: {type(e).__name__}: {e}")
+        return {}
+
+
+def _save_checkpoint(path: str, checkpoint: dict[str, Any]) -> None:
+    """原子写入检查点文件"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _remove_checkpoint(path: str) -> None:
+    """删除检查点文件"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class SummaryReindexer:
+    """总结向量重建任务
+
+    同一时间只允许一个重建任务运行；WebUI 通过 start() 在后台启动，
+    CLI 直接 await run()。进度通过 get_progress() 查询。
+    """
+
+    def __init__(
+        self,
+        checkpoint_path: str = DEFAULT_CHECKPOINT_PATH,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        """初始化重建任务
+
+        Args:
+            checkpoint_path: 检查点文件路径
+            batch_size: 默认每批处理的总结数
+        """
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self._task: asyncio.Task | None = None
+        self._running = False
+        self._progress: dict[str, Any] = {"status": "idle"}
+
+    def is_running(self) -> bool:
+        """是否有重建任务正在运行"""
+        return self._running
+
+    def get_progress(self) -> dict[str, Any]:
+        """获取当前（或最近一次）重建任务的进度"""
+        progress = dict(self._progress)
+        progress["failed_ids"] = list(progress.get("failed_ids", []))
+        total = progress.get("total") or 0
+        progress["percent"] = (
+            round(min(progress.get("processed", 0) / total, 1.0) * 100, 1) if total else 0.0
+        )
+        return progress
+
+    def start(self, reset: bool = False, batch_size: int | None = None) -> bool:
+        """在后台启动重建任务
+
+        Args:
+            reset: 为 True 时忽略检查点，从第一条总结开始
+            batch_size: 每批处理的总结数，None 使用默认值
+
+        Returns:
+            是否成功启动（已有任务运行时返回 False）
+        """
+        if self._running:
+            return False
+        # 同步置位，避免两次请求在任务真正开始前都通过检查
+        self._running = True
+        self._progress = {"status": "running", "started_at": datetime.now(UTC).isoformat()}
+        self._task = asyncio.get_running_loop().create_task(
+            self.run(reset=reset, batch_size=batch_size, _claimed=True)
+        )
+        self._task.add_done_callback(self._on_task_done)
+        return True
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        """后台任务结束回调：兜底处理任务在开始执行前就被取消的情况"""
+        self._running = False
+        if task.cancelled() and self._progress.get("status") == "running":
+            self._progress["status"] = "cancelled"
+            self._progress["finished_at"] = datetime.now(UTC).isoformat()
+
+    async def cancel(self) -> bool:
+        """取消正在运行的后台重建任务（检查点保留，可稍后继续）"""
+        if not self._task or self._task.done():
+            return False
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return True
+
+    async def run(
+        self,
+        reset: bool = False,
+        batch_size: int | None = None,
+        dry_run: bool = False,
+        _claimed: bool = False,
+    ) -> dict[str, Any]:
+        """执行重建
+
+        Args:
+            reset: 为 True 时忽略检查点，从第一条总结开始
+            batch_size: 每批处理的总结数，None 使用默认值
+            dry_run: 为 True 时只统计待处理数量，不生成向量也不写入
+            _claimed: 内部参数，表示运行标记已由 start() 设置
+
+        Returns:
+            最终进度字典
+        """
+        if not _claimed:
+            if self._running:
+                logger.warning("已有总结向量重建任务在运行，忽略本次请求")
+                return self.get_progress()
+            self._running = True
+
+        batch_size = max(1, min(batch_size or self.batch_size, MAX_BATCH_SIZE))
+        try:
+            await self._run(reset, batch_size, dry_run)
+        except asyncio.CancelledError:
+            self._progress["status"] = "cancelled"
+            logger.info(f"总结向量重建已取消，检查点停留在 id={self._progress.get('last_id')}")
+            raise
+        except Exception as e:
+            self._progress["status"] = "failed"
+            self._progress["error"] = f"{type(e).__name__}: {e}"
+            logger.error(f"总结向量重建失败: {type(e).__name__}: {e}", exc_info=True)
+        finally:
+            self._progress["finished_at"] = datetime.now(UTC).isoformat()
+            self._running = False
+
+        return self.get_progress()
+
+    async def _run(self, reset: bool, batch_size: int, dry_run: bool) -> None:
+        """重建主循环"""
+        db = get_db_manager()
+        vector_store = get_vector_store()
+        emb_gen = get_async_embedding_generator()
+
+        if not vector_store.is_available():
+            raise RuntimeError("向量存储不可用")
+        if not dry_run and not emb_gen.is_available():
+            raise RuntimeError("Embedding服务不可用")
+
+        if reset:
+            checkpoint = {}
+            if not dry_run:
+                await asyncio.to_thread(_remove_checkpoint, self.checkpoint_path)
+        else:
+            checkpoint = await asyncio.to_thread(_load_checkpoint, self.checkpoint_path)
+        last_id = int(checkpoint.get("last_id", 0))
+
+        self._progress = {
+            "status": "running",
+            "started_at": datetime.now(UTC).isoformat(),
+            "finished_at": None,
+            "resumed_from": last_id,
+            "last_id": last_id,
+            "total": await db.count_summaries(),
+            "processed": int(checkpoint.get("processed", 0)),
+            "indexed": int(checkpoint.get("indexed", 0)),
+            "failed": int(checkpoint.get("failed", 0)),
+            "skipped": int(checkpoint.get("skipped", 0)),
+            "failed_ids": [],
+            "batch_size": batch_size,
+            "dry_run": dry_run,
+            "error": None,
+        }
+        logger.info(
+            f"开始总结向量重建: 共 {self._progress['total']} 条, 从 id>{last_id} 继续, "
+            f"batch_size={batch_size}{'（dry-run）' if dry_run else ''}"
+        )
+
+        start = time.monotonic()
+        for _ in range(_MAX_BATCHES):
+            rows = await db.get_summaries_after_id(last_id, batch_size)
+            if not rows:
+                break
+
+            if not dry_run:
+                await self._index_batch(rows, vector_store, emb_gen)
+
+            last_id = rows[-1]["id"]
+            self._progress["last_id"] = last_id
+            self._progress["processed"] += len(rows)
+
+            if not dry_run:
+                await asyncio.to_thread(
+                    _save_checkpoint,
+                    self.checkpoint_path,
+                    {
+                        "last_id": last_id,
+                        "processed": self._progress["processed"],
+                        "indexed": self._progress["indexed"],
+                        "failed": self._progress["failed"],
+                        "skipped": self._progress["skipped"],
+                        "updated_at": datetime.now(UTC).isoformat(),
+                    },
+                )
+
+            if len(rows) < batch_size:
+                break
+        else:
+            raise RuntimeError(f"达到最大批次数 {_MAX_BATCHES}，重建提前结束")
+
+        if not dry_run:
+            await asyncio.to_thread(_remove_checkpoint, self.checkpoint_path)
+
+        self._progress["status"] = "completed"
+        logger.info(
+            f"总结向量重建完成: 处理 {self._progress['processed']} 条, "
+            f"写入 {self._progress['indexed']} 条, 失败 {self._progress['failed']} 条, "
+            f"跳过 {self._progress['skipped']} 条, 耗时 {time.monotonic() - start:.1f}s"
+        )
+
+    async def _index_batch(self, rows: list[dict[str, Any]], vector_store, emb_gen) -> None:
+        """为一批总结生成向量并写入 ChromaDB"""
+        candidates = [row for row in rows if (row.get("summary_text") or "").strip()]
+        self._progress["skipped"] += len(rows) - len(candidates)
+        rows = candidates
+        if not rows:
+            return
+
+        embeddings = await emb_gen.abatch_generate([row["summary_text"] for row in rows])
+        if all(emb is None for emb in embeddings):
+            # 整批失败通常意味着 Embedding 服务不可用，停止并保留检查点以便稍后继续
+            raise RuntimeError(f"批量生成embedding失败（id {rows[0]['id']}-{rows[-1]['id']}）")
+
+        ready = [(row, emb) for row, emb in zip(rows, embeddings, strict=True) if emb is not None]
+        failed = [row["id"] for row, emb in zip(rows, embeddings, strict=True) if emb is None]
+
+        written = await vector_store.aupsert_summaries_batch(
+            summary_ids=[row["id"] for row, _ in ready],
+            texts=[row["summary_text"] for row, _ in ready],
+            metadatas=[_build_metadata(row) for row, _ in ready],
+            embeddings=[emb for _, emb in ready],
+        )
+        if written == 0:
+            raise RuntimeError(f"写入向量失败（id {rows[0]['id']}-{rows[-1]['id']}）")
+
+        await vector_store.aindex_summary_passages(
+            summary_ids=[row["id"] for row, _ in ready],
+            texts=[row["summary_text"] for row, _ in ready],
+            metadatas=[_build_metadata(row) for row, _ in ready],
+        )
+
+        self._progress["indexed"] += written
+        self._progress["failed"] += len(failed)
+        remaining = _MAX_FAILED_IDS - len(self._progress["failed_ids"])
+        if remaining > 0:
+            self._progress["failed_ids"].extend(failed[:remaining])
+
+
+# 创建全局总结向量重建实例
+summary_reindexer = None
+
+
+def get_summary_reindexer():
+    """获取全局总结向量重建实例"""
+    global summary_reindexer
+    if summary_reindexer is None:
+        summary_reindexer = SummaryReindexer(
+            batch_size=int(os.getenv("SUMMARY_REINDEX_BATCH_SIZE", str(DEFAULT_BATCH_SIZE)))
+        )
+    return summary_reindexer
+
+
+# 命令行执行支持
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="从 MySQL summaries 表重建总结向量")
+    parser.add_argument("--batch-size", type=int, default=None, help="每批处理的总结数")
+    parser.add_argument("--reset", action="store_true", help="忽略检查点，从头开始重建")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待处理数量，不写入")
+    args = parser.parse_args()
+
+    load_dotenv("data/.env")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    async def main():
+        db = get_db_manager()
+        await db.init_database()
+        try:
+            result = await get_summary_reindexer().run(
+                reset=args.reset, batch_size=args.batch_size, dry_run=args.dry_run
+            )
+            print(f"重建结果: {json.dumps(result, ensure_ascii=False, indent=2)}")
+        finally:
+            await db.close()
+
+    asyncio.run(main())
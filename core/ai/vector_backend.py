@@ -0,0 +1,808 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+向量后端 - VectorStore 可插拔存储层
+
+VectorStore 只依赖 ChromaDB collection 的一个子集接口（见 VectorCollection），
+因此任何实现了 get_or_create_collection() 并返回兼容 collection 的客户端都可作为后端：
+
+- chroma：chromadb.PersistentClient（HNSW 近似检索）
+- numpy：NumpyVectorClient，归一化向量存放在内存映射的 .npy 矩阵中，
+  元数据存放在 JSONL 旁路文件中，检索时做向量化的精确 top-k 与元数据掩码过滤。
+  对数万量级的语料，精确检索延迟低于 HNSW，且无需导入 chromadb。
+
+NumPy 后端支持量化存储以降低常驻内存：检索矩阵可为 float16 或 int8（每向量一个缩放系数），
+同时在磁盘上保留 float32 全精度副本（内存映射，仅在重排时按行读取），
+对近似得分的候选短名单（top_k * rescore_factor）用全精度向量重新打分。
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Protocol
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 支持的向量存储精度
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+# 量化精度（检索矩阵有精度损失，新建时额外保存 float32 全精度副本用于重排）
+QUANTIZED_DTYPES = ("float16", "int8")
+
+# 默认重排倍数：近似检索取 top_k * 该值的候选，再用全精度向量重新打分（0 表示不重排）
+DEFAULT_RESCORE_FACTOR = 4
+
+# int8 标量量化的最大码值
+_INT8_MAX = 127.0
+
+# 初始矩阵容量（行数），之后按倍数扩容
+_INITIAL_CAPACITY = 1024
+
+# float16 矩阵检索时分块转换为 float32 的行数
+_SEARCH_CHUNK_ROWS = 8192
+
+# 旁路记录文件中失效行超过该比例（且超过下限）时在加载时压缩
+_COMPACT_MIN_LINES = 1000
+
+# 元数据中缺失字段的占位值
+_MISSING = object()
+
+_NUMERIC_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+
+
+class VectorCollection(Protocol):
+    """VectorStore 使用的 collection 接口（ChromaDB Collection 的子集）"""
+
+    name: str
+
+    def count(self) -> int: ...
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None) -> None: ...
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None) -> None: ...
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None) -> None: ...
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> dict: ...
+
+    def delete(self, ids=None, where=None) -> None: ...
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None) -> dict: ...
+
+
+class NumpyCollection:
+    """基于内存映射 .npy 矩阵的向量 collection
+
+    目录结构：
+        vectors.npy      (capacity, dim) 归一化向量检索矩阵（float32 / float16 / int8），删除后的行可复用
+        scales.npy       (capacity,) int8 每向量缩放系数（仅 int8）
+        vectors_full.npy (capacity, dim) float32 全精度副本（仅量化 collection，用于重排）
+        records.jsonl    追加式记录日志：{"id", "row", "document", "metadata"} 或 {"id", "deleted"}
+        collection.json  collection 元数据、存储精度与是否保存全精度副本
+
+    所有操作在线程锁内执行，可被线程池中的同步检索并发调用。
+    同一目录可被多个进程打开（主进程写入、问答进程检索）：读取前检查记录日志与矩阵文件，
+    日志增长时只重放新增的行，文件被替换（压缩、扩容）时重新加载或重新映射。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        metadata: dict | None = None,
+        dtype: str = "float16",
+        rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+    ):
+        """打开或创建 collection
+
+        Args:
+            path: collection 目录
+            name: collection 名称
+            metadata: collection 元数据（兼容 ChromaDB，仅作记录）
+            dtype: 向量存储精度（float32 / float16 / int8），已存在的 collection 以文件中的为准
+            rescore_factor: 重排倍数，0 表示直接使用近似得分
+        """
+        self.name = name
+        self._dir = Path(path)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self._dir / "vectors.npy"
+        self._records_path = self._dir / "records.jsonl"
+        self._scales_path = self._dir / "scales.npy"
+        self._full_path = self._dir / "vectors_full.npy"
+        self._info_path = self._dir / "collection.json"
+        self._lock = threading.Lock()
+
+        if self._info_path.exists():
+            with open(self._info_path, encoding="utf-8") as f:
+                info = json.load(f)
+            if info.get("dtype", dtype) != dtype:
+                logger.warning(
+                    f"[{name}] 已存在的 collection 精度为 {info.get('dtype')}，忽略配置的 {dtype}；"
+                    f"如需切换请删除目录后重建向量"
+                )
+        else:
+            info = {
+                "name": name,
+                "metadata": metadata or {},
+                "dtype": dtype,
+                "full_precision": dtype in QUANTIZED_DTYPES,
+            }
+            with open(self._info_path, "w", encoding="utf-8") as f:
+                json.dump(info, f, ensure_ascii=False)
+        self.metadata = info.get("metadata") or {}
+        self._dtype = np.dtype(info.get("dtype", dtype))
+        # 旧版本创建的 collection 没有全精度副本
+        self._full_precision = bool(info.get("full_precision", False))
+        self.rescore_factor = max(0, int(rescore_factor))
+
+        self._matrix = None  # np.memmap (capacity, dim)，检索矩阵
+        self._scales = None  # np.memmap (capacity,)，int8 缩放系数
+        self._full = None  # np.memmap (capacity, dim)，float32 全精度副本
+        self._ids: list[str | None] = []  # row -> id
+        self._documents: list[str | None] = []
+        self._metadatas: list[dict | None] = []
+        self._id_to_row: dict[str, int] = {}
+        self._free_rows: list[int] = []
+        self._size = 0  # 已使用的最大行号 + 1
+        # 元数据列与有效行掩码缓存，任何写入后失效
+        self._columns: dict[tuple[str, bool], Any] = {}
+        self._live_cache = None
+        # 已读取的记录日志位置与文件 inode，及已映射矩阵文件的 inode（检测其他进程的写入）
+        self._records_offset = 0
+        self._records_inode: int | None = None
+        self._mapped_inodes: dict[str, int] = {}
+
+        self._load()
+
+    # ── 持久化 ────────────────────────────────────────────────────────────
+
+    def exists(self) -> bool:
+        """collection 目录是否仍存在（可能已被其他进程删除）"""
+        return self._info_path.exists()
+
+    def _load(self) -> None:
+        """加载矩阵并重放记录日志"""
+        lines = self._replay_records()
+        self._rebuild_rows()
+        self._map_files()
+
+        if lines > max(_COMPACT_MIN_LINES, 2 * len(self._id_to_row)):
+            self._compact()
+
+        logger.info(
+            f"NumPy向量collection已加载: {self.name}, {len(self._id_to_row)} 条, "
+            f"dtype={self._dtype.name}"
+        )
+
+    def _replay_records(self) -> int:
+        """从上次读取的位置重放记录日志中完整的行，返回读取的行数
+
+        末尾没有换行的半行（写入方尚未写完）留到下次读取。
+        """
+        try:
+            f = open(self._records_path, "rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            self._records_inode = os.fstat(f.fileno()).st_ino
+            f.seek(self._records_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self._records_offset += end
+
+        lines = 0
+        for line in data[:end].decode("utf-8", errors="replace").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            lines += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 进程崩溃可能留下半行记录，忽略即可
+                logger.warning(f"[{self.name}] 跳过损坏的向量记录行")
+                continue
+            self._apply_record(record)
+        return lines
+
+    def _rebuild_rows(self) -> None:
+        """根据当前索引重新计算已使用行数与空闲行"""
+        referenced = set(self._id_to_row.values())
+        self._size = max(referenced) + 1 if referenced else 0
+        self._free_rows = [row for row in range(self._size) if row not in referenced]
+
+    def _map_files(self) -> None:
+        """映射检索矩阵、int8 缩放系数与全精度副本；文件被替换（如其他进程扩容）后重新映射"""
+        for attr, path in (
+            ("_matrix", self._vectors_path),
+            ("_scales", self._scales_path),
+            ("_full", self._full_path),
+        ):
+            try:
+                inode = os.stat(path).st_ino
+            except FileNotFoundError:
+                continue
+            if getattr(self, attr) is None or self._mapped_inodes.get(attr) != inode:
+                setattr(self, attr, np.load(path, mmap_mode="r+"))
+                self._mapped_inodes[attr] = inode
+
+    def _sync(self) -> None:
+        """读取前同步其他进程的写入：日志增长时重放新增行，日志被替换时重新加载"""
+        try:
+            stat = os.stat(self._records_path)
+        except FileNotFoundError:
+            stat = None
+
+        if (
+            stat is None
+            or stat.st_ino != self._records_inode
+            or stat.st_size < self._records_offset
+        ):
+            if stat is None and self._records_inode is None:
+                return
+            # 日志被压缩替换（或目录被清空）：重新加载全部记录
+            self._ids, self._documents, self._metadatas = [], [], []
+            self._id_to_row = {}
+            self._records_offset = 0
+            self._records_inode = None
+            self._replay_records()
+        elif stat.st_size > self._records_offset:
+            if not self._replay_records():
+                return
+        else:
+            return
+
+        self._rebuild_rows()
+        self._map_files()
+        self._invalidate_caches()
+
+    def _apply_record(self, record: dict) -> None:
+        """将一条日志记录应用到内存索引"""
+        doc_id = record["id"]
+        old_row = self._id_to_row.pop(doc_id, None)
+        if old_row is not None:
+            self._set_row_slot(old_row, None, None, None)
+        if record.get("deleted"):
+            return
+        row = record["row"]
+        self._set_row_slot(row, doc_id, record.get("document"), record.get("metadata") or {})
+        self._id_to_row[doc_id] = row
+
+    def _set_row_slot(self, row: int, doc_id, document, metadata) -> None:
+        """设置行槽位（按需扩展 Python 侧列表）"""
+        while len(self._ids) <= row:
+            self._ids.append(None)
+            self._documents.append(None)
+            self._metadatas.append(None)
+        self._ids[row] = doc_id
+        self._documents[row] = document
+        self._metadatas[row] = metadata
+
+    def _append_records(self, records: list[dict]) -> None:
+        """追加写入记录日志"""
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with open(self._records_path, "ab") as f:
+            start = f.seek(0, os.SEEK_END)
+            inode = os.fstat(f.fileno()).st_ino
+            f.write(data.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            # 之前的内容都已读取时跳过自己写入的行；否则下次同步时与其他进程的写入一起重放
+            if start == self._records_offset and inode == self._records_inode:
+                self._records_offset = f.tell()
+            elif self._records_inode is None and start == 0:
+                self._records_inode = inode
+                self._records_offset = f.tell()
+
+    def _compact(self) -> None:
+        """压缩记录日志，只保留每个 ID 的最新记录"""
+        tmp_path = self._records_path.with_suffix(".jsonl.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for doc_id, row in self._id_to_row.items():
+                record = {
+                    "id": doc_id,
+                    "row": row,
+                    "document": self._documents[row],
+                    "metadata": self._metadatas[row],
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self._records_path)
+        stat = os.stat(self._records_path)
+        self._records_inode = stat.st_ino
+        self._records_offset = stat.st_size
+        logger.info(f"[{self.name}] 向量记录日志已压缩: {len(self._id_to_row)} 条")
+
+    def _check_dimension(self, dim: int) -> None:
+        """检查写入向量的维度与已有矩阵一致"""
+        if self._matrix is not None and self._matrix.shape[1] != dim:
+            raise ValueError(f"向量维度不匹配: collection 为 {self._matrix.shape[1]}，写入为 {dim}")
+
+    def _ensure_capacity(self, dim: int, rows_needed: int) -> None:
+        """确保矩阵存在且容量足够，必要时按倍数扩容"""
+        if self._matrix is not None and self._matrix.shape[0] >= rows_needed:
+            return
+
+        capacity = self._matrix.shape[0] if self._matrix is not None else _INITIAL_CAPACITY
+        while capacity < rows_needed:
+            capacity *= 2
+
+        self._grow_memmap("_matrix", self._vectors_path, self._dtype, (capacity, dim))
+        if self._dtype == np.int8:
+            self._grow_memmap("_scales", self._scales_path, np.float32, (capacity,))
+        if self._full_precision:
+            self._grow_memmap("_full", self._full_path, np.float32, (capacity, dim))
+
+    def _grow_memmap(self, attr: str, path: Path, dtype, shape: tuple) -> None:
+        """将内存映射数组扩容到指定形状（写临时文件后原子替换）"""
+        old = getattr(self, attr)
+        tmp_path = path.with_name(path.name + ".tmp")
+        new_array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+        if old is not None:
+            copied = min(self._size, old.shape[0])
+            new_array[:copied] = old[:copied]
+        new_array.flush()
+        del new_array, old
+        setattr(self, attr, None)
+        os.replace(tmp_path, path)
+        setattr(self, attr, np.load(path, mmap_mode="r+"))
+        self._mapped_inodes[attr] = os.stat(path).st_ino
+
+    # ── 写入 ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _normalize(embeddings) -> "np.ndarray":
+        """L2 归一化（余弦相似度退化为点积）"""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            raise ValueError("embeddings 必须是二维向量列表")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _encode(self, vectors: "np.ndarray") -> tuple["np.ndarray", "np.ndarray | None"]:
+        """将归一化向量编码为存储精度，int8 同时返回每向量缩放系数"""
+        if self._dtype != np.int8:
+            return vectors.astype(self._dtype), None
+        scales = np.abs(vectors).max(axis=1) / _INT8_MAX
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _write(self, ids, embeddings, documents, metadatas, mode: str) -> None:
+        """统一写入入口
+
+        Args:
+            mode: add（已存在的 ID 跳过）、upsert（覆盖）、update（仅更新已存在的 ID，字段合并）
+        """
+        ids = [str(i) for i in ids]
+        count = len(ids)
+        for name, values in (
+            ("embeddings", embeddings),
+            ("documents", documents),
+            ("metadatas", metadatas),
+        ):
+            if values is not None and len(values) != count:
+                raise ValueError(f"{name} 数量与 ids 不一致")
+
+        vectors = self._normalize(embeddings) if embeddings is not None and count else None
+
+        with self._lock:
+            self._sync()
+            if vectors is not None:
+                self._check_dimension(vectors.shape[1])
+
+            records = []
+            pending_rows: list[tuple[int, int]] = []  # (row, index in batch)
+            for i, doc_id in enumerate(ids):
+                existing_row = self._id_to_row.get(doc_id)
+                if mode == "add" and existing_row is not None:
+                    logger.debug(f"[{self.name}] ID 已存在，跳过: {doc_id}")
+                    continue
+                if mode == "update" and existing_row is None:
+                    logger.warning(f"[{self.name}] 更新的 ID 不存在，跳过: {doc_id}")
+                    continue
+
+                if existing_row is not None:
+                    document = documents[i] if documents is not None else None
+                    metadata = metadatas[i] if metadatas is not None else None
+                    if mode == "update":
+                        if document is None:
+                            document = self._documents[existing_row]
+                        merged = dict(self._metadatas[existing_row] or {})
+                        for key, value in (metadata or {}).items():
+                            if value is None:
+                                merged.pop(key, None)
+                            else:
+                                merged[key] = value
+                        metadata = merged
+                    if vectors is None and mode != "update":
+                        raise ValueError("写入新向量必须提供 embeddings")
+                    row = existing_row
+                else:
+                    if vectors is None:
+                        raise ValueError("写入新向量必须提供 embeddings")
+                    document = documents[i] if documents is not None else None
+                    metadata = metadatas[i] if metadatas is not None else None
+                    row = self._free_rows.pop(0) if self._free_rows else self._size
+                    self._size = max(self._size, row + 1)
+
+                if vectors is not None:
+                    pending_rows.append((row, i))
+                metadata = metadata or {}
+                self._set_row_slot(row, doc_id, document, metadata)
+                self._id_to_row[doc_id] = row
+                records.append(
+                    {"id": doc_id, "row": row, "document": document, "metadata": metadata}
+                )
+
+            if pending_rows:
+                self._ensure_capacity(vectors.shape[1], self._size)
+                rows = np.fromiter((r for r, _ in pending_rows), dtype=np.int64)
+                batch_index = np.fromiter((i for _, i in pending_rows), dtype=np.int64)
+                batch = vectors[batch_index]
+                codes, scales = self._encode(batch)
+                self._matrix[rows] = codes
+                self._matrix.flush()
+                if scales is not None:
+                    self._scales[rows] = scales
+                    self._scales.flush()
+                if self._full is not None:
+                    self._full[rows] = batch
+                    self._full.flush()
+
+            if records:
+                self._append_records(records)
+                self._invalidate_caches()
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None) -> None:
+        """添加向量（已存在的 ID 跳过，与 ChromaDB 行为一致）"""
+        self._write(ids, embeddings, documents, metadatas, mode="add")
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None) -> None:
+        """添加或覆盖向量"""
+        self._write(ids, embeddings, documents, metadatas, mode="upsert")
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None) -> None:
+        """更新已存在的向量（元数据按键合并，值为 None 表示删除该键）"""
+        self._write(ids, embeddings, documents, metadatas, mode="update")
+
+    def delete(self, ids=None, where=None) -> None:
+        """按 ID 或 where 条件删除"""
+        with self._lock:
+            self._sync()
+            if ids is not None:
+                targets = [str(i) for i in ids if str(i) in self._id_to_row]
+            elif where:
+                mask = self._where_mask(where)
+                targets = [self._ids[row] for row in np.flatnonzero(mask)]
+            else:
+                targets = []
+
+            if not targets:
+                return
+
+            for doc_id in targets:
+                row = self._id_to_row.pop(doc_id)
+                self._set_row_slot(row, None, None, None)
+                self._free_rows.append(row)
+            self._append_records([{"id": doc_id, "deleted": True} for doc_id in targets])
+            self._invalidate_caches()
+
+    # ── 读取 ──────────────────────────────────────────────────────────────
+
+    def count(self) -> int:
+        """文档数量"""
+        with self._lock:
+            self._sync()
+            return len(self._id_to_row)
+
+    def _invalidate_caches(self) -> None:
+        """写入后清空列缓存与有效行掩码缓存"""
+        self._columns.clear()
+        self._live_cache = None
+
+    def _live_mask(self) -> "np.ndarray":
+        """当前有效行掩码（返回副本，调用方可原地修改）"""
+        if self._live_cache is None or self._live_cache.size != self._size:
+            mask = np.zeros(self._size, dtype=bool)
+            if self._id_to_row:
+                mask[np.fromiter(self._id_to_row.values(), dtype=np.int64)] = True
+            self._live_cache = mask
+        return self._live_cache.copy()
+
+    def _column(self, field: str, numeric: bool) -> "np.ndarray":
+        """按字段构建（并缓存）列数组，用于向量化元数据过滤"""
+        key = (field, numeric)
+        column = self._columns.get(key)
+        if column is not None:
+            return column
+
+        if numeric:
+            column = np.full(self._size, np.nan, dtype=np.float64)
+            for row in range(self._size):
+                metadata = self._metadatas[row] if row < len(self._metadatas) else None
+                value = metadata.get(field) if metadata else None
+                if isinstance(value, int | float) and not isinstance(value, bool):
+                    column[row] = value
+        else:
+            column = np.empty(self._size, dtype=object)
+            for row in range(self._size):
+                metadata = self._metadatas[row] if row < len(self._metadatas) else None
+                column[row] = metadata.get(field, _MISSING) if metadata else _MISSING
+        self._columns[key] = column
+        return column
+
+    def _field_mask(self, field: str, condition) -> "np.ndarray":
+        """单字段条件掩码"""
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        mask = np.ones(self._size, dtype=bool)
+        for operator, value in condition.items():
+            if operator in _NUMERIC_OPERATORS:
+                column = self._column(field, numeric=True)
+                with np.errstate(invalid="ignore"):
+                    if operator == "$gt":
+                        mask &= column > value
+                    elif operator == "$gte":
+                        mask &= column >= value
+                    elif operator == "$lt":
+                        mask &= column < value
+                    else:
+                        mask &= column <= value
+            elif operator in ("$eq", "$ne", "$in", "$nin"):
+                column = self._column(field, numeric=False)
+                present = np.fromiter((v is not _MISSING for v in column), bool, self._size)
+                if operator == "$eq":
+                    mask &= present & (column == value)
+                elif operator == "$ne":
+                    mask &= present & (column != value)
+                else:
+                    values = set(value)
+                    hit = np.fromiter((v in values for v in column), bool, self._size)
+                    mask &= present & (hit if operator == "$in" else ~hit)
+            else:
+                raise ValueError(f"不支持的过滤操作符: {operator}")
+        return mask
+
+    def _where_mask(self, where: dict | None) -> "np.ndarray":
+        """将 ChromaDB 风格的 where 条件转换为行掩码（已与有效行求交）"""
+        mask = self._live_mask()
+        if where:
+            mask &= self._evaluate_where(where)
+        return mask
+
+    def _evaluate_where(self, where: dict) -> "np.ndarray":
+        """递归计算 where 条件"""
+        mask = np.ones(self._size, dtype=bool)
+        for key, value in where.items():
+            if key == "$and":
+                for clause in value:
+                    mask &= self._evaluate_where(clause)
+            elif key == "$or":
+                any_mask = np.zeros(self._size, dtype=bool)
+                for clause in value:
+                    any_mask |= self._evaluate_where(clause)
+                mask &= any_mask
+            else:
+                mask &= self._field_mask(key, value)
+        return mask
+
+    def _row_result(self, rows, include: list[str]) -> dict[str, Any]:
+        """按行号构建 get() 结果"""
+        result: dict[str, Any] = {
+            "ids": [self._ids[row] for row in rows],
+            "documents": None,
+            "metadatas": None,
+            "embeddings": None,
+        }
+        if "documents" in include:
+            result["documents"] = [self._documents[row] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self._metadatas[row] for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = self._decode_rows(np.asarray(rows, dtype=np.int64)).tolist()
+        return result
+
+    def _decode_rows(self, rows: "np.ndarray") -> "np.ndarray":
+        """读取指定行的 float32 向量（优先全精度副本）"""
+        if self._full is not None:
+            return np.asarray(self._full[rows], dtype=np.float32)
+        vectors = np.asarray(self._matrix[rows], dtype=np.float32)
+        if self._dtype == np.int8:
+            vectors *= self._scales[rows][:, None]
+        return vectors
+
+    def get_storage_info(self) -> dict[str, Any]:
+        """存储精度与检索矩阵内存占用（用于选择各 collection 的量化方案）"""
+        with self._lock:
+            self._sync()
+            dim = self._matrix.shape[1] if self._matrix is not None else 0
+            bytes_per_vector = dim * self._dtype.itemsize + (4 if self._dtype == np.int8 else 0)
+            return {
+                "dtype": self._dtype.name,
+                "full_precision": self._full is not None,
+                "rescore_factor": self.rescore_factor if self._full is not None else 0,
+                "dimension": dim,
+                "search_bytes_per_vector": bytes_per_vector,
+                "search_matrix_bytes": bytes_per_vector * self._size,
+            }
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> dict:
+        """按 ID 或条件获取文档（按行号顺序分页）"""
+        include = ["metadatas", "documents"] if include is None else include
+        with self._lock:
+            self._sync()
+            if ids is not None:
+                rows = [self._id_to_row[str(i)] for i in ids if str(i) in self._id_to_row]
+            else:
+                rows = np.flatnonzero(self._where_mask(where)).tolist()
+                start = offset or 0
+                rows = rows[start : start + limit] if limit is not None else rows[start:]
+            return self._row_result(rows, include)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None) -> dict:
+        """精确 top-k 检索（余弦距离）"""
+        include = ["metadatas", "documents", "distances"] if include is None else include
+        queries = self._normalize(query_embeddings)
+
+        result: dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            self._sync()
+            if self._matrix is None or not self._id_to_row:
+                for key in result:
+                    result[key] = [[] for _ in queries]
+                return result
+
+            if queries.shape[1] != self._matrix.shape[1]:
+                raise ValueError(
+                    f"查询向量维度不匹配: collection 为 {self._matrix.shape[1]}，"
+                    f"查询为 {queries.shape[1]}"
+                )
+
+            mask = self._where_mask(where)
+            candidate_rows = np.flatnonzero(mask)
+            for query in queries:
+                rows, scores = self._top_k(query, candidate_rows, n_results)
+                page = self._row_result(rows.tolist(), include)
+                result["ids"].append(page["ids"])
+                result["documents"].append(page["documents"] or [])
+                result["metadatas"].append(page["metadatas"] or [])
+                result["distances"].append((1.0 - scores).tolist())
+
+        return result
+
+    def _approx_scores(self, query: "np.ndarray", candidate_rows: "np.ndarray") -> "np.ndarray":
+        """用检索矩阵计算候选行的点积得分（量化矩阵分块反量化）"""
+        contiguous = candidate_rows.size == self._size
+        if self._dtype == np.float32:
+            matrix = self._matrix[: self._size] if contiguous else self._matrix[candidate_rows]
+            return matrix @ query
+
+        # float16 / int8 没有 BLAS 支持，分块转换为 float32 后计算
+        scores = np.empty(candidate_rows.size, dtype=np.float32)
+        for start in range(0, candidate_rows.size, _SEARCH_CHUNK_ROWS):
+            chunk_rows = candidate_rows[start : start + _SEARCH_CHUNK_ROWS]
+            if contiguous:
+                chunk_slice = slice(chunk_rows[0], chunk_rows[-1] + 1)
+                chunk = self._matrix[chunk_slice]
+            else:
+                chunk_slice = chunk_rows
+                chunk = self._matrix[chunk_rows]
+            chunk_scores = chunk.astype(np.float32) @ query
+            if self._dtype == np.int8:
+                chunk_scores *= self._scales[chunk_slice]
+            scores[start : start + chunk_rows.size] = chunk_scores
+        return scores
+
+    def _top_k(
+        self, query: "np.ndarray", candidate_rows: "np.ndarray", k: int
+    ) -> tuple["np.ndarray", "np.ndarray"]:
+        """在候选行中取 top-k，量化 collection 对短名单用全精度向量重排"""
+        if candidate_rows.size == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = self._approx_scores(query, candidate_rows)
+        k = min(k, scores.size)
+        rescore = self._full is not None and self.rescore_factor > 0
+        shortlist = min(scores.size, k * self.rescore_factor) if rescore else k
+
+        top = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        rows = candidate_rows[top]
+        if rescore:
+            # 只读取短名单行的全精度向量，其余页面不会被换入内存
+            scores = np.asarray(self._full[rows], dtype=np.float32) @ query
+        else:
+            scores = scores[top]
+
+        order = np.argsort(-scores)[:k]
+        return rows[order], scores[order]
+
+
+class NumpyVectorClient:
+    """NumPy 向量后端客户端（接口与 chromadb.PersistentClient 对齐）"""
+
+    def __init__(
+        self,
+        path: str,
+        dtype: str = "float16",
+        collection_dtypes: dict[str, str] | None = None,
+        rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+    ):
+        """初始化客户端
+
+        Args:
+            path: 存储根目录，每个 collection 一个子目录
+            dtype: 新建 collection 的默认向量存储精度
+            collection_dtypes: 按 collection 名称覆盖的存储精度
+            rescore_factor: 量化 collection 的重排倍数
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy未安装，请运行: pip install numpy")
+        collection_dtypes = collection_dtypes or {}
+        for value in (dtype, *collection_dtypes.values()):
+            if value not in SUPPORTED_DTYPES:
+                raise ValueError(f"不支持的向量精度: {value}，可选 {SUPPORTED_DTYPES}")
+        self.path = path
+        self.dtype = dtype
+        self.collection_dtypes = collection_dtypes
+        self.rescore_factor = rescore_factor
+        self._collections: dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+        Path(path).mkdir(parents=True, exist_ok=True)
+
+    def get_or_create_collection(self, name: str, metadata: dict | None = None) -> NumpyCollection:
+        """获取或创建 collection"""
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is not None and not collection.exists():
+                # 目录已被其他进程删除（如过期分区），丢弃失效的句柄
+                collection = None
+            if collection is None:
+                collection = NumpyCollection(
+                    str(Path(self.path) / name),
+                    name,
+                    metadata=metadata,
+                    # 消息分区（messages_YYYYMM）沿用 messages 的精度配置
+                    dtype=self.collection_dtypes.get(
+                        name, self.collection_dtypes.get(name.split("_")[0], self.dtype)
+                    ),
+                    rescore_factor=self.rescore_factor,
+                )
+                self._collections[name] = collection
+            return collection
+
+    def list_collections(self) -> list[str]:
+        """列出已存在的 collection 名称"""
+        root = Path(self.path)
+        return sorted(
+            child.name
+            for child in root.iterdir()
+            if child.is_dir() and (child / "collection.json").exists()
+        )
+
+    def delete_collection(self, name: str) -> None:
+        """删除 collection 及其目录"""
+        with self._lock:
+            self._collections.pop(name, None)
+            path = Path(self.path) / name
+            if path.exists():
+                shutil.rmtree(path)
@@ -9,23 +9,76 @@
 # 许可证全文：参见 LICENSE 文件
 
 """
-向量存储管理器 - 使用ChromaDB存储和检索向量
+向量存储管理器 - 使用可插拔向量后端（ChromaDB / NumPy）存储和检索向量
 """
 
+import asyncio
 import hashlib
 import logging
 import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import Any
 
+from core.ai.embedding_cache import get_query_embedding_cache
+from core.ai.embedding_store import get_embedding_store
+from core.ai.message_partitions import MessagePartitionManager
+from core.ai.qa_tracing import get_latency_tracer
+from core.ai.vector_backend import DEFAULT_RESCORE_FACTOR, NumpyCollection, NumpyVectorClient
+from core.infrastructure.utils.date_utils import to_unix_timestamp
+from core.infrastructure.utils.text_chunking import split_passages
+
 logger = logging.getLogger(__name__)
 
-try:
-    import chromadb
+# search_all 并行检索多个 collection 使用的线程池
+_SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vector-search")
+
+# 总结段落切分：每段最大字符数（短于该长度的总结不切分，整篇向量即可覆盖）
+SUMMARY_PASSAGE_MAX_CHARS = int(os.getenv("SUMMARY_PASSAGE_MAX_CHARS", "500"))
+
+# 消息分区并行检索使用的线程池（与 _SEARCH_EXECUTOR 分开，避免嵌套提交导致线程池耗尽）
+_PARTITION_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vector-partition")
+
+# 段落检索相对 top_k 的超量召回倍数（多个段落可能属于同一篇总结）
+_PASSAGE_OVERFETCH = 3
+
+# 每篇总结最多附带的命中段落数
+_MAX_MATCHED_PASSAGES = 3
+
+# 数值时间戳元数据字段，用于在 ChromaDB 中下推 $gte/$lte 时间过滤
+CREATED_TS_FIELD = "created_ts"
 
-    CHROMADB_AVAILABLE = True
-except ImportError:
+
+def with_created_ts(metadata: dict[str, Any] | None) -> dict[str, Any]:
+    """
+    返回补充了 created_ts 整数时间戳的元数据副本
+
+    created_ts 由 created_at（ISO 格式）换算而来；已存在或无法解析时保持原样。
+    """
+    metadata = dict(metadata or {})
+    if CREATED_TS_FIELD not in metadata:
+        created_ts = to_unix_timestamp(metadata.get("created_at"))
+        if created_ts is not None:
+            metadata[CREATED_TS_FIELD] = created_ts
+    return metadata
+
+
+# 向量后端：auto（优先 ChromaDB，不可用时回退 NumPy）、chroma、numpy
+VECTOR_BACKENDS = ("auto", "chroma", "numpy")
+
+if os.getenv("VECTOR_BACKEND", "auto").lower() == "numpy":
+    # 显式使用 NumPy 后端时跳过 chromadb 的重量级导入，加快启动
+    chromadb = None
     CHROMADB_AVAILABLE = False
-    logger.warning("ChromaDB未安装，向量搜索功能将不可用")
+else:
+    try:
+        import chromadb
+
+        CHROMADB_AVAILABLE = True
+    except ImportError:
+        CHROMADB_AVAILABLE = False
+        logger.warning("ChromaDB未安装，将尝试使用 NumPy 向量后端")
 
 
 class VectorStore:
@@ -33,40 +86,100 @@ class VectorStore:
 
     def __init__(self):
         """初始化向量存储"""
-        if not CHROMADB_AVAILABLE:
-            logger.error("ChromaDB未安装，请运行: pip install chromadb")
-            self.client = None
-            self.collection = None
-            self.messages_collection = None
-            return
+        self.client = None
+        self.collection = None
+        self.messages_collection = None
+        self.passages_collection = None
+        self.message_partitions: MessagePartitionManager | None = None
+        self.backend: str | None = None
+
+        backend = os.getenv("VECTOR_BACKEND", "auto").lower()
+        if backend not in VECTOR_BACKENDS:
+            logger.warning(f"未知的向量后端: {backend}，使用 auto")
+            backend = "auto"
+
+        # 获取配置
+        vector_db_path = os.getenv("VECTOR_DB_PATH", "data/vectors")
+
+        if backend in ("auto", "chroma"):
+            if CHROMADB_AVAILABLE:
+                self._init_backend("chroma", lambda: chromadb.PersistentClient(path=vector_db_path))
+            else:
+                logger.error("ChromaDB未安装，请运行: pip install chromadb")
+
+        if self.client is None and backend in ("auto", "numpy"):
+            if backend == "auto":
+                logger.warning("ChromaDB 后端不可用，回退到 NumPy 向量后端")
+            numpy_path = os.getenv("VECTOR_NUMPY_PATH", os.path.join(vector_db_path, "numpy"))
+            dtype = os.getenv("VECTOR_NUMPY_DTYPE", "float16").lower()
+            # 按 collection 选择量化精度，未配置时使用 VECTOR_NUMPY_DTYPE
+            collection_dtypes = {
+                name: value.lower()
+                for name in ("summaries", "messages")
+                if (value := os.getenv(f"VECTOR_NUMPY_{name.upper()}_DTYPE", ""))
+            }
+            rescore_factor = int(
+                os.getenv("VECTOR_NUMPY_RESCORE_FACTOR", str(DEFAULT_RESCORE_FACTOR))
+            )
+            self._init_backend(
+                "numpy",
+                lambda: NumpyVectorClient(
+                    numpy_path,
+                    dtype=dtype,
+                    collection_dtypes=collection_dtypes,
+                    rescore_factor=rescore_factor,
+                ),
+            )
 
-        try:
-            # 获取配置
-            vector_db_path = os.getenv("VECTOR_DB_PATH", "data/vectors")
-            int(os.getenv("EMBEDDING_DIMENSION", "1024"))
+        if self.client is not None:
+            logger.info(f"向量存储初始化成功: {vector_db_path} (backend={self.backend})")
 
-            # 创建持久化客户端
-            self.client = chromadb.PersistentClient(path=vector_db_path)
+    def _init_backend(self, backend: str, create_client) -> None:
+        """创建后端客户端并获取两个 collection，失败时保持不可用状态"""
+        try:
+            client = create_client()
 
             # 获取或创建 summaries collection（总结向量）
-            self.collection = self.client.get_or_create_collection(
+            collection = client.get_or_create_collection(
                 name="summaries",
                 metadata={"hnsw:space": "cosine"},  # 使用余弦相似度
             )
 
             # 获取或创建 messages collection（频道原始消息向量）
-            self.messages_collection = self.client.get_or_create_collection(
+            messages_collection = client.get_or_create_collection(
                 name="messages",
                 metadata={"hnsw:space": "cosine"},
             )
 
-            logger.info(f"向量存储初始化成功: {vector_db_path}")
+            # 获取或创建 summary_passages collection（长总结的段落向量，metadata 含父 summary_id）
+            passages_collection = client.get_or_create_collection(
+                name="summary_passages",
+                metadata={"hnsw:space": "cosine"},
+            )
 
         except Exception as e:
-            logger.error(f"向量存储初始化失败: {type(e).__name__}: {e}")
-            self.client = None
-            self.collection = None
-            self.messages_collection = None
+            logger.error(f"向量存储初始化失败 ({backend}): {type(e).__name__}: {e}")
+            return
+
+        self.client = client
+        self.collection = collection
+        self.messages_collection = messages_collection
+        self.passages_collection = passages_collection
+        self.backend = backend
+
+        # 消息时间分区：未启用时新消息仍写入 messages，已有分区照常参与检索
+        vector_db_path = os.getenv("VECTOR_DB_PATH", "data/vectors")
+        self.message_partitions = MessagePartitionManager(
+            client,
+            months=int(os.getenv("VECTOR_MESSAGES_PARTITION_MONTHS", "0")),
+            retention_months=int(os.getenv("VECTOR_MESSAGES_RETENTION_MONTHS", "0")),
+            retention_action=os.getenv("VECTOR_MESSAGES_RETENTION_ACTION", "archive").lower(),
+            archive_dir=os.path.join(vector_db_path, "archive"),
+        )
+        try:
+            self.message_partitions.load()
+        except Exception as e:
+            logger.warning(f"加载消息向量分区失败: {type(e).__name__}: {e}")
 
     def is_available(self) -> bool:
         """检查向量存储是否可用"""
@@ -108,10 +221,59 @@ class VectorStore:
                 ids=[str(summary_id)],
                 embeddings=[embedding],
                 documents=[text],
-                metadatas=[metadata],
+                metadatas=[with_created_ts(metadata)],
             )
 
             logger.info(f"成功添加向量: summary_id={summary_id}")
+            self.index_summary_passages([summary_id], [text], [metadata])
+            return True
+
+        except Exception as e:
+            logger.error(f"添加向量失败: {type(e).__name__}: {e}")
+            return False
+
+    async def aadd_summary(self, summary_id: int, text: str, metadata: dict[str, Any]) -> bool:
+        """
+        添加总结向量到存储（异步版本）
+
+        Embedding 通过异步客户端生成，ChromaDB 写入在线程池中执行，不阻塞事件循环。
+
+        Args:
+            summary_id: 总结ID
+            text: 总结文本
+            metadata: 元数据（channel_id, channel_name, created_at等）
+
+        Returns:
+            是否成功
+        """
+        if not self.collection:
+            logger.warning("向量存储不可用")
+            return False
+
+        try:
+            from core.ai.embedding_generator import get_async_embedding_generator
+
+            emb_gen = get_async_embedding_generator()
+
+            if not emb_gen.is_available():
+                logger.warning("Embedding服务不可用")
+                return False
+
+            embedding = await emb_gen.agenerate(text)
+            if embedding is None:
+                logger.error(f"生成embedding失败: summary_id={summary_id}")
+                return False
+
+            await asyncio.to_thread(
+                self.collection.add,
+                ids=[str(summary_id)],
+                embeddings=[embedding],
+                documents=[text],
+                metadatas=[with_created_ts(metadata)],
+            )
+
+            logger.info(f"成功添加向量: summary_id={summary_id}")
+            await self.aindex_summary_passages([summary_id], [text], [metadata])
             return True
 
         except Exception as e:
@@ -146,7 +308,33 @@ class VectorStore:
 
         try:
             return self._search_collection(
-                collection=self.collection,
+                query_fn=self._query_summaries,
+                query=query,
+                top_k=top_k,
+                filter_metadata=filter_metadata,
+                date_after=date_after,
+                date_before=date_before,
+            )
+        except Exception as e:
+            logger.error(f"语义搜索失败: {type(e).__name__}: {e}")
+            return []
+
+    async def asearch_similar(
+        self,
+        query: str,
+        top_k: int = 20,
+        filter_metadata: dict | None = None,
+        date_after: str | None = None,
+        date_before: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """语义搜索相似的总结（异步版本，参数与返回值同 search_similar）"""
+        if not self.collection:
+            logger.warning("向量存储不可用")
+            return []
+
+        try:
+            return await self._asearch_collection(
+                query_fn=self._query_summaries,
                 query=query,
                 top_k=top_k,
                 filter_metadata=filter_metadata,
@@ -157,6 +345,55 @@ class VectorStore:
             logger.error(f"语义搜索失败: {type(e).__name__}: {e}")
             return []
 
+    def upsert_summaries_batch(
+        self,
+        summary_ids: list[int],
+        texts: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: list[list[float]],
+    ) -> int:
+        """
+        批量写入总结向量（upsert，已存在的 ID 会被覆盖）
+
+        Args:
+            summary_ids: 总结ID列表
+            texts: 总结文本列表
+            metadatas: 元数据列表
+            embeddings: 向量列表
+
+        Returns:
+            成功写入的数量
+        """
+        if not self.collection:
+            logger.warning("向量存储不可用")
+            return 0
+
+        try:
+            self.collection.upsert(
+                ids=[str(summary_id) for summary_id in summary_ids],
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=[with_created_ts(m) for m in metadatas],
+            )
+            logger.info(f"批量写入总结向量: {len(summary_ids)} 条")
+            return len(summary_ids)
+
+        except Exception as e:
+            logger.error(f"批量写入总结向量失败: {type(e).__name__}: {e}")
+            return 0
+
+    async def aupsert_summaries_batch(
+        self,
+        summary_ids: list[int],
+        texts: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: list[list[float]],
+    ) -> int:
+        """批量写入总结向量（异步版本，ChromaDB 写入在线程池中执行）"""
+        return await asyncio.to_thread(
+            self.upsert_summaries_batch, summary_ids, texts, metadatas, embeddings
+        )
+
     def delete_summary(self, summary_id: int) -> bool:
         """
         删除总结向量
@@ -172,6 +409,8 @@ class VectorStore:
 
         try:
             self.collection.delete(ids=[str(summary_id)])
+            if self.passages_collection:
+                self.passages_collection.delete(where={"summary_id": int(summary_id)})
             logger.info(f"成功删除向量: summary_id={summary_id}")
             return True
 
@@ -179,6 +418,222 @@ class VectorStore:
             logger.error(f"删除向量失败: {type(e).__name__}: {e}")
             return False
 
+    # ── 总结段落方法 ──────────────────────────────────────────────────────
+
+    @staticmethod
+    def _build_passage_records(
+        summary_ids: list[int], texts: list[str], metadatas: list[dict[str, Any]]
+    ) -> tuple[list[int], list[str], list[str], list[dict[str, Any]]]:
+        """
+        将总结切分为段落记录
+
+        只切分出一段的短总结不写入段落（整篇向量已等价）。
+
+        Returns:
+            (涉及的 summary_id 列表, 段落ID列表, 段落文本列表, 段落元数据列表)
+        """
+        parent_ids, ids, documents, passage_metadatas = [], [], [], []
+        for summary_id, text, metadata in zip(summary_ids, texts, metadatas, strict=True):
+            parent_ids.append(int(summary_id))
+            passages = split_passages(text or "", max_chars=SUMMARY_PASSAGE_MAX_CHARS)
+            if len(passages) <= 1:
+                continue
+            base = with_created_ts(metadata)
+            for index, passage in enumerate(passages):
+                ids.append(f"{summary_id}#{index}")
+                documents.append(passage["text"])
+                passage_metadatas.append(
+                    {
+                        **base,
+                        "summary_id": int(summary_id),
+                        "passage_index": index,
+                        "start": passage["start"],
+                        "end": passage["end"],
+                    }
+                )
+        return parent_ids, ids, documents, passage_metadatas
+
+    def _write_passages(
+        self,
+        parent_ids: list[int],
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: list[list[float] | None],
+    ) -> int:
+        """替换指定总结的全部段落向量（先删除旧段落，避免总结变短后残留），返回写入数量"""
+        self.passages_collection.delete(where={"summary_id": {"$in": parent_ids}})
+
+        ready = [i for i, emb in enumerate(embeddings) if emb is not None]
+        if not ready:
+            return 0
+        self.passages_collection.upsert(
+            ids=[ids[i] for i in ready],
+            embeddings=[embeddings[i] for i in ready],
+            documents=[documents[i] for i in ready],
+            metadatas=[metadatas[i] for i in ready],
+        )
+        return len(ready)
+
+    def index_summary_passages(
+        self, summary_ids: list[int], texts: list[str], metadatas: list[dict[str, Any]]
+    ) -> int:
+        """
+        为总结生成并写入段落向量（替换旧段落）
+
+        段落写入失败不影响整篇总结向量，仅记录日志。
+
+        Args:
+            summary_ids: 总结ID列表
+            texts: 总结文本列表
+            metadatas: 总结元数据列表
+
+        Returns:
+            写入的段落数量
+        """
+        if not self.passages_collection or not summary_ids:
+            return 0
+
+        try:
+            parent_ids, ids, documents, passage_metadatas = self._build_passage_records(
+                summary_ids, texts, metadatas
+            )
+            embeddings = []
+            if documents:
+                from core.ai.embedding_generator import get_embedding_generator
+
+                embeddings = get_embedding_generator().batch_generate(documents)
+            written = self._write_passages(
+                parent_ids, ids, documents, passage_metadatas, embeddings
+            )
+            if written:
+                logger.info(f"写入总结段落向量: {len(parent_ids)} 篇总结, {written} 段")
+            return written
+
+        except Exception as e:
+            logger.error(f"写入总结段落向量失败: {type(e).__name__}: {e}")
+            return 0
+
+    async def aindex_summary_passages(
+        self, summary_ids: list[int], texts: list[str], metadatas: list[dict[str, Any]]
+    ) -> int:
+        """为总结生成并写入段落向量（异步版本，参数与返回值同 index_summary_passages）"""
+        if not self.passages_collection or not summary_ids:
+            return 0
+
+        try:
+            parent_ids, ids, documents, passage_metadatas = self._build_passage_records(
+                summary_ids, texts, metadatas
+            )
+            embeddings = []
+            if documents:
+                from core.ai.embedding_generator import get_async_embedding_generator
+
+                embeddings = await get_async_embedding_generator().abatch_generate(documents)
+            written = await asyncio.to_thread(
+                self._write_passages, parent_ids, ids, documents, passage_metadatas, embeddings
+            )
+            if written:
+                logger.info(f"写入总结段落向量: {len(parent_ids)} 篇总结, {written} 段")
+            return written
+
+        except Exception as e:
+            logger.error(f"写入总结段落向量失败: {type(e).__name__}: {e}")
+            return 0
+
+    def _query_summaries(
+        self,
+        query_embedding: list[float],
+        top_k: int = 20,
+        filter_metadata: dict | None = None,
+        date_after: str | None = None,
+        date_before: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        检索总结：整篇向量与段落向量同时召回，按父总结去重
+
+        命中段落的总结附带 matched_passages（按相似度降序，含原文偏移）与 highlight（最佳段落），
+        相似度取整篇与最佳段落中的较大值。仅由段落召回的总结从 summaries collection 补全原文。
+        """
+        params = {
+            "query_embedding": query_embedding,
+            "filter_metadata": filter_metadata,
+            "date_after": date_after,
+            "date_before": date_before,
+        }
+        results = self._query_collection(self.collection, top_k=top_k, **params)
+        if not self.passages_collection:
+            return results
+
+        try:
+            passage_hits = self._query_collection(
+                self.passages_collection, top_k=top_k * _PASSAGE_OVERFETCH, **params
+            )
+        except Exception as e:
+            logger.warning(f"段落检索失败，仅使用整篇向量: {type(e).__name__}: {e}")
+            return results
+
+        return self._merge_passage_hits(results, passage_hits, top_k)
+
+    def _merge_passage_hits(
+        self, results: list[dict[str, Any]], passage_hits: list[dict[str, Any]], top_k: int
+    ) -> list[dict[str, Any]]:
+        """将段落命中合并到父总结结果中（按 summary_id 去重）"""
+        grouped: dict[int, list[dict[str, Any]]] = {}
+        for hit in passage_hits:
+            metadata = hit.get("metadata") or {}
+            summary_id = metadata.get("summary_id")
+            if summary_id is None:
+                continue
+            grouped.setdefault(int(summary_id), []).append(
+                {
+                    "text": hit["summary_text"],
+                    "start": metadata.get("start"),
+                    "end": metadata.get("end"),
+                    "passage_index": metadata.get("passage_index"),
+                    "similarity": hit["similarity"],
+                }
+            )
+        if not grouped:
+            return results
+
+        by_id = {r["summary_id"]: r for r in results}
+        missing = [summary_id for summary_id in grouped if summary_id not in by_id]
+        if missing:
+            parents = self.collection.get(
+                ids=[str(summary_id) for summary_id in missing],
+                include=["documents", "metadatas"],
+            )
+            for doc_id, document, metadata in zip(
+                parents.get("ids") or [],
+                parents.get("documents") or [],
+                parents.get("metadatas") or [],
+                strict=False,
+            ):
+                by_id[int(doc_id)] = {
+                    "summary_id": int(doc_id),
+                    "summary_text": document,
+                    "metadata": metadata or {},
+                    "distance": 1.0,
+                    "similarity": 0.0,
+                    "doc_id": doc_id,
+                }
+
+        for summary_id, passages in grouped.items():
+            parent = by_id.get(summary_id)
+            if parent is None:
+                # 父总结已删除但段落残留
+                continue
+            passages.sort(key=lambda p: p["similarity"], reverse=True)
+            parent["matched_passages"] = passages[:_MAX_MATCHED_PASSAGES]
+            parent["highlight"] = passages[0]["text"]
+            if passages[0]["similarity"] > parent["similarity"]:
+                parent["similarity"] = passages[0]["similarity"]
+                parent["distance"] = 1 - passages[0]["similarity"]
+
+        merged = sorted(by_id.values(), key=lambda r: r["similarity"], reverse=True)
+        return merged[:top_k]
+
     # ── Messages Collection 方法 ──────────────────────────────────────────
 
     def is_messages_available(self) -> bool:
@@ -205,7 +660,8 @@ class VectorStore:
             return False
 
         try:
-            self.messages_collection.add(
+            metadata = with_created_ts(metadata)
+            self._message_collection_for(metadata).add(
                 ids=[str(message_id)],
                 embeddings=[embedding],
                 documents=[text],
@@ -242,12 +698,20 @@ class VectorStore:
             return 0
 
         try:
-            self.messages_collection.upsert(
-                ids=ids,
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=metadatas,
-            )
+            # 按目标 collection（分区）分组写入
+            groups: dict[int, tuple[Any, list[int]]] = {}
+            metadatas = [with_created_ts(m) for m in metadatas]
+            for i, metadata in enumerate(metadatas):
+                collection = self._message_collection_for(metadata)
+                groups.setdefault(id(collection), (collection, []))[1].append(i)
+
+            for collection, indexes in groups.values():
+                collection.upsert(
+                    ids=[ids[i] for i in indexes],
+                    embeddings=[embeddings[i] for i in indexes],
+                    documents=[texts[i] for i in indexes],
+                    metadatas=[metadatas[i] for i in indexes],
+                )
             logger.info(f"批量添加消息向量: {len(ids)} 条")
             return len(ids)
 
@@ -255,6 +719,106 @@ class VectorStore:
             logger.error(f"批量添加消息向量失败: {type(e).__name__}: {e}")
             return 0
 
+    async def aadd_messages_batch(
+        self,
+        ids: list[str],
+        texts: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: list[list[float]],
+    ) -> int:
+        """批量添加频道消息向量（异步版本，ChromaDB 写入在线程池中执行）"""
+        return await asyncio.to_thread(self.add_messages_batch, ids, texts, metadatas, embeddings)
+
+    def _message_collection_for(self, metadata: dict[str, Any]):
+        """返回消息应写入的 collection：启用分区时按 created_ts 路由，否则为 messages"""
+        if self.message_partitions and self.message_partitions.enabled:
+            return self.message_partitions.for_timestamp(metadata.get(CREATED_TS_FIELD))
+        return self.messages_collection
+
+    def _message_collections(
+        self, date_after: str | None = None, date_before: str | None = None
+    ) -> list[tuple[str, Any]]:
+        """
+        返回需要检索/删除的消息 collection 列表
+
+        messages（未分区的历史数据）总是包含在内；分区只保留与时间范围有交集的。
+        """
+        collections = [("messages", self.messages_collection)] if self.messages_collection else []
+        if self.message_partitions:
+            collections.extend(
+                self.message_partitions.select(
+                    to_unix_timestamp(date_after) if date_after else None,
+                    to_unix_timestamp(date_before) if date_before else None,
+                )
+            )
+        return collections
+
+    def _query_messages(
+        self,
+        query_embedding: list[float],
+        top_k: int = 20,
+        filter_metadata: dict | None = None,
+        date_after: str | None = None,
+        date_before: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """并行检索时间范围内的消息分区，合并后按相似度取 top_k"""
+        targets = self._message_collections(date_after, date_before)
+        query = partial(
+            self._query_collection,
+            query_embedding=query_embedding,
+            top_k=top_k,
+            filter_metadata=filter_metadata,
+            date_after=date_after,
+            date_before=date_before,
+        )
+        if len(targets) <= 1:
+            return query(targets[0][1]) if targets else []
+
+        futures = [
+            (name, _PARTITION_EXECUTOR.submit(query, collection)) for name, collection in targets
+        ]
+        merged = []
+        failed = False
+        for name, future in futures:
+            try:
+                merged.extend(future.result())
+            except Exception as e:
+                failed = failed or name != "messages"
+                logger.error(f"检索消息分区 {name} 失败: {type(e).__name__}: {e}")
+        if failed and self.message_partitions:
+            # 分区可能已被其他进程删除：立即重新读取分区列表，失效的句柄不再参与检索
+            try:
+                self.message_partitions.refresh()
+            except Exception as e:
+                logger.warning(f"刷新消息向量分区列表失败: {type(e).__name__}: {e}")
+
+        merged.sort(key=lambda r: r.get("similarity", 0), reverse=True)
+        return merged[:top_k]
+
+    def get_message_collection(self, name: str):
+        """按名称获取消息 collection（messages 或已存在的分区），不存在时返回 None"""
+        if name == "messages":
+            return self.messages_collection
+        return self.message_partitions.get(name) if self.message_partitions else None
+
+    def list_message_partitions(self) -> list[dict[str, Any]]:
+        """列出消息向量分区（名称、时间范围、向量数、是否过期）"""
+        return self.message_partitions.list_info() if self.message_partitions else []
+
+    def apply_message_retention(self, dry_run: bool = False) -> dict[str, Any]:
+        """
+        对超过保留期的消息分区执行删除或归档
+
+        Args:
+            dry_run: 为 True 时只返回将被处理的分区
+
+        Returns:
+            处理结果（expired, action, archived, dry_run）
+        """
+        if not self.message_partitions:
+            return {"expired": [], "action": None, "archived": {}, "dry_run": dry_run}
+        return self.message_partitions.enforce_retention(dry_run=dry_run)
+
     def search_messages(
         self,
         query: str,
@@ -281,7 +845,32 @@ class VectorStore:
 
         try:
             return self._search_collection(
-                collection=self.messages_collection,
+                query_fn=self._query_messages,
+                query=query,
+                top_k=top_k,
+                filter_metadata=filter_metadata,
+                date_after=date_after,
+                date_before=date_before,
+            )
+        except Exception as e:
+            logger.error(f"搜索消息向量失败: {type(e).__name__}: {e}")
+            return []
+
+    async def asearch_messages(
+        self,
+        query: str,
+        top_k: int = 20,
+        filter_metadata: dict | None = None,
+        date_after: str | None = None,
+        date_before: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """语义搜索频道消息（异步版本，参数与返回值同 search_messages）"""
+        if not self.messages_collection:
+            return []
+
+        try:
+            return await self._asearch_collection(
+                query_fn=self._query_messages,
                 query=query,
                 top_k=top_k,
                 filter_metadata=filter_metadata,
@@ -301,7 +890,9 @@ class VectorStore:
         date_before: str | None = None,
     ) -> list[dict[str, Any]]:
         """
-        同时搜索 summaries 和 messages 两个 collection，合并结果按相似度排序
+        同时搜索 summaries 和 messages 两个 collection，合并结果按归一化分数排序
+
+        查询向量只生成一次，两个 collection 在线程池中并行检索。
 
         Args:
             query: 查询文本
@@ -311,47 +902,124 @@ class VectorStore:
             date_before: 时间上限，ISO格式
 
         Returns:
-            合并后的结果列表，按相似度降序排列，截取 top_k
+            合并后的结果列表，按归一化分数降序排列，截取 top_k
         """
-        all_results = []
+        targets = self._search_targets()
+        if not targets:
+            return []
 
-        # 搜索 summaries
-        if self.collection:
-            try:
-                summary_results = self._search_collection(
-                    collection=self.collection,
-                    query=query,
+        from core.ai.embedding_generator import get_embedding_generator
+
+        emb_gen = get_embedding_generator()
+        if not emb_gen.is_available():
+            return []
+
+        query_embedding = emb_gen.generate(query, use_cache=True)
+        if query_embedding is None:
+            return []
+
+        futures = [
+            (
+                source,
+                _SEARCH_EXECUTOR.submit(
+                    query_fn,
+                    query_embedding=query_embedding,
                     top_k=top_k,
                     filter_metadata=filter_metadata,
                     date_after=date_after,
                     date_before=date_before,
-                )
-                for r in summary_results:
-                    r["source"] = "summary"
-                all_results.extend(summary_results)
-            except Exception as e:
-                logger.error(f"搜索summaries失败: {type(e).__name__}: {e}")
+                ),
+            )
+            for source, query_fn in targets
+        ]
 
-        # 搜索 messages
-        if self.messages_collection:
+        grouped = []
+        for source, future in futures:
             try:
-                message_results = self._search_collection(
-                    collection=self.messages_collection,
-                    query=query,
-                    top_k=top_k,
-                    filter_metadata=filter_metadata,
-                    date_after=date_after,
-                    date_before=date_before,
-                )
-                for r in message_results:
-                    r["source"] = "message"
-                all_results.extend(message_results)
+                grouped.append((source, future.result()))
             except Exception as e:
-                logger.error(f"搜索messages失败: {type(e).__name__}: {e}")
+                logger.error(f"搜索{source}失败: {type(e).__name__}: {e}")
+
+        return self._merge_collection_results(grouped, top_k)
+
+    async def asearch_all(
+        self,
+        query: str,
+        top_k: int = 20,
+        filter_metadata: dict | None = None,
+        date_after: str | None = None,
+        date_before: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """同时搜索 summaries 和 messages（异步版本，参数与返回值同 search_all）"""
+        targets = self._search_targets()
+        if not targets:
+            return []
+
+        from core.ai.embedding_generator import get_async_embedding_generator
+
+        emb_gen = get_async_embedding_generator()
+        if not emb_gen.is_available():
+            return []
+
+        tracer = get_latency_tracer()
+        with tracer.span("embedding"):
+            query_embedding = await emb_gen.agenerate(query, use_cache=True)
+        if query_embedding is None:
+            return []
+
+        with tracer.span("vector_query", collections=len(targets)):
+            outcomes = await asyncio.gather(
+                *(
+                    asyncio.to_thread(
+                        query_fn,
+                        query_embedding=query_embedding,
+                        top_k=top_k,
+                        filter_metadata=filter_metadata,
+                        date_after=date_after,
+                        date_before=date_before,
+                    )
+                    for _, query_fn in targets
+                ),
+                return_exceptions=True,
+            )
+
+        grouped = []
+        for (source, _), outcome in zip(targets, outcomes, strict=True):
+            if isinstance(outcome, BaseException):
+                logger.error(f"搜索{source}失败: {type(outcome).__name__}: {outcome}")
+                continue
+            grouped.append((source, outcome))
+
+        return self._merge_collection_results(grouped, top_k)
+
+    def _search_targets(self) -> list[tuple[str, Callable[..., list[dict[str, Any]]]]]:
+        """返回 search_all 需要检索的 (source, 检索函数) 列表，检索函数接收已生成的查询向量"""
+        targets = []
+        if self.collection:
+            targets.append(("summary", self._query_summaries))
+        if self.messages_collection:
+            targets.append(("message", self._query_messages))
+        return targets
+
+    @staticmethod
+    def _merge_collection_results(
+        grouped: list[tuple[str, list[dict[str, Any]]]], top_k: int
+    ) -> list[dict[str, Any]]:
+        """
+        合并多个 collection 的检索结果
 
-        # 按相似度降序排序，截取 top_k
-        all_results.sort(key=lambda x: x.get("similarity", 0), reverse=True)
-        return all_results[:top_k]
+        各 collection 使用同一个嵌入模型，余弦相似度本身就在同一尺度上，
+        因此直接按原始相似度排序：某个 collection 的命中整体较弱时，
+        不会被抬升到另一个 collection 的强命中之前。
+        """
+        merged = []
+        for source, results in grouped:
+            for r in results:
+                r["source"] = source
+                merged.append(r)
+
+        merged.sort(key=lambda x: x.get("similarity", 0), reverse=True)
+        return merged[:top_k]
 
     def delete_message(self, message_id: int | str) -> bool:
         """
@@ -367,7 +1035,8 @@ class VectorStore:
             return False
 
         try:
-            self.messages_collection.delete(ids=[str(message_id)])
+            for _, collection in self._message_collections():
+                collection.delete(ids=[str(message_id)])
             logger.info(f"成功删除消息向量: message_id={message_id}")
             return True
 
@@ -394,7 +1063,13 @@ class VectorStore:
             return False
 
         try:
-            self.messages_collection.upsert(
+            metadata = with_created_ts(metadata)
+            target = self._message_collection_for(metadata)
+            # 编辑时间可能落在其他分区，先移除旧分区中的副本
+            for _, collection in self._message_collections():
+                if collection is not target:
+                    collection.delete(ids=[str(message_id)])
+            target.upsert(
                 ids=[str(message_id)],
                 embeddings=[embedding],
                 documents=[text],
@@ -407,11 +1082,17 @@ class VectorStore:
             logger.error(f"更新消息向量失败: {type(e).__name__}: {e}")
             return False
 
+    async def aupdate_message(
+        self, message_id: int | str, text: str, metadata: dict[str, Any], embedding: list[float]
+    ) -> bool:
+        """更新消息向量（异步版本，ChromaDB 写入在线程池中执行）"""
+        return await asyncio.to_thread(self.update_message, message_id, text, metadata, embedding)
+
     # ── 内部通用搜索方法 ──────────────────────────────────────────────────
 
     def _search_collection(
         self,
-        collection,
+        query_fn: Callable[..., list[dict[str, Any]]],
         query: str,
         top_k: int = 20,
         filter_metadata: dict | None = None,
@@ -422,7 +1103,7 @@ class VectorStore:
         通用 collection 搜索方法
 
         Args:
-            collection: ChromaDB collection 实例
+            query_fn: 使用查询向量检索的函数（_query_summaries 或绑定 collection 的 _query_collection）
             query: 查询文本
             top_k: 返回结果数量
             filter_metadata: 元数据过滤条件
@@ -439,22 +1120,90 @@ class VectorStore:
         if not emb_gen.is_available():
             return []
 
-        query_embedding = emb_gen.generate(query)
+        query_embedding = emb_gen.generate(query, use_cache=True)
+        if query_embedding is None:
+            return []
+
+        return query_fn(
+            query_embedding=query_embedding,
+            top_k=top_k,
+            filter_metadata=filter_metadata,
+            date_after=date_after,
+            date_before=date_before,
+        )
+
+    async def _asearch_collection(
+        self,
+        query_fn: Callable[..., list[dict[str, Any]]],
+        query: str,
+        top_k: int = 20,
+        filter_metadata: dict | None = None,
+        date_after: str | None = None,
+        date_before: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        通用 collection 搜索方法（异步版本）
+
+        查询向量通过异步 Embedding 客户端生成，ChromaDB 查询在线程池中执行。
+        """
+        from core.ai.embedding_generator import get_async_embedding_generator
+
+        emb_gen = get_async_embedding_generator()
+
+        if not emb_gen.is_available():
+            return []
+
+        tracer = get_latency_tracer()
+        with tracer.span("embedding"):
+            query_embedding = await emb_gen.agenerate(query, use_cache=True)
         if query_embedding is None:
             return []
 
+        with tracer.span("vector_query", collections=1):
+            return await asyncio.to_thread(
+                query_fn,
+                query_embedding=query_embedding,
+                top_k=top_k,
+                filter_metadata=filter_metadata,
+                date_after=date_after,
+                date_before=date_before,
+            )
+
+    def _query_collection(
+        self,
+        collection,
+        query_embedding: list[float],
+        top_k: int = 20,
+        filter_metadata: dict | None = None,
+        date_after: str | None = None,
+        date_before: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        使用已生成的查询向量检索 collection（同步，可在线程池中执行）
+
+        Args:
+            collection: ChromaDB collection 实例
+            query_embedding: 查询向量
+            top_k: 返回结果数量
+            filter_metadata: 元数据过滤条件
+            date_after: 时间下限
+            date_before: 时间上限
+
+        Returns:
+            匹配结果列表
+        """
         # 构建 where 过滤条件
         where_conditions = []
         if filter_metadata:
             for k, v in filter_metadata.items():
                 where_conditions.append({k: {"$eq": v}})
 
-        need_date_filter = date_after or date_before
-        fetch_k = top_k * 3 if need_date_filter else top_k
+        # 时间范围下推到 ChromaDB（基于 created_ts 整数时间戳），避免超量召回后再过滤
+        where_conditions.extend(self._build_date_conditions(date_after, date_before))
 
         query_params = {
             "query_embeddings": [query_embedding],
-            "n_results": fetch_k,
+            "n_results": top_k,
             "include": ["metadatas", "documents", "distances"],
         }
 
@@ -468,7 +1217,7 @@ class VectorStore:
             total_count = collection.count()
             if total_count == 0:
                 return []
-            if fetch_k > total_count:
+            if top_k > total_count:
                 query_params["n_results"] = total_count
         except Exception as e:
             logger.warning(f"获取collection文档数量失败: {type(e).__name__}: {e}")
@@ -499,31 +1248,32 @@ class VectorStore:
                     }
                 )
 
-        # 后置日期过滤
-        if need_date_filter:
-            from datetime import datetime
+        return formatted
 
-            def _parse_dt(s: str) -> datetime | None:
-                try:
-                    return datetime.fromisoformat(s)
-                except (ValueError, TypeError):
-                    return None
-
-            after_dt = _parse_dt(date_after) if date_after else None
-            before_dt = _parse_dt(date_before) if date_before else None
-
-            filtered = []
-            for s in formatted:
-                created_str = s["metadata"].get("created_at", "")
-                created_dt = _parse_dt(created_str)
-                if after_dt and (created_dt is None or created_dt < after_dt):
-                    continue
-                if before_dt and (created_dt is None or created_dt > before_dt):
-                    continue
-                filtered.append(s)
-            formatted = filtered[:top_k]
+    @staticmethod
+    def _build_date_conditions(
+        date_after: str | None, date_before: str | None
+    ) -> list[dict[str, Any]]:
+        """
+        将时间范围转换为 created_ts 的 $gte/$lte 过滤条件
 
-        return formatted
+        Args:
+            date_after: 时间下限，ISO格式字符串
+            date_before: 时间上限，ISO格式字符串
+
+        Returns:
+            where 条件列表，无法解析的边界会被忽略
+        """
+        conditions = []
+        for value, operator in ((date_after, "$gte"), (date_before, "$lte")):
+            if not value:
+                continue
+            ts = to_unix_timestamp(value)
+            if ts is None:
+                logger.warning(f"无法解析时间过滤条件，已忽略: {value}")
+                continue
+            conditions.append({CREATED_TS_FIELD: {operator: ts}})
+        return conditions
 
     def get_stats(self) -> dict[str, Any]:
         """
@@ -532,13 +1282,16 @@ class VectorStore:
         Returns:
             统计信息字典，包含 summaries 和 messages 两个 collection 的统计
         """
-        stats = {"available": False, "summaries": {}, "messages": {}}
+        stats = {"available": False, "backend": self.backend, "summaries": {}, "messages": {}}
 
         # Summaries collection 统计
         if self.collection:
             try:
                 count = self.collection.count()
                 stats["summaries"] = {"available": True, "total_vectors": count}
+                # NumPy 后端返回量化精度与检索矩阵内存占用
+                if isinstance(self.collection, NumpyCollection):
+                    stats["summaries"]["storage"] = self.collection.get_storage_info()
                 stats["available"] = True
             except Exception as e:
                 logger.error(f"获取summaries统计失败: {type(e).__name__}: {e}")
@@ -549,11 +1302,47 @@ class VectorStore:
             try:
                 count = self.messages_collection.count()
                 stats["messages"] = {"available": True, "total_vectors": count}
+                # NumPy 后端返回量化精度与检索矩阵内存占用
+                if isinstance(self.messages_collection, NumpyCollection):
+                    stats["messages"]["storage"] = self.messages_collection.get_storage_info()
+                # 时间分区：total_vectors 包含所有分区，unpartitioned_vectors 为 messages 中的历史数据
+                if self.message_partitions:
+                    partitions = self.message_partitions.list_info()
+                    stats["messages"].update(
+                        {
+                            "total_vectors": count
+                            + sum(p["total_vectors"] or 0 for p in partitions),
+                            "unpartitioned_vectors": count,
+                            "partition_months": self.message_partitions.months,
+                            "retention_months": self.message_partitions.retention_months,
+                            "retention_action": self.message_partitions.retention_action,
+                            "partitions": partitions,
+                        }
+                    )
                 stats["available"] = True
             except Exception as e:
                 logger.error(f"获取messages统计失败: {type(e).__name__}: {e}")
                 stats["messages"] = {"available": True, "error": str(e)}
 
+        # 总结段落向量数
+        if self.passages_collection:
+            try:
+                stats["passages"] = {
+                    "available": True,
+                    "total_vectors": self.passages_collection.count(),
+                }
+            except Exception as e:
+                logger.error(f"获取passages统计失败: {type(e).__name__}: {e}")
+                stats["passages"] = {"available": True, "error": str(e)}
+
+        # 查询向量缓存命中率（用于调优缓存容量与 TTL）
+        stats["query_embedding_cache"] = get_query_embedding_cache().get_stats()
+
+        # 持久化Embedding存储（未启用时不返回）
+        store = get_embedding_store()
+        if store:
+            stats["embedding_store"] = store.get_stats()
+
         # 兼容旧接口
         if self.collection and "total_vectors" not in stats["summaries"]:
             stats["total_vectors"] = 0
@@ -181,7 +181,7 @@ async def generate_channel_summary(
                 # 生成并保存向量
                 vector_store = get_vector_store()
                 if vector_store.is_available():
-                    success = vector_store.add_summary(
+                    success = await vector_store.aadd_summary(
                         summary_id=summary_id,
                         text=report_text,
                         metadata={
@@ -450,7 +450,7 @@ async def handle_manual_summary(event):
                         # 生成并保存向量
                         vector_store = get_vector_store()
                         if vector_store.is_available():
-                            success = vector_store.add_summary(
+                            success = await vector_store.aadd_summary(
                                 summary_id=summary_id,
                                 text=report_text,
                                 metadata={
@@ -11,7 +11,8 @@
 """
 实时 RAG 处理器 - 异步队列批量处理频道消息并写入向量库
 
-监听频道新消息，通过 asyncio.Queue 异步批量生成 embedding 后写入 ChromaDB messages collection。
+监听频道新消息，通过 asyncio.Queue 异步批量生成 embedding 后写入消息向量库
+（启用时间分区时由 VectorStore 按消息时间路由到 messages_YYYYMM 分区）。
 """
 
 import asyncio
@@ -193,6 +194,7 @@ class RealtimeRAGHandler:
             是否成功删除
         """
         try:
+            from core.ai.answer_cache import invalidate_channel_answers
             from core.ai.vector_store import get_vector_store
 
             vector_store = get_vector_store()
@@ -200,7 +202,10 @@ class RealtimeRAGHandler:
                 return False
 
             vector_id = f"{channel_id}:{message_id}"
-            return vector_store.delete_message(vector_id)
+            deleted = vector_store.delete_message(vector_id)
+            if deleted:
+                await invalidate_channel_answers(channel_id)
+            return deleted
 
         except Exception as e:
             logger.error(f"删除消息向量失败: {type(e).__name__}: {e}")
@@ -270,11 +275,12 @@ class RealtimeRAGHandler:
             batch: 消息列表，每条包含 vector_id, text, metadata 等
         """
         try:
-            from core.ai.embedding_generator import get_embedding_generator
+            from core.ai.answer_cache import invalidate_channel_answers
+            from core.ai.embedding_generator import get_async_embedding_generator
             from core.ai.vector_store import get_vector_store
 
             vector_store = get_vector_store()
-            emb_gen = get_embedding_generator()
+            emb_gen = get_async_embedding_generator()
 
             if not vector_store.is_messages_available():
                 logger.warning("消息向量存储不可用，跳过批次处理")
@@ -289,13 +295,8 @@ class RealtimeRAGHandler:
             # 提取文本列表
             texts = [item["text"] for item in batch]
 
-            # 批量生成 embedding
-            loop = asyncio.get_running_loop()
-
-            def _batch_embed():
-                return emb_gen.batch_generate(texts)
-
-            embeddings = await loop.run_in_executor(None, _batch_embed)
+            # 批量生成 embedding（异步连接池，不阻塞事件循环）
+            embeddings = await emb_gen.abatch_generate(texts)
 
             if embeddings is None or len(embeddings) != len(batch):
                 logger.error(
@@ -336,7 +337,7 @@ class RealtimeRAGHandler:
 
             # 批量新增
             if add_items:
-                success_count = vector_store.add_messages_batch(
+                success_count = await vector_store.aadd_messages_batch(
                     ids=[it["id"] for it in add_items],
                     texts=[it["text"] for it in add_items],
                     metadatas=[it["metadata"] for it in add_items],
@@ -347,7 +348,7 @@ class RealtimeRAGHandler:
 
             # 逐条更新
             for item in update_items:
-                success = vector_store.update_message(
+                success = await vector_store.aupdate_message(
                     message_id=item["id"],
                     text=item["text"],
                     metadata=item["metadata"],
@@ -358,6 +359,11 @@ class RealtimeRAGHandler:
                 else:
                     self._failed_count += 1
 
+            # 消息向量变更后使相关缓存回答失效
+            changed_channels = {it["metadata"]["channel_id"] for it in add_items + update_items}
+            if changed_channels:
+                await invalidate_channel_answers(*changed_channels)
+
             logger.info(
                 f"批次处理完成: 新增 {len(add_items)} 条, 更新 {len(update_items)} 条, "
                 f"队列剩余 {self._queue.qsize()} 条"
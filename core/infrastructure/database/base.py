@@ -156,6 +156,11 @@ class DatabaseManagerBase(ABC):
         """保存对话记录"""
         pass
 
+    @abstractmethod
+    def save_conversations_batch(self, records: list[dict[str, Any]]) -> int:
+        """批量保存对话记录"""
+        pass
+
     @abstractmethod
     def get_conversation_history(
         self, user_id: int, session_id: str, limit: int = 20
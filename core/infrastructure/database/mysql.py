@@ -17,6 +17,7 @@ MySQL数据库管理器模块
 import json
 import logging
 import os
+import time
 import warnings
 from datetime import UTC, datetime, timedelta
 from typing import Any
@@ -81,7 +82,9 @@ class MySQLManager(DatabaseManagerBase):
 
         self.pool = None
         self._db_type = "mysql"
-        self._db_version = 6
+        self._db_version = 7
+        # summaries 全文索引（ngram）是否可用，建表时检测；不可用时关键词检索回退到逐行匹配
+        self._fulltext_available = False
 
         logger.info(
             f"MySQL管理器初始化: {self.user}@{self.host}:{self.port}/{self.database} "
@@ -445,11 +448,14 @@ class MySQLManager(DatabaseManagerBase):
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """)
 
+                # 16. 总结全文索引（ngram 分词，支持中文）
+                await self._ensure_summary_fulltext_index(cursor)
+
                 # 插入或更新版本号
                 await cursor.execute("""
                     INSERT INTO db_version (version, upgraded_at)
-                    VALUES (6, NOW())
-                    ON DUPLICATE KEY UPDATE version = 6, upgraded_at = NOW()
+                    VALUES (7, NOW())
+                    ON DUPLICATE KEY UPDATE version = 7, upgraded_at = NOW()
                 """)
 
         finally:
@@ -461,6 +467,47 @@ class MySQLManager(DatabaseManagerBase):
                 # 如果原始值为空，恢复到空字符串
                 await cursor.execute("SET SESSION sql_mode = %s", ("",))
 
+    async def _ensure_summary_fulltext_index(self, cursor):
+        """
+        为 summaries 创建全文索引（幂等）
+
+        keywords/topics 为 JSON 列不能直接建立全文索引，先新增存储型生成列 search_tags
+        拼接其文本，再在 (summary_text, search_tags) 上创建 ngram 解析器的 FULLTEXT 索引。
+        已有大量数据时首次建索引耗时较长（仅执行一次）。MariaDB 等不支持 ngram 解析器时
+        记录警告，关键词检索回退到逐行匹配。
+
+        回滚：ALTER TABLE summaries DROP INDEX ft_summaries_search, DROP COLUMN search_tags
+        """
+        try:
+            await cursor.execute(
+                "ALTER TABLE summaries ADD COLUMN search_tags TEXT "
+                "GENERATED ALWAYS AS (CONCAT_WS(' ', CAST(keywords AS CHAR), "
+                "CAST(topics AS CHAR))) STORED"
+            )
+            logger.info("总结表新增 search_tags 生成列成功")
+        except Exception as alter_err:
+            if "Duplicate column name" in str(alter_err):
+                logger.debug("search_tags 列已存在，跳过")
+            else:
+                logger.warning(f"添加 search_tags 列时出错: {alter_err}")
+                return
+
+        start = time.monotonic()
+        try:
+            await cursor.execute(
+                "ALTER TABLE summaries ADD FULLTEXT INDEX ft_summaries_search "
+                "(summary_text, search_tags) WITH PARSER ngram"
+            )
+            logger.info(f"总结表全文索引创建成功，耗时 {time.monotonic() - start:.1f}s")
+        except Exception as alter_err:
+            if "Duplicate key name" in str(alter_err):
+                logger.debug("ft_summaries_search 索引已存在，跳过")
+            else:
+                logger.warning(f"创建总结全文索引失败，关键词检索将回退到逐行匹配: {alter_err}")
+                return
+
+        self._fulltext_available = True
+
     async def save_summary(
         self,
         channel_id: str,
@@ -510,12 +557,24 @@ class MySQLManager(DatabaseManagerBase):
                     await conn.commit()
                     summary_id = cursor.lastrowid
                     logger.info(f"成功保存总结记录到MySQL, ID: {summary_id}, 频道: {channel_name}")
-                    return summary_id
+
+            await self._invalidate_cached_answers(channel_id)
+            return summary_id
 
         except Exception as e:
             logger.error(f"保存总结记录失败: {type(e).__name__}: {e}", exc_info=True)
             return None
 
+    @staticmethod
+    async def _invalidate_cached_answers(channel_id: str) -> None:
+        """新总结保存后使该频道（及全部频道）的缓存回答失效"""
+        try:
+            from core.ai.answer_cache import invalidate_channel_answers
+
+            await invalidate_channel_answers(channel_id)
+        except Exception as e:
+            logger.warning(f"使答案缓存失效失败: {type(e).__name__}: {e}")
+
     async def get_summaries(
         self,
         channel_id: str | None = None,
@@ -616,11 +675,145 @@ class MySQLManager(DatabaseManagerBase):
             logger.error(f"统计总结记录失败: {type(e).__name__}: {e}", exc_info=True)
             return 0
 
+    async def get_summaries_after_id(
+        self, last_id: int = 0, limit: int = 100
+    ) -> list[dict[str, Any]]:
+        """按主键顺序分页读取总结（keyset 分页，用于向量重建）
+
+        Args:
+            last_id: 上一批最后一条记录的 ID，返回 id > last_id 的记录
+            limit: 每批数量
+
+        Returns:
+            按 id 升序排列的总结记录列表
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(
+                        """
+                        SELECT id, channel_id, channel_name, summary_text, message_count,
+                               created_at, summary_type, summary_message_ids, keywords, topics
+                        FROM summaries
+                        WHERE id > %s
+                        ORDER BY id ASC
+                        LIMIT %s
+                    """,
+                        (last_id, limit),
+                    )
+                    rows = await cursor.fetchall()
+                    return self._parse_summary_rows(rows)
+
+        except Exception as e:
+            logger.error(
+                f"分页读取总结记录失败 (last_id={last_id}): {type(e).__name__}: {e}", exc_info=True
+            )
+            raise
+
+    async def get_oldest_summary_time(self) -> datetime | None:
+        """获取现存最早一条总结的创建时间（用于同步清理进程内索引中已删除的旧总结）
+
+        Returns:
+            最早的 created_at，无总结或查询失败时返回 None
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT MIN(created_at) FROM summaries")
+                    row = await cursor.fetchone()
+                    return row[0] if row else None
+
+        except Exception as e:
+            logger.error(f"查询最早总结时间失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
+    @staticmethod
+    def _fulltext_boolean_query(terms: list[str]) -> str:
+        """将检索词转换为 BOOLEAN MODE 查询串：每个词作为短语，任一命中即可"""
+        phrases = []
+        for term in terms:
+            # 去除双引号与布尔运算符，避免破坏查询语法
+            cleaned = " ".join(term.replace('"', " ").strip("+-<>()~*@ ").split())
+            if cleaned and f'"{cleaned}"' not in phrases:
+                phrases.append(f'"{cleaned}"')
+        return " ".join(phrases)
+
+    async def search_summaries_fulltext(
+        self,
+        terms: list[str],
+        channel_id: str | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+        limit: int = 10,
+    ) -> list[dict[str, Any]] | None:
+        """
+        基于全文索引按相关度检索总结（覆盖整个时间范围）
+
+        Args:
+            terms: 检索词（关键词/主题），任一命中即可，命中越多相关度越高
+            channel_id: 频道URL
+            start_date: 开始时间
+            end_date: 结束时间
+            limit: 返回数量限制
+
+        Returns:
+            按相关度降序的总结列表（含 relevance 字段）；全文索引不可用或查询失败时返回 None
+        """
+        if not self._fulltext_available:
+            return None
+
+        against = self._fulltext_boolean_query(terms)
+        if not against:
+            return []
+
+        conditions = ["MATCH(summary_text, search_tags) AGAINST (%s IN BOOLEAN MODE)"]
+        params: list[Any] = [against, against]
+
+        if channel_id:
+            conditions.append("channel_id = %s")
+            params.append(channel_id)
+
+        if start_date:
+            conditions.append("created_at >= %s")
+            params.append(start_date.replace(tzinfo=None) if start_date.tzinfo else start_date)
+
+        if end_date:
+            conditions.append("created_at <= %s")
+            params.append(end_date.replace(tzinfo=None) if end_date.tzinfo else end_date)
+
+        params.append(limit)
+
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(
+                        f"""
+                        SELECT *,
+                               MATCH(summary_text, search_tags)
+                                   AGAINST (%s IN BOOLEAN MODE) AS relevance
+                        FROM summaries
+                        WHERE {" AND ".join(conditions)}
+                        ORDER BY relevance DESC, created_at DESC
+                        LIMIT %s
+                    """,
+                        params,
+                    )
+                    rows = await cursor.fetchall()
+                    for row in rows:
+                        row["relevance"] = float(row.get("relevance") or 0.0)
+                    return self._parse_summary_rows(rows)
+
+        except Exception as e:
+            logger.error(f"全文检索总结失败: {type(e).__name__}: {e}", exc_info=True)
+            return None
+
     @staticmethod
     def _parse_summary_rows(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
         """解析总结记录中的 JSON 字段"""
         summaries = []
         for row in rows:
+            # search_tags 为全文索引用的生成列，不对外暴露
+            row.pop("search_tags", None)
             if row.get("summary_message_ids"):
                 try:
                     row["summary_message_ids"] = json.loads(row["summary_message_ids"])
@@ -642,6 +835,7 @@ class MySQLManager(DatabaseManagerBase):
                     row = await cursor.fetchone()
 
                     if row:
+                        row.pop("search_tags", None)
                         if row.get("summary_message_ids"):
                             try:
                                 row["summary_message_ids"] = json.loads(row["summary_message_ids"])
@@ -677,7 +871,8 @@ class MySQLManager(DatabaseManagerBase):
                     await conn.commit()
 
                     logger.info(f"已删除 {deleted_count} 条旧总结记录 (超过 {days} 天)")
-                    return deleted_count
+
+            return deleted_count
 
         except Exception as e:
             logger.error(f"删除旧总结记录失败: {type(e).__name__}: {e}", exc_info=True)
@@ -1264,20 +1459,67 @@ class MySQLManager(DatabaseManagerBase):
             logger.error(f"保存对话记录失败: {type(e).__name__}: {e}", exc_info=True)
             return False
 
+    async def save_conversations_batch(self, records: list[dict[str, Any]]) -> int:
+        """批量保存对话记录（单个事务）
+
+        Args:
+            records: 记录列表，每条包含 user_id、session_id、role、content，
+                可选 metadata 与 timestamp（UTC datetime，缺省为写入时间）
+
+        Returns:
+            写入的记录数，失败返回 0
+        """
+        if not records:
+            return 0
+        try:
+            rows = [
+                (
+                    r["user_id"],
+                    r["session_id"],
+                    r["role"],
+                    r["content"],
+                    json.dumps(r["metadata"], ensure_ascii=False) if r.get("metadata") else None,
+                    (r.get("timestamp") or datetime.now(UTC)).replace(tzinfo=None),
+                )
+                for r in records
+            ]
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.executemany(
+                        """
+                        INSERT INTO conversation_history
+                        (user_id, session_id, role, content, metadata, timestamp)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """,
+                        rows,
+                    )
+                    await conn.commit()
+
+            logger.debug(f"批量保存对话记录: {len(rows)} 条")
+            return len(rows)
+
+        except Exception as e:
+            logger.error(f"批量保存对话记录失败: {type(e).__name__}: {e}", exc_info=True)
+            return 0
+
     async def get_conversation_history(
         self, user_id: int, session_id: str, limit: int = 20
     ) -> list[dict[str, Any]]:
-        """获取用户的对话历史"""
+        """获取用户的对话历史（最近 limit 条，按时间正序）"""
         try:
             async with self.pool.acquire() as conn:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
                     await cursor.execute(
                         """
                         SELECT role, content, timestamp, metadata
-                        FROM conversation_history
-                        WHERE user_id = %s AND session_id = %s
-                        ORDER BY timestamp ASC
-                        LIMIT %s
+                        FROM (
+                            SELECT id, role, content, timestamp, metadata
+                            FROM conversation_history
+                            WHERE user_id = %s AND session_id = %s
+                            ORDER BY timestamp DESC, id DESC
+                            LIMIT %s
+                        ) AS recent
+                        ORDER BY timestamp ASC, id ASC
                     """,
                         (user_id, session_id, limit),
                     )
@@ -39,7 +39,7 @@ from .constants import (
 )
 
 # Date utilities
-from .date_utils import extract_date_range_from_summary
+from .date_utils import extract_date_range_from_summary, to_unix_timestamp
 
 # Exceptions
 from .exceptions import (
@@ -60,6 +60,15 @@ from .message_utils import format_schedule_info, split_long_message
 # States
 from .states import UserContext, get_user_context
 
+# Text chunking
+from .text_chunking import join_passages, split_passages
+
+# Text tokenization
+from .text_tokenize import normalize_query, tokenize_terms
+
+# Token estimation
+from .token_estimate import estimate_tokens, truncate_to_tokens
+
 # Version utilities
 from .version_utils import compare_versions, get_local_version
 
@@ -98,6 +107,7 @@ __all__ = [
     "BOT_STATE_SHUTTING_DOWN",
     # Date utilities
     "extract_date_range_from_summary",
+    "to_unix_timestamp",
     # Exceptions
     "AIServiceError",
     "BotError",
@@ -114,6 +124,15 @@ __all__ = [
     # States
     "UserContext",
     "get_user_context",
+    # Text chunking
+    "join_passages",
+    "split_passages",
+    # Text tokenization
+    "normalize_query",
+    "tokenize_terms",
+    # Token estimation
+    "estimate_tokens",
+    "truncate_to_tokens",
     # Version utilities
     "compare_versions",
     "get_local_version",
@@ -63,3 +63,30 @@ def extract_date_range_from_summary(summary_text):
     except Exception as e:
         logger.warning(f"提取日期范围时出错: {e}")
         return None, None
+
+
+def to_unix_timestamp(value: str | datetime | None) -> int | None:
+    """
+    将 ISO 格式字符串或 datetime 转换为 Unix 时间戳（秒）
+
+    不带时区信息的时间按 UTC 处理，与项目统一写入 UTC 时间的约定保持一致。
+
+    Args:
+        value: ISO 格式字符串或 datetime 对象
+
+    Returns:
+        整数时间戳，无法解析时返回 None
+    """
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, str) and value:
+        try:
+            dt = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    else:
+        return None
+
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return int(dt.timestamp())
@@ -0,0 +1,117 @@
+"""
+文本分段工具函数
+"""
+
+import re
+
+# 句末标点（含紧随其后的右引号/右括号）、后接空白的英文句点或换行视为句子边界
+_SENTENCE_END = re.compile(r"[。！？!?；;]+[”’\"'）)\]]*|\.(?=\s)|\n")
+
+# 小节起始行：Markdown 标题、整行加粗标题、中文序号、数字序号、分隔线
+_SECTION_START = re.compile(
+    r"^(?:#{1,6}\s|\*\*[^*\n]+\*\*\s*$|[一二三四五六七八九十]+[、.．]|\d{1,2}[.、．]\s|[-=*_]{3,}\s*$)"
+)
+
+
+def _sentence_units(text: str) -> list[tuple[int, int, bool]]:
+    """将文本切分为去除首尾空白的句子单元
+
+    Returns:
+        list: (start, end, section_start) 列表，section_start 表示该句开启一个新小节
+    """
+    units = []
+    start = 0
+    blank_line = True
+    boundaries = [m.end() for m in _SENTENCE_END.finditer(text)]
+    if not boundaries or boundaries[-1] != len(text):
+        boundaries.append(len(text))
+
+    for end in boundaries:
+        raw = text[start:end]
+        stripped = raw.strip()
+        if not stripped:
+            # 空行作为小节分隔
+            if "\n" in raw:
+                blank_line = True
+            start = end
+            continue
+
+        unit_start = start + (len(raw) - len(raw.lstrip()))
+        unit_end = unit_start + len(stripped)
+        at_line_start = unit_start == 0 or text[unit_start - 1] == "\n" or blank_line
+        section_start = at_line_start and (blank_line or bool(_SECTION_START.match(stripped)))
+        units.append((unit_start, unit_end, section_start))
+        blank_line = False
+        start = end
+
+    return units
+
+
+def split_passages(text: str, max_chars: int = 500, min_chars: int = 80) -> list[dict]:
+    """按小节与句子边界将长文本切分为段落
+
+    先按标题/空行识别小节，小节内按句子打包，单段不超过 max_chars；
+    当前段已达到 min_chars 时遇到新小节会另起一段，避免不同话题混在同一段中。
+    超长的单句按 max_chars 强制切分。
+
+    Args:
+        text: 要切分的文本
+        max_chars: 每段最大字符数
+        min_chars: 遇到新小节时另起一段所需的最小字符数
+
+    Returns:
+        list: 段落列表，每项包含 text、start、end（在原文中的字符偏移，左闭右开）
+    """
+    if not text or not text.strip():
+        return []
+
+    units = []
+    for start, end, section_start in _sentence_units(text):
+        if end - start <= max_chars:
+            units.append((start, end, section_start))
+            continue
+        for offset in range(start, end, max_chars):
+            units.append((offset, min(offset + max_chars, end), section_start and offset == start))
+
+    spans = []
+    current_start = current_end = None
+    for start, end, section_start in units:
+        if current_start is not None and (
+            end - current_start > max_chars
+            or (section_start and current_end - current_start >= min_chars)
+        ):
+            spans.append((current_start, current_end))
+            current_start = None
+        if current_start is None:
+            current_start = start
+        current_end = end
+    if current_start is not None:
+        spans.append((current_start, current_end))
+
+    return [{"text": text[start:end], "start": start, "end": end} for start, end in spans]
+
+
+def join_passages(passages: list[dict], max_chars: int, separator: str = "\n…\n") -> str:
+    """按原文顺序拼接命中段落，总长度不超过 max_chars
+
+    Args:
+        passages: 段落列表（含 text、start），通常按相似度降序
+        max_chars: 拼接结果最大字符数
+        separator: 不相邻段落之间的分隔符
+
+    Returns:
+        str: 拼接后的文本；相似度靠后的段落在超出长度时被舍弃
+    """
+    selected = []
+    total = 0
+    for passage in passages:
+        text = passage.get("text") or ""
+        cost = len(text) + (len(separator) if selected else 0)
+        if selected and total + cost > max_chars:
+            break
+        selected.append(passage)
+        total += cost
+
+    selected.sort(key=lambda p: p.get("start") or 0)
+    joined = separator.join(p.get("text") or "" for p in selected)
+    return joined[:max_chars] + "..." if len(joined) > max_chars else joined
@@ -0,0 +1,56 @@
+"""
+词法切分工具函数（供本地 BM25 等词法检索使用）
+"""
+
+import re
+import unicodedata
+
+# 与 IntentParser._extract_keywords 相同的英文词与中文词段规则
+_LATIN_WORD = re.compile(r"[A-Za-z][A-Za-z0-9\-_.]{1,}")
+_CJK_RUN = re.compile(r"[\u4e00-\u9fff]+")
+
+# 查询规范化时去除的结尾标点（已经过 NFKC，全角标点已转为半角）
+_TRAILING_PUNCTUATION = " ?!.。~,，、;；:：…"
+
+
+def tokenize_terms(text: str) -> list[str]:
+    """将文本切分为词法检索用的词项
+
+    英文词（长度>=2）统一小写并去除结尾的 "."；连续中文按字二元组（bigram）切分，
+    单字中文保留为单字词项。中文无需分词词典，查询词与文档按相同规则切分即可对齐。
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        list: 词项列表（保留重复，用于统计词频）
+    """
+    if not text:
+        return []
+
+    terms = []
+    for word in _LATIN_WORD.findall(text):
+        word = word.lower().rstrip(".")
+        if len(word) >= 2:
+            terms.append(word)
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def normalize_query(text: str) -> str:
+    """规范化查询文本，用于判断两个查询是否相同
+
+    全角字符转半角、英文小写化、合并空白，并去除首尾空白与结尾的标点。
+
+    Args:
+        text: 查询文本
+
+    Returns:
+        str: 规范化后的查询
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return " ".join(text.split()).rstrip(_TRAILING_PUNCTUATION)
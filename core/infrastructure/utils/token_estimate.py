@@ -0,0 +1,72 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""
+Token 数估算工具函数（用于上下文预算分配，无需加载具体模型的分词器）
+"""
+
+# 校准值：cl100k / Qwen / DeepSeek 等 BPE 分词器上，中日韩字符约 0.6~1 token/字，
+# 其他字符（英文、数字、标点、空白）约 4 字符/token；中文按 1 token/字偏保守估计
+CJK_TOKENS_PER_CHAR = 1.0
+OTHER_CHARS_PER_TOKEN = 4.0
+
+
+def _is_wide(char: str) -> bool:
+    """中日韩文字、全角标点与假名按单字计 token"""
+    code = ord(char)
+    return (
+        0x4E00 <= code <= 0x9FFF
+        or 0x3000 <= code <= 0x30FF
+        or 0xFF00 <= code <= 0xFFEF
+        or 0xAC00 <= code <= 0xD7AF
+    )
+
+
+def _char_cost(char: str) -> float:
+    return CJK_TOKENS_PER_CHAR if _is_wide(char) else 1.0 / OTHER_CHARS_PER_TOKEN
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        int: 估算的 token 数（向上取整）
+    """
+    if not text:
+        return 0
+    wide = sum(1 for char in text if _is_wide(char))
+    cost = wide * CJK_TOKENS_PER_CHAR + (len(text) - wide) / OTHER_CHARS_PER_TOKEN
+    return int(cost) + (cost > int(cost))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, suffix: str = "...") -> str:
+    """将文本截断到估算 token 数不超过 max_tokens（含后缀）
+
+    Args:
+        text: 输入文本
+        max_tokens: 最大 token 数
+        suffix: 截断时追加的后缀
+
+    Returns:
+        str: 截断后的文本；未超出时原样返回
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    budget = max_tokens - estimate_tokens(suffix)
+    cost = 0.0
+    for index, char in enumerate(text):
+        cost += _char_cost(char)
+        if cost > budget:
+            return text[:index] + suffix
+    return text
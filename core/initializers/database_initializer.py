@@ -14,6 +14,7 @@
 负责 MySQL 数据库连接初始化和迁移执行。
 """
 
+import asyncio
 import logging
 
 from core.infrastructure.database.manager import get_db_manager
@@ -26,6 +27,7 @@ class DatabaseInitializer:
 
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self._background_tasks: set[asyncio.Task] = set()
 
     async def initialize(self) -> None:
         """初始化 MySQL 数据库连接并执行迁移"""
@@ -72,3 +74,18 @@ class DatabaseInitializer:
             await ensure_reviewed_at_datetime_fixed(db_manager)
         except Exception as e:
             self.logger.warning(f"datetime 格式修复执行失败（可忽略）: {type(e).__name__}: {e}")
+
+        # 为旧版本写入的向量回填 created_ts（时间过滤已下推到向量库，缺少该字段的文档不会命中）
+        # 需要遍历整个向量库，放到后台执行，不阻塞启动
+        try:
+            from core.migrations.backfill_vector_created_ts import (
+                ensure_vector_created_ts_backfilled,
+            )
+
+            task = asyncio.create_task(ensure_vector_created_ts_backfilled())
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+        except Exception as e:
+            self.logger.warning(
+                f"向量库 created_ts 回填启动失败（可忽略）: {type(e).__name__}: {e}"
+            )
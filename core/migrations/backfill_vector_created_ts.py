@@ -0,0 +1,172 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+
+"""
+向量库迁移脚本：为已有文档回填 created_ts 数值时间戳
+
+问题：时间范围过滤已下推到 ChromaDB（created_ts 的 $gte/$lte 条件），
+      但旧版本写入的文档只有 ISO 格式的 created_at，不会被带时间过滤的检索命中。
+
+解决方案：
+1. 分页遍历 summaries / messages collection 的元数据
+2. 对缺少 created_ts 且 created_at 可解析的文档，写入整数时间戳
+3. 已存在 created_ts 的文档直接跳过（幂等，可重复执行）
+4. 应用启动时由 DatabaseInitializer 在后台自动执行，也可手动执行
+
+回滚方案：created_ts 为新增字段，旧版本代码不会读取，无需回滚；
+          如需清理，可对相应 ID 调用 collection.update 将 created_ts 置为 None。
+
+用法：
+    python -m core.migrations.backfill_vector_created_ts [--dry-run] [--batch-size 500]
+
+版本：v1.8.9
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from core.ai.vector_store import CREATED_TS_FIELD, get_vector_store, with_created_ts
+
+logger = logging.getLogger(__name__)
+
+# 每批读取/更新的文档数
+_BATCH_SIZE = 500
+
+# 分页循环最大迭代次数保护（500 * 20000 = 1000 万条文档）
+_MAX_BATCHES = 20000
+
+
+def _backfill_collection(collection, dry_run: bool, batch_size: int) -> dict:
+    """
+    回填单个 collection 的 created_ts 字段（同步，ChromaDB 调用）
+
+    Args:
+        collection: ChromaDB collection 实例
+        dry_run: 为 True 时只统计不写入
+        batch_size: 每批处理的文档数
+
+    Returns:
+        dict: 统计信息
+    """
+    stats = {"scanned": 0, "updated": 0, "skipped": 0, "unparseable": 0}
+    total = collection.count()
+    logger.info(f"[{collection.name}] 共 {total} 条文档，预计 {total // batch_size + 1} 批")
+
+    offset = 0
+    for _ in range(_MAX_BATCHES):
+        page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+
+        update_ids = []
+        update_metadatas = []
+        for doc_id, metadata in zip(ids, page.get("metadatas") or [], strict=False):
+            metadata = metadata or {}
+            if CREATED_TS_FIELD in metadata:
+                stats["skipped"] += 1
+                continue
+            patched = with_created_ts(metadata)
+            if CREATED_TS_FIELD not in patched:
+                stats["unparseable"] += 1
+                continue
+            update_ids.append(doc_id)
+            update_metadatas.append(patched)
+
+        if update_ids and not dry_run:
+            collection.update(ids=update_ids, metadatas=update_metadatas)
+        stats["updated"] += len(update_ids)
+        stats["scanned"] += len(ids)
+        offset += len(ids)
+
+        if len(ids) < batch_size:
+            break
+    else:
+        logger.warning(f"[{collection.name}] 达到最大批次数 {_MAX_BATCHES}，提前结束")
+
+    return stats
+
+
+async def backfill_vector_created_ts(
+    vector_store, dry_run: bool = False, batch_size: int = _BATCH_SIZE
+) -> dict:
+    """
+    为向量库中缺少 created_ts 的文档回填数值时间戳
+
+    Args:
+        vector_store: 向量存储实例（VectorStore）
+        dry_run: 为 True 时只统计需要更新的文档数，不写入
+        batch_size: 每批处理的文档数
+
+    Returns:
+        dict: 迁移结果
+    """
+    result = {"success": False, "message": "", "details": {}}
+
+    if not vector_store or not vector_store.is_available():
+        result["message"] = "向量存储不可用"
+        return result
+
+    start = time.monotonic()
+    try:
+        for name, collection in (
+            ("summaries", vector_store.collection),
+            ("messages", vector_store.messages_collection),
+        ):
+            if collection is None:
+                continue
+            # ChromaDB 为同步 API，放到线程池执行避免阻塞事件循环
+            stats = await asyncio.to_thread(_backfill_collection, collection, dry_run, batch_size)
+            result["details"][name] = stats
+            logger.info(f"[{name}] 回填完成{'（dry-run）' if dry_run else ''}: {stats}")
+
+        elapsed = time.monotonic() - start
+        updated = sum(s["updated"] for s in result["details"].values())
+        result["success"] = True
+        result["message"] = (
+            f"{'预计' if dry_run else '已'}回填 {updated} 条文档的 created_ts，耗时 {elapsed:.1f}s"
+        )
+        logger.info(result["message"])
+
+    except Exception as e:
+        logger.error(f"回填 created_ts 失败: {type(e).__name__}: {e}", exc_info=True)
+        result["message"] = f"回填失败: {str(e)}"
+
+    return result
+
+
+async def ensure_vector_created_ts_backfilled() -> None:
+    """
+    确保向量库已有文档均带有 created_ts
+
+    在应用启动时调用，已回填的文档直接跳过，失败只记录日志
+    """
+    try:
+        result = await backfill_vector_created_ts(get_vector_store())
+        if result["success"]:
+            logger.info(f"✅ 向量库 created_ts 回填完成: {result['message']}")
+        else:
+            logger.warning(f"向量库 created_ts 回填未执行: {result['message']}")
+    except Exception as e:
+        logger.error(f"❌ 向量库 created_ts 回填异常: {type(e).__name__}: {e}")
+
+
+# 命令行执行支持
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="为向量库已有文档回填 created_ts 数值时间戳")
+    parser.add_argument("--dry-run", action="store_true", help="只统计需要更新的文档，不写入")
+    parser.add_argument("--batch-size", type=int, default=_BATCH_SIZE, help="每批处理的文档数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    async def main():
+        result = await backfill_vector_created_ts(
+            get_vector_store(), dry_run=args.dry_run, batch_size=args.batch_size
+        )
+        print(f"迁移结果: {result}")
+
+    asyncio.run(main())
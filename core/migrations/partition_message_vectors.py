@@ -0,0 +1,176 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+
+"""
+向量库迁移脚本：将 messages collection 中的历史消息迁移到按月分区的 collection
+
+问题：启用 VECTOR_MESSAGES_PARTITION_MONTHS 后新消息写入 messages_YYYYMM 分区，
+      但 messages 中的历史数据仍在单一 collection 中，每次检索都要扫描且不受保留期约束。
+
+解决方案：
+1. 分批读取 messages 中的文档（含向量）
+2. 按 created_ts（缺失时解析 created_at）路由到对应分区并 upsert
+3. 写入成功后从 messages 中删除这些文档
+4. 无法解析时间的文档保留在 messages 中
+
+幂等性：分区写入为 upsert，已迁移的文档不再存在于 messages 中，可重复执行；
+        中途失败时已 upsert 但未删除的文档会在下次执行时被覆盖写入后删除。
+
+回滚方案：分区中的文档含完整向量与元数据，可用相同方式反向 upsert 回 messages；
+          回滚前需将 VECTOR_MESSAGES_PARTITION_MONTHS 设为 0，避免新消息继续写入分区。
+
+用法：
+    python -m core.migrations.partition_message_vectors [--dry-run] [--batch-size 500]
+
+版本：v1.8.9
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from core.ai.message_partitions import partition_name
+from core.ai.vector_store import CREATED_TS_FIELD, get_vector_store, with_created_ts
+
+logger = logging.getLogger(__name__)
+
+# 每批读取/迁移的文档数
+_BATCH_SIZE = 500
+
+# 分页循环最大迭代次数保护（500 * 20000 = 1000 万条文档）
+_MAX_BATCHES = 20000
+
+
+def _partition_collection(vector_store, dry_run: bool, batch_size: int) -> dict:
+    """
+    迁移 messages collection 中的文档到分区（同步，向量后端调用）
+
+    Args:
+        vector_store: 向量存储实例
+        dry_run: 为 True 时只统计不写入
+        batch_size: 每批处理的文档数
+
+    Returns:
+        dict: 统计信息
+    """
+    legacy = vector_store.messages_collection
+    partitions = vector_store.message_partitions
+    stats = {"scanned": 0, "moved": 0, "unparseable": 0, "partitions": Counter()}
+    logger.info(f"[messages] 共 {legacy.count()} 条文档待迁移")
+
+    # 迁移后文档会从 messages 中删除，偏移只需跳过无法迁移（保留）的文档
+    offset = 0
+    for _ in range(_MAX_BATCHES):
+        page = legacy.get(
+            include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset
+        )
+        ids = page.get("ids") or []
+        if not ids:
+            break
+
+        groups: dict[str, list[int]] = {}
+        metadatas = [with_created_ts(m or {}) for m in page.get("metadatas") or [{}] * len(ids)]
+        for i, metadata in enumerate(metadatas):
+            ts = metadata.get(CREATED_TS_FIELD)
+            if ts is None:
+                stats["unparseable"] += 1
+                offset += 1
+                continue
+            groups.setdefault(partition_name(ts, partitions.months), []).append(i)
+
+        moved_ids = []
+        for name, indexes in groups.items():
+            stats["partitions"][name] += len(indexes)
+            if dry_run:
+                continue
+            target = partitions.for_timestamp(metadatas[indexes[0]][CREATED_TS_FIELD])
+            target.upsert(
+                ids=[ids[i] for i in indexes],
+                embeddings=[page["embeddings"][i] for i in indexes],
+                documents=[(page.get("documents") or [None] * len(ids))[i] for i in indexes],
+                metadatas=[metadatas[i] for i in indexes],
+            )
+            moved_ids.extend(ids[i] for i in indexes)
+
+        if moved_ids:
+            legacy.delete(ids=moved_ids)
+        stats["moved"] += sum(len(indexes) for indexes in groups.values())
+        stats["scanned"] += len(ids)
+        if dry_run:
+            # dry-run 不删除文档，按页前进
+            offset = stats["scanned"]
+
+        if len(ids) < batch_size:
+            break
+    else:
+        logger.warning(f"[messages] 达到最大批次数 {_MAX_BATCHES}，提前结束")
+
+    stats["partitions"] = dict(stats["partitions"])
+    return stats
+
+
+async def partition_message_vectors(
+    vector_store, dry_run: bool = False, batch_size: int = _BATCH_SIZE
+) -> dict:
+    """
+    将 messages collection 中的历史消息迁移到时间分区
+
+    Args:
+        vector_store: 向量存储实例（VectorStore）
+        dry_run: 为 True 时只统计各分区将迁入的文档数，不写入
+        batch_size: 每批处理的文档数
+
+    Returns:
+        dict: 迁移结果
+    """
+    result = {"success": False, "message": "", "details": {}}
+
+    if not vector_store or not vector_store.is_messages_available():
+        result["message"] = "消息向量存储不可用"
+        return result
+
+    if not vector_store.message_partitions or not vector_store.message_partitions.enabled:
+        result["message"] = "未启用消息分区，请先设置 VECTOR_MESSAGES_PARTITION_MONTHS"
+        return result
+
+    start = time.monotonic()
+    try:
+        # 向量后端为同步 API，放到线程池执行避免阻塞事件循环
+        stats = await asyncio.to_thread(_partition_collection, vector_store, dry_run, batch_size)
+        result["details"] = stats
+
+        elapsed = time.monotonic() - start
+        result["success"] = True
+        result["message"] = (
+            f"{'预计' if dry_run else '已'}迁移 {stats['moved']} 条消息向量到 "
+            f"{len(stats['partitions'])} 个分区，{stats['unparseable']} 条无法解析时间保留在 messages，"
+            f"耗时 {elapsed:.1f}s"
+        )
+        logger.info(result["message"])
+
+    except Exception as e:
+        logger.error(f"迁移消息向量分区失败: {type(e).__name__}: {e}", exc_info=True)
+        result["message"] = f"迁移失败: {str(e)}"
+
+    return result
+
+
+# 命令行执行支持
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将 messages collection 的历史消息迁移到时间分区")
+    parser.add_argument("--dry-run", action="store_true", help="只统计各分区将迁入的文档数，不写入")
+    parser.add_argument("--batch-size", type=int, default=_BATCH_SIZE, help="每批处理的文档数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    async def main():
+        result = await partition_message_vectors(
+            get_vector_store(), dry_run=args.dry_run, batch_size=args.batch_size
+        )
+        print(f"迁移结果: {result}")
+
+    asyncio.run(main())
@@ -236,7 +236,7 @@ async def main_job(channel=None):
                             vector_store = get_vector_store()
 
                             if vector_store.is_available():
-                                success = vector_store.add_summary(
+                                success = await vector_store.aadd_summary(
                                     summary_id=summary_id,
                                     text=report_text,
                                     metadata={
@@ -853,7 +853,7 @@ async def send_report(
 
                         if vector_store.is_available():
                             # 保存向量
-                            success = vector_store.add_summary(
+                            success = await vector_store.aadd_summary(
                                 summary_id=summary_id,
                                 text=summary_text_for_source,
                                 metadata={
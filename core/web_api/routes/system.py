@@ -360,6 +360,20 @@ async def check_qa_bot_health_endpoint(request: Request):
     }
 
 
+@router.get("/qa-bot/latency")
+async def get_qa_bot_latency():
+    """获取问答流水线各阶段延迟分位数（p50/p95/p99）与最近的慢请求追踪树。
+
+    统计由问答 Bot 进程定期写入快照文件，这里读取最近一次快照。
+    """
+    from core.ai.qa_tracing import load_latency_snapshot
+
+    snapshot = await asyncio.to_thread(load_latency_snapshot)
+    if snapshot is None:
+        return {"success": False, "message": "暂无问答延迟数据（问答Bot未运行或尚未处理请求）"}
+    return {"success": True, "data": snapshot}
+
+
 @router.post("/config/reload")
 async def reload_config_endpoint(request: Request):
     """重新读取配置文件并刷新模块变量。"""
@@ -11,13 +11,16 @@
 """
 向量存储管理 API 路由
 
-提供向量存储（ChromaDB）的浏览、搜索、删除等管理功能。
+提供向量存储（ChromaDB）的浏览、搜索、删除、总结向量重建等管理功能。
 """
 
+import asyncio
 import logging
 
 from fastapi import APIRouter, HTTPException, Query
 
+from core.ai.message_partitions import parse_partition_name
+from core.ai.summary_reindexer import MAX_BATCH_SIZE, get_summary_reindexer
 from core.ai.vector_store import get_vector_store
 
 logger = logging.getLogger(__name__)
@@ -31,8 +34,8 @@ CLEAR_COLLECTION_BATCH_SIZE = 1000
 
 
 def _validate_collection(collection_name: str) -> None:
-    """校验向量集合名称。"""
-    if collection_name not in VALID_COLLECTIONS:
+    """校验向量集合名称（summaries、messages 或消息分区 messages_YYYYMM）。"""
+    if collection_name not in VALID_COLLECTIONS and not parse_partition_name(collection_name):
         raise HTTPException(status_code=400, detail=f"不支持的集合名称: {collection_name}")
 
 
@@ -40,7 +43,12 @@ def _get_collection(collection_name: str):
     """获取指定向量集合实例。"""
     _validate_collection(collection_name)
     vs = get_vector_store()
-    return vs.collection if collection_name == "summaries" else vs.messages_collection
+    if collection_name == "summaries":
+        return vs.collection
+    collection = vs.get_message_collection(collection_name)
+    if collection is None and collection_name != "messages":
+        raise HTTPException(status_code=404, detail=f"消息分区不存在: {collection_name}")
+    return collection
 
 
 def _delete_document_by_collection(collection_name: str, doc_id: str) -> bool:
@@ -77,7 +85,7 @@ async def get_vector_stats():
     """获取向量存储统计信息
 
     Returns:
-        向量存储统计数据，包含 summaries 和 messages 两个 collection 的信息
+        向量存储统计数据，包含 summaries 和 messages（含时间分区）的信息
     """
     try:
         vs = get_vector_store()
@@ -88,6 +96,47 @@ async def get_vector_stats():
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+@router.get("/partitions")
+async def list_message_partitions():
+    """列出消息向量时间分区
+
+    Returns:
+        分区列表（名称、时间范围、向量数、是否已过保留期）与分区配置
+    """
+    vs = get_vector_store()
+    partitions = await asyncio.to_thread(vs.list_message_partitions)
+    manager = vs.message_partitions
+    return {
+        "success": True,
+        "data": {
+            "partitions": partitions,
+            "partition_months": manager.months if manager else 0,
+            "retention_months": manager.retention_months if manager else 0,
+            "retention_action": manager.retention_action if manager else None,
+        },
+    }
+
+
+@router.post("/partitions/retention")
+async def apply_message_retention(
+    dry_run: bool = Query(False, description="只返回将被处理的分区，不执行删除/归档"),
+):
+    """对超过保留期的消息分区执行删除或归档
+
+    Returns:
+        处理结果（过期分区、处理方式、归档文件路径）
+    """
+    try:
+        result = await asyncio.to_thread(get_vector_store().apply_message_retention, dry_run)
+    except Exception as e:
+        logger.error(f"执行消息分区保留策略失败: {type(e).__name__}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    if not dry_run and result["expired"]:
+        logger.info(f"WebUI 已处理过期消息分区: {result['expired']} ({result['action']})")
+    return {"success": True, "data": result}
+
+
 @router.get("/collections/{collection_name}")
 async def list_collection_documents(
     collection_name: str,
@@ -97,7 +146,7 @@ async def list_collection_documents(
     """列出指定 collection 中的文档
 
     Args:
-        collection_name: 集合名称（summaries 或 messages）
+        collection_name: 集合名称（summaries、messages 或消息分区 messages_YYYYMM）
 
     Returns:
         文档列表和总数
@@ -169,7 +218,7 @@ async def get_document(collection_name: str, doc_id: str):
     """获取指定文档的详细信息
 
     Args:
-        collection_name: 集合名称（summaries 或 messages）
+        collection_name: 集合名称（summaries、messages 或消息分区 messages_YYYYMM）
         doc_id: 文档 ID
 
     Returns:
@@ -212,7 +261,7 @@ async def clear_collection(collection_name: str):
     """清空指定 collection 中的所有文档
 
     Args:
-        collection_name: 集合名称（summaries 或 messages）
+        collection_name: 集合名称（summaries、messages 或消息分区 messages_YYYYMM）
 
     Returns:
         清空结果
@@ -251,7 +300,7 @@ async def delete_document(collection_name: str, doc_id: str):
     """删除指定文档
 
     Args:
-        collection_name: 集合名称（summaries 或 messages）
+        collection_name: 集合名称（summaries、messages 或消息分区 messages_YYYYMM）
         doc_id: 文档 ID
 
     Returns:
@@ -281,7 +330,7 @@ async def delete_documents_batch(
     """批量删除文档
 
     Args:
-        collection_name: 集合名称（summaries 或 messages）
+        collection_name: 集合名称（summaries、messages 或消息分区 messages_YYYYMM）
         doc_ids: 要删除的文档 ID 列表
 
     Returns:
@@ -338,11 +387,11 @@ async def search_vectors(
         vs = get_vector_store()
 
         if collection == "summaries":
-            results = vs.search_similar(query=query, top_k=top_k)
+            results = await vs.asearch_similar(query=query, top_k=top_k)
         elif collection == "messages":
-            results = vs.search_messages(query=query, top_k=top_k)
+            results = await vs.asearch_messages(query=query, top_k=top_k)
         else:
-            results = vs.search_all(query=query, top_k=top_k)
+            results = await vs.asearch_all(query=query, top_k=top_k)
 
         return {
             "success": True,
@@ -358,3 +407,53 @@ async def search_vectors(
     except Exception as e:
         logger.error(f"搜索向量失败: {type(e).__name__}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.get("/reindex")
+async def get_reindex_progress():
+    """获取总结向量重建任务进度
+
+    Returns:
+        当前（或最近一次）重建任务的进度
+    """
+    return {"success": True, "data": get_summary_reindexer().get_progress()}
+
+
+@router.post("/reindex")
+async def start_reindex(
+    reset: bool = Query(False, description="忽略检查点，从头开始重建"),
+    batch_size: int | None = Query(None, ge=1, le=MAX_BATCH_SIZE, description="每批处理的总结数"),
+):
+    """在后台启动总结向量重建任务
+
+    从 MySQL summaries 表按 ID 顺序分批读取总结并写入向量存储，
+    默认从上次中断的检查点继续。
+
+    Returns:
+        启动结果与初始进度
+    """
+    reindexer = get_summary_reindexer()
+    if not reindexer.start(reset=reset, batch_size=batch_size):
+        raise HTTPException(status_code=409, detail="已有重建任务正在运行")
+
+    logger.info(f"WebUI 已启动总结向量重建: reset={reset}, batch_size={batch_size}")
+    return {
+        "success": True,
+        "message": "总结向量重建已在后台启动",
+        "data": reindexer.get_progress(),
+    }
+
+
+@router.post("/reindex/cancel")
+async def cancel_reindex():
+    """取消正在运行的总结向量重建任务（检查点保留，可稍后继续）
+
+    Returns:
+        取消结果
+    """
+    reindexer = get_summary_reindexer()
+    if not await reindexer.cancel():
+        return {"success": False, "message": "当前没有运行中的重建任务"}
+
+    logger.info("WebUI 已取消总结向量重建")
+    return {"success": True, "message": "已取消重建任务", "data": reindexer.get_progress()}
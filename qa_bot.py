@@ -14,6 +14,7 @@ Sakura 问答Bot - 独立的智能问答助手
 基于历史总结回答自然语言查询
 """
 
+import asyncio
 import logging
 import os
 import sys
@@ -34,6 +35,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from core.ai.conversation_manager import get_conversation_manager
 from core.ai.qa_engine_v3 import get_qa_engine_v3
 from core.ai.quota_manager import get_quota_manager
+from core.ai.summary_index import get_summary_index
 from core.config import get_qa_bot_persona
 from core.i18n.i18n import get_text
 from core.infrastructure.exceptions import DatabaseError
@@ -112,6 +114,8 @@ class QABot:
         self.conversation_mgr = get_conversation_manager()
         self.user_system = get_qa_user_system()
         self.application = None
+        # 每个用户正在进行的流式回答任务（用户发送新问题时取消旧任务）
+        self._active_streams: dict[int, asyncio.Task] = {}
 
         logger.info("问答Bot初始化完成（v3.0.0向量搜索版本 + 多轮对话支持 + 用户系统）")
 
@@ -133,6 +137,11 @@ class QABot:
         elif hasattr(db, "init_database"):
             await db.init_database()
 
+        # 问答进程是总结检索方，由本进程持有并定期刷新总结倒排索引
+        index = get_summary_index()
+        if index is not None and hasattr(db, "get_summaries_after_id"):
+            index.start(db)
+
     async def _init_mysql_pool(self, db) -> None:
         """初始化MySQL连接池
 
@@ -674,6 +683,9 @@ class QABot:
           每积累 STREAM_EDIT_THRESHOLD 字符或超过 STREAM_EDIT_INTERVAL 秒则编辑一次。
         - 完成阶段：用完整文本做最终编辑，并尝试启用 Markdown 格式。
         - 如果单条消息超过 4096 字符，则继续追加新消息。
+        - 用户放弃请求（发送了新问题或删除了占位消息）时停止生成，
+          并关闭 QA 引擎的流式生成器以中断 LLM 请求（对话历史记为"已取消"）；
+          被新问题取消时在清理后重新抛出 CancelledError。
         """
         # ── 可调参数 ─────────────────────────────────────────────────────────
         # 每积累多少字符触发一次编辑
@@ -690,9 +702,18 @@ class QABot:
         is_new_session = False
         current_msg = placeholder  # 当前正在编辑的消息对象
         extra_msgs = []  # 超长时追加的额外消息
+        abandoned = False  # 占位消息已被用户删除
+
+        # 同一用户的新问题会取代仍在生成中的旧回答
+        previous = self._active_streams.get(user_id)
+        if previous is not None and not previous.done():
+            previous.cancel()
+        current_task = asyncio.current_task()
+        self._active_streams[user_id] = current_task
 
         async def _safe_edit(msg, text: str, use_markdown: bool = False):
             """安全地编辑消息，失败时静默处理。"""
+            nonlocal abandoned
             if not text.strip():
                 return
             try:
@@ -705,6 +726,9 @@ class QABot:
                 # 内容与当前内容相同时忽略
                 if "Message is not modified" in err:
                     return
+                if "message to edit not found" in err.lower():
+                    abandoned = True
+                    return
                 if use_markdown:
                     # Markdown 失败，尝试修复
                     try:
@@ -759,8 +783,9 @@ class QABot:
             last_edit_len = len(accumulated)
             last_edit_time = time.monotonic()
 
+        stream = self.qa_engine.process_query_stream(query, user_id, channel_hint)
         try:
-            async for chunk in self.qa_engine.process_query_stream(query, user_id, channel_hint):
+            async for chunk in stream:
                 # ── 处理特殊控制标记 ─────────────────────────────────────────
                 if chunk == "__DONE__":
                     break
@@ -769,6 +794,18 @@ class QABot:
                     is_new_session = True
                     continue
 
+                if chunk.startswith("__QUEUED__:"):
+                    # 等待 LLM 准入：占位消息显示排队位置，准入后恢复检索提示
+                    if not accumulated:
+                        position = int(chunk[len("__QUEUED__:") :])
+                        await _safe_edit(
+                            current_msg,
+                            f"⏳ 当前提问人数较多，正在排队（第 {position} 位）..."
+                            if position
+                            else "🔍 正在检索相关记录...",
+                        )
+                    continue
+
                 if chunk.startswith("__ERROR__:"):
                     error_msg = chunk[len("__ERROR__:") :]
                     await _safe_edit(current_msg, error_msg)
@@ -805,11 +842,27 @@ class QABot:
                     last_edit_len = len(accumulated)
                     last_edit_time = time.monotonic()
 
+                if abandoned:
+                    logger.info(f"占位消息已被删除，停止生成: user_id={user_id}")
+                    return
+
+        except asyncio.CancelledError:
+            logger.info(f"用户发送了新问题，取消旧的流式回答: user_id={user_id}")
+            await _safe_edit(
+                current_msg, (accumulated + "\n\n" if accumulated else "") + "⏹️ 已取消"
+            )
+            # 关闭生成器（补记已取消的回合）后继续传播取消，等待该任务的代码可感知取消
+            raise
         except Exception as e:
             logger.error(f"流式接收失败: {type(e).__name__}: {e}", exc_info=True)
             if not accumulated:
                 await _safe_edit(current_msg, "❌ 抱歉，处理查询时出错。请稍后再试。")
                 return
+        finally:
+            # 提前结束（完成、放弃或取消）时关闭生成器，中断仍在进行的 LLM 请求
+            await stream.aclose()
+            if self._active_streams.get(user_id) is current_task:
+                del self._active_streams[user_id]
 
         # ── 生成完成：最终编辑，追加配额提示并启用 Markdown ─────────────────
         if not accumulated.strip():
@@ -939,6 +992,17 @@ class QABot:
         # 将命令注册添加到post_init回调
         self.application.post_init = register_commands
 
+        async def flush_conversation_history(application):
+            """关闭前写入尚未保存的对话历史、会话快照与总结索引快照"""
+            if not await self.conversation_mgr.flush():
+                logger.warning("关闭时仍有对话历史未能写入数据库")
+            await self.conversation_mgr.save_sessions()
+            index = get_summary_index()
+            if index is not None:
+                await index.stop()
+
+        self.application.post_shutdown = flush_conversation_history
+
         # 投稿处理器（ConversationHandler）—— 必须在 /start 之前注册，
         # 以便深链接 /start submit 能被 ConversationHandler 的入口点捕获
         try:
@@ -956,7 +1020,8 @@ class QABot:
         self.application.add_handler(CommandHandler("status", self.status_command))
         self.application.add_handler(CommandHandler("clear", self.clear_command))
         self.application.add_handler(CommandHandler("view_persona", self.view_persona_command))
-        self.application.add_handler(CommandHandler("ask", self.ask_command))
+        # 问答处理器不阻塞其他更新，多个用户的流式回答可并发进行
+        self.application.add_handler(CommandHandler("ask", self.ask_command, block=False))
 
         # 订阅管理命令
         self.application.add_handler(CommandHandler("listchannels", self.list_channels_command))
@@ -989,7 +1054,7 @@ class QABot:
 
         # 消息处理器
         self.application.add_handler(
-            MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message)
+            MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message, block=False)
         )
 
         # 添加定期检查通知任务（跨Bot通信）
@@ -92,6 +92,15 @@ def clean_environment():
     for var in vars_to_remove:
         del os.environ[var]
 
+    # 禁用持久化 Embedding 存储，避免测试写入 data/ 目录
+    os.environ["EMBEDDING_STORE_PATH"] = ""
+    # 固定使用 ChromaDB 后端，避免 ChromaDB 不可用时回退到 NumPy 后端写入 data/ 目录
+    os.environ["VECTOR_BACKEND"] = "chroma"
+    # 禁用问答延迟统计快照文件，避免测试写入 data/ 目录
+    os.environ["QA_TRACE_SNAPSHOT_PATH"] = ""
+    # 禁用会话快照文件
+    os.environ["QA_SESSION_SNAPSHOT_PATH"] = ""
+
     yield
 
     # 测试结束后恢复原始环境变量
@@ -10,6 +10,7 @@
 
 """测试 Agentic RAG 工具执行器"""
 
+import asyncio
 import json
 from unittest.mock import AsyncMock, MagicMock
 
@@ -27,6 +28,7 @@ def executor():
     memory_manager = MagicMock()
     reranker = MagicMock()
     reranker.is_available.return_value = False
+    reranker.is_local_available.return_value = False
     return ToolExecutor(vector_store, memory_manager, reranker)
 
 
@@ -55,6 +57,20 @@ def test_serialize_result_builds_message_post_link():
     assert serialized["post_links"] == ["https://t.me/test/123"]
 
 
+def test_serialize_result_sends_matched_passages_only():
+    """测试带命中段落的长总结只发送段落而不是全文开头"""
+    result = {
+        "summary_id": 1,
+        "summary_text": "开头" * 400 + "命中的段落",
+        "matched_passages": [{"text": "命中的段落", "start": 800, "end": 805}],
+        "metadata": {},
+    }
+
+    serialized = ToolExecutor._serialize_result(result)
+
+    assert serialized["summary_text"] == "命中的段落"
+
+
 def test_build_summary_post_links_uses_summary_message_ids():
     """测试总结结果会根据 summary_message_ids 生成帖子链接"""
     summary = {
@@ -150,15 +166,17 @@ async def test_execute_resolve_channel_returns_match(executor):
 @pytest.mark.asyncio
 async def test_execute_semantic_search_uses_channel_filter(executor):
     """测试语义检索传递频道过滤"""
-    executor.vector_store.search_all.return_value = [
-        {
-            "summary_id": 1,
-            "summary_text": "完整内容",
-            "metadata": {"channel_id": "https://t.me/test", "channel_name": "Test"},
-            "doc_id": "https://t.me/test:1",
-            "source": "message",
-        }
-    ]
+    executor.vector_store.asearch_all = AsyncMock(
+        return_value=[
+            {
+                "summary_id": 1,
+                "summary_text": "完整内容",
+                "metadata": {"channel_id": "https://t.me/test", "channel_name": "Test"},
+                "doc_id": "https://t.me/test:1",
+                "source": "message",
+            }
+        ]
+    )
 
     result = json.loads(
         await executor.execute(
@@ -169,25 +187,137 @@ async def test_execute_semantic_search_uses_channel_filter(executor):
 
     assert result["count"] == 1
     assert result["results"][0]["post_links"] == ["https://t.me/test/1"]
-    executor.vector_store.search_all.assert_called_once()
-    call_kwargs = executor.vector_store.search_all.call_args.kwargs
+    executor.vector_store.asearch_all.assert_awaited_once()
+    call_kwargs = executor.vector_store.asearch_all.call_args.kwargs
     assert call_kwargs["filter_metadata"] == {"channel_id": "https://t.me/test"}
 
 
 @pytest.mark.asyncio
 async def test_execute_source_detail_returns_full_text(executor):
     """测试来源详情返回完整文本"""
-    executor.vector_store.search_all.return_value = [
-        {
-            "summary_id": 1,
-            "summary_text": "很长的完整内容" * 100,
-            "metadata": {"channel_id": "https://t.me/test", "channel_name": "Test"},
-            "doc_id": "https://t.me/test:1",
-        }
-    ]
+    executor.vector_store.asearch_all = AsyncMock(
+        return_value=[
+            {
+                "summary_id": 1,
+                "summary_text": "很长的完整内容" * 100,
+                "metadata": {"channel_id": "https://t.me/test", "channel_name": "Test"},
+                "doc_id": "https://t.me/test:1",
+            }
+        ]
+    )
     await executor.execute("semantic_search", {"query": "AI"})
 
     result = json.loads(await executor.execute("get_source_detail", {"summary_id": 1}))
 
     assert "detail" in result
     assert len(result["detail"]["summary_text"]) > 500
+
+
+@pytest.mark.asyncio
+async def test_execute_many_runs_independent_tools_concurrently(executor):
+    """测试同一轮的独立工具并发执行，结果按调用顺序返回"""
+    both_started = asyncio.Event()
+    started = []
+
+    async def wait_for_peer(name):
+        started.append(name)
+        if len(started) == 2:
+            both_started.set()
+        await asyncio.wait_for(both_started.wait(), timeout=1)
+        return [{"channel_id": name, "channel_name": name, "summary_count": 1}]
+
+    async def list_channels():
+        return await wait_for_peer("list")
+
+    async def resolve_channel(hint):
+        await wait_for_peer("resolve")
+        return {"success": True, "channel_id": hint}
+
+    executor.memory_manager.list_channels = AsyncMock(side_effect=list_channels)
+    executor.memory_manager.resolve_channel = AsyncMock(side_effect=resolve_channel)
+
+    results = await executor.execute_many(
+        [("resolve_channel", {"channel_hint": "@test"}), ("list_channels", {})]
+    )
+
+    assert json.loads(results[0])["channel_id"] == "@test"
+    assert json.loads(results[1])["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_execute_many_timeout_and_dependent_order(executor):
+    """测试超时工具返回错误，依赖搜索结果的工具在搜索完成后执行"""
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    executor.tool_timeout = 0.05
+    executor.memory_manager.list_channels = AsyncMock(side_effect=slow)
+    executor.vector_store.asearch_all = AsyncMock(
+        return_value=[{"summary_id": 7, "summary_text": "内容", "metadata": {}}]
+    )
+
+    results = await executor.execute_many(
+        [
+            ("get_source_detail", {"summary_id": 7}),
+            ("semantic_search", {"query": "AI"}),
+            ("list_channels", {}),
+        ]
+    )
+
+    assert json.loads(results[0])["detail"]["summary_text"] == "内容"
+    assert json.loads(results[1])["count"] == 1
+    assert "超时" in json.loads(results[2])["error"]
+
+
+@pytest.mark.asyncio
+async def test_search_results_packed_and_deduplicated_across_rounds(executor):
+    """测试搜索结果按预算打包，之前已发送原文的文档只返回引用"""
+    executor.reset(token_budget=400)
+    executor.vector_store.asearch_all = AsyncMock(
+        return_value=[
+            {"summary_id": 1, "summary_text": "相关" * 25, "similarity": 0.9, "metadata": {}},
+            *(
+                {"summary_id": i, "summary_text": "次要" * 200, "similarity": 0.5, "metadata": {}}
+                for i in range(2, 6)
+            ),
+        ]
+    )
+
+    first = json.loads((await executor.execute_many([("semantic_search", {"query": "AI"})]))[0])
+    second = json.loads((await executor.execute_many([("semantic_search", {"query": "AI"})]))[0])
+
+    assert first["results"][0]["summary_text"] == "相关" * 25
+    assert first["results"][1]["summary_text"].endswith("...")
+    assert "summary_text" not in first["results"][4]
+    assert "get_source_detail" in first["results"][4]["note"]
+    assert all("summary_text" not in r for r in second["results"][:4])
+    assert second["results"][4]["summary_text"]
+
+
+@pytest.mark.asyncio
+async def test_compact_history_keeps_documents_referenced_by_latest_round(executor):
+    """测试较早轮次压缩为引用，最新一轮引用的文档保留原文，被压缩的文档可重新发送"""
+    executor.reset(token_budget=1000)
+    executor.vector_store.asearch_all = AsyncMock(
+        return_value=[
+            {"summary_id": 1, "summary_text": "甲", "metadata": {}},
+            {"summary_id": 2, "summary_text": "乙", "metadata": {}},
+        ]
+    )
+    messages = [
+        {"role": "tool", "content": r}
+        for r in await executor.execute_many([("semantic_search", {"query": "AI"})])
+    ]
+    await executor.execute_many([("get_source_detail", {"summary_id": 1})])
+
+    executor.compact_history(messages, [0])
+
+    results = json.loads(messages[0]["content"])["results"]
+    assert results[0]["summary_text"] == "甲"
+    assert results[1]["compressed"] is True
+    executor.vector_store.asearch_all.return_value = [
+        {"summary_id": 2, "summary_text": "乙", "metadata": {}}
+    ]
+    again = json.loads(await executor.execute("semantic_search", {"query": "AI"}))
+    assert again["results"][0]["summary_text"] == "乙"
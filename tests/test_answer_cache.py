@@ -0,0 +1,138 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试问答语义答案缓存"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.ai.answer_cache import ChannelGenerations, SemanticAnswerCache
+from core.ai.qa_engine_v3 import QAEngineV3
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SemanticAnswerCache(
+        max_size=4,
+        threshold=0.9,
+        generations=ChannelGenerations(str(tmp_path / "generations.json")),
+    )
+
+
+@pytest.mark.unit
+class TestSemanticAnswerCache:
+    """答案缓存测试"""
+
+    def test_hits_similar_query_in_same_scope(self, cache):
+        """测试作用域内相近的查询命中，不同频道/时间范围或不相近的查询未命中"""
+        cache.set([1.0, 0.0], "https://t.me/a", 7, "回答A")
+
+        assert cache.get([0.99, 0.05], "https://t.me/a", 7) == "回答A"
+        assert cache.get([0.99, 0.05], "https://t.me/b", 7) is None
+        assert cache.get([0.99, 0.05], "https://t.me/a", None) is None
+        assert cache.get([0.5, 0.5], "https://t.me/a", 7) is None
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 3
+        assert stats["hit_rate"] == 0.25
+
+    def test_channel_change_invalidates_scoped_and_global_answers(self, cache, tmp_path):
+        """测试其他进程递增频道代数后，该频道与全部频道的回答失效"""
+        cache.set([1.0, 0.0], "https://t.me/a", None, "频道A")
+        cache.set([1.0, 0.0], "https://t.me/b", None, "频道B")
+        cache.set([1.0, 0.0], None, None, "全部频道")
+
+        writer = ChannelGenerations(str(tmp_path / "generations.json"))
+        writer.bump(["https://t.me/a"])
+
+        assert cache.get([1.0, 0.0], "https://t.me/a", None) is None
+        assert cache.get([1.0, 0.0], None, None) is None
+        assert cache.get([1.0, 0.0], "https://t.me/b", None) == "频道B"
+        assert cache.get_stats()["invalidations"] == 2
+
+    def test_stale_generation_snapshot_is_not_served(self, cache):
+        """测试生成回答期间频道发生变更时，写入的回答不会被命中"""
+        generation = cache.current_generation("https://t.me/a")
+        cache.generations.bump(["https://t.me/a"])
+        cache.set([1.0, 0.0], "https://t.me/a", None, "旧回答", generation=generation)
+
+        assert cache.get([1.0, 0.0], "https://t.me/a", None) is None
+
+    def test_lru_eviction_and_disabled(self, cache):
+        """测试超出容量时淘汰最久未使用的条目；容量为 0 时禁用"""
+        for i in range(5):
+            cache.set([float(i + 1), 1.0 - i], None, i, f"回答{i}")
+
+        assert cache.get([1.0, 1.0], None, 0) is None
+        assert cache.get_stats()["evictions"] == 1
+
+        disabled = SemanticAnswerCache(max_size=0)
+        disabled.set([1.0, 0.0], None, None, "回答")
+        assert disabled.get([1.0, 0.0], None, None) is None
+
+
+@pytest.mark.unit
+class TestAnswerCacheStream:
+    """流式问答接入答案缓存测试"""
+
+    @pytest.fixture
+    def engine(self):
+        engine = QAEngineV3.__new__(QAEngineV3)
+        engine.conversation_mgr = MagicMock()
+        engine.conversation_mgr.get_or_create_session.return_value = ("s1", False)
+        engine.conversation_mgr.save_message = AsyncMock()
+        engine.conversation_mgr.get_conversation_history = AsyncMock(
+            return_value=[{"role": "user", "content": "AI 有什么新闻"}]
+        )
+        engine.intent_parser = MagicMock()
+        engine.intent_parser.parse_query.return_value = {
+            "intent": "content",
+            "original_query": "AI 有什么新闻",
+            "keywords": ["AI"],
+            "time_range": 7,
+        }
+        engine.memory_manager = MagicMock()
+        return engine
+
+    @staticmethod
+    async def _collect(engine, user_id: int) -> list[str]:
+        return [chunk async for chunk in engine.process_query_stream("AI 有什么新闻", user_id)]
+
+    @pytest.mark.asyncio
+    async def test_second_query_replays_cached_answer(self, engine, cache):
+        """测试首次回答写入缓存，相近问题直接回放且不再调用 Agentic 流程"""
+        answer = "这是一段很长的回答。" * 20
+
+        async def agentic(**kwargs):
+            yield answer
+
+        emb_gen = MagicMock()
+        emb_gen.is_available.return_value = True
+        emb_gen.agenerate = AsyncMock(return_value=[1.0, 0.0])
+        engine._agentic_stream = MagicMock(side_effect=agentic)
+
+        with (
+            patch("core.ai.qa_engine_v3.get_answer_cache", return_value=cache),
+            patch(
+                "core.ai.embedding_generator.get_async_embedding_generator",
+                return_value=emb_gen,
+            ),
+        ):
+            first = await self._collect(engine, 1)
+            second = await self._collect(engine, 2)
+
+        assert first == [answer, "__DONE__"]
+        assert engine._agentic_stream.call_count == 1
+        assert len(second) > 2
+        assert "".join(second[:-1]) == answer
+        assert second[-1] == "__DONE__"
+        assert cache.get_stats()["hits"] == 1
@@ -0,0 +1,90 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试 RAG 上下文打包"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from core.ai.context_packer import compact_tool_result, context_budget, pack_by_relevance
+from core.ai.qa_engine_v3 import QAEngineV3
+
+
+@pytest.mark.unit
+class TestContextPacker:
+    """上下文打包测试"""
+
+    def test_context_budget_scales_with_model_window(self):
+        """测试预算按模型窗口比例计算，并受上限约束"""
+        with patch("core.ai.context_packer.QA_CONTEXT_MAX_TOKENS", 100_000):
+            assert context_budget("gpt-3.5-turbo") == 4000
+            assert context_budget("deepseek/deepseek-chat") == 16000
+            assert context_budget("unknown-model") == 8000
+        assert context_budget("gpt-4o") == 4000
+
+    def test_pack_fills_budget_by_relevance(self):
+        """测试按相关度优先放入，最后一篇截断，放不下的省略"""
+        docs = [{"similarity": 0.2}, {"rerank_score": 0.9}, {"similarity": 0.5}, {}]
+        texts = ["低" * 100, "高" * 100, "中" * 100, "无" * 100]
+
+        packed = pack_by_relevance(docs, texts, budget=280)
+
+        assert packed[1] == "高" * 100
+        assert packed[2] == "中" * 100
+        assert packed[0].startswith("低") and packed[0].endswith("...")
+        assert packed[3] is None
+
+    def test_pack_respects_item_cap(self):
+        """测试单篇文档不超过单条上限"""
+        packed = pack_by_relevance([{}, {}], ["甲" * 500, "乙" * 100], 1000, max_item_tokens=200)
+
+        assert len(packed[0]) < 210
+        assert packed[1] == "乙" * 100
+
+    def test_compact_tool_result_keeps_referenced_documents(self):
+        """测试较早的工具结果压缩为 ID 引用，仍被引用的文档保留原文"""
+        content = json.dumps(
+            {
+                "results": [
+                    {"summary_id": 1, "summary_text": "甲", "post_links": ["x"]},
+                    {"summary_id": 2, "summary_text": "乙", "doc_id": "c:2"},
+                ],
+                "count": 2,
+            }
+        )
+
+        compacted = json.loads(compact_tool_result(content, {"summary:1"}))
+
+        assert compacted["results"][0]["summary_text"] == "甲"
+        assert compacted["results"][1] == {"summary_id": 2, "doc_id": "c:2", "compressed": True}
+        assert compacted["count"] == 2
+        assert compact_tool_result('{"channels": []}') == '{"channels": []}'
+
+    def test_prepare_rag_context_packs_within_budget(self):
+        """测试 RAG 上下文按预算打包并连续编号，重复文档只出现一次"""
+        summaries = [
+            {"summary_id": 1, "summary_text": "次要" * 300, "similarity": 0.5},
+            {"summary_id": 2, "summary_text": "重要内容", "similarity": 0.9},
+            {"summary_id": 2, "summary_text": "重要内容", "similarity": 0.9},
+            {"summary_id": 3, "summary_text": "无关" * 300, "similarity": 0.1},
+        ]
+        engine = QAEngineV3.__new__(QAEngineV3)
+
+        with (
+            patch("core.ai.qa_engine_v3.get_llm_model", return_value="test-model"),
+            patch("core.ai.qa_engine_v3.context_budget", return_value=300),
+        ):
+            context = engine._prepare_rag_context(summaries)
+
+        assert context.count("重要内容") == 1
+        assert "[1]" in context and "[2]" in context and "[3]" not in context
+        assert "无关" not in context
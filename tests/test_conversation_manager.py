@@ -4,6 +4,7 @@ Copyright 2026 Sakura-Bot
 本项目采用 AGPL-3.0 许可
 """
 
+import asyncio
 from datetime import UTC, datetime, timedelta
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -343,3 +344,289 @@ class TestGetConversationManager:
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+@pytest.mark.unit
+class TestHistoryBuffer:
+    """对话历史内存缓冲测试"""
+
+    @staticmethod
+    def _manager():
+        mock_db = MagicMock()
+        mock_db.save_conversations_batch = AsyncMock(side_effect=lambda records: len(records))
+        mock_db.get_conversation_history = AsyncMock(return_value=[])
+        mock_db.clear_user_conversations = AsyncMock(return_value=0)
+        with patch("core.ai.conversation_manager.get_db_manager", return_value=mock_db):
+            return ConversationManager(), mock_db
+
+    @pytest.mark.asyncio
+    async def test_new_session_served_from_memory(self):
+        """新会话的读写都在内存中完成，数据库写入延迟批量进行"""
+        manager, mock_db = self._manager()
+        session_id, _ = manager.get_or_create_session(123)
+
+        await manager.save_message(123, session_id, "user", "问题")
+        await manager.save_message(123, session_id, "assistant", "回答", {"sources": 1})
+        history = await manager.get_conversation_history(123, session_id)
+
+        assert [item["content"] for item in history] == ["问题", "回答"]
+        assert history[1]["metadata"] == {"sources": 1}
+        mock_db.get_conversation_history.assert_not_called()
+        mock_db.save_conversations_batch.assert_not_called()
+
+        assert await manager.flush() is True
+        mock_db.save_conversations_batch.assert_awaited_once()
+        records = mock_db.save_conversations_batch.call_args.args[0]
+        assert [r["role"] for r in records] == ["user", "assistant"]
+        assert records[0]["timestamp"] <= records[1]["timestamp"]
+
+    @pytest.mark.asyncio
+    async def test_buffer_keeps_latest_messages(self):
+        """缓冲只保留最近 MAX_MESSAGES_PER_SESSION 条消息"""
+        manager, _ = self._manager()
+        session_id, _ = manager.get_or_create_session(123)
+
+        for i in range(manager.MAX_MESSAGES_PER_SESSION + 5):
+            await manager.save_message(123, session_id, "user", f"消息{i}")
+        history = await manager.get_conversation_history(123, session_id)
+
+        assert len(history) == manager.MAX_MESSAGES_PER_SESSION
+        assert history[-1]["content"] == f"消息{manager.MAX_MESSAGES_PER_SESSION + 4}"
+        assert len(manager._pending) == manager.MAX_MESSAGES_PER_SESSION + 5
+
+    @pytest.mark.asyncio
+    async def test_cache_miss_flushes_then_loads_from_db(self):
+        """淘汰后的会话先写入待保存消息再从数据库加载"""
+        manager, mock_db = self._manager()
+        mock_db.get_conversation_history.return_value = [{"role": "user", "content": "旧消息"}]
+
+        with patch("core.ai.conversation_manager.QA_HISTORY_CACHE_SESSIONS", 1):
+            first, _ = manager.get_or_create_session(1)
+            await manager.save_message(1, first, "user", "你好")
+            manager.get_or_create_session(2)
+            assert (1, first) not in manager._history
+
+            history = await manager.get_conversation_history(1, first)
+
+        mock_db.save_conversations_batch.assert_awaited_once()
+        mock_db.get_conversation_history.assert_awaited_once_with(
+            user_id=1, session_id=first, limit=manager.MAX_MESSAGES_PER_SESSION
+        )
+        assert history == [{"role": "user", "content": "旧消息"}]
+        assert await manager.get_conversation_history(1, first) == history
+        assert mock_db.get_conversation_history.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_requeues(self):
+        """写入失败时消息保留在队列中"""
+        manager, mock_db = self._manager()
+        mock_db.save_conversations_batch = AsyncMock(return_value=0)
+        session_id, _ = manager.get_or_create_session(123)
+        await manager.save_message(123, session_id, "user", "问题")
+
+        assert await manager.flush() is False
+        assert len(manager._pending) == 1
+
+    @pytest.mark.asyncio
+    async def test_clear_drops_pending_and_buffer(self):
+        """清除历史同时丢弃未写入的消息与内存缓冲"""
+        manager, mock_db = self._manager()
+        session_id, _ = manager.get_or_create_session(123)
+        other, _ = manager.get_or_create_session(456)
+        await manager.save_message(123, session_id, "user", "问题")
+        await manager.save_message(456, other, "user", "其他")
+
+        await manager.clear_user_history(123)
+
+        assert [r["user_id"] for r in manager._pending] == [456]
+        assert (123, session_id) not in manager._history
+        assert (456, other) in manager._history
+
+
+@pytest.mark.unit
+class TestSessionTable:
+    """会话表容量限制与快照持久化测试"""
+
+    @staticmethod
+    def _manager(snapshot_path=""):
+        with (
+            patch("core.ai.conversation_manager.get_db_manager", return_value=MagicMock()),
+            patch.dict("os.environ", {"QA_SESSION_SNAPSHOT_PATH": str(snapshot_path)}),
+        ):
+            return ConversationManager()
+
+    def test_lru_eviction(self):
+        """超出上限时淘汰最久未活动的用户及其历史缓冲"""
+        manager = self._manager()
+        with patch("core.ai.conversation_manager.QA_SESSION_CACHE_SIZE", 2):
+            first, _ = manager.get_or_create_session(1)
+            manager.get_or_create_session(2)
+            manager.get_or_create_session(1)
+            manager.get_or_create_session(3)
+
+        assert list(manager._session_cache) == [1, 3]
+        assert (1, first) in manager._history
+        assert all(key[0] != 2 for key in manager._history)
+
+    def test_compact_sessions(self):
+        """清理已超时的会话"""
+        manager = self._manager()
+        manager.get_or_create_session(1)
+        manager.get_or_create_session(2)
+        manager._session_cache[1]["last_active"] = datetime.now(UTC) - timedelta(hours=1)
+
+        assert manager.compact_sessions() == 1
+        assert list(manager._session_cache) == [2]
+
+    @pytest.mark.asyncio
+    async def test_snapshot_survives_restart(self, tmp_path):
+        """重启后从快照恢复未超时的会话"""
+        snapshot_path = tmp_path / "sessions.json"
+        manager = self._manager(snapshot_path)
+        active, _ = manager.get_or_create_session(1)
+        manager.get_or_create_session(2)
+        manager._session_cache[2]["last_active"] = datetime.now(UTC) - timedelta(hours=1)
+        await manager.save_sessions()
+
+        restarted = self._manager(snapshot_path)
+
+        assert list(restarted._session_cache) == [1]
+        assert restarted.get_or_create_session(1) == (active, False)
+        # 恢复的会话没有内存缓冲，读取历史时从数据库加载
+        assert (1, active) not in restarted._history
+
+    def test_corrupt_snapshot_ignored(self, tmp_path):
+        """快照损坏时从空会话表启动"""
+        snapshot_path = tmp_path / "sessions.json"
+        snapshot_path.write_text("{", encoding="utf-8")
+
+        manager = self._manager(snapshot_path)
+
+        assert len(manager._session_cache) == 0
+
+
+@pytest.mark.unit
+class TestHistoryCompaction:
+    """长会话滚动压缩测试"""
+
+    @staticmethod
+    def _manager():
+        mock_db = MagicMock()
+        mock_db.save_conversations_batch = AsyncMock(side_effect=lambda records: len(records))
+        with patch("core.ai.conversation_manager.get_db_manager", return_value=mock_db):
+            return ConversationManager()
+
+    @pytest.mark.asyncio
+    async def test_compacts_older_turns_in_background(self):
+        """超过阈值后较早的轮次合并为摘要，缓冲只保留最近消息"""
+        manager = self._manager()
+        manager._summarize = AsyncMock(return_value="用户询问了频道 A 的更新")
+        session_id, _ = manager.get_or_create_session(123)
+
+        with (
+            patch("core.ai.conversation_manager.QA_HISTORY_COMPACT_TOKENS", 50),
+            patch("core.ai.conversation_manager.QA_HISTORY_RECENT_MESSAGES", 2),
+        ):
+            for turn in range(3):
+                await manager.save_message(123, session_id, "user", f"问题{turn}")
+                await manager.save_message(123, session_id, "assistant", "回答" * 30)
+            await manager._compact_tasks[(123, session_id)]
+
+        previous, older = manager._summarize.call_args.args
+        assert previous == ""
+        assert [m["content"] for m in older][:2] == ["问题0", "回答" * 30]
+        history = await manager.get_conversation_history(123, session_id)
+        assert history[0] == {"role": "summary", "content": "用户询问了频道 A 的更新"}
+        assert [m["content"] for m in history[1:]] == ["问题2", "回答" * 30]
+        assert not manager._compact_tasks
+        # 数据库仍写入全部原始消息，摘要作为单独的记录写入
+        await manager.flush()
+        records = manager.db.save_conversations_batch.call_args.args[0]
+        assert [r["role"] for r in records] == ["user", "assistant"] * 3 + ["summary"]
+        assert records[-1]["metadata"] == {"recent": 2}
+
+    @pytest.mark.asyncio
+    async def test_summary_restored_from_db_after_eviction(self):
+        """缓冲淘汰后从数据库恢复摘要，已被摘要覆盖的消息不再重复加载"""
+        manager = self._manager()
+        manager.db.get_conversation_history = AsyncMock(
+            return_value=[
+                {"role": "user", "content": "问题0"},
+                {"role": "assistant", "content": "回答0"},
+                {"role": "user", "content": "问题1"},
+                {"role": "assistant", "content": "回答1"},
+                {"role": "summary", "content": "摘要", "metadata": {"recent": 2}},
+                {"role": "user", "content": "问题2"},
+            ]
+        )
+
+        history = await manager.get_conversation_history(123, "s1")
+
+        assert history[0] == {"role": "summary", "content": "摘要"}
+        assert [m["content"] for m in history[1:]] == ["问题1", "回答1", "问题2"]
+        assert manager._summaries[(123, "s1")] == "摘要"
+
+    @pytest.mark.asyncio
+    async def test_compaction_discarded_after_clear(self):
+        """压缩期间会话被清除时丢弃压缩结果"""
+        manager = self._manager()
+        manager.db.clear_user_conversations = AsyncMock(return_value=0)
+        session_id, _ = manager.get_or_create_session(123)
+        await manager.save_message(123, session_id, "user", "问题")
+        buffer = manager._history[(123, session_id)]
+
+        async def summarize(previous, messages):
+            await manager.clear_user_history(123)
+            return "摘要"
+
+        manager._summarize = summarize
+        await manager._compact_history((123, session_id), buffer)
+
+        assert (123, session_id) not in manager._summaries
+
+    @pytest.mark.asyncio
+    async def test_compaction_waits_for_llm_admission(self):
+        """压缩作为后台任务经过 LLM 准入调度，名额被占满时等待"""
+        from core.ai.llm_scheduler import LLMScheduler
+
+        manager = self._manager()
+        manager._summarize = AsyncMock(return_value="摘要")
+        session_id, _ = manager.get_or_create_session(123)
+        for content in ("问题", "回答"):
+            await manager.save_message(123, session_id, "user", content)
+        key = (123, session_id)
+
+        scheduler = LLMScheduler(max_concurrency=1)
+        running = scheduler.submit(9)
+        with (
+            patch("core.ai.llm_scheduler.get_llm_scheduler", return_value=scheduler),
+            patch("core.ai.conversation_manager.QA_HISTORY_RECENT_MESSAGES", 0),
+        ):
+            task = asyncio.create_task(manager._compact_history(key, manager._history[key]))
+            await asyncio.sleep(0.01)
+            manager._summarize.assert_not_called()
+
+            scheduler.release(running)
+            await task
+
+        assert manager._summaries[key] == "摘要"
+        assert scheduler.get_stats()["active"] == 0
+
+    def test_format_with_summary_within_budget(self):
+        """格式化输出摘要 + 最近轮次，超出预算的较早消息省略"""
+        manager = self._manager()
+        history = [
+            {"role": "summary", "content": "之前讨论了频道 A"},
+            {"role": "user", "content": "旧问题" + "字" * 200},
+            {"role": "assistant", "content": "旧回答" + "字" * 200},
+            {"role": "user", "content": "新问题"},
+        ]
+
+        with patch("core.ai.conversation_manager.QA_HISTORY_CONTEXT_TOKENS", 300):
+            result = manager.format_conversation_context(history)
+
+        lines = result.split("\n")
+        assert lines[0] == "较早对话摘要：之前讨论了频道 A"
+        assert lines[-1] == "用户：新问题"
+        assert "旧回答" in result
+        assert "旧问题" not in result
@@ -0,0 +1,118 @@
+"""
+测试 MySQL 总结全文索引与全文检索
+"""
+
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from core.infrastructure.database.mysql import MySQLManager
+
+
+@pytest.fixture
+def mysql_manager():
+    """创建 MySQL 管理器实例"""
+    return MySQLManager(
+        host="localhost",
+        port=3306,
+        user="test_user",
+        password="test_pass",
+        database="test_db",
+    )
+
+
+def _mock_pool(manager, rows=None):
+    """为管理器挂载 Mock 连接池，返回游标"""
+    mock_pool = MagicMock()
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+
+    mock_pool.acquire = MagicMock(return_value=mock_conn)
+    mock_conn.__aenter__ = AsyncMock(return_value=mock_conn)
+    mock_conn.__aexit__ = AsyncMock()
+    mock_conn.cursor = MagicMock(return_value=mock_cursor)
+    mock_cursor.__aenter__ = AsyncMock(return_value=mock_cursor)
+    mock_cursor.__aexit__ = AsyncMock()
+    mock_cursor.execute = AsyncMock()
+    mock_cursor.fetchall = AsyncMock(return_value=rows or [])
+
+    manager.pool = mock_pool
+    return mock_cursor
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_ensure_fulltext_index_is_idempotent(mysql_manager):
+    """测试列与索引已存在时视为可用"""
+    cursor = MagicMock()
+    cursor.execute = AsyncMock(
+        side_effect=[
+            Exception("(1060, \"Duplicate column name 'search_tags'\")"),
+            Exception("(1061, \"Duplicate key name 'ft_summaries_search'\")"),
+        ]
+    )
+
+    await mysql_manager._ensure_summary_fulltext_index(cursor)
+
+    assert mysql_manager._fulltext_available is True
+    assert "WITH PARSER ngram" in cursor.execute.call_args_list[1].args[0]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_ensure_fulltext_index_unsupported(mysql_manager):
+    """测试不支持 ngram 解析器时标记为不可用"""
+    cursor = MagicMock()
+    cursor.execute = AsyncMock(side_effect=[None, Exception("Function 'ngram' is not defined")])
+
+    await mysql_manager._ensure_summary_fulltext_index(cursor)
+
+    assert mysql_manager._fulltext_available is False
+    assert await mysql_manager.search_summaries_fulltext(["AI"]) is None
+
+
+@pytest.mark.unit
+def test_fulltext_boolean_query():
+    """测试检索词转换为短语查询并去除运算符"""
+    query = MySQLManager._fulltext_boolean_query(["人工智能", "+AI*", 'say "hi"', "AI", "  "])
+
+    assert query == '"人工智能" "AI" "say hi"'
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_search_summaries_fulltext(mysql_manager):
+    """测试全文检索按相关度查询并解析结果"""
+    mysql_manager._fulltext_available = True
+    cursor = _mock_pool(
+        mysql_manager,
+        rows=[
+            {
+                "id": 1,
+                "summary_text": "AI 周报",
+                "summary_message_ids": "[10, 11]",
+                "search_tags": '["AI"]',
+                "relevance": 1.5,
+            }
+        ],
+    )
+    start = datetime(2026, 1, 1, tzinfo=UTC)
+
+    results = await mysql_manager.search_summaries_fulltext(
+        ["AI", "模型"], channel_id="https://t.me/test", start_date=start, limit=5
+    )
+
+    sql, params = cursor.execute.call_args.args
+    assert "MATCH(summary_text, search_tags)" in sql
+    assert "ORDER BY relevance DESC" in sql
+    assert params == [
+        '"AI" "模型"',
+        '"AI" "模型"',
+        "https://t.me/test",
+        start.replace(tzinfo=None),
+        5,
+    ]
+    assert results == [
+        {"id": 1, "summary_text": "AI 周报", "summary_message_ids": [10, 11], "relevance": 1.5}
+    ]
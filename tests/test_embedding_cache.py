@@ -0,0 +1,103 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试查询向量缓存"""
+
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import core.ai.embedding_cache as embedding_cache_module
+from core.ai.embedding_cache import QueryEmbeddingCache, normalize_query_text
+from core.ai.embedding_generator import EmbeddingGenerator
+
+
+@pytest.fixture
+def fresh_global_cache():
+    """为每个测试提供独立的全局缓存实例"""
+    embedding_cache_module.query_embedding_cache = QueryEmbeddingCache(max_size=8, ttl=0)
+    yield embedding_cache_module.query_embedding_cache
+    embedding_cache_module.query_embedding_cache = None
+
+
+def test_normalize_query_text_collapses_trivial_differences():
+    """测试归一化合并空白、全角与大小写差异"""
+    assert normalize_query_text("  最近 有什么\t新闻 ") == "最近 有什么 新闻"
+    assert normalize_query_text("ＡＩ News") == normalize_query_text("ai news")
+
+
+def test_cache_hit_and_miss_metrics():
+    """测试命中与未命中统计"""
+    cache = QueryEmbeddingCache(max_size=4, ttl=0)
+
+    assert cache.get("m", "hello") is None
+    cache.set("m", "hello", [0.5, 0.25])
+
+    assert cache.get("m", " Hello ") == pytest.approx([0.5, 0.25])
+    assert cache.get("other-model", "hello") is None
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == pytest.approx(1 / 3, abs=1e-4)
+
+
+def test_cache_lru_eviction():
+    """测试超过容量时淘汰最久未使用的条目"""
+    cache = QueryEmbeddingCache(max_size=2, ttl=0)
+    cache.set("m", "a", [1.0])
+    cache.set("m", "b", [2.0])
+    cache.get("m", "a")  # a 变为最近使用
+    cache.set("m", "c", [3.0])
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == [1.0]
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_cache_ttl_expiration():
+    """测试过期条目视为未命中"""
+    cache = QueryEmbeddingCache(max_size=2, ttl=10)
+    with patch("core.ai.embedding_cache.time.monotonic", return_value=100.0):
+        cache.set("m", "a", [1.0])
+    with patch("core.ai.embedding_cache.time.monotonic", return_value=111.0):
+        assert cache.get("m", "a") is None
+
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_cache_disabled_when_size_zero():
+    """测试容量为 0 时禁用缓存"""
+    cache = QueryEmbeddingCache(max_size=0)
+    cache.set("m", "a", [1.0])
+
+    assert cache.get("m", "a") is None
+    assert cache.get_stats()["size"] == 0
+
+
+@patch.dict(os.environ, {"EMBEDDING_API_KEY": "test_key"})
+@patch("core.ai.embedding_generator.OpenAI")
+def test_generate_with_cache_skips_api_round_trip(mock_openai, fresh_global_cache):
+    """测试开启缓存后重复查询不再调用 Embedding API"""
+    mock_response = MagicMock()
+    mock_response.data = [MagicMock(embedding=[0.1, 0.2])]
+    mock_client = MagicMock()
+    mock_client.embeddings.create.return_value = mock_response
+    mock_openai.return_value = mock_client
+
+    generator = EmbeddingGenerator()
+    first = generator.generate("最近有什么新闻", use_cache=True)
+    second = generator.generate("最近有什么新闻 ", use_cache=True)
+
+    assert first == [0.1, 0.2]
+    assert second == pytest.approx([0.1, 0.2])
+    mock_client.embeddings.create.assert_called_once()
+    assert fresh_global_cache.get_stats()["hits"] == 1
@@ -5,11 +5,15 @@ Copyright 2026 Sakura-Bot
 """
 
 import os
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from core.ai.embedding_generator import EmbeddingGenerator, get_embedding_generator
+from core.ai.embedding_generator import (
+    AsyncEmbeddingGenerator,
+    EmbeddingGenerator,
+    get_embedding_generator,
+)
 
 
 @pytest.mark.unit
@@ -197,5 +201,61 @@ class TestGetEmbeddingGenerator:
         assert isinstance(generator, EmbeddingGenerator)
 
 
+@pytest.mark.unit
+class TestAsyncEmbeddingGenerator:
+    """异步Embedding生成器测试"""
+
+    @patch.dict(os.environ, {"EMBEDDING_API_KEY": "test_key", "EMBEDDING_MAX_CONNECTIONS": "4"})
+    @patch("core.ai.embedding_generator.AsyncOpenAI")
+    def test_init_uses_pooled_http_client(self, mock_async_openai):
+        """测试初始化时使用共享连接池"""
+        generator = AsyncEmbeddingGenerator()
+
+        assert generator.is_available()
+        assert generator.max_connections == 4
+        http_client = mock_async_openai.call_args.kwargs["http_client"]
+        assert http_client is generator._http_client
+
+    def test_init_without_api_key(self):
+        """测试没有API key时不可用"""
+        with patch.dict(os.environ, {}, clear=True):
+            generator = AsyncEmbeddingGenerator()
+
+        assert not generator.is_available()
+
+    @pytest.mark.asyncio
+    @patch.dict(os.environ, {"EMBEDDING_API_KEY": "test_key"})
+    @patch("core.ai.embedding_generator.AsyncOpenAI")
+    async def test_agenerate_success(self, mock_async_openai):
+        """测试异步生成embedding"""
+        mock_response = MagicMock()
+        mock_response.data = [MagicMock(embedding=[0.1, 0.2, 0.3])]
+        mock_client = MagicMock()
+        mock_client.embeddings.create = AsyncMock(return_value=mock_response)
+        mock_async_openai.return_value = mock_client
+
+        generator = AsyncEmbeddingGenerator()
+        result = await generator.agenerate("test text")
+
+        assert result == [0.1, 0.2, 0.3]
+        await generator.aclose()
+
+    @pytest.mark.asyncio
+    @patch.dict(os.environ, {"EMBEDDING_API_KEY": "test_key"})
+    @patch("core.ai.embedding_generator.AsyncOpenAI")
+    async def test_abatch_generate_api_error(self, mock_async_openai):
+        """测试异步批量生成API错误"""
+        mock_client = MagicMock()
+        mock_client.embeddings.create = AsyncMock(side_effect=Exception("API Error"))
+        mock_async_openai.return_value = mock_client
+
+        generator = AsyncEmbeddingGenerator()
+        result = await generator.abatch_generate(["text1", "text2"])
+
+        assert result == [None, None]
+        await generator.aclose()
+        assert not generator.is_available()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
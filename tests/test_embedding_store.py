@@ -0,0 +1,134 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试持久化 Embedding 存储"""
+
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import core.ai.embedding_store as embedding_store_module
+from core.ai.embedding_generator import AsyncEmbeddingGenerator, EmbeddingGenerator
+from core.ai.embedding_store import EmbeddingStore, content_key, get_embedding_store
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    """将全局存储指向临时目录"""
+    path = str(tmp_path / "embedding_store.sqlite3")
+    embedding_store_module.embedding_store = None
+    with patch.dict(os.environ, {"EMBEDDING_STORE_PATH": path}):
+        yield path
+    if embedding_store_module.embedding_store is not None:
+        embedding_store_module.embedding_store.close()
+    embedding_store_module.embedding_store = None
+
+
+def _mock_response(vectors):
+    response = MagicMock()
+    response.data = [MagicMock(embedding=v) for v in vectors]
+    return response
+
+
+@pytest.mark.unit
+def test_content_key_depends_on_model_and_text():
+    """测试内容寻址键同时区分模型与文本"""
+    assert content_key("m", "hello") == content_key("m", "hello")
+    assert content_key("m", "hello") != content_key("m2", "hello")
+    assert content_key("m", "hello") != content_key("m", "hello ")
+
+
+@pytest.mark.unit
+def test_store_round_trip_and_persistence(tmp_path):
+    """测试写入后可读回，且重新打开文件后依然存在"""
+    path = str(tmp_path / "store.sqlite3")
+    store = EmbeddingStore(path)
+    assert store.put_many("m", ["a", "b"], [[0.5, -0.25], None]) == 1
+    store.close()
+
+    reopened = EmbeddingStore(path)
+    results = reopened.get_many("m", ["a", "b", "a"])
+
+    assert results[0] == pytest.approx([0.5, -0.25])
+    assert results[1] is None
+    assert results[2] == pytest.approx([0.5, -0.25])
+    stats = reopened.get_stats()
+    assert stats["total_vectors"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    reopened.close()
+
+
+@pytest.mark.unit
+def test_get_embedding_store_disabled_by_empty_path():
+    """测试 EMBEDDING_STORE_PATH 为空时禁用存储"""
+    with patch.dict(os.environ, {"EMBEDDING_STORE_PATH": ""}):
+        assert get_embedding_store() is None
+
+
+@pytest.mark.unit
+@patch.dict(os.environ, {"EMBEDDING_API_KEY": "test_key"})
+@patch("core.ai.embedding_generator.OpenAI")
+def test_batch_generate_only_embeds_unseen_texts(mock_openai, store_path):
+    """测试批量生成时仅对未存储的文本调用 API"""
+    mock_client = MagicMock()
+    mock_client.embeddings.create.side_effect = [
+        _mock_response([[0.1, 0.2], [0.3, 0.4]]),
+        _mock_response([[0.5, 0.6]]),
+    ]
+    mock_openai.return_value = mock_client
+
+    generator = EmbeddingGenerator()
+    first = generator.batch_generate(["a", "b"])
+    second = generator.batch_generate(["b", "c", "a"])
+
+    assert first == [[0.1, 0.2], [0.3, 0.4]]
+    assert second[0] == pytest.approx([0.3, 0.4], abs=1e-3)
+    assert second[1] == [0.5, 0.6]
+    assert second[2] == pytest.approx([0.1, 0.2], abs=1e-3)
+    assert mock_client.embeddings.create.call_args_list[1].kwargs["input"] == ["c"]
+
+
+@pytest.mark.unit
+@patch.dict(os.environ, {"EMBEDDING_API_KEY": "test_key"})
+@patch("core.ai.embedding_generator.OpenAI")
+def test_batch_generate_all_cached_skips_api(mock_openai, store_path):
+    """测试全部命中时不调用 API"""
+    get_embedding_store().put_many("text-embedding-3-small", ["a"], [[1.0, 0.0]])
+    mock_client = MagicMock()
+    mock_openai.return_value = mock_client
+
+    generator = EmbeddingGenerator()
+    generator.model = "text-embedding-3-small"
+    results = generator.batch_generate(["a"])
+
+    assert results == [[1.0, 0.0]]
+    mock_client.embeddings.create.assert_not_called()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+@patch.dict(os.environ, {"EMBEDDING_API_KEY": "test_key"})
+@patch("core.ai.embedding_generator.AsyncOpenAI")
+async def test_abatch_generate_uses_store(mock_async_openai, store_path):
+    """测试异步批量生成同样复用持久化存储"""
+    mock_client = MagicMock()
+    mock_client.embeddings.create = AsyncMock(return_value=_mock_response([[0.25, 0.75]]))
+    mock_async_openai.return_value = mock_client
+
+    generator = AsyncEmbeddingGenerator()
+    first = await generator.abatch_generate(["hello"])
+    second = await generator.abatch_generate(["hello"])
+
+    assert first == [[0.25, 0.75]]
+    assert second == [pytest.approx([0.25, 0.75])]
+    mock_client.embeddings.create.assert_awaited_once()
+    await generator.aclose()
@@ -0,0 +1,237 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试问答 LLM 准入调度"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.ai.llm_scheduler import AdmissionRejected, LLMScheduler
+from core.ai.qa_engine_v3 import QAEngineV3
+
+
+def _admitted_order(scheduler: LLMScheduler, tickets) -> list:
+    """依次释放已准入的请求，返回准入顺序"""
+    order = []
+    pending = list(tickets)
+    for _ in range(len(pending)):
+        ticket = next(t for t in pending if t.admitted)
+        order.append(ticket)
+        pending.remove(ticket)
+        scheduler.release(ticket)
+    return order
+
+
+@pytest.mark.unit
+class TestLLMScheduler:
+    """准入调度测试"""
+
+    def test_concurrency_cap(self):
+        """测试超过并发上限的请求排队，释放后按顺序准入"""
+        scheduler = LLMScheduler(max_concurrency=2)
+        tickets = [scheduler.submit(uid) for uid in (1, 2, 3)]
+
+        assert [t.admitted for t in tickets] == [True, True, False]
+        assert scheduler.position(tickets[2]) == 1
+
+        scheduler.release(tickets[0])
+
+        assert tickets[2].admitted
+        assert scheduler.get_stats()["active"] == 2
+
+    def test_round_robin_between_users(self):
+        """测试突发请求的用户不会挤占其他用户"""
+        scheduler = LLMScheduler(max_concurrency=1, max_queue_per_user=5)
+        running = scheduler.submit(9)
+        heavy = [scheduler.submit(1) for _ in range(3)]
+        light = scheduler.submit(2)
+
+        assert scheduler.position(light) == 2
+        scheduler.release(running)
+        order = _admitted_order(scheduler, [*heavy, light])
+
+        assert order == [heavy[0], light, heavy[1], heavy[2]]
+
+    def test_admin_priority(self):
+        """测试管理员请求先于普通用户准入"""
+        scheduler = LLMScheduler(max_concurrency=1)
+        running = scheduler.submit(9)
+        normal = scheduler.submit(1)
+        admin = scheduler.submit(2, priority=True)
+
+        assert scheduler.position(admin) == 1
+        assert scheduler.position(normal) == 2
+        scheduler.release(running)
+
+        assert admin.admitted and not normal.admitted
+
+    def test_backpressure(self):
+        """测试单个用户与全局排队数超过上限时拒绝"""
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=2, max_queue_per_user=1)
+        scheduler.submit(1)
+        scheduler.submit(1)
+
+        with pytest.raises(AdmissionRejected):
+            scheduler.submit(1)
+        scheduler.submit(2)
+        with pytest.raises(AdmissionRejected):
+            scheduler.submit(3)
+        assert scheduler.get_stats()["rejected"] == 2
+
+    @pytest.mark.asyncio
+    async def test_wait_reports_position_and_cancel_leaves_queue(self):
+        """测试等待期间报告排队位置，放弃等待后移出队列"""
+        scheduler = LLMScheduler(max_concurrency=1)
+        running = scheduler.submit(9)
+        first = scheduler.submit(1)
+        second = scheduler.submit(2)
+
+        positions = []
+
+        async def wait(ticket):
+            async for position in scheduler.wait(ticket):
+                positions.append(position)
+
+        waiter = asyncio.create_task(wait(second))
+        await asyncio.sleep(0)
+        scheduler.release(first)
+        await asyncio.sleep(0)
+        assert positions == [2, 1]
+
+        waiter.cancel()
+        scheduler.release(second)
+        scheduler.release(running)
+        stats = scheduler.get_stats()
+        assert (stats["active"], stats["queued"]) == (0, 0)
+
+    def test_background_runs_after_user_requests(self):
+        """测试后台任务排在所有用户请求之后准入"""
+        scheduler = LLMScheduler(max_concurrency=1)
+        running = scheduler.submit(9)
+        background = scheduler.submit(1, background=True)
+        user = scheduler.submit(2)
+
+        assert scheduler.position(user) == 1
+        assert scheduler.position(background) == 2
+        scheduler.release(running)
+        assert user.admitted and not background.admitted
+
+        scheduler.release(user)
+        assert background.admitted
+
+    @pytest.mark.asyncio
+    async def test_admitted_context_waits_and_releases(self):
+        """测试 admitted() 等待准入并在结束时释放名额"""
+        scheduler = LLMScheduler(max_concurrency=1)
+        running = scheduler.submit(9)
+        entered = asyncio.Event()
+
+        async def work():
+            async with scheduler.admitted(1, background=True):
+                entered.set()
+
+        task = asyncio.create_task(work())
+        await asyncio.sleep(0)
+        assert not entered.is_set()
+
+        scheduler.release(running)
+        await task
+        assert entered.is_set()
+        assert scheduler.get_stats()["active"] == 0
+
+
+@pytest.mark.unit
+class TestAdmissionStream:
+    """流式问答接入准入调度测试"""
+
+    @pytest.mark.asyncio
+    async def test_queued_request_reports_position(self):
+        """测试排队中的请求输出位置标记，且标记不写入对话历史"""
+        engine = QAEngineV3.__new__(QAEngineV3)
+        engine.conversation_mgr = MagicMock()
+        engine.conversation_mgr.get_or_create_session.return_value = ("s1", False)
+        engine.conversation_mgr.save_message = AsyncMock()
+        engine.conversation_mgr.get_conversation_history = AsyncMock(
+            return_value=[
+                {"role": "user", "content": "上一个问题"},
+                {"role": "assistant", "content": "上一个回答"},
+            ]
+        )
+        engine.intent_parser = MagicMock()
+        engine.intent_parser.parse_query.return_value = {
+            "intent": "content",
+            "original_query": "AI 有什么新闻？",
+            "keywords": [],
+            "time_range": None,
+        }
+        engine._resolve_channel_from_parsed = AsyncMock(return_value=None)
+        engine._lookup_cached_answer = AsyncMock(return_value=(None, None, None))
+
+        async def answer(**kwargs):
+            yield "回答"
+
+        engine._agentic_stream = MagicMock(side_effect=answer)
+
+        scheduler = LLMScheduler(max_concurrency=1)
+        running = scheduler.submit(9)
+        chunks = []
+
+        async def collect():
+            async for chunk in engine.process_query_stream("AI 有什么新闻？", 1):
+                chunks.append(chunk)
+
+        with (
+            patch("core.ai.qa_engine_v3.get_llm_scheduler", return_value=scheduler),
+            patch("core.ai.qa_engine_v3.get_quota_manager") as get_quota,
+        ):
+            get_quota.return_value.is_admin.return_value = False
+            task = asyncio.create_task(collect())
+            await asyncio.sleep(0.01)
+            assert chunks == ["__QUEUED__:1"]
+            scheduler.release(running)
+            await task
+
+        assert chunks == ["__QUEUED__:1", "__QUEUED__:0", "回答", "__DONE__"]
+        saved = engine.conversation_mgr.save_message.await_args_list[-1].kwargs
+        assert saved["content"] == "回答"
+        assert scheduler.get_stats()["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_non_stream_query_waits_for_admission(self):
+        """测试非流式问答在生成前同样经过准入调度"""
+        engine = QAEngineV3.__new__(QAEngineV3)
+        engine.conversation_mgr = MagicMock()
+        engine.conversation_mgr.get_conversation_history = AsyncMock(return_value=[])
+        engine._resolve_channel_from_parsed = AsyncMock(return_value=None)
+        engine._run_retrieval_legs = AsyncMock(return_value=([{"summary_id": 1}], []))
+        engine._rrf_fusion = MagicMock(return_value=[{"summary_id": 1}])
+        engine.reranker = MagicMock()
+        engine.reranker.is_available.return_value = False
+        engine.reranker.is_local_available.return_value = False
+        engine._generate_answer_with_rag = AsyncMock(return_value="回答")
+        parsed = {"original_query": "AI 有什么新闻？", "keywords": [], "time_range": None}
+
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=0)
+        running = scheduler.submit(9)
+        with (
+            patch("core.ai.qa_engine_v3.get_llm_scheduler", return_value=scheduler),
+            patch("core.ai.qa_engine_v3.get_quota_manager") as get_quota,
+        ):
+            get_quota.return_value.is_admin.return_value = False
+            rejected = await engine._handle_content_query_v3(parsed, 1, "s1")
+            scheduler.release(running)
+            answer = await engine._handle_content_query_v3(parsed, 1, "s1")
+
+        assert rejected.startswith("⏳")
+        assert answer == "回答"
+        engine._generate_answer_with_rag.assert_awaited_once()
+        assert scheduler.get_stats()["active"] == 0
@@ -234,6 +234,40 @@ class TestSearchSummaries:
 
         assert len(results) == 1
 
+    @patch("core.ai.memory_manager.get_db_manager")
+    @pytest.mark.asyncio
+    async def test_search_summaries_uses_fulltext(self, mock_get_db):
+        """测试有关键词时优先使用全文检索"""
+        mock_db = MagicMock()
+        mock_db.search_summaries_fulltext = AsyncMock(return_value=[{"id": 1, "relevance": 2.0}])
+        mock_db.get_summaries = AsyncMock(return_value=[])
+        mock_get_db.return_value = mock_db
+
+        manager = MemoryManager()
+        results = await manager.search_summaries(keywords=["AI"], topics=["模型"], limit=5)
+
+        assert results == [{"id": 1, "relevance": 2.0}]
+        assert mock_db.search_summaries_fulltext.await_args.args[0] == ["AI", "模型"]
+        assert mock_db.search_summaries_fulltext.await_args.kwargs["limit"] == 5
+        mock_db.get_summaries.assert_not_called()
+
+    @patch("core.ai.memory_manager.get_db_manager")
+    @pytest.mark.asyncio
+    async def test_search_summaries_fulltext_unavailable(self, mock_get_db):
+        """测试全文索引不可用时回退到逐行匹配"""
+        mock_db = MagicMock()
+        mock_db.search_summaries_fulltext = AsyncMock(return_value=None)
+        mock_db.get_summaries = AsyncMock(
+            return_value=[{"summary_text": "AI is great", "keywords": '["AI"]', "topics": "[]"}]
+        )
+        mock_get_db.return_value = mock_db
+
+        manager = MemoryManager()
+        results = await manager.search_summaries(keywords=["AI"])
+
+        assert len(results) == 1
+        mock_db.get_summaries.assert_awaited_once()
+
     @patch("core.ai.memory_manager.get_db_manager")
     @pytest.mark.asyncio
     async def test_search_summaries_empty_result(self, mock_get_db):
@@ -0,0 +1,215 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试消息向量时间分区"""
+
+import gzip
+import json
+from datetime import UTC, datetime
+from unittest.mock import patch
+
+import pytest
+
+from core.ai.message_partitions import (
+    MessagePartitionManager,
+    parse_partition_name,
+    partition_name,
+)
+from core.ai.vector_backend import NumpyVectorClient
+from core.ai.vector_store import VectorStore
+from core.migrations.partition_message_vectors import partition_message_vectors
+
+
+def _ts(year: int, month: int, day: int = 15) -> int:
+    return int(datetime(year, month, day, tzinfo=UTC).timestamp())
+
+
+@pytest.mark.unit
+class TestPartitionNaming:
+    """分区命名测试"""
+
+    def test_monthly_and_multi_month_names(self):
+        """测试按跨度对齐的分区名称"""
+        assert partition_name(_ts(2026, 2), 1) == "messages_202602"
+        assert partition_name(_ts(2026, 5), 3) == "messages_202604_3m"
+        assert partition_name(_ts(2026, 12, 31), 12) == "messages_202601_12m"
+
+    def test_parse_partition_range(self):
+        """测试解析分区时间范围（左闭右开，跨年）"""
+        start, end = parse_partition_name("messages_202611_3m")
+
+        assert start == _ts(2026, 11, 1)
+        assert end == _ts(2027, 2, 1)
+        assert parse_partition_name("messages") is None
+        assert parse_partition_name("messages_202613") is None
+
+
+@pytest.mark.unit
+class TestMessagePartitionManager:
+    """分区管理器测试"""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        client = NumpyVectorClient(str(tmp_path / "vectors"), dtype="float32")
+        manager = MessagePartitionManager(client, months=1, archive_dir=str(tmp_path / "archive"))
+        for month in (1, 2, 5):
+            manager.for_timestamp(_ts(2026, month)).add(
+                ids=[f"c:{month}"], embeddings=[[1.0, 0.0]], documents=[f"m{month}"]
+            )
+        # 写入完成后再设置保留期，避免创建分区时按当前时间触发保留策略
+        manager.retention_months = 3
+        return manager
+
+    def test_select_overlapping_partitions(self, manager):
+        """测试只选出与时间范围有交集的分区"""
+        selected = [name for name, _ in manager.select(_ts(2026, 2, 1), _ts(2026, 4, 1))]
+
+        assert selected == ["messages_202602"]
+        assert len(manager.select(None, None)) == 3
+
+    def test_load_existing_partitions(self, manager):
+        """测试重新加载后端中已存在的分区"""
+        reloaded = MessagePartitionManager(manager.client, months=1)
+        reloaded.load()
+
+        assert [name for name, _ in reloaded.all()] == [name for name, _ in manager.all()]
+
+    def test_partitions_shared_across_processes(self, manager, tmp_path):
+        """测试读取方（另一进程）发现写入方新建的分区，并跳过已被删除的分区"""
+        reader = MessagePartitionManager(
+            NumpyVectorClient(str(tmp_path / "vectors"), dtype="float32"),
+            months=1,
+            refresh_interval=0,
+        )
+        reader.load()
+        assert len(reader.select(None, None)) == 3
+
+        manager.retention_months = 0
+        manager.for_timestamp(_ts(2026, 6)).add(
+            ids=["c:6"], embeddings=[[1.0, 0.0]], documents=["m6"]
+        )
+        selected = reader.select(_ts(2026, 6, 1), None)
+        assert [name for name, _ in selected] == ["messages_202606"]
+        assert selected[0][1].get(ids=["c:6"])["documents"] == ["m6"]
+
+        manager.retention_months = 3
+        manager.retention_action = "drop"
+        manager.enforce_retention(now_ts=_ts(2026, 5, 20))
+        names = [name for name, _ in reader.select(None, _ts(2026, 1, 20))]
+        assert names == []
+        assert [name for name, _ in reader.all()] == [
+            "messages_202602",
+            "messages_202605",
+            "messages_202606",
+        ]
+
+    def test_retention_archives_expired_partitions(self, manager, tmp_path):
+        """测试过期分区导出归档后删除"""
+        now = _ts(2026, 5, 20)
+        preview = manager.enforce_retention(dry_run=True, now_ts=now)
+        assert preview["expired"] == ["messages_202601"]
+        assert manager.get("messages_202601") is not None
+
+        result = manager.enforce_retention(now_ts=now)
+
+        assert result["expired"] == ["messages_202601"]
+        assert manager.get("messages_202601") is None
+        assert "messages_202601" not in manager.client.list_collections()
+        with gzip.open(result["archived"]["messages_202601"], "rt", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert records[0]["id"] == "c:1"
+        assert records[0]["embedding"] == pytest.approx([1.0, 0.0])
+
+    def test_retention_drop(self, manager, tmp_path):
+        """测试 drop 方式直接删除不归档"""
+        manager.retention_action = "drop"
+
+        result = manager.enforce_retention(now_ts=_ts(2026, 6, 2))
+
+        assert result["expired"] == ["messages_202601", "messages_202602"]
+        assert result["archived"] == {}
+        assert not (tmp_path / "archive").exists()
+
+
+@pytest.mark.unit
+class TestVectorStorePartitions:
+    """VectorStore 分区路由测试"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        env = {
+            "VECTOR_BACKEND": "numpy",
+            "VECTOR_DB_PATH": str(tmp_path),
+            "VECTOR_MESSAGES_PARTITION_MONTHS": "1",
+        }
+        with patch.dict("os.environ", env):
+            yield VectorStore()
+
+    @staticmethod
+    def _metadata(month: int) -> dict:
+        return {"channel_id": "c", "created_at": f"2026-{month:02d}-10T00:00:00+00:00"}
+
+    def test_batch_routes_by_month_and_search_prunes(self, store):
+        """测试按月路由写入，带时间范围的检索只查询相关分区"""
+        store.add_messages_batch(
+            ids=["c:1", "c:2"],
+            texts=["一月", "三月"],
+            metadatas=[self._metadata(1), self._metadata(3)],
+            embeddings=[[1.0, 0.0], [1.0, 0.1]],
+        )
+
+        assert store.messages_collection.count() == 0
+        assert [p["name"] for p in store.list_message_partitions()] == [
+            "messages_202601",
+            "messages_202603",
+        ]
+
+        with patch.object(store, "_query_collection", wraps=store._query_collection) as query:
+            results = store._query_messages([1.0, 0.0], top_k=5, date_after="2026-03-01T00:00:00")
+        queried = {c.args[0].name for c in query.call_args_list}
+        assert queried == {"messages", "messages_202603"}
+        assert [r["doc_id"] for r in results] == ["c:2"]
+
+        assert [r["doc_id"] for r in store._query_messages([1.0, 0.0], top_k=5)] == ["c:1", "c:2"]
+        assert store.get_stats()["messages"]["total_vectors"] == 2
+
+    def test_update_moves_between_partitions_and_delete(self, store):
+        """测试编辑后消息只保留在新分区，删除会清理所有分区"""
+        store.add_message("c:1", "原文", self._metadata(1), [1.0, 0.0])
+        store.update_message("c:1", "编辑后", self._metadata(2), [0.0, 1.0])
+
+        assert store.get_message_collection("messages_202601").count() == 0
+        assert store.get_message_collection("messages_202602").count() == 1
+
+        assert store.delete_message("c:1") is True
+        assert store.get_message_collection("messages_202602").count() == 0
+
+    @pytest.mark.asyncio
+    async def test_migrate_legacy_messages(self, store):
+        """测试将 messages 中的历史消息迁移到分区（含 dry-run 与幂等）"""
+        store.messages_collection.add(
+            ids=["c:1", "c:2", "c:x"],
+            embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]],
+            documents=["一月", "二月", "无时间"],
+            metadatas=[self._metadata(1), self._metadata(2), {"created_at": "unknown"}],
+        )
+
+        dry_run = await partition_message_vectors(store, dry_run=True, batch_size=2)
+        assert dry_run["details"]["partitions"] == {"messages_202601": 1, "messages_202602": 1}
+        assert store.messages_collection.count() == 3
+
+        result = await partition_message_vectors(store, batch_size=2)
+        assert result["success"] is True
+        assert result["details"]["moved"] == 2
+        assert store.messages_collection.get()["ids"] == ["c:x"]
+        assert store.get_message_collection("messages_202602").get()["documents"] == ["二月"]
+
+        again = await partition_message_vectors(store, batch_size=2)
+        assert again["details"]["moved"] == 0
@@ -0,0 +1,142 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试问答固定流水线的并发检索与 RRF 融合"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.ai.qa_engine_v3 import QAEngineV3
+
+
+def _semantic(summary_id: int) -> dict:
+    return {"summary_id": summary_id, "summary_text": f"s{summary_id}", "metadata": {}}
+
+
+def _keyword(summary_id: int) -> dict:
+    return {"id": summary_id, "summary_text": f"k{summary_id}", "channel_id": "c"}
+
+
+@pytest.fixture
+def engine():
+    engine = QAEngineV3.__new__(QAEngineV3)
+    engine.vector_store = MagicMock()
+    engine.vector_store.is_available.return_value = True
+    engine.vector_store.is_messages_available.return_value = False
+    engine.memory_manager = MagicMock()
+    return engine
+
+
+@pytest.mark.unit
+class TestRRFFusion:
+    """RRF 融合测试"""
+
+    def test_fuses_any_number_of_lists(self, engine):
+        """测试多路结果按融合分数排序，关键词行转换为统一格式"""
+        fused = engine._rrf_fusion(
+            [_semantic(1), _semantic(2)],
+            [_keyword(2), _keyword(3)],
+            [_semantic(3), _semantic(2)],
+        )
+
+        assert [r["summary_id"] for r in fused] == [2, 3, 1]
+        assert fused[0]["summary_text"] == "s2"
+        assert fused[1]["summary_text"] == "k3"
+        assert fused[1]["metadata"]["channel_id"] == "c"
+
+    def test_single_list_keeps_order(self, engine):
+        """测试只有一路结果时保持原始顺序"""
+        assert engine._rrf_fusion([_keyword(5), _keyword(4)], []) == [
+            QAEngineV3._keyword_to_candidate(_keyword(5)),
+            QAEngineV3._keyword_to_candidate(_keyword(4)),
+        ]
+
+
+@pytest.mark.unit
+class TestRetrievalLegs:
+    """并发检索分支测试"""
+
+    @pytest.mark.asyncio
+    async def test_legs_run_concurrently(self, engine):
+        """测试语义检索与关键词检索同时进行"""
+        started = []
+        both_started = asyncio.Event()
+
+        async def leg(result):
+            started.append(result)
+            if len(started) == 2:
+                both_started.set()
+            await asyncio.wait_for(both_started.wait(), timeout=1)
+            return result
+
+        async def semantic_leg(**kwargs):
+            return await leg([_semantic(1)])
+
+        async def keyword_leg(**kwargs):
+            return await leg([_keyword(2)])
+
+        engine.vector_store.asearch_similar = AsyncMock(side_effect=semantic_leg)
+        engine.memory_manager.search_summaries = AsyncMock(side_effect=keyword_leg)
+
+        semantic, keyword = await engine._run_retrieval_legs(
+            query="q", keywords=["k"], time_range=None, date_after=None, channel_id=None
+        )
+
+        assert semantic == [_semantic(1)]
+        assert keyword == [_keyword(2)]
+        assert engine.memory_manager.search_summaries.await_args.kwargs["time_range_days"] == 90
+
+    @pytest.mark.asyncio
+    async def test_timeout_and_error_drop_leg(self, engine):
+        """测试超时或失败的分支返回空结果，不影响其他分支"""
+
+        async def slow(**kwargs):
+            await asyncio.sleep(1)
+            return [_semantic(1)]
+
+        engine.vector_store.asearch_similar = AsyncMock(side_effect=slow)
+        engine.memory_manager.search_summaries = AsyncMock(return_value=[_keyword(2)])
+
+        with patch("core.ai.qa_engine_v3.SEMANTIC_LEG_TIMEOUT", 0.01):
+            semantic, keyword = await engine._run_retrieval_legs(
+                query="q", keywords=["k"], time_range=7, date_after=None, channel_id=None
+            )
+        assert semantic == []
+        assert keyword == [_keyword(2)]
+
+        engine.vector_store.asearch_similar = AsyncMock(return_value=[_semantic(1)])
+        engine.memory_manager.search_summaries = AsyncMock(side_effect=RuntimeError("db down"))
+        semantic, keyword = await engine._run_retrieval_legs(
+            query="q", keywords=["k"], time_range=7, date_after=None, channel_id=None
+        )
+        assert semantic == [_semantic(1)]
+        assert keyword == []
+
+    @pytest.mark.asyncio
+    async def test_recent_summaries_only_supplement_sparse_semantic(self, engine):
+        """测试无关键词时，语义结果充足则丢弃关键词分支返回的最新总结"""
+        engine.vector_store.is_messages_available.return_value = True
+        engine.vector_store.asearch_all = AsyncMock(return_value=[_semantic(i) for i in range(5)])
+        engine.memory_manager.search_summaries = AsyncMock(return_value=[_keyword(9)])
+
+        semantic, keyword = await engine._run_retrieval_legs(
+            query="q",
+            keywords=[],
+            time_range=None,
+            date_after=None,
+            channel_id=None,
+            search_all=True,
+        )
+
+        assert len(semantic) == 5
+        assert keyword == []
+        engine.vector_store.asearch_all.assert_awaited_once()
@@ -0,0 +1,260 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试问答引擎的异步 LLM 流式生成"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.ai.qa_engine_v3 import QAEngineV3
+
+
+class FakeStream:
+    """模拟 AsyncOpenAI 返回的流（记录是否被关闭）"""
+
+    def __init__(self, deltas: list[str | None]):
+        self._chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=d))])
+            for d in deltas
+        ]
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def llm():
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock()
+    with (
+        patch("core.ai.qa_engine_v3.async_client_llm", client),
+        patch("core.ai.qa_engine_v3.get_llm_model", return_value="test-model"),
+    ):
+        yield client
+
+
+@pytest.mark.unit
+class TestAsyncStreaming:
+    """异步流式生成测试"""
+
+    @pytest.mark.asyncio
+    async def test_stream_completion_yields_deltas_and_closes(self, llm):
+        """测试逐段输出非空增量，结束后关闭底层流"""
+        stream = FakeStream(["你好", None, "世界"])
+        llm.chat.completions.create.return_value = stream
+
+        deltas = [d async for d in QAEngineV3._stream_completion([{"role": "user"}])]
+
+        assert deltas == ["你好", "世界"]
+        assert stream.closed
+        assert llm.chat.completions.create.await_args.kwargs["stream"] is True
+
+    @pytest.mark.asyncio
+    async def test_abandoned_stream_is_closed(self, llm):
+        """测试调用方提前关闭生成器时中断 LLM 流"""
+        stream = FakeStream(["a", "b", "c"])
+        llm.chat.completions.create.return_value = stream
+
+        generator = QAEngineV3._stream_completion([{"role": "user"}])
+        assert await generator.__anext__() == "a"
+        await generator.aclose()
+
+        assert stream.closed
+
+    @pytest.mark.asyncio
+    async def test_generate_answer_stream_appends_sources(self, llm):
+        """测试降级路径通过异步客户端流式生成并追加来源信息"""
+        llm.chat.completions.create.return_value = FakeStream(["回答"])
+        engine = QAEngineV3.__new__(QAEngineV3)
+        engine._build_rag_prompts = AsyncMock(return_value=("system", "user"))
+        engine._format_source_info_v3 = MagicMock(return_value="📚 数据来源: A")
+
+        chunks = [c async for c in engine.generate_answer_stream("问题", [{"summary_id": 1}])]
+
+        assert chunks == ["回答", "\n\n📚 数据来源: A"]
+        messages = llm.chat.completions.create.await_args.kwargs["messages"]
+        assert [m["content"] for m in messages] == ["system", "user"]
+
+
+def _tool_call_message(call_id: str, keyword: str):
+    """模拟一次 keyword_search 工具调用的 LLM 响应"""
+    tool_call = SimpleNamespace(
+        id=call_id,
+        function=SimpleNamespace(
+            name="keyword_search", arguments=json.dumps({"keywords": [keyword]})
+        ),
+    )
+    message = SimpleNamespace(content="", tool_calls=[tool_call])
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _answer_ready_message():
+    message = SimpleNamespace(content="", tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.mark.unit
+class TestConcurrentAgentLoops:
+    """并发 agent loop 隔离测试"""
+
+    @pytest.mark.asyncio
+    async def test_interleaved_loops_keep_their_own_sources(self, llm):
+        """测试两个交错执行的 agent loop 各自只引用自己的检索结果"""
+        b_searched = asyncio.Event()
+
+        async def create(**kwargs):
+            if kwargs.get("stream"):
+                return FakeStream(["回答"])
+            messages = kwargs["messages"]
+            user = "A" if messages[1]["content"].startswith("A") else "B"
+            if not any(m["role"] == "tool" for m in messages):
+                return _tool_call_message(f"call-{user}", user)
+            if user == "A":
+                # A 的工具结果已返回，等待 B 开始并完成检索后再继续
+                await b_searched.wait()
+            else:
+                b_searched.set()
+            return _answer_ready_message()
+
+        async def search_summaries(keywords, **kwargs):
+            user = keywords[0]
+            return [
+                {
+                    "id": 1 if user == "A" else 2,
+                    "summary_text": f"{user} 的总结",
+                    "channel_id": f"https://t.me/{user.lower()}",
+                    "channel_name": f"{user}频道",
+                }
+            ]
+
+        llm.chat.completions.create.side_effect = create
+        engine = QAEngineV3.__new__(QAEngineV3)
+        engine.vector_store = MagicMock()
+        engine.reranker = MagicMock()
+        engine.memory_manager = MagicMock()
+        engine.memory_manager.get_channel_context = AsyncMock(return_value="")
+        engine.memory_manager.search_summaries = AsyncMock(side_effect=search_summaries)
+        engine.conversation_mgr = MagicMock()
+        engine.conversation_mgr.format_conversation_context.return_value = ""
+
+        async def run(query):
+            stream = engine._agentic_stream(query, [], None, None, [])
+            return "".join([chunk async for chunk in stream])
+
+        task_a = asyncio.create_task(run("A 有什么新闻？"))
+        await asyncio.sleep(0.01)
+        task_b = asyncio.create_task(run("B 有什么新闻？"))
+        answer_a, answer_b = await asyncio.gather(task_a, task_b)
+
+        assert "A频道" in answer_a and "B频道" not in answer_a
+        assert "B频道" in answer_b and "A频道" not in answer_b
+
+
+@pytest.mark.unit
+class TestStreamCancellation:
+    """流式问答被放弃或取消时的对话历史测试"""
+
+    @pytest.fixture
+    def engine(self):
+        engine = QAEngineV3.__new__(QAEngineV3)
+        engine.conversation_mgr = MagicMock()
+        engine.conversation_mgr.get_or_create_session.return_value = ("s1", False)
+        engine.conversation_mgr.save_message = AsyncMock()
+        engine.conversation_mgr.get_conversation_history = AsyncMock(return_value=[])
+        engine.intent_parser = MagicMock()
+        engine.intent_parser.parse_query.return_value = {
+            "intent": "content",
+            "original_query": "AI 有什么新闻",
+            "keywords": ["AI"],
+            "time_range": None,
+        }
+        engine._resolve_channel_from_parsed = AsyncMock(return_value=None)
+        engine._lookup_cached_answer = AsyncMock(return_value=(None, None, None))
+        engine._is_first_turn = MagicMock(return_value=False)
+        return engine
+
+    @staticmethod
+    def _saved_turns(engine) -> list[tuple[str, str]]:
+        return [
+            (call.kwargs["role"], call.kwargs["content"])
+            for call in engine.conversation_mgr.save_message.await_args_list
+        ]
+
+    @pytest.mark.asyncio
+    async def test_closed_stream_records_cancelled_turn(self, engine):
+        """测试调用方中途关闭生成器时补记带部分回答的"（已取消）"助手回合"""
+
+        async def answer(user_id, factory):
+            yield "第一段"
+            yield "第二段"
+
+        engine._admitted_stream = answer
+
+        stream = engine.process_query_stream("AI 有什么新闻", 1)
+        assert await stream.__anext__() == "第一段"
+        await stream.aclose()
+
+        assert self._saved_turns(engine) == [
+            ("user", "AI 有什么新闻"),
+            ("assistant", "第一段\n\n（已取消）"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_task_records_turn_and_propagates(self, engine):
+        """测试所在任务被取消时补记已取消回合，并继续向上抛出 CancelledError"""
+        started = asyncio.Event()
+
+        async def answer(user_id, factory):
+            started.set()
+            await asyncio.Event().wait()
+            yield "不会输出"
+
+        engine._admitted_stream = answer
+
+        async def consume():
+            return [chunk async for chunk in engine.process_query_stream("AI 有什么新闻", 1)]
+
+        task = asyncio.create_task(consume())
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert self._saved_turns(engine)[-1] == ("assistant", "（已取消）")
+
+    @pytest.mark.asyncio
+    async def test_completed_answer_is_not_marked_cancelled(self, engine):
+        """测试回答已保存后关闭生成器不会再追加已取消回合"""
+
+        async def answer(user_id, factory):
+            yield "完整回答"
+
+        engine._admitted_stream = answer
+
+        stream = engine.process_query_stream("AI 有什么新闻", 1)
+        assert [await stream.__anext__(), await stream.__anext__()] == ["完整回答", "__DONE__"]
+        await stream.aclose()
+
+        assert self._saved_turns(engine) == [
+            ("user", "AI 有什么新闻"),
+            ("assistant", "完整回答"),
+        ]
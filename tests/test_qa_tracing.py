@@ -0,0 +1,116 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试问答流水线延迟追踪"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.ai.agent_tools import ToolExecutor
+from core.ai.qa_tracing import LatencyTracer, current_trace_id, load_latency_snapshot
+from core.web_api.routes import system
+
+
+@pytest.fixture
+def tracer():
+    return LatencyTracer(window=100, slow_ms=0)
+
+
+@pytest.mark.unit
+class TestLatencyTracer:
+    """延迟追踪器测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_spans_attach_to_parent(self, tracer):
+        """测试并发子任务的 span 挂到同一父 span 下，追踪结束后恢复上下文"""
+
+        async def leg(name):
+            with tracer.span(name):
+                await asyncio.sleep(0)
+                return current_trace_id()
+
+        with tracer.trace("qa_request") as root:
+            with tracer.span("retrieval"):
+                trace_ids = await asyncio.gather(leg("semantic_leg"), leg("keyword_leg"))
+
+        assert trace_ids == [root.trace_id, root.trace_id]
+        assert current_trace_id() is None
+        tree = root.to_dict()
+        assert [c["name"] for c in tree["children"]] == ["retrieval"]
+        assert {c["name"] for c in tree["children"][0]["children"]} == {
+            "semantic_leg",
+            "keyword_leg",
+        }
+
+    def test_percentiles_per_stage(self, tracer):
+        """测试按阶段汇总滚动窗口分位数，未在追踪中的 span 不记录"""
+        with tracer.span("orphan") as span:
+            assert span is None
+
+        for _ in range(10):
+            with tracer.trace("qa_request"):
+                with tracer.span("intent_parse"):
+                    pass
+
+        stages = tracer.get_stats()["stages"]
+        assert set(stages) == {"qa_request", "intent_parse"}
+        assert stages["intent_parse"]["count"] == 10
+        assert stages["intent_parse"]["p50_ms"] <= stages["intent_parse"]["p99_ms"]
+
+    def test_slow_request_logged_with_tree_and_snapshot(self, tmp_path):
+        """测试慢请求记录完整 span 树，快照写入文件后可被读取"""
+        path = tmp_path / "qa_latency.json"
+        tracer = LatencyTracer(slow_ms=0.001, snapshot_path=str(path))
+
+        with pytest.raises(RuntimeError):
+            with tracer.trace("qa_request", user_id=1):
+                with tracer.span("agent_llm", iteration=1):
+                    raise RuntimeError("boom")
+
+        slow = tracer.get_stats()["slow_requests"]
+        assert len(slow) == 1
+        tree = slow[0]["tree"]
+        assert tree["attrs"] == {"user_id": 1, "error": "RuntimeError"}
+        assert tree["children"][0]["attrs"] == {"iteration": 1, "error": "RuntimeError"}
+
+        snapshot = load_latency_snapshot(str(path))
+        assert snapshot["slow_requests"][0]["trace_id"] == slow[0]["trace_id"]
+        assert "agent_llm" in snapshot["stages"]
+
+    @pytest.mark.asyncio
+    async def test_tool_execution_recorded_as_stage(self, tracer):
+        """测试工具调用按工具名记录阶段耗时"""
+        memory_manager = MagicMock()
+        memory_manager.list_channels = AsyncMock(return_value=[])
+        executor = ToolExecutor(MagicMock(), memory_manager, MagicMock())
+
+        with patch("core.ai.agent_tools.get_latency_tracer", return_value=tracer):
+            with tracer.trace("qa_request"):
+                await executor.execute_many([("list_channels", {})])
+
+        assert "tool.list_channels" in tracer.get_stats()["stages"]
+
+
+@pytest.mark.asyncio
+async def test_latency_endpoint_reads_snapshot(tmp_path):
+    """测试延迟统计接口返回问答Bot写入的快照"""
+    path = tmp_path / "qa_latency.json"
+    path.write_text(json.dumps({"stages": {"qa_request": {"p95_ms": 1.0}}}), encoding="utf-8")
+
+    with patch.dict("os.environ", {"QA_TRACE_SNAPSHOT_PATH": str(path)}):
+        result = await system.get_qa_bot_latency()
+    assert result == {"success": True, "data": {"stages": {"qa_request": {"p95_ms": 1.0}}}}
+
+    with patch.dict("os.environ", {"QA_TRACE_SNAPSHOT_PATH": str(tmp_path / "missing.json")}):
+        result = await system.get_qa_bot_latency()
+    assert result["success"] is False
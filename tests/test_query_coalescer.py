@@ -0,0 +1,155 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试相同查询合并"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.ai.qa_engine_v3 import QAEngineV3
+from core.ai.query_coalescer import QueryCoalescer
+
+
+class Source:
+    """可控的回答生成器：每次 release() 产出一个片段"""
+
+    def __init__(self, chunks: list[str]):
+        self.chunks = chunks
+        self.calls = 0
+        self.closed = False
+        self.released = asyncio.Semaphore(0)
+
+    def release(self, n: int = 1):
+        for _ in range(n):
+            self.released.release()
+
+    async def generate(self):
+        self.calls += 1
+        try:
+            for chunk in self.chunks:
+                await self.released.acquire()
+                yield chunk
+        finally:
+            self.closed = True
+
+
+async def _collect(stream) -> list[str]:
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.unit
+class TestQueryCoalescer:
+    """相同查询合并测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_queries_share_one_generation(self):
+        """测试相同键的并发请求只生成一次，后到的请求回放已生成的片段"""
+        coalescer = QueryCoalescer()
+        source = Source(["a", "b", "c"])
+
+        first = asyncio.create_task(_collect(coalescer.stream("k", source.generate)))
+        source.release()
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(_collect(coalescer.stream("k", source.generate)))
+        await asyncio.sleep(0.01)
+        source.release(2)
+
+        assert await first == ["a", "b", "c"]
+        assert await second == ["a", "b", "c"]
+        assert source.calls == 1
+        assert coalescer.get_stats() == {"in_flight": 0, "coalesced": 1}
+
+    @pytest.mark.asyncio
+    async def test_generation_cancelled_only_when_all_waiters_leave(self):
+        """测试单个请求取消不影响其他请求，全部离开后停止生成"""
+        coalescer = QueryCoalescer()
+        source = Source(["a", "b"])
+
+        leaving = asyncio.create_task(_collect(coalescer.stream("k", source.generate)))
+        staying = asyncio.create_task(_collect(coalescer.stream("k", source.generate)))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        source.release(2)
+
+        assert await staying == ["a", "b"]
+
+        abandoned = Source(["x", "y"])
+        task = asyncio.create_task(_collect(coalescer.stream("j", abandoned.generate)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0.01)
+        assert abandoned.closed
+        assert coalescer.get_stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_error_propagates_to_all_waiters(self):
+        """测试生成失败时所有等待的请求都收到异常"""
+        coalescer = QueryCoalescer()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            yield "a"
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            _collect(coalescer.stream("k", failing)),
+            _collect(coalescer.stream("k", failing)),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.unit
+class TestQueryCoalescingStream:
+    """流式问答接入相同查询合并测试"""
+
+    @pytest.mark.asyncio
+    async def test_identical_first_turn_queries_share_generation(self):
+        """测试不同用户的相同首轮问题共享生成，各自保存对话历史"""
+        engine = QAEngineV3.__new__(QAEngineV3)
+        engine.conversation_mgr = MagicMock()
+        engine.conversation_mgr.get_or_create_session.side_effect = lambda uid: (f"s{uid}", False)
+        engine.conversation_mgr.save_message = AsyncMock()
+        engine.conversation_mgr.get_conversation_history = AsyncMock(
+            return_value=[{"role": "user", "content": "AI 有什么新闻？"}]
+        )
+        engine.intent_parser = MagicMock()
+        engine.intent_parser.parse_query.side_effect = lambda q: {
+            "intent": "content",
+            "original_query": q,
+            "keywords": ["AI"],
+            "time_range": 7,
+        }
+        engine._resolve_channel_from_parsed = AsyncMock(return_value=None)
+        engine._lookup_cached_answer = AsyncMock(return_value=(None, None, None))
+        source = Source(["回答"])
+        engine._agentic_stream = MagicMock(side_effect=lambda **kwargs: source.generate())
+
+        with patch("core.ai.qa_engine_v3.get_query_coalescer", return_value=QueryCoalescer()):
+            tasks = [
+                asyncio.create_task(_collect(engine.process_query_stream(q, uid)))
+                for uid, q in ((1, "AI 有什么新闻？"), (2, "ai 有什么新闻"))
+            ]
+            await asyncio.sleep(0.01)
+            source.release()
+            results = await asyncio.gather(*tasks)
+
+        assert results == [["回答", "__DONE__"], ["回答", "__DONE__"]]
+        assert engine._agentic_stream.call_count == 1
+        saved = [c.kwargs for c in engine.conversation_mgr.save_message.await_args_list]
+        assert {(s["session_id"], s["role"]) for s in saved} == {
+            ("s1", "user"),
+            ("s1", "assistant"),
+            ("s2", "user"),
+            ("s2", "assistant"),
+        }
@@ -4,11 +4,12 @@ Copyright 2026 Sakura-Bot
 本项目采用 AGPL-3.0 许可
 """
 
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from core.ai.reranker import Reranker, get_reranker
+from core.ai.lexical_ranker import bm25_scores, lexical_rerank, query_terms
+from core.ai.reranker import RerankCache, Reranker, get_reranker
 
 
 @pytest.mark.unit
@@ -76,8 +77,9 @@ class TestRerankerRerank:
     """Reranker 重排序测试"""
 
     def test_rerank_without_api_key(self, monkeypatch):
-        """测试没有API KEY时返回原始结果"""
+        """测试没有API KEY且未启用本地重排时返回原始结果"""
         monkeypatch.delenv("RERANKER_API_KEY", raising=False)
+        monkeypatch.setenv("RERANKER_LOCAL", "false")
 
         r = Reranker()
         candidates = [
@@ -95,6 +97,7 @@ class TestRerankerRerank:
     def test_rerank_with_custom_top_k(self, monkeypatch):
         """测试自定义top_k"""
         monkeypatch.delenv("RERANKER_API_KEY", raising=False)
+        monkeypatch.setenv("RERANKER_LOCAL", "false")
 
         r = Reranker()
         candidates = [{"summary_id": i, "summary_text": f"文档{i}"} for i in range(10)]
@@ -269,6 +272,180 @@ class TestRerankerRerank:
         assert result[0]["rerank_score"] == 0.9
 
 
+@pytest.mark.unit
+class TestRerankerAsync:
+    """异步重排序与结果缓存测试"""
+
+    @pytest.fixture
+    def reranker(self, monkeypatch):
+        monkeypatch.setenv("RERANKER_API_KEY", "test_key")
+        r = Reranker()
+        response = MagicMock()
+        response.json.return_value = {
+            "results": [
+                {"index": 1, "relevance_score": 0.9},
+                {"index": 0, "relevance_score": 0.4},
+            ]
+        }
+        client = MagicMock()
+        client.post = AsyncMock(return_value=response)
+        r._get_async_client = MagicMock(return_value=client)
+        return r, client
+
+    @pytest.mark.asyncio
+    async def test_arerank_success(self, reranker):
+        """测试异步重排序结果"""
+        r, client = reranker
+        candidates = [
+            {"summary_id": 1, "summary_text": "文档1"},
+            {"summary_id": 2, "summary_text": "文档2"},
+        ]
+
+        result = await r.arerank("测试查询", candidates, top_k=2)
+
+        assert [doc["summary_id"] for doc in result] == [2, 1]
+        assert result[0]["rerank_score"] == 0.9
+        assert client.post.await_args.kwargs["json"]["top_n"] == 2
+
+    @pytest.mark.asyncio
+    async def test_arerank_cache_hit_ignores_candidate_order(self, reranker):
+        """测试相同候选集（顺序不同）重复重排时命中缓存"""
+        r, client = reranker
+        candidates = [
+            {"summary_id": 1, "summary_text": "文档1"},
+            {"summary_id": 2, "summary_text": "文档2"},
+        ]
+
+        await r.arerank("测试查询", candidates, top_k=2)
+        result = await r.arerank("  测试查询 ", list(reversed(candidates)), top_k=2)
+
+        assert client.post.await_count == 1
+        assert [doc["summary_id"] for doc in result] == [2, 1]
+        assert result[1]["rerank_score"] == 0.4
+        assert r.cache.get_stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_arerank_different_candidates_miss_cache(self, reranker):
+        """测试候选集文本不同时不命中缓存"""
+        r, client = reranker
+
+        await r.arerank("测试查询", [{"summary_text": "甲"}, {"summary_text": "乙"}], top_k=2)
+        await r.arerank("测试查询", [{"summary_text": "甲"}, {"summary_text": "丙"}], top_k=2)
+
+        assert client.post.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_arerank_api_error(self, reranker):
+        """测试异步API调用失败时返回原始结果且不写入缓存"""
+        r, client = reranker
+        r.local_enabled = False
+        client.post.side_effect = Exception("API错误")
+        candidates = [{"summary_id": 1, "summary_text": "文档1"}]
+
+        result = await r.arerank("测试查询", candidates, top_k=1)
+
+        assert result == candidates
+        assert r.cache.get_stats()["size"] == 0
+
+    def test_cache_lru_eviction(self):
+        """测试缓存超过上限时淘汰最久未使用的条目"""
+        cache = RerankCache(max_size=2, ttl=0)
+        keys = [cache.make_key("m", f"q{i}", ["id:1"], 5) for i in range(3)]
+        cache.set(keys[0], [("id:1", 0.1)])
+        cache.set(keys[1], [("id:1", 0.2)])
+        cache.get(keys[0])
+        cache.set(keys[2], [("id:1", 0.3)])
+
+        assert cache.get(keys[0]) == [("id:1", 0.1)]
+        assert cache.get(keys[1]) is None
+
+    def test_cache_disabled(self):
+        """测试 max_size=0 时禁用缓存"""
+        cache = RerankCache(max_size=0)
+        key = cache.make_key("m", "q", ["id:1"], 5)
+        cache.set(key, [("id:1", 0.1)])
+
+        assert cache.get(key) is None
+
+
+@pytest.mark.unit
+class TestLexicalRerank:
+    """本地 BM25 重排序测试"""
+
+    CANDIDATES = [
+        {"summary_id": 1, "summary_text": "今天频道讨论了天气和午餐安排"},
+        {"summary_id": 2, "summary_text": "Python 3.13 发布，新增自由线程模式"},
+        {"summary_id": 3, "summary_text": "人工智能大模型推理优化：Python 服务的量化与批处理"},
+    ]
+
+    def test_query_terms_use_intent_keywords(self):
+        """测试查询词项来自关键词提取（去除时间词与停用词）并按二元组切分"""
+        terms = query_terms("最近关于人工智能的讨论有哪些？Python")
+
+        assert "python" in terms
+        assert "人工" in terms and "智能" in terms
+        assert "最近" not in terms
+
+    def test_bm25_prefers_rare_terms(self):
+        """测试 BM25 中罕见词项权重更高、未命中文档得分为 0"""
+        scores = bm25_scores(["python", "量化"], [["python"], ["python", "量化"], ["天气"]])
+
+        assert scores[1] > scores[0] > 0
+        assert scores[2] == 0
+
+    def test_lexical_rerank_orders_by_relevance(self):
+        """测试按词法相关度排序，未命中文档保持原顺序"""
+        result = lexical_rerank("Python 量化优化", self.CANDIDATES, top_k=3)
+
+        assert [doc["summary_id"] for doc in result] == [3, 2, 1]
+        assert result[0]["rerank_score"] == 1.0
+        assert result[2]["rerank_score"] == 0.0
+        assert "bm25_score" in result[0]
+
+    def test_rerank_without_api_key_uses_local(self, monkeypatch):
+        """测试没有API KEY时使用本地BM25重排"""
+        monkeypatch.delenv("RERANKER_API_KEY", raising=False)
+        monkeypatch.delenv("RERANKER_LOCAL", raising=False)
+
+        r = Reranker()
+        result = r.rerank("Python 量化优化", self.CANDIDATES, top_k=2)
+
+        assert r.is_local_available()
+        assert [doc["summary_id"] for doc in result] == [3, 2]
+
+    @pytest.mark.asyncio
+    async def test_arerank_api_error_falls_back_to_local(self, monkeypatch):
+        """测试远程API失败时回退到本地BM25重排"""
+        monkeypatch.setenv("RERANKER_API_KEY", "test_key")
+        r = Reranker()
+        client = MagicMock()
+        client.post = AsyncMock(side_effect=Exception("API错误"))
+        r._get_async_client = MagicMock(return_value=client)
+
+        result = await r.arerank("Python 量化优化", self.CANDIDATES, top_k=1)
+
+        assert [doc["summary_id"] for doc in result] == [3]
+
+    @pytest.mark.asyncio
+    async def test_arerank_prefilter_limits_documents_sent(self, monkeypatch):
+        """测试预筛后只将前N个候选发送给远程API"""
+        monkeypatch.setenv("RERANKER_API_KEY", "test_key")
+        monkeypatch.setenv("RERANKER_PREFILTER_K", "2")
+        r = Reranker()
+        response = MagicMock()
+        response.json.return_value = {"results": [{"index": 1, "relevance_score": 0.8}]}
+        client = MagicMock()
+        client.post = AsyncMock(return_value=response)
+        r._get_async_client = MagicMock(return_value=client)
+
+        result = await r.arerank("Python 量化优化", self.CANDIDATES, top_k=1)
+
+        sent = client.post.await_args.kwargs["json"]["documents"]
+        assert sent == [self.CANDIDATES[2]["summary_text"], self.CANDIDATES[1]["summary_text"]]
+        assert result[0]["summary_id"] == 2
+        assert result[0]["rerank_score"] == 0.8
+
+
 @pytest.mark.unit
 class TestGetReranker:
     """获取Reranker实例测试"""
@@ -0,0 +1,183 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试总结倒排索引"""
+
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.ai.memory_manager import MemoryManager
+from core.ai.summary_index import SummaryInvertedIndex, get_summary_index
+
+ROWS = [
+    {
+        "id": 1,
+        "channel_id": "https://t.me/a",
+        "channel_name": "A",
+        "summary_text": "人工智能大模型发布，推理速度提升",
+        "created_at": datetime(2026, 1, 10),
+        "summary_message_ids": [11],
+        "keywords": '["AI"]',
+    },
+    {
+        "id": 2,
+        "channel_id": "https://t.me/b",
+        "channel_name": "B",
+        "summary_text": "本周天气晴朗，频道讨论了午餐",
+        "created_at": datetime(2026, 1, 12),
+    },
+    {
+        "id": 3,
+        "channel_id": "https://t.me/a",
+        "channel_name": "A",
+        "summary_text": "大模型量化与人工智能芯片",
+        "created_at": datetime(2026, 2, 1),
+    },
+]
+
+
+def _ts(*args) -> int:
+    return int(datetime(*args, tzinfo=UTC).timestamp())
+
+
+@pytest.fixture
+def index():
+    idx = SummaryInvertedIndex()
+    for row in ROWS:
+        idx.add(row)
+    return idx
+
+
+@pytest.mark.unit
+class TestSummaryInvertedIndex:
+    """倒排索引检索测试"""
+
+    def test_search_ranks_and_returns_rows(self, index):
+        """测试 BM25 排序并返回与数据库行一致的字段"""
+        results = index.search(["人工智能", "AI"])
+
+        assert [r["id"] for r in results] == [1, 3]
+        assert results[0]["channel_name"] == "A"
+        assert results[0]["created_at"] == "2026-01-10T00:00:00"
+        assert results[0]["summary_message_ids"] == [11]
+        assert results[0]["relevance"] > results[1]["relevance"] > 0
+
+    def test_search_filters_channel_and_time(self, index):
+        """测试频道与时间过滤"""
+        assert [r["id"] for r in index.search(["大模型"], start_ts=_ts(2026, 1, 20))] == [3]
+        assert index.search(["大模型"], channel_id="https://t.me/b") == []
+        assert [r["id"] for r in index.search(["天气"], channel_id="https://t.me/b")] == [2]
+
+    def test_update_and_remove(self, index):
+        """测试重复写入覆盖旧内容、按时间移除"""
+        index.add({**ROWS[1], "summary_text": "人工智能周报"})
+        assert {r["id"] for r in index.search(["人工智能"])} == {1, 2, 3}
+        assert index.search(["天气"]) == []
+
+        assert index.remove_older_than(_ts(2026, 1, 11)) == 1
+        assert {r["id"] for r in index.search(["人工智能"])} == {2, 3}
+        assert len(index) == 2
+
+    def test_snapshot_roundtrip(self, index, tmp_path):
+        """测试快照保存与加载"""
+        index.path = tmp_path / "summary_index.json.gz"
+        index.save()
+
+        restored = SummaryInvertedIndex(str(index.path))
+
+        assert restored.load() is True
+        assert restored._max_id == 3
+        assert restored.search(["人工智能"]) == index.search(["人工智能"])
+
+    @pytest.mark.asyncio
+    async def test_build_loads_snapshot_and_catches_up(self, tmp_path):
+        """测试启动时加载快照并按主键追平新增总结"""
+        path = tmp_path / "summary_index.json.gz"
+        warm = SummaryInvertedIndex(str(path))
+        warm.add(ROWS[0])
+        warm.save()
+
+        db = MagicMock()
+        db.get_summaries_after_id = AsyncMock(side_effect=[ROWS[1:], []])
+        index = SummaryInvertedIndex(str(path))
+
+        await index.build(db, batch_size=2)
+
+        assert index.ready
+        assert len(index) == 3
+        db.get_summaries_after_id.assert_any_await(1, 2)
+        assert SummaryInvertedIndex(str(path)).load() is True
+
+    @pytest.mark.asyncio
+    async def test_refresh_adds_updates_and_prunes(self):
+        """测试刷新追加新总结、补入后写的关键词并移除数据库中已删除的总结"""
+        index = SummaryInvertedIndex()
+        index.add(ROWS[0])
+        index.add(ROWS[1])
+        tagged = {**ROWS[1], "topics": '["气象"]'}
+
+        db = MagicMock()
+        db.get_summaries_after_id = AsyncMock(side_effect=[[ROWS[2]], [tagged, ROWS[2]]])
+        db.get_oldest_summary_time = AsyncMock(return_value=datetime(2026, 1, 12))
+
+        await index.refresh(db)
+
+        assert sorted(index._docs) == [2, 3]
+        assert [r["id"] for r in index.search(["气象"])] == [2]
+        assert index.search(["AI"]) == []
+
+    @pytest.mark.asyncio
+    async def test_snapshot_writes_are_throttled(self, tmp_path):
+        """测试快照只在有变更且超过最小间隔时写入"""
+        index = SummaryInvertedIndex(str(tmp_path / "summary_index.json.gz"), save_interval=600)
+        index.add(ROWS[0])
+        assert await index.maybe_save(force=True) is True
+
+        index.add(ROWS[1])
+        assert await index.maybe_save() is False
+
+        index._last_save -= 600
+        assert await index.maybe_save() is True
+        assert await index.maybe_save(force=True) is False
+
+
+@pytest.mark.unit
+class TestSummaryIndexIntegration:
+    """倒排索引接入 MemoryManager 测试"""
+
+    def test_disabled_by_default(self, monkeypatch):
+        """测试默认不启用"""
+        monkeypatch.delenv("SUMMARY_INDEX_ENABLED", raising=False)
+
+        assert get_summary_index() is None
+
+    @patch("core.ai.memory_manager.get_db_manager")
+    @pytest.mark.asyncio
+    async def test_search_summaries_uses_ready_index(self, mock_get_db, index):
+        """测试索引就绪时关键词检索不访问数据库"""
+        mock_db = MagicMock()
+        mock_db.search_summaries_fulltext = AsyncMock()
+        mock_db.get_summaries = AsyncMock()
+        mock_get_db.return_value = mock_db
+        index._ready = True
+
+        manager = MemoryManager()
+        with patch("core.ai.memory_manager.get_summary_index", return_value=index):
+            results = await manager.search_summaries(
+                keywords=["人工智能"],
+                time_range_days=20,
+                date_before=datetime(2026, 2, 5),
+            )
+
+        assert [r["id"] for r in results] == [3]
+        mock_db.search_summaries_fulltext.assert_not_called()
+        mock_db.get_summaries.assert_not_called()
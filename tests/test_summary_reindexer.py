@@ -0,0 +1,172 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试总结向量重建"""
+
+import asyncio
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.ai.summary_reindexer import SummaryReindexer, _build_metadata
+
+
+def _rows(ids):
+    return [
+        {
+            "id": i,
+            "channel_id": "c1",
+            "channel_name": "频道",
+            "summary_text": f"summary {i}",
+            "message_count": 3,
+            "created_at": datetime(2026, 1, 1),
+            "summary_type": "daily",
+            "summary_message_ids": [i],
+        }
+        for i in ids
+    ]
+
+
+class FakeDB:
+    """按 keyset 分页返回固定行的数据库替身"""
+
+    def __init__(self, ids, fail_after_id=None):
+        self.rows = _rows(ids)
+        self.fail_after_id = fail_after_id
+        self.calls = []
+
+    async def count_summaries(self):
+        return len(self.rows)
+
+    async def get_summaries_after_id(self, last_id=0, limit=100):
+        self.calls.append(last_id)
+        if self.fail_after_id is not None and last_id >= self.fail_after_id:
+            raise ConnectionError("db down")
+        return [r for r in self.rows if r["id"] > last_id][:limit]
+
+
+@pytest.fixture
+def deps():
+    """替换数据库、向量存储与 Embedding 生成器"""
+    vector_store = MagicMock()
+    vector_store.is_available.return_value = True
+    vector_store.aupsert_summaries_batch = AsyncMock(
+        side_effect=lambda summary_ids, **kwargs: len(summary_ids)
+    )
+    vector_store.aindex_summary_passages = AsyncMock(return_value=0)
+
+    emb_gen = MagicMock()
+    emb_gen.is_available.return_value = True
+    emb_gen.abatch_generate = AsyncMock(side_effect=lambda texts: [[0.1, 0.2] for _ in texts])
+
+    with (
+        patch("core.ai.summary_reindexer.get_vector_store", return_value=vector_store),
+        patch("core.ai.summary_reindexer.get_async_embedding_generator", return_value=emb_gen),
+    ):
+        yield vector_store, emb_gen
+
+
+@pytest.mark.unit
+def test_build_metadata_matches_realtime_fields():
+    """测试元数据字段与实时写入保持一致，created_at 视为 UTC"""
+    metadata = _build_metadata(_rows([7])[0])
+
+    assert metadata["created_at"] == "2026-01-01T00:00:00+00:00"
+    assert metadata["summary_type"] == "daily"
+    assert json.loads(metadata["summary_message_ids"]) == [7]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_reindex_streams_in_keyset_batches(deps, tmp_path):
+    """测试按 ID 顺序分批处理并在完成后清除检查点"""
+    vector_store, emb_gen = deps
+    db = FakeDB([1, 2, 3, 5, 8])
+    checkpoint = tmp_path / "checkpoint.json"
+
+    with patch("core.ai.summary_reindexer.get_db_manager", return_value=db):
+        result = await SummaryReindexer(str(checkpoint), batch_size=2).run()
+
+    assert result["status"] == "completed"
+    assert result["processed"] == 5
+    assert result["indexed"] == 5
+    assert result["percent"] == 100.0
+    assert db.calls == [0, 2, 5]
+    assert emb_gen.abatch_generate.await_count == 3
+    assert vector_store.aupsert_summaries_batch.await_args_list[0].kwargs["summary_ids"] == [1, 2]
+    assert vector_store.aindex_summary_passages.await_args_list[0].kwargs["summary_ids"] == [1, 2]
+    assert not checkpoint.exists()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_reindex_resumes_from_checkpoint(deps, tmp_path):
+    """测试中途失败后保留检查点，再次运行从断点继续"""
+    vector_store, _ = deps
+    checkpoint = tmp_path / "checkpoint.json"
+    reindexer = SummaryReindexer(str(checkpoint), batch_size=2)
+
+    with patch("core.ai.summary_reindexer.get_db_manager", return_value=FakeDB([1, 2, 3, 4], 2)):
+        failed = await reindexer.run()
+
+    assert failed["status"] == "failed"
+    assert json.loads(checkpoint.read_text())["last_id"] == 2
+
+    db = FakeDB([1, 2, 3, 4])
+    with patch("core.ai.summary_reindexer.get_db_manager", return_value=db):
+        resumed = await reindexer.run()
+
+    assert resumed["status"] == "completed"
+    assert resumed["resumed_from"] == 2
+    assert resumed["processed"] == 4
+    assert db.calls[0] == 2
+    assert vector_store.aupsert_summaries_batch.await_args_list[-1].kwargs["summary_ids"] == [3, 4]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_reindex_stops_when_embedding_batch_fails(deps, tmp_path):
+    """测试整批 Embedding 失败时停止且不推进检查点"""
+    vector_store, emb_gen = deps
+    emb_gen.abatch_generate = AsyncMock(side_effect=lambda texts: [None for _ in texts])
+    checkpoint = tmp_path / "checkpoint.json"
+
+    with patch("core.ai.summary_reindexer.get_db_manager", return_value=FakeDB([1, 2])):
+        result = await SummaryReindexer(str(checkpoint), batch_size=2).run()
+
+    assert result["status"] == "failed"
+    assert result["processed"] == 0
+    assert not checkpoint.exists()
+    vector_store.aupsert_summaries_batch.assert_not_awaited()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_start_rejects_concurrent_jobs(deps, tmp_path):
+    """测试后台任务运行期间拒绝重复启动，且可取消"""
+    release = asyncio.Event()
+
+    class SlowDB(FakeDB):
+        async def get_summaries_after_id(self, last_id=0, limit=100):
+            await release.wait()
+            return await super().get_summaries_after_id(last_id, limit)
+
+    reindexer = SummaryReindexer(str(tmp_path / "checkpoint.json"), batch_size=2)
+    with patch("core.ai.summary_reindexer.get_db_manager", return_value=SlowDB([1, 2, 3])):
+        assert reindexer.start() is True
+        assert reindexer.start() is False
+        assert reindexer.get_progress()["status"] == "running"
+
+        assert await reindexer.cancel() is True
+
+    assert reindexer.is_running() is False
+    assert reindexer.get_progress()["status"] == "cancelled"
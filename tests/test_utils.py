@@ -8,6 +8,9 @@ from datetime import UTC
 
 import pytest
 
+from core.infrastructure.utils.text_chunking import join_passages, split_passages
+from core.infrastructure.utils.text_tokenize import normalize_query, tokenize_terms
+from core.infrastructure.utils.token_estimate import estimate_tokens, truncate_to_tokens
 from core.utils.date_utils import extract_date_range_from_summary
 from core.utils.message_utils import format_schedule_info
 
@@ -151,5 +154,89 @@ class TestMessageUtils:
         assert "05:05" in result
 
 
+@pytest.mark.unit
+class TestTextChunking:
+    """文本分段工具测试"""
+
+    REPORT = (
+        "**科技频道周报 1.8-1.15**\n\n"
+        "一、AI 动态\nOpenAI 发布了新模型。性能提升明显！社区反响热烈。\n\n"
+        "二、硬件\n苹果发布新芯片；功耗降低 20%。\n"
+    )
+
+    def test_split_passages_offsets_match_text(self):
+        """测试段落偏移与原文一致"""
+        passages = split_passages(self.REPORT, max_chars=60, min_chars=20)
+
+        assert len(passages) == 2
+        for passage in passages:
+            assert self.REPORT[passage["start"] : passage["end"]] == passage["text"]
+        assert passages[1]["text"].startswith("二、硬件")
+
+    def test_split_passages_respects_max_chars(self):
+        """测试超长句子被强制切分"""
+        text = "很长的一句话" * 50 + "。结束。"
+        passages = split_passages(text, max_chars=100)
+
+        assert all(len(p["text"]) <= 100 for p in passages)
+        assert "".join(p["text"] for p in passages) == text
+
+    def test_split_passages_short_text_single_passage(self):
+        """测试短文本只有一段，空文本没有段落"""
+        assert len(split_passages("只有一句话。", max_chars=100)) == 1
+        assert split_passages("   \n ") == []
+
+    def test_join_passages_orders_by_offset_and_limits_length(self):
+        """测试按原文顺序拼接并按相似度舍弃超长段落"""
+        passages = [
+            {"text": "第二段", "start": 10},
+            {"text": "第一段", "start": 0},
+            {"text": "很长的第三段" * 10, "start": 20},
+        ]
+
+        assert join_passages(passages, max_chars=20, separator="|") == "第一段|第二段"
+
+
+@pytest.mark.unit
+class TestTextTokenize:
+    """词法切分测试"""
+
+    def test_tokenize_cjk_bigrams_and_latin_words(self):
+        """测试中文按二元组切分、英文小写化"""
+        assert tokenize_terms("OpenAI发布新模型。") == ["openai", "发布", "布新", "新模", "模型"]
+
+    def test_tokenize_single_char_and_empty(self):
+        """测试单字中文与空文本"""
+        assert tokenize_terms("猫 and v1.2.") == ["and", "v1.2", "猫"]
+        assert tokenize_terms("") == []
+
+    def test_normalize_query(self):
+        """测试查询规范化忽略大小写、全角字符、多余空白与结尾标点"""
+        assert normalize_query("  OpenAI  最近有什么新闻？？ ") == "openai 最近有什么新闻"
+        assert normalize_query("ＧＰＴ-5 发布了吗?") == "gpt-5 发布了吗"
+        assert normalize_query("") == ""
+
+
+@pytest.mark.unit
+class TestTokenEstimate:
+    """Token 数估算测试"""
+
+    def test_estimate_tokens_cjk_and_latin(self):
+        """测试中文按字计数、其他字符约 4 字符/token"""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("你好世界") == 4
+        assert estimate_tokens("hello world!") == 3
+        assert estimate_tokens("你好世界 hello world") == 7
+
+    def test_truncate_to_tokens(self):
+        """测试截断结果（含后缀）不超过预算，未超出时原样返回"""
+        text = "频道总结内容" * 10
+        truncated = truncate_to_tokens(text, 10)
+
+        assert truncated.endswith("...")
+        assert estimate_tokens(truncated) <= 10
+        assert truncate_to_tokens("短文本", 10) == "短文本"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,330 @@
+# Copyright 2026 Sakura-Bot
+#
+# 本项目采用 GNU Affero General Public License Version 3.0 (AGPL-3.0) 许可
+#
+# - 署名：必须提供本项目的原始来源链接
+# - 相同方式共享：衍生作品必须采用相同的许可证
+#
+# 本项目源代码：https://github.com/Sakura520222/Sakura-Bot
+# 许可证全文：参见 LICENSE 文件
+
+"""测试 NumPy 向量后端"""
+
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from core.ai.vector_backend import NumpyCollection, NumpyVectorClient
+from core.ai.vector_store import VectorStore
+
+
+@pytest.fixture
+def collection(tmp_path):
+    """创建一个包含 4 条文档的 collection"""
+    coll = NumpyVectorClient(str(tmp_path), dtype="float32").get_or_create_collection("messages")
+    coll.add(
+        ids=["a", "b", "c", "d"],
+        embeddings=[[1.0, 0.0], [0.8, 0.6], [0.0, 1.0], [-1.0, 0.0]],
+        documents=["doc a", "doc b", "doc c", "doc d"],
+        metadatas=[
+            {"channel_id": "c1", "created_ts": 100},
+            {"channel_id": "c1", "created_ts": 200},
+            {"channel_id": "c2", "created_ts": 300},
+            {"channel_id": "c2"},
+        ],
+    )
+    return coll
+
+
+@pytest.mark.unit
+class TestNumpyCollection:
+    """NumpyCollection 测试"""
+
+    def test_query_returns_exact_top_k(self, collection):
+        """测试精确 top-k 与余弦距离"""
+        result = collection.query(query_embeddings=[[2.0, 0.0]], n_results=2)
+
+        assert result["ids"] == [["a", "b"]]
+        assert result["documents"] == [["doc a", "doc b"]]
+        assert result["distances"][0] == pytest.approx([0.0, 0.2], abs=1e-6)
+
+    def test_query_with_where_mask(self, collection):
+        """测试 $and / $eq / $gte 过滤"""
+        result = collection.query(
+            query_embeddings=[[1.0, 0.0]],
+            n_results=10,
+            where={"$and": [{"channel_id": {"$eq": "c1"}}, {"created_ts": {"$gte": 150}}]},
+        )
+
+        assert result["ids"] == [["b"]]
+
+    def test_missing_numeric_field_never_matches_range(self, collection):
+        """测试缺少 created_ts 的文档不会命中范围过滤"""
+        result = collection.query(
+            query_embeddings=[[-1.0, 0.0]], n_results=10, where={"created_ts": {"$lte": 1000}}
+        )
+
+        assert "d" not in result["ids"][0]
+
+    def test_add_skips_existing_and_upsert_overwrites(self, collection):
+        """测试 add 跳过已存在 ID，upsert 覆盖"""
+        collection.add(ids=["a"], embeddings=[[0.0, 1.0]], documents=["new"], metadatas=[{}])
+        assert collection.get(ids=["a"])["documents"] == ["doc a"]
+
+        collection.upsert(ids=["a"], embeddings=[[0.0, 1.0]], documents=["new"], metadatas=[{}])
+        assert collection.get(ids=["a"])["documents"] == ["new"]
+        assert collection.count() == 4
+
+    def test_update_merges_metadata(self, collection):
+        """测试 update 合并元数据，None 删除键"""
+        collection.update(ids=["a"], metadatas=[{"created_ts": None, "tag": "x"}])
+
+        metadata = collection.get(ids=["a"])["metadatas"][0]
+        assert metadata == {"channel_id": "c1", "tag": "x"}
+
+    def test_get_pagination_and_delete(self, collection):
+        """测试分页读取与删除后行复用"""
+        page = collection.get(include=[], limit=2, offset=1)
+        assert page["ids"] == ["b", "c"]
+        assert page["documents"] is None
+
+        collection.delete(ids=["b"])
+        assert collection.count() == 3
+        collection.add(ids=["e"], embeddings=[[0.6, 0.8]], documents=["doc e"], metadatas=[{}])
+        assert collection.count() == 4
+        assert collection.query(query_embeddings=[[0.6, 0.8]], n_results=1)["ids"] == [["e"]]
+
+    def test_persistence_across_reopen(self, collection, tmp_path):
+        """测试重新打开后数据（含删除与更新）保持一致"""
+        collection.delete(ids=["c"])
+        collection.upsert(ids=["b"], embeddings=[[0.0, 1.0]], documents=["b2"], metadatas=[{}])
+
+        reopened = NumpyCollection(str(tmp_path / "messages"), "messages")
+
+        assert reopened.count() == 3
+        assert reopened.get(ids=["b"])["documents"] == ["b2"]
+        assert reopened.query(query_embeddings=[[0.0, 1.0]], n_results=1)["ids"] == [["b"]]
+
+    def test_capacity_growth_and_float16(self, tmp_path):
+        """测试超过初始容量后扩容，float16 检索结果与 float32 一致"""
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((1500, 16)).astype(np.float32)
+        ids = [str(i) for i in range(1500)]
+
+        results = {}
+        for dtype in ("float32", "float16"):
+            client = NumpyVectorClient(str(tmp_path / dtype), dtype=dtype)
+            coll = client.get_or_create_collection("summaries")
+            for start in range(0, 1500, 500):
+                coll.add(
+                    ids=ids[start : start + 500],
+                    embeddings=vectors[start : start + 500].tolist(),
+                    documents=ids[start : start + 500],
+                )
+            results[dtype] = coll.query(query_embeddings=[vectors[42].tolist()], n_results=5)
+
+        assert results["float32"]["ids"][0][0] == "42"
+        assert results["float16"]["ids"][0][0] == "42"
+
+    @pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+    def test_reader_sees_writes_from_another_instance(self, tmp_path, dtype):
+        """测试同一目录的读取方（另一进程）看到写入方后续的写入、扩容与日志压缩"""
+        path = str(tmp_path / "messages")
+        writer = NumpyCollection(path, "messages", dtype=dtype)
+        writer.add(ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]], documents=["a", "b"])
+        reader = NumpyCollection(path, "messages", dtype=dtype)
+        assert reader.count() == 2
+
+        writer.add(ids=["c"], embeddings=[[0.6, 0.8]], documents=["c"], metadatas=[{"k": 1}])
+        assert reader.query(query_embeddings=[[0.6, 0.8]], n_results=1)["ids"] == [["c"]]
+        assert reader.get(where={"k": 1})["ids"] == ["c"]
+
+        # 超过初始容量：写入方替换矩阵文件，读取方重新映射
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((1100, 2)).astype(np.float32)
+        writer.add(ids=[f"v{i}" for i in range(1100)], embeddings=vectors.tolist())
+        result = reader.query(query_embeddings=[vectors[1050].tolist()], n_results=1)
+        assert reader.count() == 1103
+        assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-2)
+
+        # 删除并压缩日志：写入方替换记录文件，读取方重新加载
+        writer.delete(ids=["a"])
+        writer._compact()
+        writer.add(ids=["d"], embeddings=[[-1.0, 0.0]], documents=["d"])
+        assert reader.count() == 1103
+        assert reader.get(ids=["a", "d"])["ids"] == ["d"]
+        assert reader.query(query_embeddings=[[-1.0, 0.0]], n_results=1)["ids"] == [["d"]]
+        # 量化 collection 的缩放系数与全精度副本同样重新映射
+        assert (reader._scales is None) == (dtype != "int8")
+        assert reader.get_storage_info()["full_precision"] == (dtype != "float32")
+        for attr in ("_matrix", "_scales", "_full"):
+            if getattr(writer, attr) is not None:
+                assert getattr(reader, attr).shape == getattr(writer, attr).shape
+
+    def test_dimension_mismatch_rejected(self, collection):
+        """测试维度不一致时拒绝写入且不破坏状态"""
+        with pytest.raises(ValueError):
+            collection.add(ids=["x"], embeddings=[[1.0, 0.0, 0.0]], documents=["x"])
+
+        assert collection.count() == 4
+
+
+@pytest.mark.unit
+class TestQuantizedStorage:
+    """量化存储与全精度重排测试"""
+
+    @pytest.fixture
+    def corpus(self):
+        """带聚类结构的随机语料与查询"""
+        rng = np.random.default_rng(1)
+        centers = rng.standard_normal((8, 32)).astype(np.float32)
+        vectors = centers[rng.integers(0, 8, size=600)] + rng.standard_normal((600, 32)) * 0.5
+        queries = vectors[:20] + rng.standard_normal((20, 32)) * 0.3
+        return vectors.astype(np.float32), queries.astype(np.float32)
+
+    def _build(self, path, vectors, dtype, rescore_factor=4):
+        coll = NumpyCollection(str(path), "bench", dtype=dtype, rescore_factor=rescore_factor)
+        coll.add(ids=[str(i) for i in range(len(vectors))], embeddings=vectors.tolist())
+        return coll
+
+    def test_int8_rescoring_matches_exact(self, tmp_path, corpus):
+        """测试 int8 + 重排与 float32 精确检索的结果和距离一致"""
+        vectors, queries = corpus
+        exact = self._build(tmp_path / "f32", vectors, "float32")
+        quantized = self._build(tmp_path / "i8", vectors, "int8")
+
+        for query in queries:
+            expected = exact.query(query_embeddings=[query.tolist()], n_results=5)
+            actual = quantized.query(query_embeddings=[query.tolist()], n_results=5)
+            assert actual["ids"] == expected["ids"]
+            assert actual["distances"][0] == pytest.approx(expected["distances"][0], abs=1e-5)
+
+    def test_int8_without_rescoring_is_close(self, tmp_path, corpus):
+        """测试关闭重排时 int8 近似得分误差很小"""
+        vectors, queries = corpus
+        quantized = self._build(tmp_path / "i8", vectors, "int8", rescore_factor=0)
+
+        result = quantized.query(query_embeddings=[vectors[3].tolist()], n_results=1)
+        assert result["ids"] == [["3"]]
+        assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-2)
+
+    def test_storage_info_and_files(self, tmp_path, corpus):
+        """测试 int8 检索矩阵约为 float32 的 1/4，并保存全精度副本"""
+        vectors, _ = corpus
+        quantized = self._build(tmp_path / "i8", vectors, "int8")
+
+        info = quantized.get_storage_info()
+        assert info["dtype"] == "int8"
+        assert info["full_precision"] is True
+        assert info["search_bytes_per_vector"] == 32 + 4
+        assert (tmp_path / "i8" / "scales.npy").exists()
+        assert (tmp_path / "i8" / "vectors_full.npy").exists()
+
+        embedding = quantized.get(ids=["7"], include=["embeddings"])["embeddings"][0]
+        expected = vectors[7] / np.linalg.norm(vectors[7])
+        assert embedding == pytest.approx(expected.tolist(), abs=1e-6)
+
+    def test_reopen_keeps_stored_dtype(self, tmp_path, corpus):
+        """测试已存在的 collection 以文件中的精度为准"""
+        vectors, _ = corpus
+        self._build(tmp_path / "i8", vectors[:10], "int8")
+
+        reopened = NumpyCollection(str(tmp_path / "i8"), "bench", dtype="float32")
+
+        assert reopened.get_storage_info()["dtype"] == "int8"
+        result = reopened.query(query_embeddings=[vectors[2].tolist()], n_results=1)
+        assert result["ids"] == [["2"]]
+
+    def test_legacy_float16_collection_without_full_precision(self, tmp_path, corpus):
+        """测试旧版本 float16 collection（无全精度副本）仍可检索"""
+        vectors, _ = corpus
+        self._build(tmp_path / "f16", vectors[:10], "float16")
+        info_path = tmp_path / "f16" / "collection.json"
+        info = json.loads(info_path.read_text(encoding="utf-8"))
+        del info["full_precision"]
+        info_path.write_text(json.dumps(info), encoding="utf-8")
+        (tmp_path / "f16" / "vectors_full.npy").unlink()
+
+        reopened = NumpyCollection(str(tmp_path / "f16"), "bench")
+
+        assert reopened.get_storage_info()["full_precision"] is False
+        result = reopened.query(query_embeddings=[vectors[4].tolist()], n_results=1)
+        assert result["ids"] == [["4"]]
+
+    def test_client_per_collection_dtype(self, tmp_path):
+        """测试客户端按 collection 名称覆盖精度"""
+        client = NumpyVectorClient(
+            str(tmp_path), dtype="float16", collection_dtypes={"messages": "int8"}
+        )
+
+        assert client.get_or_create_collection("messages")._dtype == np.int8
+        assert client.get_or_create_collection("summaries")._dtype == np.float16
+
+        with pytest.raises(ValueError):
+            NumpyVectorClient(str(tmp_path), collection_dtypes={"messages": "int4"})
+
+
+@pytest.mark.unit
+class TestVectorStoreBackendSelection:
+    """VectorStore 后端选择测试"""
+
+    def test_numpy_backend_end_to_end(self, tmp_path):
+        """测试显式选择 NumPy 后端后可写入并按时间过滤检索"""
+        env = {"VECTOR_BACKEND": "numpy", "VECTOR_DB_PATH": str(tmp_path)}
+        with patch.dict("os.environ", env):
+            store = VectorStore()
+
+        assert store.backend == "numpy"
+        store.add_messages_batch(
+            ids=["c:1", "c:2"],
+            texts=["old", "new"],
+            metadatas=[
+                {"created_at": "2026-01-01T00:00:00+00:00"},
+                {"created_at": "2026-03-01T00:00:00+00:00"},
+            ],
+            embeddings=[[1.0, 0.0], [0.9, 0.1]],
+        )
+
+        results = store._query_collection(
+            store.messages_collection, [1.0, 0.0], top_k=5, date_after="2026-02-01T00:00:00"
+        )
+        assert [r["doc_id"] for r in results] == ["c:2"]
+        stats = store.get_stats()
+        assert stats["backend"] == "numpy"
+        assert stats["messages"]["storage"]["dimension"] == 2
+
+    def test_numpy_backend_collection_dtypes_from_env(self, tmp_path):
+        """测试通过环境变量为 messages 选择 int8 量化"""
+        env = {
+            "VECTOR_BACKEND": "numpy",
+            "VECTOR_DB_PATH": str(tmp_path),
+            "VECTOR_NUMPY_MESSAGES_DTYPE": "int8",
+            "VECTOR_NUMPY_RESCORE_FACTOR": "2",
+        }
+        with patch.dict("os.environ", env):
+            store = VectorStore()
+
+        assert store.messages_collection.get_storage_info()["dtype"] == "int8"
+        assert store.messages_collection.rescore_factor == 2
+        assert store.collection.get_storage_info()["dtype"] == "float16"
+
+    @patch("core.ai.vector_store.CHROMADB_AVAILABLE", False)
+    def test_auto_falls_back_to_numpy(self, tmp_path):
+        """测试 auto 模式下 ChromaDB 不可用时回退到 NumPy 后端"""
+        with patch.dict("os.environ", {"VECTOR_BACKEND": "auto", "VECTOR_DB_PATH": str(tmp_path)}):
+            store = VectorStore()
+
+        assert store.is_available() is True
+        assert store.backend == "numpy"
+
+    @patch("core.ai.vector_store.CHROMADB_AVAILABLE", False)
+    def test_chroma_backend_does_not_fall_back(self, tmp_path):
+        """测试显式选择 chroma 时不回退"""
+        with patch.dict(
+            "os.environ", {"VECTOR_BACKEND": "chroma", "VECTOR_DB_PATH": str(tmp_path)}
+        ):
+            store = VectorStore()
+
+        assert store.is_available() is False
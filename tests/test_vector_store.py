@@ -4,11 +4,13 @@ Copyright 2026 Sakura-Bot
 本项目采用 AGPL-3.0 许可
 """
 
-from unittest.mock import MagicMock, patch
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from core.ai.vector_store import VectorStore, get_vector_store
+from core.ai.vector_store import VectorStore, get_vector_store, with_created_ts
+from core.migrations.backfill_vector_created_ts import backfill_vector_created_ts
 
 
 @pytest.mark.unit
@@ -168,6 +170,297 @@ class TestSearchSimilar:
         assert results == []
 
 
+@pytest.mark.unit
+class TestAsyncVariants:
+    """异步搜索/写入测试"""
+
+    @pytest.mark.asyncio
+    @patch("core.ai.vector_store.CHROMADB_AVAILABLE", True)
+    @patch("core.ai.vector_store.chromadb.PersistentClient")
+    @patch("core.ai.embedding_generator.get_async_embedding_generator")
+    async def test_asearch_similar_uses_async_embedding(self, mock_get_emb, mock_client):
+        """测试异步搜索使用异步 embedding 客户端"""
+        mock_collection = MagicMock()
+        mock_collection.count.return_value = 10
+        mock_collection.query.return_value = {
+            "ids": [["1"]],
+            "documents": [["text1"]],
+            "metadatas": [[{"channel_id": "test"}]],
+            "distances": [[0.1]],
+        }
+        mock_client.return_value.get_or_create_collection.return_value = mock_collection
+
+        mock_emb_gen = MagicMock()
+        mock_emb_gen.is_available.return_value = True
+        mock_emb_gen.agenerate = AsyncMock(return_value=[0.1, 0.2])
+        mock_get_emb.return_value = mock_emb_gen
+
+        store = VectorStore()
+        results = await store.asearch_similar("test")
+
+        assert len(results) == 1
+        assert results[0]["summary_id"] == 1
+        mock_emb_gen.agenerate.assert_awaited_once_with("test", use_cache=True)
+        mock_emb_gen.generate.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch("core.ai.vector_store.CHROMADB_AVAILABLE", True)
+    @patch("core.ai.vector_store.chromadb.PersistentClient")
+    @patch("core.ai.embedding_generator.get_async_embedding_generator")
+    async def test_aadd_summary_success(self, mock_get_emb, mock_client):
+        """测试异步添加总结向量"""
+        mock_collection = MagicMock()
+        mock_client.return_value.get_or_create_collection.return_value = mock_collection
+
+        mock_emb_gen = MagicMock()
+        mock_emb_gen.is_available.return_value = True
+        mock_emb_gen.agenerate = AsyncMock(return_value=[0.1, 0.2])
+        mock_get_emb.return_value = mock_emb_gen
+
+        store = VectorStore()
+        result = await store.aadd_summary(1, "test summary", {"channel_id": "test"})
+
+        assert result is True
+        mock_collection.add.assert_called_once()
+
+    @pytest.mark.asyncio
+    @patch("core.ai.vector_store.CHROMADB_AVAILABLE", True)
+    @patch("core.ai.vector_store.chromadb.PersistentClient")
+    @patch("core.ai.embedding_generator.get_async_embedding_generator")
+    async def test_aadd_summary_embedding_failed(self, mock_get_emb, mock_client):
+        """测试异步添加时 embedding 生成失败"""
+        mock_client.return_value.get_or_create_collection.return_value = MagicMock()
+
+        mock_emb_gen = MagicMock()
+        mock_emb_gen.is_available.return_value = True
+        mock_emb_gen.agenerate = AsyncMock(return_value=None)
+        mock_get_emb.return_value = mock_emb_gen
+
+        store = VectorStore()
+        result = await store.aadd_summary(1, "test", {})
+
+        assert result is False
+
+
+@pytest.mark.unit
+class TestSearchAll:
+    """双 collection 联合检索测试"""
+
+    @staticmethod
+    def _make_collection(ids, similarities):
+        collection = MagicMock()
+        collection.count.return_value = 10
+        collection.query.return_value = {
+            "ids": [ids],
+            "documents": [[f"doc-{i}" for i in ids]],
+            "metadatas": [[{} for _ in ids]],
+            "distances": [[1 - sim for sim in similarities]],
+        }
+        return collection
+
+    @patch("core.ai.vector_store.CHROMADB_AVAILABLE", True)
+    @patch("core.ai.vector_store.chromadb.PersistentClient")
+    @patch("core.ai.embedding_generator.get_embedding_generator")
+    def test_search_all_embeds_query_once(self, mock_get_emb, mock_client):
+        """测试联合检索只生成一次查询向量"""
+        summaries = self._make_collection(["1", "2"], [0.9, 0.8])
+        messages = self._make_collection(["c:1", "c:2"], [0.5, 0.4])
+        passages = self._make_collection([], [])
+        mock_client.return_value.get_or_create_collection.side_effect = [
+            summaries,
+            messages,
+            passages,
+        ]
+
+        mock_emb_gen = MagicMock()
+        mock_emb_gen.is_available.return_value = True
+        mock_emb_gen.generate.return_value = [0.1, 0.2]
+        mock_get_emb.return_value = mock_emb_gen
+
+        store = VectorStore()
+        results = store.search_all("test", top_k=10)
+
+        mock_emb_gen.generate.assert_called_once_with("test", use_cache=True)
+        assert summaries.query.call_args.kwargs["query_embeddings"] == [[0.1, 0.2]]
+        assert messages.query.call_args.kwargs["query_embeddings"] == [[0.1, 0.2]]
+        assert len(results) == 4
+        assert {r["source"] for r in results} == {"summary", "message"}
+
+    def test_merge_keeps_weaker_collection_below(self):
+        """测试某个 collection 的命中整体较弱时，全部排在另一个 collection 的命中之后"""
+        grouped = [
+            ("summary", [{"similarity": 0.8}, {"similarity": 0.9}, {"similarity": 0.85}]),
+            ("message", [{"similarity": 0.45}, {"similarity": 0.5}, {"similarity": 0.4}]),
+        ]
+
+        merged = VectorStore._merge_collection_results(grouped, top_k=6)
+
+        assert [(r["source"], r["similarity"]) for r in merged] == [
+            ("summary", 0.9),
+            ("summary", 0.85),
+            ("summary", 0.8),
+            ("message", 0.5),
+            ("message", 0.45),
+            ("message", 0.4),
+        ]
+
+    def test_merge_interleaves_by_similarity(self):
+        """测试各 collection 的结果按原始相似度交错排序并截断到 top_k"""
+        grouped = [
+            ("summary", [{"similarity": 0.9}, {"similarity": 0.6}]),
+            ("message", [{"similarity": 0.95}, {"similarity": 0.7}]),
+        ]
+
+        merged = VectorStore._merge_collection_results(grouped, top_k=3)
+
+        assert [(r["source"], r["similarity"]) for r in merged] == [
+            ("message", 0.95),
+            ("summary", 0.9),
+            ("message", 0.7),
+        ]
+
+    @pytest.mark.asyncio
+    @patch("core.ai.vector_store.CHROMADB_AVAILABLE", True)
+    @patch("core.ai.vector_store.chromadb.PersistentClient")
+    @patch("core.ai.embedding_generator.get_async_embedding_generator")
+    async def test_asearch_all_embeds_query_once(self, mock_get_emb, mock_client):
+        """测试异步联合检索只生成一次查询向量"""
+        summaries = self._make_collection(["1"], [0.9])
+        messages = self._make_collection(["c:1"], [0.5])
+        passages = self._make_collection([], [])
+        mock_client.return_value.get_or_create_collection.side_effect = [
+            summaries,
+            messages,
+            passages,
+        ]
+
+        mock_emb_gen = MagicMock()
+        mock_emb_gen.is_available.return_value = True
+        mock_emb_gen.agenerate = AsyncMock(return_value=[0.1, 0.2])
+        mock_get_emb.return_value = mock_emb_gen
+
+        store = VectorStore()
+        results = await store.asearch_all("test", top_k=10)
+
+        mock_emb_gen.agenerate.assert_awaited_once_with("test", use_cache=True)
+        assert len(results) == 2
+
+
+@pytest.mark.unit
+class TestDateFilterPushdown:
+    """时间范围过滤下推测试"""
+
+    def test_with_created_ts_derives_timestamp(self):
+        """测试由 created_at 推导 created_ts，且不修改原字典"""
+        metadata = {"created_at": "2026-01-01T00:00:00+00:00"}
+
+        patched = with_created_ts(metadata)
+
+        assert patched["created_ts"] == 1767225600
+        assert "created_ts" not in metadata
+        assert "created_ts" not in with_created_ts({"created_at": "not-a-date"})
+
+    def test_date_range_pushed_into_where_clause(self):
+        """测试时间范围转换为 created_ts 的 $gte/$lte 条件，不再超量召回"""
+        collection = MagicMock()
+        collection.count.return_value = 100
+        collection.query.return_value = {"ids": [[]], "documents": [[]], "metadatas": [[]]}
+
+        # 绕过 __init__，仅测试查询参数构建
+        VectorStore.__new__(VectorStore)._query_collection(
+            collection,
+            [0.1, 0.2],
+            top_k=5,
+            filter_metadata={"channel_id": "c1"},
+            date_after="2026-01-01T00:00:00+00:00",
+            date_before="2026-01-02T00:00:00",
+        )
+
+        params = collection.query.call_args.kwargs
+        assert params["n_results"] == 5
+        assert params["where"] == {
+            "$and": [
+                {"channel_id": {"$eq": "c1"}},
+                {"created_ts": {"$gte": 1767225600}},
+                {"created_ts": {"$lte": 1767312000}},
+            ]
+        }
+
+    @pytest.mark.asyncio
+    async def test_real_chroma_filter_and_backfill(self, tmp_path):
+        """测试真实 ChromaDB 中的下推过滤与旧文档回填"""
+        with patch.dict("os.environ", {"VECTOR_DB_PATH": str(tmp_path / "vectors")}):
+            store = VectorStore()
+
+        store.add_messages_batch(
+            ids=["c:1", "c:2"],
+            texts=["old", "new"],
+            metadatas=[
+                {"created_at": "2026-01-01T00:00:00+00:00"},
+                {"created_at": "2026-03-01T00:00:00+00:00"},
+            ],
+            embeddings=[[1.0, 0.0], [0.9, 0.1]],
+        )
+        # 模拟旧版本写入的文档（只有 created_at）
+        store.messages_collection.add(
+            ids=["c:3"],
+            embeddings=[[0.8, 0.2]],
+            documents=["legacy"],
+            metadatas=[{"created_at": "2026-03-02T00:00:00+00:00"}],
+        )
+
+        def _search():
+            results = store._query_collection(
+                store.messages_collection,
+                [1.0, 0.0],
+                top_k=10,
+                date_after="2026-02-01T00:00:00+00:00",
+            )
+            return sorted(r["doc_id"] for r in results)
+
+        assert _search() == ["c:2"]
+
+        dry_run = await backfill_vector_created_ts(store, dry_run=True)
+        assert dry_run["details"]["messages"]["updated"] == 1
+        assert _search() == ["c:2"]
+
+        result = await backfill_vector_created_ts(store, batch_size=2)
+        assert result["success"] is True
+        assert result["details"]["messages"]["updated"] == 1
+        assert result["details"]["messages"]["skipped"] == 2
+        assert _search() == ["c:2", "c:3"]
+
+        # 幂等：再次执行不会更新任何文档
+        again = await backfill_vector_created_ts(store)
+        assert again["details"]["messages"]["updated"] == 0
+
+    @pytest.mark.asyncio
+    async def test_startup_migrations_run_backfill(self):
+        """测试启动迁移在后台自动回填 created_ts"""
+        from core.initializers.database_initializer import DatabaseInitializer
+
+        backfill = AsyncMock()
+        initializer = DatabaseInitializer()
+        with (
+            patch(
+                "core.migrations.migrate_forwarding_table_v1.ensure_forwarding_table_updated",
+                AsyncMock(),
+            ),
+            patch(
+                "core.migrations.fix_reviewed_at_datetime.ensure_reviewed_at_datetime_fixed",
+                AsyncMock(),
+            ),
+            patch(
+                "core.migrations.backfill_vector_created_ts.ensure_vector_created_ts_backfilled",
+                backfill,
+            ),
+        ):
+            await initializer._run_migrations(MagicMock())
+            await asyncio.gather(*initializer._background_tasks)
+
+        backfill.assert_awaited_once()
+
+
 @pytest.mark.unit
 class TestDeleteSummary:
     """删除总结测试"""
@@ -251,3 +544,73 @@ class TestGetVectorStore:
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+@pytest.mark.unit
+class TestSummaryPassages:
+    """总结段落切分与检索测试"""
+
+    REPORT = "**周报**\n\n一、AI 动态\n" + "模型发布。" * 30 + "\n\n二、硬件\n" + "芯片发布。" * 30
+
+    @staticmethod
+    def _embed(text):
+        """确定性的测试向量：按话题关键字区分方向"""
+        return [1.0 if "模型" in text else 0.0, 1.0 if "芯片" in text else 0.0, 0.1]
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        """NumPy 后端的真实向量存储，Embedding 使用确定性假实现"""
+        emb_gen = MagicMock()
+        emb_gen.is_available.return_value = True
+        emb_gen.generate.side_effect = lambda text, **kwargs: self._embed(text)
+        emb_gen.batch_generate.side_effect = lambda texts: [self._embed(t) for t in texts]
+
+        env = {"VECTOR_BACKEND": "numpy", "VECTOR_DB_PATH": str(tmp_path)}
+        with (
+            patch.dict("os.environ", env),
+            patch("core.ai.embedding_generator.get_embedding_generator", return_value=emb_gen),
+        ):
+            yield VectorStore()
+
+    def test_build_passage_records_skips_short_summaries(self):
+        """测试短总结不生成段落，长总结段落带父 ID 与偏移"""
+        with patch("core.ai.vector_store.SUMMARY_PASSAGE_MAX_CHARS", 200):
+            parent_ids, ids, documents, metadatas = VectorStore._build_passage_records(
+                [1, 2], ["短总结。", self.REPORT], [{}, {"channel_id": "c"}]
+            )
+
+        assert parent_ids == [1, 2]
+        assert ids[0] == "2#0"
+        assert {m["summary_id"] for m in metadatas} == {2}
+        for document, metadata in zip(documents, metadatas, strict=True):
+            assert self.REPORT[metadata["start"] : metadata["end"]] == document
+            assert metadata["channel_id"] == "c"
+
+    def test_search_returns_parent_with_best_passage(self, store):
+        """测试检索按父总结去重并高亮最佳段落"""
+        with patch("core.ai.vector_store.SUMMARY_PASSAGE_MAX_CHARS", 200):
+            assert store.add_summary(7, self.REPORT, {"channel_id": "c"}) is True
+        assert store.passages_collection.count() >= 2
+
+        results = store.search_similar("芯片", top_k=5)
+
+        assert [r["summary_id"] for r in results] == [7]
+        assert results[0]["summary_text"] == self.REPORT
+        assert "芯片" in results[0]["highlight"]
+        assert "模型" not in results[0]["highlight"]
+        assert results[0]["similarity"] == pytest.approx(
+            results[0]["matched_passages"][0]["similarity"]
+        )
+
+    def test_reindex_replaces_and_delete_removes_passages(self, store):
+        """测试重新写入会替换旧段落，删除总结会删除其段落"""
+        with patch("core.ai.vector_store.SUMMARY_PASSAGE_MAX_CHARS", 200):
+            store.add_summary(7, self.REPORT, {})
+            store.index_summary_passages([7], ["已缩短的总结。"], [{}])
+
+        assert store.passages_collection.count() == 0
+
+        with patch("core.ai.vector_store.SUMMARY_PASSAGE_MAX_CHARS", 200):
+            store.index_summary_passages([7], [self.REPORT], [{}])
+        assert store.delete_summary(7) is True
+        assert store.passages_collection.count() == 0
@@ -514,11 +514,31 @@ export interface VectorStats {
   messages: {
     available?: boolean;
     total_vectors?: number;
+    unpartitioned_vectors?: number;
+    partition_months?: number;
+    retention_months?: number;
+    retention_action?: "archive" | "drop";
+    partitions?: MessagePartition[];
     error?: string;
   };
   total_vectors?: number;
 }
 
+export interface MessagePartition {
+  name: string;
+  start: string;
+  end: string;
+  total_vectors: number | null;
+  expired: boolean;
+}
+
+export interface RetentionResult {
+  expired: string[];
+  action: "archive" | "drop" | null;
+  archived: Record<string, string>;
+  dry_run: boolean;
+}
+
 export interface VectorDocument {
   id: string;
   document: string;
@@ -573,6 +593,49 @@ export async function clearVectorCollection(collection: string) {
   return res.data;
 }
 
+export async function getMessagePartitions() {
+  const res = await apiClient.get("/vector-store/partitions");
+  return res.data;
+}
+
+export async function applyMessageRetention(dryRun = false) {
+  const res = await apiClient.post("/vector-store/partitions/retention", null, {
+    params: { dry_run: dryRun },
+  });
+  return res.data;
+}
+
+export interface ReindexProgress {
+  status: "idle" | "running" | "completed" | "failed" | "cancelled";
+  started_at?: string;
+  finished_at?: string | null;
+  resumed_from?: number;
+  last_id?: number;
+  total?: number;
+  processed?: number;
+  indexed?: number;
+  failed?: number;
+  skipped?: number;
+  failed_ids?: number[];
+  percent: number;
+  error?: string | null;
+}
+
+export async function getReindexProgress() {
+  const res = await apiClient.get("/vector-store/reindex");
+  return res.data;
+}
+
+export async function startReindex(reset = false) {
+  const res = await apiClient.post("/vector-store/reindex", null, { params: { reset } });
+  return res.data;
+}
+
+export async function cancelReindex() {
+  const res = await apiClient.post("/vector-store/reindex/cancel");
+  return res.data;
+}
+
 // ==================== 数据库管理 ====================
 
 export interface TableInfo {